@@ -0,0 +1,51 @@
+import argparse
+import statistics
+
+from benchmarks.fixtures import FIXTURES, fixture_graph
+from benchmarks.utils import measure, percentile, random_points, report
+from route_builder import builders, utils
+
+
+def main() -> None:
+    """ Замер построения альтернативных маршрутов методом плато для k = 1..5 и запросов с разными optimizer """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixture', default='city', choices=list(FIXTURES))
+    parser.add_argument('--engine', default='dijkstra')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 2, 3, 4, 5])
+    args = parser.parse_args()
+
+    graph = fixture_graph(args.fixture, args.engine)
+    graph.route_cache = None
+
+    points = random_points(graph.bbox, args.requests * 2, seed=2)
+    pairs = [points[index:index + 2] for index in range(0, len(points), 2)]
+
+    for count in args.counts:
+        route_builders = [builders.RouteBuilder(graph, points_coordinates=pair, optimizer='travel_time',
+                                                alternatives=count) for pair in pairs]
+        results = [route_builder.build() for route_builder in route_builders]
+        timings = [measure(route_builder.build, 1)[0] * 1000 for route_builder in route_builders]
+
+        routes = [result.routes for result in results if isinstance(result, utils.Alternatives)]
+        report('alternatives', method='plateau', fixture=args.fixture, count=count,
+               mean_routes=round(statistics.mean(len(result) for result in routes), 2),
+               mean_stretch=round(statistics.mean(result[-1].travel_time / result[0].travel_time
+                                                  for result in routes), 4),
+               mean_ms=round(statistics.mean(timings), 4), p99_ms=round(percentile(timings, 99), 4))
+
+    # Текущий способ получить варианты: отдельный запрос на каждый optimizer
+    def _per_optimizer(pair):
+        return [builders.build_route(graph, points_coordinates=pair, optimizer=optimizer)
+                for optimizer in ('travel_time', 'length')]
+
+    results = [_per_optimizer(pair) for pair in pairs]
+    timings = [measure(lambda pair=pair: _per_optimizer(pair), 1)[0] * 1000 for pair in pairs]
+
+    report('alternatives', method='per_optimizer', fixture=args.fixture, count=2,
+           identical=sum(first.paths == second.paths for first, second in results),
+           mean_ms=round(statistics.mean(timings), 4), p99_ms=round(percentile(timings, 99), 4))
+
+
+if __name__ == '__main__':
+    main()
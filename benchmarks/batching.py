@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import aio_pika
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, percentile, random_points, report
+from listener.__main__ import run
+from route_builder import builders
+from tests.utils import Consumer, Publisher
+
+
+class LatencyConsumer(Consumer):
+    """ Подписчик, фиксирующий время получения ответа по correlation_id """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = {}
+        self.waiters = {}
+
+    async def _process_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        async with message.process():
+            self.received[message.correlation_id] = time.perf_counter()
+
+            waiter = self.waiters.pop(message.correlation_id, None)
+            if waiter and not waiter.done():
+                waiter.set_result(None)
+
+
+async def _load(graph: builders.Graph, requests: list, batch_size: int, concurrency: int) -> dict:
+    """
+    Отправка запросов в запущенный listener и замер задержек ответов
+    :param graph: граф
+    :param requests: конфигурации маршрутов
+    :param batch_size: размер пачки listener'а
+    :param concurrency: количество одновременно ожидающих ответа запросов
+    :return: метрики
+    """
+    settings.RMQ_BATCH_SIZE = batch_size
+    settings.RMQ_PREFETCH_COUNT = max(concurrency, batch_size)
+    reply_to = f'{settings.APP_NAME}:benchmark_reply:{uuid.uuid4()}'
+
+    server = asyncio.create_task(run(graph))
+    await asyncio.sleep(1)
+
+    publisher = Publisher(settings.RMQ_URL, settings.RMQ_QUEUE, reply_to=reply_to)
+    consumer = LatencyConsumer(settings.RMQ_URL, reply_to)
+    await publisher.create_connection()
+    await consumer.create_connection()
+    await consumer.consume()
+
+    sent = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(request: dict) -> None:
+        async with semaphore:
+            correlation_id = str(uuid.uuid4())
+            waiter = consumer.waiters[correlation_id] = asyncio.get_running_loop().create_future()
+            sent[correlation_id] = time.perf_counter()
+            await publisher.exchange.publish(
+                aio_pika.Message(body=json.dumps(request).encode(), reply_to=reply_to, correlation_id=correlation_id),
+                routing_key=publisher.routing_key)
+
+            await waiter
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    duration = time.perf_counter() - started_at
+
+    await publisher.close()
+    await consumer.close()
+    server.cancel()
+
+    latencies = [(consumer.received[key] - value) * 1000 for key, value in sent.items()]
+    return {'p50_ms': round(percentile(latencies, 50), 2), 'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.mean(latencies), 2), 'msgs_per_second': round(len(requests) / duration, 2)}
+
+
+def main() -> None:
+    """ Нагрузочный замер listener'а: задержка p50/p99 и сообщений в секунду в зависимости от размера пачки """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--distinct-points', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 64])
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type)
+    graph.build()
+    # Кеш участков выключен: все размеры пачки обрабатывают одни и те же запросы
+    graph.route_cache = None
+
+    points = random_points(BENCHMARK_BBOX, args.distinct_points)
+    requests = [{'points_coordinates': [points[index % len(points)], points[index * 7 % len(points)]]}
+                for index in range(args.requests)]
+
+    for batch_size in args.batch_sizes:
+        metrics = asyncio.run(_load(graph, requests, batch_size, args.concurrency))
+        report('batching', batch_size=batch_size, requests=len(requests), concurrency=args.concurrency, **metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import statistics
+from dataclasses import asdict
+
+from benchmarks.utils import measure, report
+from route_builder import codecs, utils
+
+
+def _route(points: int, nodes: int) -> utils.Route:
+    """
+    Маршрут с путями реалистичного размера: идентификаторы узлов OSM растут с небольшим шагом
+    :param points: количество точек маршрута
+    :param nodes: количество узлов в пути участка
+    :return: Route
+    """
+    paths = [[5000000000 + leg * nodes * 7 + node * 7 for node in range(nodes)] for leg in range(points - 1)]
+    return utils.Route(paths=paths, length=12345.6, travel_time=1234.5, map=None)
+
+
+def main() -> None:
+    """ Замер кодирования, декодирования и размера ответа: json.dumps(asdict), JSON-кодек и msgpack """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--points', type=int, nargs='+', default=[2, 10])
+    parser.add_argument('--nodes', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    for points in args.points:
+        route = _route(points, args.nodes)
+        body = json.dumps(asdict(route)).encode()
+
+        encode = measure(lambda route=route: json.dumps(asdict(route)).encode(), args.repeat)
+        decode = measure(lambda body=body: json.loads(body), args.repeat)
+        report('codecs', codec='json.dumps(asdict)', points=points,
+               encode_mean_ms=round(statistics.mean(encode) * 1000, 4),
+               decode_mean_ms=round(statistics.mean(decode) * 1000, 4), bytes=len(body))
+
+        for content_type in codecs.CODECS:
+            try:
+                codec = codecs.get_codec(content_type)
+            except ValueError as ex:
+                report('codecs', codec=content_type, error=str(ex))
+                continue
+
+            body = codec.encode(route)
+            encode = measure(lambda codec=codec, route=route: codec.encode(route), args.repeat)
+            decode = measure(lambda codec=codec, body=body: codec.decode(body), args.repeat)
+
+            report('codecs', codec=content_type, points=points,
+                   encode_mean_ms=round(statistics.mean(encode) * 1000, 4),
+                   decode_mean_ms=round(statistics.mean(decode) * 1000, 4), bytes=len(body))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import argparse
+import statistics
+
+from osmnx.utils_graph import get_route_edge_attributes
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, utils
+
+
+def main() -> None:
+    """ Замер суммирования атрибутов ребер маршрута: osmnx по MultiDiGraph и векторно по массивам ребер """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--points', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type)
+    graph.build()
+
+    for points in args.points:
+        nodes = graph.nearest_nodes(*utils.split_coordinates(random_points(BENCHMARK_BBOX, points)))
+        paths = [path for path in graph.shortest_path(nodes[:-1], nodes[1:], 'length') if path]
+
+        def osmnx_sums(paths=paths):
+            return [{attr_name: sum(get_route_edge_attributes(graph.graph, path, attribute=attr_name))
+                     for attr_name in builders.EDGE_ATTRIBUTES} for path in paths]
+
+        for method, func in (('get_route_edge_attributes', osmnx_sums),
+                             ('Graph.path_sums', lambda paths=paths: graph.path_sums(paths, 'length'))):
+            timings = measure(func, args.repeat)
+            report('edge_sums', method=method, legs=len(paths), edges=sum(len(path) - 1 for path in paths),
+                   mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   median_ms=round(statistics.median(timings) * 1000, 4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import resource
+import statistics
+import tracemalloc
+from dataclasses import astuple
+
+import osmnx as ox
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, utils
+from route_builder.csr import CSRGraph
+
+
+def _traced_size(func) -> int:
+    """
+    Объем памяти, выделенной функцией и оставшейся после ее выполнения
+    :param func: функция без аргументов
+    :return: количество байт
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    """ Замер задержки запроса и занимаемой памяти для алгоритмов поиска кратчайшего пути """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--weight', default='length', choices=['length', 'travel_time'])
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine='networkx')
+    graph.build()
+
+    report('engines_memory', engine='networkx', nodes=len(graph.graph.nodes), edges=len(graph.graph.edges),
+           traced_bytes=_traced_size(lambda: ox.graph_from_bbox(*astuple(BENCHMARK_BBOX),
+                                                          network_type=args.network_type)))
+    report('engines_memory', engine='csr', nodes=len(graph.graph.nodes), edges=len(graph.graph.edges),
+           traced_bytes=_traced_size(lambda: CSRGraph.from_graph(graph.graph)), array_bytes=graph.csr.nbytes)
+
+    x, y = utils.split_coordinates(random_points(BENCHMARK_BBOX, args.queries * 2))
+    nodes = graph.nearest_nodes(x, y)
+    pairs = list(zip(nodes[::2], nodes[1::2]))
+
+    for engine in ('networkx', 'dijkstra', 'bidirectional'):
+        graph.engine = engine
+        timings = []
+
+        for orig, dest in pairs:
+            timings.extend(measure(lambda orig=orig, dest=dest: graph.shortest_path(orig, dest, args.weight), 1))
+
+        report('engines_latency', engine=engine, weight=args.weight, queries=len(pairs),
+               mean_ms=round(statistics.mean(timings) * 1000, 4),
+               median_ms=round(statistics.median(timings) * 1000, 4),
+               max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import itertools
+import math
+import random
+from dataclasses import astuple
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import networkx as nx
+import osmnx as ox
+
+from route_builder import builders, utils
+
+# Каталог фикстур OSM в формате GraphML (<наименование>.graphml)
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+# Размеры фикстур: зона OSM для сохранения фикстуры и размер синтетической сетки (строки, столбцы),
+# которая используется, если файла фикстуры нет
+FIXTURES: Dict[str, Tuple[utils.Bbox, Tuple[int, int]]] = {
+    'neighbourhood': (utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280), (20, 20)),
+    'city': (utils.Bbox(56.01000, 55.96000, 37.25000, 37.13000), (120, 120)),
+    'region': (utils.Bbox(56.10000, 55.90000, 37.40000, 37.00000), (300, 300)),
+}
+
+# Шаг синтетической сетки в метрах и скорости улиц (каждая ARTERIAL_STEP-я линия - магистраль)
+GRID_STEP = 100
+ARTERIAL_STEP = 10
+SPEEDS = {'primary': 60.0, 'residential': 30.0}
+
+
+def _add_nodes(graph: nx.MultiDiGraph, rows: int, cols: int, origin: Tuple[float, float],
+               generator: random.Random) -> None:
+    """
+    Добавление узлов сетки со смещением
+    :param graph: граф
+    :param rows: количество строк узлов
+    :param cols: количество столбцов узлов
+    :param origin: координаты юго-западного угла (Y, X)
+    :param generator: генератор смещений
+    :return: None
+    """
+    lat_step = GRID_STEP / 111_320
+    lon_step = GRID_STEP / (111_320 * math.cos(math.radians(origin[0])))
+
+    for row in range(rows):
+        for col in range(cols):
+            graph.add_node(row * cols + col + 1,
+                           y=origin[0] + (row + generator.uniform(-0.2, 0.2)) * lat_step,
+                           x=origin[1] + (col + generator.uniform(-0.2, 0.2)) * lon_step)
+
+
+def _add_street(graph: nx.MultiDiGraph, edge: Tuple[int, int], highway: str, speed: float, osmid: int) -> None:
+    """
+    Добавление двусторонней улицы между соседними узлами
+    :param graph: граф
+    :param edge: (узел, соседний узел)
+    :param highway: тип улицы
+    :param speed: скорость, км/ч
+    :param osmid: идентификатор улицы
+    :return: None
+    """
+    node, neighbour = edge
+    length = ox.distance.great_circle_vec(graph.nodes[node]['y'], graph.nodes[node]['x'],
+                                          graph.nodes[neighbour]['y'], graph.nodes[neighbour]['x'])
+
+    for orig, dest in (edge, (neighbour, node)):
+        graph.add_edge(orig, dest, osmid=osmid, highway=highway, oneway=False,
+                       length=length, speed_kph=speed, travel_time=length / (speed / 3.6))
+
+
+def _add_streets(graph: nx.MultiDiGraph, rows: int, cols: int, removed: float, generator: random.Random) -> None:
+    """
+    Добавление улиц между соседними узлами сетки: каждая ARTERIAL_STEP-я линия - магистраль,
+    доля removed остальных улиц не добавляется
+    :param graph: граф
+    :param rows: количество строк узлов
+    :param cols: количество столбцов узлов
+    :param removed: доля удаляемых ребер
+    :param generator: генератор удаления ребер и скоростей
+    :return: None
+    """
+    osmids = itertools.count(1)
+
+    for row in range(rows):
+        for col in range(cols):
+            node = row * cols + col + 1
+
+            # Соседи справа (по строке row) и сверху (по столбцу col)
+            neighbours = ([(node + 1, row)] if col + 1 < cols else []) + \
+                ([(node + cols, col)] if row + 1 < rows else [])
+
+            for neighbour, line in neighbours:
+                highway = 'primary' if line % ARTERIAL_STEP == 0 else 'residential'
+                if highway == 'residential' and generator.random() < removed:
+                    continue
+
+                _add_street(graph, (node, neighbour), highway, SPEEDS[highway] * generator.uniform(0.8, 1.0),
+                            next(osmids))
+
+
+def grid_graph(rows: int, cols: int, origin: Tuple[float, float] = (55.95, 37.1), seed: int = 0,
+               removed: float = 0.1) -> nx.MultiDiGraph:
+    """
+    Синтетическая улично-дорожная сеть в формате osmnx: сетка с шагом GRID_STEP, магистралями,
+    случайно удаленными ребрами и смещенными узлами, чтобы кратчайшие пути не были равнозначны
+    :param rows: количество строк узлов
+    :param cols: количество столбцов узлов
+    :param origin: координаты юго-западного угла (Y, X)
+    :param seed: начальное значение генератора
+    :param removed: доля удаляемых ребер
+    :return: MultiDiGraph с атрибутами узлов x, y и ребер length, highway, speed_kph, travel_time
+    """
+    generator = random.Random(seed)
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+
+    _add_nodes(graph, rows, cols, origin, generator)
+    _add_streets(graph, rows, cols, removed, generator)
+
+    # Удаление ребер может отделить узлы: остается наибольшая компонента, как в графах osmnx
+    largest = max(nx.strongly_connected_components(graph), key=len)
+    return graph.subgraph(largest).copy()
+
+
+def fixture_path(name: str) -> Path:
+    """
+    Путь к файлу фикстуры
+    :param name: наименование фикстуры
+    :return: путь
+    """
+    return FIXTURES_DIR / f'{name}.graphml'
+
+
+def load_fixture(name: str) -> Tuple[utils.Bbox, nx.MultiDiGraph]:
+    """
+    Загрузка фикстуры OSM или построение синтетической сетки того же размера, если файла фикстуры нет
+    :param name: наименование фикстуры (neighbourhood, city, region)
+    :return: (зона графа, граф)
+    """
+    if name not in FIXTURES:
+        raise ValueError(f'Значения fixture: {", ".join(FIXTURES)}')
+
+    path = fixture_path(name)
+
+    if path.exists():
+        return FIXTURES[name][0], ox.load_graphml(path)
+
+    graph = grid_graph(*FIXTURES[name][1])
+    lons, lats = zip(*((data['x'], data['y']) for _, data in graph.nodes(data=True)))
+
+    return utils.Bbox(max(lats), min(lats), max(lons), min(lons)), graph
+
+
+def fixture_graph(name: str, engine: Optional[str] = None) -> builders.Graph:
+    """
+    Граф построителя по фикстуре без загрузки из OSM
+    :param name: наименование фикстуры
+    :param engine: алгоритм поиска кратчайшего пути
+    :return: построенный граф
+    """
+    bbox, source = load_fixture(name)
+
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    graph.build(source)
+
+    return graph
+
+
+def main() -> None:
+    """ Сохранение фикстур OSM в формате GraphML (нужен доступ к Overpass API) """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixtures', nargs='+', default=list(FIXTURES), choices=list(FIXTURES))
+    parser.add_argument('--network-type', default='drive')
+    args = parser.parse_args()
+
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+
+    for name in args.fixtures:
+        graph = ox.graph_from_bbox(*astuple(FIXTURES[name][0]), network_type=args.network_type)
+        graph = ox.add_edge_travel_times(ox.add_edge_speeds(graph))
+        ox.save_graphml(graph, fixture_path(name))
+
+        print(f'{name}: {len(graph.nodes)} nodes, {len(graph.edges)} edges -> {fixture_path(name)}')
+
+
+if __name__ == '__main__':
+    main()
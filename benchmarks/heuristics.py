@@ -0,0 +1,71 @@
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+import osmnx as ox
+
+from benchmarks.utils import BENCHMARK_BBOX, measure_searches, random_points, report
+from route_builder import builders, utils
+from route_builder.heuristics import HaversineHeuristic, Landmarks
+from route_builder.indexes import GraphIndexes
+
+
+def _measure_networkx(graph: builders.Graph, pairs: List[Tuple[int, int]], weight: str) -> List[float]:
+    """
+    Замер времени поиска кратчайшего пути osmnx
+    :param graph: граф
+    :param pairs: пары позиций (начальный узел, конечный узел)
+    :param weight: наименование атрибута веса
+    :return: длительности в секундах
+    """
+    timings = []
+
+    for source, target in pairs:
+        orig, dest = graph.csr.to_node_ids([source, target])
+        started_at = time.perf_counter()
+        ox.shortest_path(graph.graph, orig, dest, weight)
+        timings.append(time.perf_counter() - started_at)
+
+    return timings
+
+
+def main() -> None:
+    """ Замер просмотренных узлов и задержки A* и ALT в сравнении с алгоритмом Дейкстры """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--landmarks', type=int, default=16)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine='dijkstra')
+    graph.build()
+
+    started_at = time.perf_counter()
+    heuristics = {'astar': HaversineHeuristic(graph.csr)}
+    report('heuristics_preprocessing', engine='astar', seconds=round(time.perf_counter() - started_at, 4))
+
+    started_at = time.perf_counter()
+    heuristics['alt'] = Landmarks.build(graph.csr, args.landmarks)
+    report('heuristics_preprocessing', engine='alt', landmarks=args.landmarks,
+           seconds=round(time.perf_counter() - started_at, 4))
+
+    points = random_points(BENCHMARK_BBOX, args.queries * 2)
+    positions = graph.csr.positions(graph.nearest_nodes(*utils.split_coordinates(points)))
+    pairs = list(zip(positions[::2], positions[1::2]))
+
+    for weight in ('length', 'travel_time'):
+        report('heuristics', engine='networkx', weight=weight, queries=len(pairs),
+               mean_ms=round(statistics.mean(_measure_networkx(graph, pairs, weight)) * 1000, 4))
+
+        for engine in ('dijkstra', 'bidirectional', 'astar', 'alt'):
+            indexes = GraphIndexes(graph.csr, heuristics.get(engine))
+            timings, settled = measure_searches(indexes, pairs, weight, engine)
+
+            report('heuristics', engine=engine, weight=weight, queries=len(pairs),
+                   mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   mean_settled=round(statistics.mean(settled), 1))
+
+
+if __name__ == '__main__':
+    main()
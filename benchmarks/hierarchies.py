@@ -0,0 +1,45 @@
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import BENCHMARK_BBOX, measure_searches, random_points, report
+from route_builder import builders, utils
+from route_builder.hierarchies import ContractionHierarchy
+from route_builder.indexes import GraphIndexes
+
+
+def main() -> None:
+    """ Замер предварительной обработки, размера индекса и задержки запроса Contraction Hierarchies """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--witness-settled-limit', type=int, default=500)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine='dijkstra')
+    graph.build()
+
+    points = random_points(BENCHMARK_BBOX, args.queries * 2)
+    positions = graph.csr.positions(graph.nearest_nodes(*utils.split_coordinates(points)))
+    pairs = list(zip(positions[::2], positions[1::2]))
+
+    for weight in ('length', 'travel_time'):
+        started_at = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(graph.csr, weight, args.witness_settled_limit)
+        report('hierarchies_preprocessing', weight=weight, seconds=round(time.perf_counter() - started_at, 4),
+               nodes=graph.csr.nodes_count, edges=graph.csr.edges_count, shortcuts=hierarchy.shortcuts_count,
+               index_bytes=hierarchy.nbytes, graph_bytes=graph.csr.nbytes)
+
+        indexes = GraphIndexes(graph.csr, hierarchies={weight: hierarchy})
+
+        for engine in ('dijkstra', 'bidirectional', 'ch'):
+            timings, settled = measure_searches(indexes, pairs, weight, engine)
+
+            report('hierarchies_query', engine=engine, weight=weight, queries=len(pairs),
+                   mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   median_ms=round(statistics.median(timings) * 1000, 4),
+                   mean_settled=round(statistics.mean(settled), 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from dataclasses import astuple
+from typing import List, Optional
+
+from benchmarks.fixtures import FIXTURES, fixture_graph
+from benchmarks.utils import random_points, report
+
+MODULES = ('settings', 'route_builder.builders', 'listener.__main__')
+# Тяжелые зависимости, которые не должны загружаться при импорте и построении маршрута без карты
+HEAVY_MODULES = ('osmnx', 'folium', 'geopandas', 'matplotlib', 'sklearn', 'shapely')
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+started_at = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started_at,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+FIRST_REQUEST_SCRIPT = '''
+import json, sys, time
+started_at = time.perf_counter()
+from route_builder import builders, utils
+graph = builders.Graph(utils.Bbox(*{bbox!r}), 'drive', engine='dijkstra')
+graph.load({directory!r})
+loaded_at = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+result = builders.build_route(graph, **{request!r})
+print(json.dumps({{"startup_seconds": loaded_at - started_at, "seconds": time.perf_counter() - loaded_at,
+                  "error": hasattr(result, "error_details"),
+                  "heavy": [name for name in {heavy!r} if name in sys.modules and name not in heavy]}}))
+'''
+
+
+def _run(script: str) -> dict:
+    """
+    Выполнение замера в отдельном процессе: модули загружаются заново
+    :param script: код замера, выводящий результат в формате JSON
+    :return: результат замера
+    """
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def import_times(repeat: int, modules: Optional[List[str]] = None) -> List[dict]:
+    """
+    Время импорта модулей в новом процессе
+    :param repeat: количество повторов
+    :param modules: наименования модулей (по умолчанию MODULES)
+    :return: результаты замеров
+    """
+    results = []
+
+    for module in modules or MODULES:
+        runs = [_run(IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(repeat)]
+        results.append(report('imports.import', module=module, heavy=runs[0]['heavy'],
+                              import_ms=round(statistics.median(run['seconds'] for run in runs) * 1000, 4)))
+
+    return results
+
+
+def first_requests(fixture: str, repeat: int) -> List[dict]:
+    """
+    Запуск по снимку графа, как у listener'а, и задержка первого запроса в новом процессе:
+    модули, нужные только карте, загружаются при первом запросе с картой
+    :param fixture: наименование фикстуры графа
+    :param repeat: количество повторов
+    :return: результаты замеров
+    """
+    graph = fixture_graph(fixture, 'dijkstra')
+    points = random_points(graph.bbox, 2, seed=1)
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        graph.save(directory)
+
+        for map_format in (None, 'polyline', 'geojson', 'html'):
+            request = {'points_coordinates': points, 'with_map': bool(map_format), 'map_format': map_format or 'html'}
+            runs = [_run(FIRST_REQUEST_SCRIPT.format(bbox=astuple(graph.bbox), directory=directory,
+                                                     heavy=HEAVY_MODULES, request=request))
+                    for _ in range(repeat)]
+
+            results.append(report('imports.first_request', fixture=fixture, map_format=map_format,
+                                  error=runs[0]['error'], loaded=runs[0]['heavy'],
+                                  startup_ms=round(statistics.median(run['startup_seconds'] for run in runs) * 1000, 4),
+                                  first_request_ms=round(statistics.median(run['seconds'] for run in runs) * 1000, 4)))
+
+    return results
+
+
+def main() -> None:
+    """ Замер времени импорта модулей и задержки первого запроса в новом процессе """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixture', default='neighbourhood', choices=list(FIXTURES))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import_times(args.repeat)
+    first_requests(args.fixture, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
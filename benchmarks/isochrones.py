@@ -0,0 +1,50 @@
+import argparse
+import statistics
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, isochrones
+
+
+def main() -> None:
+    """ Замер построения зон достижимости: одно ограниченное дерево и маршруты до каждого узла графа """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='dijkstra')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[60, 120, 300])
+    parser.add_argument('--origins', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+    graph.build()
+    graph.route_cache = None
+
+    destinations = graph.csr.node_ids.tolist()
+
+    for point in random_points(BENCHMARK_BBOX, args.origins):
+        for hull in ('concave', 'convex'):
+            isochrone_builder = isochrones.IsochroneBuilder(graph, point, args.thresholds, hull=hull)
+            result = isochrone_builder.build()
+            timings = measure(isochrone_builder.build, args.repeat)
+
+            report('isochrones', method='bounded_tree', hull=hull, thresholds=args.thresholds,
+                   nodes=[isochrone.nodes_count for isochrone in result.isochrones],
+                   mean_ms=round(statistics.mean(timings) * 1000, 4))
+
+        # Наивный способ: маршрут до каждого узла графа и отбор узлов по времени в пути
+        origin = result.origin
+
+        def _naive(origin=origin):
+            legs = graph.build_legs([(origin, destination) for destination in destinations], 'travel_time')
+            return [sum(route is not None and route.sums['travel_time'] <= threshold for route in legs.values())
+                    for threshold in args.thresholds]
+
+        nodes = _naive()
+        timings = measure(_naive, 1)
+
+        report('isochrones', method='per_destination', thresholds=args.thresholds, nodes=nodes,
+               destinations=len(destinations), mean_ms=round(statistics.mean(timings) * 1000, 4))
+
+
+if __name__ == '__main__':
+    main()
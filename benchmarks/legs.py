@@ -0,0 +1,41 @@
+import argparse
+import os
+import statistics
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, utils
+
+
+def main() -> None:
+    """ Замер построения многоточечных маршрутов: последовательно, пулами osmnx и постоянным пулом графа """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='networkx')
+    parser.add_argument('--waypoints', type=int, nargs='+', default=[2, 5, 10, 20, 50])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+    graph.build()
+
+    for method in ('serial', 'osmnx_pool', 'persistent_pool'):
+        settings.CPU_LIMITER = 1 if method == 'serial' else args.workers
+        if method == 'persistent_pool':
+            graph.start_leg_pool(args.workers)
+
+        for waypoints in args.waypoints:
+            nodes = graph.nearest_nodes(*utils.split_coordinates(random_points(BENCHMARK_BBOX, waypoints)))
+            timings = measure(lambda nodes=nodes: graph.shortest_path(nodes[:-1], nodes[1:], 'length'),
+                              args.repeat)
+
+            report('legs', method=method, engine=args.engine, workers=args.workers, waypoints=waypoints,
+                   mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   median_ms=round(statistics.median(timings) * 1000, 4))
+
+    graph.shutdown_leg_pool()
+
+
+if __name__ == '__main__':
+    main()
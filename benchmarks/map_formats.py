@@ -0,0 +1,39 @@
+import argparse
+import json
+import statistics
+from dataclasses import asdict
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders
+
+
+def main() -> None:
+    """ Замер времени построения и размера ответа для форматов карты маршрута """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--points', type=int, nargs='+', default=[2, 5])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type)
+    graph.build()
+
+    for points in args.points:
+        coordinates = random_points(BENCHMARK_BBOX, points)
+
+        for map_format in builders.MAP_FORMATS:
+            route_builder = builders.RouteBuilder(graph, coordinates, with_map=True, map_format=map_format)
+            route = route_builder.build()
+
+            timings = measure(lambda builder=route_builder: json.dumps(asdict(builder.build())), args.repeat)
+            build_timings = measure(lambda builder=route_builder, paths=route.paths: builder.build_map(paths),
+                                    args.repeat)
+
+            report('map_formats', map_format=map_format, points=points,
+                   map_mean_ms=round(statistics.mean(build_timings) * 1000, 4),
+                   reply_mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   reply_bytes=len(json.dumps(asdict(route)).encode()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import math
+import statistics
+from typing import List
+
+import numpy as np
+
+from benchmarks.fixtures import FIXTURES, fixture_graph
+from benchmarks.utils import measure, percentile, random_points, report
+from route_builder import builders, matching, utils
+
+
+def synthetic_trace(graph: builders.Graph, path: List[int], spacing: float, noise: float,
+                    generator: np.random.Generator) -> List[List[float]]:
+    """
+    Трек по пути графа: точки через spacing метров вдоль ребер с нормальной ошибкой noise метров
+    :param graph: граф
+    :param path: узлы пути
+    :param spacing: расстояние между точками, м
+    :param noise: стандартное отклонение ошибки, м
+    :param generator: генератор случайных чисел
+    :return: координаты точек вида [[Y, X], ...] (ошибка не выводит точки за пределы зоны графа)
+    """
+    x, y = (np.asarray(values) for values in graph.csr.coordinates(path))
+    metres_y = 111_320.0
+    metres_x = metres_y * math.cos(math.radians(float(y.mean())))
+
+    offsets = np.concatenate([[0], np.cumsum(np.hypot(np.diff(x) * metres_x, np.diff(y) * metres_y))])
+    distances = np.arange(0, offsets[-1], spacing)
+    trace_x = np.clip(np.interp(distances, offsets, x) + generator.normal(0, noise, len(distances)) / metres_x,
+                      graph.bbox.west, graph.bbox.east)
+    trace_y = np.clip(np.interp(distances, offsets, y) + generator.normal(0, noise, len(distances)) / metres_y,
+                      graph.bbox.south, graph.bbox.north)
+
+    return np.column_stack((trace_y, trace_x)).tolist()
+
+
+def off_path(paths: List[List[int]], nodes: List[List[int]]) -> float:
+    """
+    Доля точек трека, привязанных к узлам вне пути, по которому построен трек
+    :param paths: пути треков
+    :param nodes: узлы точек треков
+    :return: доля точек
+    """
+    outside = sum(node not in set(path) for path, trace_nodes in zip(paths, nodes) for node in trace_nodes)
+    return round(outside / sum(len(trace_nodes) for trace_nodes in nodes), 4)
+
+
+def main() -> None:
+    """ Замер привязки GPS-треков: точек в секунду и доля узлов вне истинного пути в сравнении с привязкой к ближайшим """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixture', default='city', choices=list(FIXTURES))
+    parser.add_argument('--traces', type=int, default=50)
+    parser.add_argument('--spacing', type=float, default=15)
+    parser.add_argument('--noise', type=float, nargs='+', default=[5, 10, 20])
+    args = parser.parse_args()
+
+    graph = fixture_graph(args.fixture, 'dijkstra')
+    graph.route_cache = None
+    generator = np.random.default_rng(0)
+
+    points = random_points(graph.bbox, args.traces * 2, seed=3)
+    routes = [builders.build_route(graph, points_coordinates=points[index:index + 2])
+              for index in range(0, len(points), 2)]
+    paths = [route.paths for route in routes if isinstance(route, utils.Route) and len(route.paths) > 2]
+
+    for noise in args.noise:
+        traces = [synthetic_trace(graph, path, args.spacing, noise, generator) for path in paths]
+        traces = [(path, trace) for path, trace in zip(paths, traces) if len(trace) >= 2]
+        points_count = sum(len(trace) for _, trace in traces)
+
+        results = [matching.match_trace(graph, points_coordinates=trace) for _, trace in traces]
+        seconds = sum(measure(lambda trace=trace: matching.match_trace(graph, points_coordinates=trace), 1)[0]
+                      for _, trace in traces)
+        timings = [measure(lambda trace=trace: matching.match_trace(graph, points_coordinates=trace), 1)[0] * 1000
+                   for _, trace in traces]
+
+        report('matching', method='hmm', fixture=args.fixture, noise_m=noise, traces=len(traces),
+               points=points_count, points_per_second=round(points_count / seconds),
+               segments=statistics.mean(len(result.paths) if isinstance(result.paths[0], list) else 1
+                                        for result in results),
+               off_path=off_path([path for path, _ in traces], [result.nodes for result in results]),
+               mean_ms=round(statistics.mean(timings), 4), p99_ms=round(percentile(timings, 99), 4))
+
+        # Текущий способ: каждая точка трека - точка маршрута, привязанная к ближайшему узлу
+        nearest = [graph.nearest_nodes([point[1] for point in trace], [point[0] for point in trace])
+                   for _, trace in traces]
+        seconds = sum(measure(lambda trace=trace: builders.build_route(graph, points_coordinates=trace), 1)[0]
+                      for _, trace in traces)
+
+        report('matching', method='nearest_route', fixture=args.fixture, noise_m=noise, traces=len(traces),
+               points=points_count, points_per_second=round(points_count / seconds), off_path=off_path([path for path, _ in traces], nearest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import statistics
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, matrix
+
+
+def main() -> None:
+    """ Построение матриц 100x100 деревьями кратчайших путей в сравнении с попарным построением маршрутов """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--pairs-sample', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine='dijkstra')
+    graph.build()
+
+    sources = random_points(BENCHMARK_BBOX, args.size, seed=0)
+    destinations = random_points(BENCHMARK_BBOX, args.size, seed=1)
+
+    for workers in args.workers:
+        settings.MATRIX_WORKERS = workers
+        timings = measure(lambda: matrix.build_matrix(graph, sources=sources, destinations=destinations),
+                          args.repeat)
+
+        report('matrix', method='trees', size=args.size, workers=workers,
+               mean_seconds=round(statistics.mean(timings), 4))
+
+    # попарное построение маршрутов замеряется на выборке пар и экстраполируется на всю матрицу
+    pairs = [[sources[index % args.size], destinations[index * 7 % args.size]] for index in range(args.pairs_sample)]
+    timings = measure(lambda: [builders.build_route(graph, points_coordinates=pair) for pair in pairs], 1)
+
+    report('matrix', method='pairs', size=args.size, pairs_sample=len(pairs),
+           mean_seconds=round(timings[0] / len(pairs) * args.size * args.size, 4))
+
+
+if __name__ == '__main__':
+    main()
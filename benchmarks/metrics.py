@@ -0,0 +1,47 @@
+import argparse
+import statistics
+from contextlib import nullcontext
+from unittest import mock
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, metrics
+from route_builder.profiling import SamplingProfiler
+
+
+def main() -> None:
+    """ Замер накладных расходов метрик этапов и семплирующего профилировщика на построении маршрутов """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='dijkstra')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--profile-dir', default='/tmp/route-builder-profiles')
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+    graph.build()
+    graph.route_cache = None
+
+    points = random_points(BENCHMARK_BBOX, args.requests * 3)
+    requests = [points[index:index + 3] for index in range(0, len(points), 3)]
+    profiler = SamplingProfiler(float('inf'), args.profile_dir)
+
+    def _build(profile: bool = False):
+        for coordinates in requests:
+            with profiler.profile('build_route') if profile else nullcontext():
+                builders.build_route(graph, points_coordinates=coordinates)
+
+    _build()
+
+    with mock.patch.object(metrics, 'stage', lambda name: nullcontext()), \
+            mock.patch.object(metrics, 'observe_stage', lambda name, seconds: None):
+        timings = measure(_build, 5)
+
+    report('metrics', mode='disabled', mean_ms=round(statistics.mean(timings) / len(requests) * 1000, 4))
+
+    for mode, profile in (('stages', False), ('stages_and_profiler', True)):
+        timings = measure(lambda profile=profile: _build(profile), 5)
+        report('metrics', mode=mode, mean_ms=round(statistics.mean(timings) / len(requests) * 1000, 4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, random_points, report
+from route_builder import builders, ordering, trees, utils
+
+
+def main() -> None:
+    """ Замер времени и качества выбора порядка обхода точек в зависимости от их количества """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--optimizer', default='length')
+    parser.add_argument('--points', type=int, nargs='+', default=[5, 8, 10, 15, 25, 50, 100])
+    parser.add_argument('--time-budget', type=float, default=settings.ORDER_TIME_BUDGET)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine='dijkstra')
+    graph.build()
+
+    for points in args.points:
+        nodes = graph.nearest_nodes(*utils.split_coordinates(random_points(BENCHMARK_BBOX, points)))
+        positions = graph.csr.positions(nodes)
+
+        started_at = time.perf_counter()
+        costs = trees.distance_matrix(graph.csr, positions, positions, args.optimizer, (args.optimizer,))
+        costs = costs[args.optimizer].tolist()
+        matrix_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        order = ordering.solve_order(costs, args.time_budget)
+        solve_seconds = time.perf_counter() - started_at
+
+        # Качество сравнивается с исходным порядком точек и с порядком ближайшего соседа
+        report('ordering', points=points, exact=points <= ordering.EXACT_LIMIT,
+               matrix_seconds=round(matrix_seconds, 4), solve_seconds=round(solve_seconds, 4),
+               cost=round(ordering.order_cost(costs, order), 2),
+               given_order_cost=round(ordering.order_cost(costs, list(range(points))), 2),
+               nearest_neighbour_cost=round(ordering.order_cost(costs, ordering.nearest_neighbour(costs)), 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import aio_pika
+
+import settings
+from benchmarks.fixtures import FIXTURES, fixture_graph
+from benchmarks.utils import percentile, random_points, report
+from listener.__main__ import run
+from listener.admission import is_cheap
+from route_builder import builders, metrics
+from tests.broker import InMemoryBroker
+
+
+def _requests(graph: builders.Graph, count: int, expensive: float, seed: int = 0) -> List[dict]:
+    """
+    Смесь запросов: дешевые (маршрут из двух точек без карты) и дорогие (пять точек с картой html)
+    :param graph: граф
+    :param count: количество запросов
+    :param expensive: доля дорогих запросов
+    :param seed: начальное значение генератора
+    :return: конфигурации маршрутов
+    """
+    generator = random.Random(seed)
+    points = random_points(graph.bbox, count * 5, seed=seed)
+
+    return [{'points_coordinates': points[index * 5:index * 5 + 5], 'with_map': True}
+            if generator.random() < expensive else {'points_coordinates': points[index * 5:index * 5 + 2]}
+            for index in range(count)]
+
+
+def _counters() -> Dict[str, float]:
+    """
+    Текущие значения счетчиков опоздавших и сброшенных запросов
+    :return: значения по наименованию в отчете
+    """
+    return {'late': metrics.LATE.value(),
+            **{f'shed_{reason}': metrics.SHED.value(reason=reason) for reason in ('expired', 'waiting', 'aborted')}}
+
+
+async def _publish(broker: InMemoryBroker, requests: List[dict], rate: float, timeout: Optional[float],
+                   reply_to: str) -> Dict[str, float]:
+    """
+    Публикация запросов с частотой rate независимо от ответов
+    :param broker: брокер в памяти
+    :param requests: конфигурации маршрутов
+    :param rate: запросов в секунду
+    :param timeout: срок запроса от публикации, с (None - без срока)
+    :param reply_to: очередь ответов
+    :return: время публикации (time.perf_counter) по correlation_id
+    """
+    sent = {}
+
+    started_at = time.perf_counter()
+    for index, request in enumerate(requests):
+        await asyncio.sleep(max(started_at + index / rate - time.perf_counter(), 0))
+
+        body = {**request, 'deadline': time.time() + timeout} if timeout else request
+        sent[str(index)] = time.perf_counter()
+        await broker.publish(aio_pika.Message(body=json.dumps(body).encode(), reply_to=reply_to,
+                                              correlation_id=str(index)), settings.RMQ_QUEUE)
+
+    return sent
+
+
+def _summary(requests: List[dict], replies: Dict[str, tuple], sent: Dict[str, float], timeout: float,
+             seconds: float) -> dict:
+    """
+    Задержки ответов и количество ответов в пределах времени ожидания вызывающего
+    :param requests: конфигурации маршрутов
+    :param replies: (время получения, ошибка) ответа по correlation_id
+    :param sent: время публикации по correlation_id
+    :param timeout: время ожидания вызывающего, с
+    :param seconds: длительность нагрузки, с
+    :return: задержки и счетчики
+    """
+    delays = {int(key): received_at - sent[key] for key, (received_at, _) in replies.items()}
+
+    def latencies(indexes: List[int]) -> dict:
+        values = [delays[index] * 1000 for index in indexes]
+        return {'p50_ms': round(percentile(values, 50), 4), 'p99_ms': round(percentile(values, 99), 4)}
+
+    cheap = [index for index, request in enumerate(requests) if is_cheap(request)]
+    on_time = sum(1 for key, (_, error) in replies.items() if not error and delays[int(key)] <= timeout)
+
+    return {**latencies(list(range(len(requests)))), **{f'cheap_{name}': value for name, value in
+                                                        latencies(cheap).items()},
+            'on_time': on_time, 'on_time_per_second': round(on_time / seconds, 2)}
+
+
+async def _overload(graph: builders.Graph, requests: List[dict], rate: float, timeout: float,
+                    admission: bool) -> dict:
+    """
+    Открытая нагрузка на listener, подключенный к брокеру в памяти: запросы публикуются с частотой rate
+    независимо от ответов, вызывающий ожидает ответа не дольше timeout
+    :param graph: граф
+    :param requests: конфигурации маршрутов
+    :param rate: запросов в секунду
+    :param timeout: время ожидания вызывающего, с
+    :param admission: запросы со сроком (deadline) и полоса дешевых запросов
+    :return: задержки и счетчики
+    """
+    broker = InMemoryBroker()
+    reply_to = f'{settings.APP_NAME}:overload_reply:{uuid.uuid4()}'
+    replies: Dict[str, tuple] = {}
+    done = asyncio.Event()
+
+    async def receive(message) -> None:
+        async with message.process():
+            replies[message.correlation_id] = (time.perf_counter(), 'error_details' in json.loads(message.body))
+            if len(replies) == len(requests):
+                done.set()
+
+    counters = _counters()
+
+    server = asyncio.create_task(run(graph, broker.connect_robust))
+    await broker.queue(reply_to).consume(receive)
+    await broker.queue(settings.RMQ_QUEUE).consumed.wait()
+
+    started_at = time.perf_counter()
+    sent = await _publish(broker, requests, rate, timeout if admission else None, reply_to)
+    await done.wait()
+
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    broker.close()
+
+    return {**_summary(requests, replies, sent, timeout, time.perf_counter() - started_at),
+            **{name: int(value - counters[name]) for name, value in _counters().items()}}
+
+
+def main() -> None:
+    """ Замер p99 задержки listener'а при перегрузке со сроками запросов и полосой дешевых запросов и без них """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixture', default='neighbourhood', choices=list(FIXTURES))
+    parser.add_argument('--requests', type=int, default=600)
+    parser.add_argument('--expensive', type=float, default=0.2, help='доля дорогих запросов')
+    parser.add_argument('--overload', type=float, nargs='+', default=[1.5, 3], help='нагрузка относительно пропускной способности')
+    parser.add_argument('--timeout', type=float, default=1.0, help='время ожидания вызывающего, с')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--priority-workers', type=int, default=1)
+    args = parser.parse_args()
+
+    graph = fixture_graph(args.fixture, 'dijkstra')
+    graph.route_cache = None
+    requests = _requests(graph, args.requests, args.expensive)
+
+    # Пропускная способность - по среднему времени построения смеси запросов без брокера
+    sample = requests[:100]
+    started_at = time.perf_counter()
+    for request in sample:
+        builders.build_route(graph, **request)
+    capacity = len(sample) / (time.perf_counter() - started_at)
+
+    settings.EXECUTOR_MODE, settings.EXECUTOR_WORKERS = 'thread', args.workers
+    settings.RMQ_BATCH_SIZE, settings.RMQ_PREFETCH_COUNT = 1, 16
+
+    for overload in args.overload:
+        for admission in (False, True):
+            settings.PRIORITY_WORKERS = args.priority_workers if admission else 0
+            result = asyncio.run(_overload(graph, requests, capacity * overload, args.timeout, admission))
+
+            report('overload', fixture=args.fixture, overload=overload, admission=admission,
+                   requests=len(requests), expensive=args.expensive, timeout_s=args.timeout,
+                   capacity_per_second=round(capacity, 2), **result)
+
+
+if __name__ == '__main__':
+    main()
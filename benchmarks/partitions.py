@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List
+
+import networkx as nx
+
+from benchmarks.fixtures import FIXTURES, load_fixture
+from benchmarks.utils import percentile, random_points, report
+from listener.__main__ import MESSAGE_TYPES
+from listener.coordinator import PartitionRouter
+from route_builder import builders, codecs, executors, partitions, utils
+
+
+def _build(bbox: utils.Bbox, source: nx.MultiDiGraph) -> builders.Graph:
+    """
+    Построение графа построителя без кеша участков
+    :param bbox: зона графа
+    :param source: исходный граф
+    :return: граф
+    """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build(source)
+    graph.route_cache = None
+    return graph
+
+
+def _traced_build(bbox: utils.Bbox, source: nx.MultiDiGraph) -> tuple:
+    """
+    Построение графа с замером оставшейся после построения памяти (без исходного MultiDiGraph)
+    :param bbox: зона графа
+    :param source: исходный граф
+    :return: (граф, количество байт)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = _build(bbox, source)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return graph, size
+
+
+def _latencies(timings: List[float]) -> dict:
+    values = [timing * 1000 for timing in timings]
+    return {'mean_ms': round(statistics.mean(values), 4), 'p50_ms': round(percentile(values, 50), 4),
+            'p99_ms': round(percentile(values, 99), 4)}
+
+
+async def _partitioned(graphs: Dict[str, builders.Graph], tiles: Dict[str, utils.Bbox],
+                       pairs: List[List[List[float]]], optimizer: str) -> tuple:
+    """
+    Маршруты по разделам: операции разделов вызываются напрямую с кодированием запроса и ответа, как через брокер
+    :param graphs: графы разделов
+    :param tiles: зоны разделов
+    :param pairs: пары точек маршрутов
+    :param optimizer: атрибут, по которому выбирается кратчайший путь
+    :return: (граф верхнего уровня, задержки маршрутов в секундах, веса маршрутов)
+    """
+    codec = codecs.get_codec()
+
+    async def call(name: str, request: dict) -> dict:
+        request = codec.decode(codec.encode(request))
+        operation = executors.operation_function(MESSAGE_TYPES[request.pop('type')])
+        return codec.decode(codec.encode(operation(graphs[name], **request)))
+
+    router = PartitionRouter(tiles, call)
+    await router.load()
+
+    timings, weights = [], []
+    for pair in pairs:
+        started_at = time.perf_counter()
+        try:
+            route = await router.build_route(pair, optimizer=optimizer)
+        except ValueError:
+            route = None
+        timings.append(time.perf_counter() - started_at)
+        weights.append(getattr(route, optimizer) if route else None)
+
+    return router.overlay, timings, weights
+
+
+def _monolithic(graph: builders.Graph, pairs: List[List[List[float]]], optimizer: str) -> tuple:
+    """
+    Маршруты по графу всего региона
+    :param graph: граф региона
+    :param pairs: пары точек маршрутов
+    :param optimizer: атрибут, по которому выбирается кратчайший путь
+    :return: (задержки маршрутов в секундах, веса маршрутов)
+    """
+    timings, weights = [], []
+    for pair in pairs:
+        started_at = time.perf_counter()
+        route = builders.build_route(graph, points_coordinates=pair, optimizer=optimizer)
+        timings.append(time.perf_counter() - started_at)
+        weights.append(getattr(route, optimizer) if isinstance(route, utils.Route) else None)
+
+    return timings, weights
+
+
+def _split(source: nx.MultiDiGraph, tiles: Dict[str, utils.Bbox]) -> tuple:
+    """
+    Разбиение графа региона на разделы и построение их графов
+    :param source: граф региона
+    :param tiles: зоны разделов
+    :return: (разделы, графы разделов, количество байт графов разделов, длительность разбиения в мс)
+    """
+    started_at = time.perf_counter()
+    parts = partitions.split(source, tiles)
+    split_ms = round((time.perf_counter() - started_at) * 1000, 4)
+
+    graphs, sizes = {}, {}
+    for name, partition in parts.items():
+        graphs[name], sizes[name] = _traced_build(tiles[name], partition.graph)
+        graphs[name].partition = partition
+
+    return parts, graphs, sizes, split_ms
+
+
+def _report_grid(args: argparse.Namespace, grid: str, region: tuple, pairs: List[List[List[float]]],
+                 expected: List[float]) -> None:
+    """
+    Замер маршрутов по разделам сетки
+    :param args: аргументы замера
+    :param grid: сетка разделов (строки x столбцы)
+    :param region: (зона региона, граф региона)
+    :param pairs: пары точек маршрутов
+    :param expected: веса маршрутов по графу всего региона
+    :return: None
+    """
+    tiles = partitions.grid_tiles(region[0], *(int(value) for value in grid.split('x')))
+    parts, graphs, sizes, split_ms = _split(region[1], tiles)
+
+    overlay, timings, weights = asyncio.run(_partitioned(graphs, tiles, pairs, args.optimizer))
+
+    # Точки привязываются к узлам своего раздела, поэтому у точек возле границы веса могут отличаться
+    compared = [(weight, value) for weight, value in zip(weights, expected) if weight and value]
+    report('partitions', layout=grid, fixture=args.fixture, split_ms=split_ms,
+           max_partition_nodes=max(len(partition.graph) for partition in parts.values()),
+           max_partition_traced_bytes=max(sizes.values()), total_traced_bytes=sum(sizes.values()),
+           overlay_nodes=overlay.nodes_count, overlay_edges=int(overlay.matrices[args.optimizer].nnz),
+           routes=len(compared), mean_weight_ratio=round(statistics.mean(weight / value
+                                                                         for weight, value in compared), 4),
+           **_latencies(timings))
+
+
+def main() -> None:
+    """ Замер маршрутов по разделам региона в сравнении с графом всего региона: задержка, память и граф верхнего уровня """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixture', default='city', choices=list(FIXTURES))
+    parser.add_argument('--grids', nargs='+', default=['2x2', '3x3'])
+    parser.add_argument('--routes', type=int, default=100)
+    parser.add_argument('--optimizer', default='length', choices=list(partitions.WEIGHTS))
+    args = parser.parse_args()
+
+    bbox, source = load_fixture(args.fixture)
+    graph, size = _traced_build(bbox, source)
+    points = random_points(bbox, args.routes * 2, seed=5)
+    pairs = [points[index:index + 2] for index in range(0, len(points), 2)]
+
+    timings, expected = _monolithic(graph, pairs, args.optimizer)
+    report('partitions', layout='monolithic', fixture=args.fixture, nodes=len(source), traced_bytes=size,
+           **_latencies(timings))
+
+    for grid in args.grids:
+        _report_grid(args, grid, (bbox, source), pairs, expected)
+
+
+if __name__ == '__main__':
+    main()
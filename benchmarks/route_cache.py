@@ -0,0 +1,45 @@
+import argparse
+import random
+import statistics
+import time
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, random_points, report
+from route_builder import builders, routing
+
+
+def main() -> None:
+    """ Воспроизведение запросов с распределением Ципфа с кешем участков маршрута и без него """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='networkx', choices=routing.ENGINES)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--distinct-points', type=int, default=200)
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--cache-sizes', type=int, nargs='+', default=[0, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    points = random_points(BENCHMARK_BBOX, args.distinct_points)
+    generator = random.Random(0)
+    weights = [1 / (rank + 1) ** args.skew for rank in range(len(points))]
+    trace = [generator.choices(points, weights, k=generator.choice((2, 3))) for _ in range(args.requests)]
+
+    for cache_size in args.cache_sizes:
+        settings.ROUTE_CACHE_SIZE = cache_size
+        graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+        graph.build()
+
+        timings = []
+        for coordinates in trace:
+            started_at = time.perf_counter()
+            builders.build_route(graph, points_coordinates=coordinates)
+            timings.append(time.perf_counter() - started_at)
+
+        report('route_cache', engine=args.engine, cache_size=cache_size, requests=len(trace),
+               mean_ms=round(statistics.mean(timings) * 1000, 4),
+               total_seconds=round(sum(timings), 4),
+               **(graph.route_cache.stats() if graph.route_cache is not None else {}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import multiprocessing
+import tempfile
+
+from benchmarks.utils import BENCHMARK_BBOX, random_points, report
+from route_builder import builders, routing
+
+
+def _memory_usage() -> dict:
+    """
+    Память текущего процесса: RSS учитывает разделяемые страницы в каждом процессе,
+    PSS делит их между процессами и корректно суммируется
+    :return: {'rss_kb': ..., 'pss_kb': ...}
+    """
+    usage = {}
+
+    with open('/proc/self/smaps_rollup', encoding='utf-8') as file:
+        for line in file:
+            name, *values = line.split()
+            if name in ('Rss:', 'Pss:'):
+                usage[f'{name[:-1].lower()}_kb'] = int(values[0])
+
+    return usage
+
+
+def _worker(layout: str, directory: str, args: argparse.Namespace, results: multiprocessing.Queue,
+            barrier: multiprocessing.Barrier) -> None:
+    """
+    Воркер: подключение к графу, несколько запросов и замер памяти, пока все воркеры живы
+    :param layout: private - собственная копия графа, shared - разделяемые массивы
+    :param directory: каталог снимков
+    :param args: параметры замера
+    :param results: очередь результатов
+    :param barrier: барьер для одновременного замера
+    :return: None
+    """
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+
+    if layout == 'shared':
+        graph.load_shared(directory)
+    else:
+        graph.load(directory)
+
+    points = random_points(BENCHMARK_BBOX, 20, seed=multiprocessing.current_process().pid)
+    for index in range(0, len(points), 2):
+        builders.RouteBuilder(graph, points[index:index + 2]).build()
+
+    barrier.wait()
+    results.put(_memory_usage())
+    barrier.wait()
+
+
+def main() -> None:
+    """ Замер суммарной памяти N процессов с собственной копией графа и с разделяемым графом """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='bidirectional', choices=[e for e in routing.ENGINES if e != 'networkx'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as private_directory, tempfile.TemporaryDirectory() as shared_directory:
+        graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+        graph.build()
+        graph.save(private_directory)
+        del graph
+
+        context = multiprocessing.get_context('spawn')
+
+        for layout, directory in (('private', private_directory), ('shared', shared_directory)):
+            for workers in args.workers:
+                results = context.Queue()
+                barrier = context.Barrier(workers)
+                processes = [context.Process(target=_worker, args=(layout, directory, args, results, barrier))
+                             for _ in range(workers)]
+
+                for process in processes:
+                    process.start()
+
+                usages = [results.get() for _ in processes]
+
+                for process in processes:
+                    process.join()
+
+                report('shared_memory', layout=layout, engine=args.engine, workers=workers,
+                       total_rss_kb=sum(usage['rss_kb'] for usage in usages),
+                       total_pss_kb=sum(usage['pss_kb'] for usage in usages))
+
+
+if __name__ == '__main__':
+    main()
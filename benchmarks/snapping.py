@@ -0,0 +1,32 @@
+import argparse
+import statistics
+
+import osmnx as ox
+
+from benchmarks.utils import BENCHMARK_BBOX, measure, random_points, report
+from route_builder import builders, utils
+
+
+def main() -> None:
+    """ Замер задержки привязки координат запроса к узлам графа """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--points', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type)
+    graph.build()
+
+    x, y = utils.split_coordinates(random_points(BENCHMARK_BBOX, args.points))
+
+    for method, func in (('ox.nearest_nodes', lambda: ox.nearest_nodes(graph.graph, x, y)),
+                         ('Graph.nearest_nodes', lambda: graph.nearest_nodes(x, y))):
+        timings = measure(func, args.repeat)
+        report('snapping', method=method, nodes=len(graph.graph.nodes), points=args.points,
+               mean_ms=round(statistics.mean(timings) * 1000, 4),
+               median_ms=round(statistics.median(timings) * 1000, 4))
+
+
+if __name__ == '__main__':
+    main()
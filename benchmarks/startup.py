@@ -0,0 +1,40 @@
+import argparse
+import tempfile
+import time
+
+import osmnx as ox
+
+import settings
+from benchmarks.utils import BENCHMARK_BBOX, report
+from route_builder import builders, routing
+
+
+def main() -> None:
+    """ Замер времени запуска: построение без кеша osmnx, построение с кешем osmnx, загрузка снимка """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engine', default='networkx', choices=routing.ENGINES)
+    args = parser.parse_args()
+
+    for mode, use_cache in (('cold_build', False), ('cached_build', True)):
+        # Настройка применяется и при первом импорте osmnx построителем
+        settings.USE_CACHE = ox.settings.use_cache = use_cache
+        graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+
+        started_at = time.perf_counter()
+        graph.build()
+        report('startup', mode=mode, engine=args.engine, seconds=round(time.perf_counter() - started_at, 4))
+
+    with tempfile.TemporaryDirectory() as directory:
+        graph.save(directory)
+
+        for mode, with_graph in (('snapshot_load', True), ('snapshot_load_indexes_only', False)):
+            loaded = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=args.engine)
+
+            started_at = time.perf_counter()
+            loaded.load(directory, with_graph=with_graph)
+            report('startup', mode=mode, engine=args.engine, seconds=round(time.perf_counter() - started_at, 4))
+
+
+if __name__ == '__main__':
+    main()
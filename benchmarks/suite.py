@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import aio_pika
+
+import settings
+from benchmarks import imports
+from benchmarks.fixtures import FIXTURES, fixture_graph, load_fixture
+from benchmarks.utils import measure, percentile, random_points, report
+from listener.__main__ import run
+from route_builder import builders, utils
+from tests.broker import InMemoryBroker
+
+# Поля результата, по которым сравниваются замеры: меньше - лучше (_ms) или больше - лучше (_per_second)
+LOWER_IS_BETTER = '_ms'
+HIGHER_IS_BETTER = '_per_second'
+
+OPTIMIZERS = ('length', 'travel_time')
+MAP_FORMATS = ('html', 'geojson', 'polyline')
+
+
+def _latencies(timings: List[float]) -> dict:
+    """
+    Задержки в миллисекундах
+    :param timings: длительности в секундах
+    :return: mean_ms, p50_ms, p99_ms
+    """
+    values = [timing * 1000 for timing in timings]
+    return {'mean_ms': round(statistics.mean(values), 4), 'p50_ms': round(percentile(values, 50), 4),
+            'p99_ms': round(percentile(values, 99), 4)}
+
+
+async def _listener_throughput(graph: builders.Graph, requests: List[dict], concurrency: int) -> dict:
+    """
+    Обработка запросов listener'ом, подключенным к брокеру в памяти
+    :param graph: граф
+    :param requests: конфигурации маршрутов
+    :param concurrency: количество одновременно ожидающих ответа запросов
+    :return: задержки и пропускная способность
+    """
+    broker = InMemoryBroker()
+    reply_to = f'{settings.APP_NAME}:suite_reply:{uuid.uuid4()}'
+    waiters: Dict[str, asyncio.Future] = {}
+
+    async def receive(message) -> None:
+        async with message.process():
+            waiters.pop(message.correlation_id).set_result(time.perf_counter())
+
+    settings.RMQ_PREFETCH_COUNT = concurrency
+    server = asyncio.create_task(run(graph, broker.connect_robust))
+    await broker.queue(reply_to).consume(receive)
+
+    # listener подписывается на очередь после запуска исполнителя
+    await broker.queue(settings.RMQ_QUEUE).consumed.wait()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def send(request: dict) -> None:
+        async with semaphore:
+            correlation_id = str(uuid.uuid4())
+            waiter = waiters[correlation_id] = asyncio.get_running_loop().create_future()
+            sent_at = time.perf_counter()
+
+            await broker.publish(aio_pika.Message(body=json.dumps(request).encode(), reply_to=reply_to,
+                                                  correlation_id=correlation_id), settings.RMQ_QUEUE)
+            timings.append(await waiter - sent_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    duration = time.perf_counter() - started_at
+
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    broker.close()
+
+    return {**_latencies(timings), 'msgs_per_second': round(len(requests) / duration, 2)}
+
+
+def _route_results(graph: builders.Graph, common: dict, coordinates: List[List[List[float]]]) -> List[dict]:
+    """
+    Замеры построения маршрутов по каждому оптимизатору и карт маршрутов в каждом формате
+    :param graph: граф фикстуры
+    :param common: общие поля результатов
+    :param coordinates: пары точек маршрутов
+    :return: результаты замеров
+    """
+    results = []
+
+    for optimizer in OPTIMIZERS:
+        route_builders = [builders.RouteBuilder(graph, points_coordinates=pair, optimizer=optimizer)
+                          for pair in coordinates]
+        timings = [measure(route_builder.build, 1)[0] for route_builder in route_builders]
+        results.append(report('suite.route', **common, optimizer=optimizer, **_latencies(timings)))
+
+    paths = [route.paths for route in (builders.build_route(graph, points_coordinates=pair)
+                                       for pair in coordinates[:50]) if isinstance(route, utils.Route)]
+    for map_format in MAP_FORMATS:
+        route_builder = builders.RouteBuilder(graph, points_coordinates=coordinates[0], with_map=True,
+                                              map_format=map_format)
+        timings = [measure(lambda path=path, route_builder=route_builder: route_builder.build_map(path), 1)[0] for path in paths]
+        results.append(report('suite.map', **common, map_format=map_format, **_latencies(timings)))
+
+    return results
+
+
+def run_fixture(name: str, engine: str, requests: int, repeat: int, concurrency: int) -> List[dict]:
+    """
+    Замеры на одной фикстуре
+    :param name: наименование фикстуры
+    :param engine: алгоритм поиска кратчайшего пути
+    :param requests: количество маршрутов
+    :param repeat: количество повторов построения графа
+    :param concurrency: количество одновременных запросов listener'а
+    :return: результаты замеров
+    """
+    results = []
+    bbox, source = load_fixture(name)
+    common = {'fixture': name, 'engine': engine, 'nodes': len(source)}
+
+    timings = measure(lambda: builders.Graph(bbox, 'drive', engine=engine).build(source), repeat)
+    results.append(report('suite.build', **common, **_latencies(timings)))
+
+    graph = fixture_graph(name, engine)
+    graph.route_cache = None
+
+    points = random_points(graph.bbox, requests * 2, seed=1)
+    lons, lats = utils.split_coordinates(points)
+
+    timings = measure(lambda: graph.nearest_nodes(lons, lats), repeat)
+    results.append(report('suite.snapping', **common, points=len(points),
+                          points_per_second=round(len(points) / statistics.mean(timings), 2)))
+
+    coordinates = [points[index:index + 2] for index in range(0, len(points), 2)]
+    results.extend(_route_results(graph, common, coordinates))
+
+    results.append(report('suite.listener', **common, requests=len(coordinates), concurrency=concurrency,
+                          **asyncio.run(_listener_throughput(graph, [{'points_coordinates': pair}
+                                                                     for pair in coordinates], concurrency))))
+
+    return results
+
+
+def _key(result: dict) -> Tuple:
+    """
+    Ключ результата для сравнения с базовыми замерами: наименование и параметры без значений метрик
+    и списков наблюдений (например, загруженных модулей)
+    :param result: результат замера
+    :return: ключ
+    """
+    return tuple(sorted((name, json.dumps(value)) for name, value in result.items()
+                        if not name.endswith((LOWER_IS_BETTER, HIGHER_IS_BETTER)) and not isinstance(value, list)))
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """
+    Сравнение замеров с базовыми
+    :param results: текущие результаты
+    :param baseline: базовые результаты
+    :param tolerance: допустимое ухудшение (доля)
+    :return: ухудшения: замер, метрика, базовое и текущее значение
+    """
+    baseline = {_key(result): result for result in baseline}
+    regressions = []
+
+    for result in results:
+        base = baseline.get(_key(result))
+        if base is None:
+            continue
+
+        for name, value in result.items():
+            if name not in base or not base[name]:
+                continue
+
+            if name.endswith(LOWER_IS_BETTER):
+                change = value / base[name] - 1
+            elif name.endswith(HIGHER_IS_BETTER):
+                change = base[name] / value - 1 if value else float('inf')
+            else:
+                continue
+
+            if change > tolerance:
+                regressions.append({**{key: result[key] for key in ('benchmark', 'fixture', 'module') if key in result},
+                                    'metric': name, 'baseline': base[name], 'value': value,
+                                    'change': round(change, 4)})
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """ Воспроизводимые замеры на фикстурах графов без сети и RabbitMQ с поиском ухудшений относительно базовых """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--fixtures', nargs='+', default=['neighbourhood', 'city'], choices=list(FIXTURES))
+    parser.add_argument('--engine', default='dijkstra')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', help='файл для сохранения результатов (JSON Lines)')
+    parser.add_argument('--baseline', help='файл базовых результатов (JSON Lines) для поиска ухудшений')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение метрики (доля)')
+    args = parser.parse_args(argv)
+
+    results = [result for name in args.fixtures
+               for result in run_fixture(name, args.engine, args.requests, args.repeat, args.concurrency)]
+    results += imports.import_times(args.repeat) + imports.first_requests(args.fixtures[0], args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(result) + '\n' for result in results)
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = [json.loads(line) for line in file if line.strip()]
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        report('suite.regression', **regression)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.utils import BENCHMARK_BBOX, random_points, report
+from route_builder import builders, executors
+
+
+async def _run_requests(executor: executors.RouteExecutor, requests: list) -> float:
+    """
+    Обработка пачки запросов исполнителем
+    :param executor: исполнитель
+    :param requests: список конфигураций маршрутов
+    :return: длительность обработки в секундах
+    """
+    started_at = time.perf_counter()
+    await asyncio.gather(*(executor.build_route(**request) for request in requests))
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    """ Замер пропускной способности исполнителя в зависимости от количества воркеров """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--modes', nargs='+', default=['thread', 'process'], choices=executors.EXECUTOR_MODES)
+    args = parser.parse_args()
+
+    graph = builders.Graph(BENCHMARK_BBOX, args.network_type)
+    graph.build()
+    # Кеш участков выключен: все конфигурации исполнителя строят одни и те же маршруты
+    graph.route_cache = None
+
+    points = random_points(BENCHMARK_BBOX, args.requests * 2)
+    requests = [{'points_coordinates': points[i:i + 2]} for i in range(0, len(points), 2)]
+
+    for mode in args.modes:
+        for workers in args.workers:
+            executor = executors.RouteExecutor(graph, mode, workers, max_in_flight=workers * 2)
+            duration = asyncio.run(_run_requests(executor, requests))
+            executor.shutdown()
+
+            report('throughput', mode=mode, workers=workers, requests=len(requests),
+                   seconds=round(duration, 4), rps=round(len(requests) / duration, 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.utils import BENCHMARK_BBOX, random_points, report
+from route_builder import builders, utils
+
+
+def _batches(edges: list, size: int, seed: int = 0) -> dict:
+    """
+    Пачки изменений ребер: замедление, ускорение и перекрытие с возвратом исходных значений
+    :param edges: ребра графа (начальный узел, конечный узел)
+    :param size: количество изменений в пачке (ребра повторяются, если их меньше)
+    :param seed: начальное значение генератора
+    :return: пачки по наименованию
+    """
+    generator = random.Random(seed)
+    chosen = [generator.choice(edges) for _ in range(size)]
+
+    return {
+        'slower': [{'u': orig, 'v': dest, 'speed_kph': generator.uniform(5, 20)} for orig, dest in chosen],
+        'faster': [{'u': orig, 'v': dest, 'speed_kph': generator.uniform(90, 130)} for orig, dest in chosen],
+        'closed': [{'u': orig, 'v': dest, 'closed': True} for orig, dest in chosen],
+        'reset': [{'u': orig, 'v': dest, 'reset': True} for orig, dest in chosen],
+    }
+
+
+def main() -> None:
+    """ Замер задержки применения пачек изменений весов ребер без перестроения графа """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--network-type', default='drive')
+    parser.add_argument('--engines', nargs='+', default=['dijkstra', 'astar', 'alt'])
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for engine in args.engines:
+        graph = builders.Graph(BENCHMARK_BBOX, args.network_type, engine=engine)
+        graph.build()
+
+        nodes = graph.nearest_nodes(*utils.split_coordinates(random_points(BENCHMARK_BBOX, args.queries * 2)))
+        legs = list(zip(nodes[::2], nodes[1::2]))
+        batches = _batches(sorted(set(graph.graph.edges())), args.batch)
+
+        for name, updates in batches.items():
+            timings, invalidated = [], []
+
+            for _ in range(args.repeat):
+                # Кеш заполняется до каждого обновления, чтобы замер включал удаление устаревших участков
+                graph.build_legs(legs, 'travel_time')
+
+                started_at = time.perf_counter()
+                invalidated.append(graph.update_edges(updates).invalidated_routes)
+                timings.append(time.perf_counter() - started_at)
+
+            report('updates', engine=engine, batch=name, edges=len(updates), cached_routes=len(legs),
+                   update_mean_ms=round(statistics.mean(timings) * 1000, 4),
+                   update_max_ms=round(max(timings) * 1000, 4),
+                   invalidated_routes=round(statistics.mean(invalidated), 1))
+
+
+if __name__ == '__main__':
+    main()
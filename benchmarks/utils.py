@@ -0,0 +1,90 @@
+import json
+import random
+import sys
+import time
+from typing import TYPE_CHECKING, Callable, List, Sequence, Tuple
+
+from route_builder import routing, utils
+
+if TYPE_CHECKING:
+    from route_builder.indexes import GraphIndexes
+
+
+BENCHMARK_BBOX = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+def random_points(bbox: utils.Bbox, count: int, seed: int = 0) -> List[List[float]]:
+    """
+    Генерация случайных точек внутри зоны
+    :param bbox: зона ограничения
+    :param count: количество точек
+    :param seed: начальное значение генератора
+    :return: список координат вида [(Y, X), (Y, X), ...]
+    """
+    generator = random.Random(seed)
+    return [[generator.uniform(bbox.south, bbox.north), generator.uniform(bbox.west, bbox.east)]
+            for _ in range(count)]
+
+
+def measure(func: Callable, repeat: int) -> List[float]:
+    """
+    Замер времени выполнения функции
+    :param func: функция без аргументов
+    :param repeat: количество повторов
+    :return: список длительностей в секундах
+    """
+    timings = []
+
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+
+    return timings
+
+
+def measure_searches(indexes: 'GraphIndexes', pairs: Sequence[Tuple[int, int]], weight: str,
+                     engine: routing.EnginesType) -> Tuple[List[float], List[int]]:
+    """
+    Замер времени поиска кратчайшего пути и количества просмотренных узлов
+    :param indexes: CSR-граф и индексы алгоритма
+    :param pairs: пары позиций (начальный узел, конечный узел)
+    :param weight: наименование атрибута веса
+    :param engine: алгоритм поиска
+    :return: (длительности в секундах, количества просмотренных узлов; 0 - путь не существует)
+    """
+    timings, settled = [], []
+
+    for source, target in pairs:
+        started_at = time.perf_counter()
+        result = routing.search(indexes, source, target, weight, engine)
+        timings.append(time.perf_counter() - started_at)
+        settled.append(result.settled if result else 0)
+
+    return timings, settled
+
+
+def percentile(values: Sequence[float], rank: float) -> float:
+    """
+    Перцентиль выборки
+    :param values: выборка
+    :param rank: ранг в диапазоне [0, 100]
+    :return: значение перцентиля
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(rank / 100 * (len(ordered) - 1))))]
+
+
+def report(benchmark: str, **values) -> dict:
+    """
+    Вывод результата замера в формате JSON Lines
+    :param benchmark: наименование замера
+    :param values: значения метрик
+    :return: результат замера
+    """
+    record = {'benchmark': benchmark, **values}
+
+    sys.stdout.write(json.dumps(record) + '\n')
+    sys.stdout.flush()
+
+    return record
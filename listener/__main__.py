@@ -1,55 +1,434 @@
 import logging
 import asyncio
+import functools
 import json
-from dataclasses import asdict
+import time
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 import aio_pika
 
 import settings
-from route_builder import builders
+from listener import coordinator
+from listener.admission import Response, admit, is_cheap, is_late, queue_lag
+from route_builder import codecs, executors, metrics, partitions, utils
+from route_builder.profiling import SamplingProfiler
+from route_builder.registry import GraphRegistry
 
 
 logger = logging.getLogger(__name__)
 
+# Тип сообщения (поле type тела запроса) -> операция построителя
+MESSAGE_TYPES = {
+    'route': 'build_route',
+    'matrix': 'build_matrix',
+    'update': 'update_graph',
+    'isochrones': 'build_isochrones',
+    'match': 'match_trace',
+    'overlay': 'partition_overlay',
+    'boundary_table': 'build_boundary_table',
+    'legs': 'build_node_legs',
+}
 
-async def run(graph) -> None:
+
+def batch_key(codec: codecs.Codec, request_data: dict) -> Union[str, bytes]:
+    """
+    Ключ одинаковых запросов пачки: JSON с упорядоченными полями, а для значений, не представимых в JSON
+    (например, bytes в запросе msgpack), - тело запроса, закодированное кодеком запроса
+    :param codec: кодек запроса
+    :param request_data: запрос
+    :return: ключ
+    """
+    try:
+        return json.dumps(request_data, sort_keys=True)
+    except TypeError:
+        return codec.encode(request_data)
+
+
+def create_executor(graph) -> executors.RouteExecutor:
+    """
+    Исполнитель listener'а по настройкам: профилировщик медленных запросов и полоса дешевых запросов
+    :param graph: граф или реестр графов
+    :return: исполнитель
+    """
+    profiler = SamplingProfiler(settings.PROFILE_SLOW_MS, settings.PROFILE_DIR, settings.PROFILE_INTERVAL_MS) \
+        if settings.PROFILE_SLOW_MS else None
+
+    return executors.RouteExecutor(graph, settings.EXECUTOR_MODE, settings.EXECUTOR_WORKERS,
+                                   max_in_flight=settings.RMQ_PREFETCH_COUNT, profiler=profiler,
+                                   priority_workers=settings.PRIORITY_WORKERS)
+
+
+async def send(channel: aio_pika.abc.AbstractChannel, message: aio_pika.abc.AbstractIncomingMessage, data: Response,
+               codec: codecs.Codec, headers: Optional[dict] = None) -> None:
+    """
+    Отправка сообщения ответа
+    :param channel: канал брокера
+    :param message: сообщение запроса (очередь ответа и идентификатор запроса)
+    :param data: ответ или часть ответа
+    :param codec: кодек ответа
+    :param headers: заголовки сообщения
+    :return: None
+    """
+    with metrics.stage('encode'):
+        body = codec.encode(data)
+
+    with metrics.stage('publish'):
+        await channel.default_exchange.publish(aio_pika.Message(
+            body=body,
+            content_type=codec.content_type,
+            correlation_id=message.correlation_id,
+            headers=headers,
+        ), routing_key=message.reply_to)
+
+
+async def publish(channel: aio_pika.abc.AbstractChannel, message: aio_pika.abc.AbstractIncomingMessage,
+                  data: Response, codec: codecs.Codec) -> None:
+    """
+    Публикация ответа. Части потока (например, зоны достижимости с stream), не отправленные StreamPublisher
+    при построении, отправляются отдельными сообщениями: заголовки part и parts
+    :param channel: канал брокера
+    :param message: сообщение запроса
+    :param data: ответ
+    :param codec: кодек ответа
+    :return: None
+    """
+    if isinstance(data, utils.Stream):
+        for part, part_data in enumerate(data.parts):
+            await send(channel, message, part_data, codec, headers={'part': part, 'parts': data.count})
+    else:
+        await send(channel, message, data, codec)
+
+    logger.info("============== MESSAGE %s REPLIED ==============", message.correlation_id)
+
+
+class StreamPublisher:
+    """
+    Отправка частей потока по мере построения: части принимаются из потока воркера исполнителя
+    и отправляются по порядку задачей цикла событий (заголовки part и parts).
+    Задача отправки создается при получении первой части
+    """
+    def __init__(self, channel: aio_pika.abc.AbstractChannel, message: aio_pika.abc.AbstractIncomingMessage,
+                 codec: codecs.Codec):
+        """
+        Инициализация
+        :param channel: канал брокера
+        :param message: сообщение запроса
+        :param codec: кодек ответа
+        """
+        self.channel = channel
+        self.message = message
+        self.codec = codec
+
+        self._loop = asyncio.get_running_loop()
+        self._parts: asyncio.Queue = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    def put(self, part_data: Response, count: int) -> None:
+        """
+        Передача построенной части на отправку (из любого потока)
+        :param part_data: часть ответа
+        :param count: количество частей
+        :return: None
+        """
+        self._loop.call_soon_threadsafe(self._enqueue, (part_data, count))
+
+    def _enqueue(self, item: Tuple[Response, int]) -> None:
+        """
+        Постановка части в очередь отправки (в цикле событий)
+        :param item: (часть ответа, количество частей)
+        :return: None
+        """
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send())
+
+        self._parts.put_nowait(item)
+
+    async def _send(self) -> None:
+        """
+        Отправка частей по порядку до закрытия
+        :return: None
+        """
+        part = 0
+
+        while (item := await self._parts.get()) is not None:
+            part_data, count = item
+            await send(self.channel, self.message, part_data, self.codec, headers={'part': part, 'parts': count})
+            part += 1
+
+    async def close(self) -> None:
+        """
+        Ожидание отправки переданных частей
+        :return: None
+        """
+        # Части, переданные из цикла событий (режим sync), ставятся в очередь после шага цикла
+        await asyncio.sleep(0)
+
+        if self._sender is not None:
+            self._parts.put_nowait(None)
+            await self._sender
+
+
+async def handle(executor: executors.RouteExecutor, request_data: dict, deadline: Optional[float] = None,
+                 on_part: Optional[executors.PartCallback] = None) -> Response:
+    """
+    Выполнение запроса операцией построителя по типу сообщения
+    :param executor: исполнитель
+    :param request_data: запрос
+    :param deadline: срок выполнения (время time.time()), None - без срока
+    :param on_part: получатель частей потока по мере построения (без получателя части возвращаются в ответе)
+    :return: ответ
+    """
+    priority = is_cheap(request_data)
+    message_type = request_data.pop('type', 'route')
+    metrics.MESSAGES.inc(type=message_type)
+
+    if message_type == 'graphs' and isinstance(executor.graph, GraphRegistry):
+        return {'graphs': executor.graph.stats(), 'memory_bytes': executor.graph.memory_bytes,
+                'evictions': executor.graph.evictions}
+
+    if message_type in MESSAGE_TYPES:
+        return await executor.run(MESSAGE_TYPES[message_type], deadline=deadline, priority=priority, on_part=on_part,
+                                  **request_data)
+
+    return utils.Error(f'Значения type: {", ".join(MESSAGE_TYPES)}')
+
+
+def group_routes(requests: List[dict]) -> Dict[tuple, List[int]]:
+    """
+    Группы маршрутов пачки по графу (регион, тип связей) и полосе исполнителя.
+    Из запросов маршрутов извлекаются type, region и network_type
+    :param requests: запросы пачки
+    :return: индексы запросов по (регион, тип связей, полоса дешевых запросов)
+    """
+    groups = {}
+
+    for index, request_data in enumerate(requests):
+        if request_data.get('type', 'route') == 'route':
+            metrics.MESSAGES.inc(type='route')
+            priority = is_cheap(request_data)
+            group = (request_data.pop('region', None), request_data.pop('network_type', None), priority)
+            request_data.pop('type', None)
+            groups.setdefault(group, []).append(index)
+
+    return groups
+
+
+async def handle_batch(executor: executors.RouteExecutor, requests: List[dict],
+                       requests_deadlines: List[Optional[float]]) -> List[Response]:
+    """
+    Выполнение запросов пачки: маршруты строятся одним вызовом на группу group_routes, остальные запросы - по одному
+    :param executor: исполнитель
+    :param requests: запросы
+    :param requests_deadlines: сроки выполнения запросов
+    :return: ответы в порядке запросов
+    """
+    responses: List[Optional[Response]] = [None] * len(requests)
+    groups = group_routes(requests)
+
+    async def handle_group(group: tuple, indexes: List[int]) -> None:
+        graph_params = {name: value for name, value in zip(('region', 'network_type'), group) if value}
+        # Группа прерывается, только когда истек срок всех ее запросов
+        group_deadlines = [requests_deadlines[index] for index in indexes]
+        deadline = None if None in group_deadlines else max(group_deadlines)
+
+        results = await executor.run('build_routes', deadline=deadline, priority=group[2],
+                                     requests=[requests[index] for index in indexes], **graph_params)
+
+        # Ошибка выбора графа реестром возвращается одна на всю группу
+        if not isinstance(results, list):
+            results = [results] * len(indexes)
+
+        for index, result in zip(indexes, results):
+            responses[index] = result
+
+    async def handle_single(index: int) -> None:
+        responses[index] = await handle(executor, requests[index], requests_deadlines[index])
+
+    grouped = {index for indexes in groups.values() for index in indexes}
+    await asyncio.gather(*(handle_group(group, indexes) for group, indexes in groups.items()),
+                         *(handle_single(index) for index in range(len(requests)) if index not in grouped))
+
+    return responses
+
+
+async def process_message(executor: executors.RouteExecutor, channel: aio_pika.abc.AbstractChannel,
+                          message: aio_pika.abc.AbstractIncomingMessage) -> None:
+    """
+    Обработка сообщения
+    :param executor: исполнитель
+    :param channel: канал брокера для ответа
+    :param message: сообщение
+    :return: None
+    """
+    async with message.process():
+        logger.info("============== MESSAGE %s RECEIVED ==============", message.correlation_id)
+        received_at = time.time()
+        metrics.QUEUE_LAG_SECONDS.set(queue_lag(message, received_at))
+        codec, request_data, deadline = admit(message, received_at)
+
+        if not isinstance(request_data, utils.Error):
+            # Части потока отправляются по мере построения, ошибка построения - после отправленных частей
+            streamer = StreamPublisher(channel, message, codec)
+
+            try:
+                request_data = await handle(executor, request_data, deadline, on_part=streamer.put)
+            finally:
+                await streamer.close()
+
+        if is_late(request_data, deadline):
+            metrics.LATE.inc()
+
+        await publish(channel, message, request_data, codec)
+
+
+async def process_batch(executor: executors.RouteExecutor, channel: aio_pika.abc.AbstractChannel,
+                        received: List[Tuple[float, aio_pika.abc.AbstractIncomingMessage]]) -> None:
+    """
+    Обработка пачки сообщений: одинаковые запросы выполняются один раз
+    :param executor: исполнитель
+    :param channel: канал брокера для ответов
+    :param received: (время получения, сообщение) сообщений пачки
+    :return: None
+    """
+    messages = [message for _, message in received]
+
+    async with AsyncExitStack() as stack:
+        for message in messages:
+            await stack.enter_async_context(message.process())
+
+        logger.info("============== BATCH OF %s MESSAGES RECEIVED ==============", len(messages))
+        metrics.QUEUE_LAG_SECONDS.set(max(queue_lag(message, received_at) for received_at, message in received))
+
+        decoded = [admit(message, received_at) for received_at, message in received]
+
+        # Ключи считаются до обработки: обработка изменяет запрос (извлекает type, region и network_type).
+        # Срок общего запроса - наиболее поздний из сроков одинаковых запросов
+        keys = [None if isinstance(request_data, utils.Error) else batch_key(codec, request_data)
+                for codec, request_data, _ in decoded]
+        unique, unique_deadlines = {}, {}
+        for key, (_, request_data, deadline) in zip(keys, decoded):
+            if key is None:
+                continue
+
+            if key not in unique:
+                unique[key], unique_deadlines[key] = request_data, deadline
+            elif unique_deadlines[key] is not None:
+                unique_deadlines[key] = None if deadline is None else max(deadline, unique_deadlines[key])
+
+        responses = dict(zip(unique, await handle_batch(executor, list(unique.values()),
+                                                        list(unique_deadlines.values()))))
+
+        def response(key: Optional[Union[str, bytes]], request_data: Union[dict, utils.Error],
+                     deadline: Optional[float]) -> Response:
+            result = request_data if key is None else responses[key]
+
+            if is_late(result, deadline):
+                metrics.LATE.inc()
+
+            return result
+
+        # Подтверждения публикаций ожидаются одновременно, а не по одной
+        await asyncio.gather(*(publish(channel, message, response(key, request_data, deadline), codec)
+                               for message, key, (codec, request_data, deadline) in zip(messages, keys, decoded)))
+
+
+async def collect_batches(pending: asyncio.Queue,
+                          process: Callable[[List[Tuple[float, aio_pika.abc.AbstractIncomingMessage]]],
+                                            Awaitable[None]]) -> None:
+    """
+    Сбор пачек из полученных сообщений: до settings.RMQ_BATCH_SIZE сообщений или settings.RMQ_BATCH_WAIT_MS
+    ожидания после первого сообщения пачки. Пачки обрабатываются отдельными задачами
+    :param pending: очередь (время получения, сообщение) полученных сообщений
+    :param process: обработка пачки
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+    batches = set()
+
+    while True:
+        messages = [await pending.get()]
+        deadline = loop.time() + settings.RMQ_BATCH_WAIT_MS / 1000
+
+        while len(messages) < settings.RMQ_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+
+            try:
+                messages.append(await asyncio.wait_for(pending.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        batch = asyncio.create_task(process(messages))
+        batches.add(batch)
+        batch.add_done_callback(batches.discard)
+
+
+async def consume(queue: aio_pika.abc.AbstractQueue, executor: executors.RouteExecutor,
+                  channel: aio_pika.abc.AbstractChannel) -> Optional[asyncio.Task]:
+    """
+    Подписка на очередь запросов: сообщения обрабатываются по одному или пачками (settings.RMQ_BATCH_SIZE > 1)
+    :param queue: очередь запросов
+    :param executor: исполнитель
+    :param channel: канал брокера для ответов
+    :return: задача сбора пачек или None
+    """
+    if settings.RMQ_BATCH_SIZE <= 1:
+        await queue.consume(functools.partial(process_message, executor, channel))
+        return None
+
+    pending: asyncio.Queue = asyncio.Queue()
+
+    async def receive(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        await pending.put((time.time(), message))
+
+    collector = asyncio.create_task(collect_batches(pending, functools.partial(process_batch, executor, channel)))
+    await queue.consume(receive)
+    return collector
+
+
+async def run(graph, connect: Callable[[str], Awaitable] = aio_pika.connect_robust,
+              queue_name: Optional[str] = None) -> None:
     """
     Запуск rpc-модуля
-    :param graph: используемый для построения маршрутов граф
+    :param graph: используемый для построения маршрутов граф или реестр графов
+    :param connect: подключение к брокеру (например, брокер в памяти для замеров и тестов)
+    :param queue_name: очередь запросов (по умолчанию settings.RMQ_QUEUE)
     :return: None
     """
-    connection = await aio_pika.connect_robust(settings.RMQ_URL)
+    executor = create_executor(graph)
+
+    metrics_server = await metrics.start_server(settings.METRICS_PORT) if settings.METRICS_PORT else None
+
+    connection = await connect(settings.RMQ_URL)
 
     # Creating channel
     channel = await connection.channel()
 
     # Maximum message count which will be processing at the same time.
-    await channel.set_qos(prefetch_count=settings.RMQ_PREFETCH_COUNT)
+    # Полоса дешевых запросов получает сообщения сверх prefetch основной полосы
+    await channel.set_qos(prefetch_count=max(settings.RMQ_PREFETCH_COUNT, settings.RMQ_BATCH_SIZE)
+                          + settings.PRIORITY_WORKERS)
 
     # Declaring queue
-    queue = await channel.declare_queue(settings.RMQ_QUEUE, auto_delete=True)
-
-    async def publish(routing_key: str, correlation_id: str, data: dict):
-        await channel.default_exchange.publish(aio_pika.Message(
-            body=json.dumps(data).encode(),
-            correlation_id=correlation_id,
-        ), routing_key=routing_key)
-        logger.info("============== MESSAGE %s REPLIED ==============", correlation_id)
+    queue = await channel.declare_queue(queue_name or settings.RMQ_QUEUE, auto_delete=True)
 
-    async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
-        async with message.process():
-            logger.info("============== MESSAGE %s RECEIVED ==============", message.correlation_id)
-            request_data = json.loads(message.body)
-            response_data = asdict(builders.build_route(graph, **request_data))
-            await publish(message.reply_to, message.correlation_id, response_data)
-
-    await queue.consume(process_message)
+    collector = await consume(queue, executor, channel)
 
     try:
         # Wait until terminate
         await asyncio.Future()
     finally:
+        if collector:
+            collector.cancel()
+
+        if metrics_server:
+            metrics_server.close()
+
         await connection.close()
+        executor.shutdown()
+        graph.shutdown_leg_pool()
 
 
 if __name__ == "__main__":
@@ -58,7 +437,24 @@ if __name__ == "__main__":
     if not settings.APP_NAME:
         raise ValueError('APP_NAME: value required')
 
-    _graph = builders.Graph(settings.BBOX, settings.NETWORK_TYPE)
-    _graph.build()
+    # Регион, разбитый на разделы: listener раздела (settings.PARTITION) хранит граф своего раздела,
+    # координатор строит маршруты через listener'ы разделов
+    if settings.PARTITION_ROWS * settings.PARTITION_COLS > 1:
+        _tiles = partitions.grid_tiles(settings.BBOX, settings.PARTITION_ROWS, settings.PARTITION_COLS)
+
+        if settings.PARTITION:
+            asyncio.run(run(coordinator.load_partition(settings.PARTITION, _tiles),
+                            queue_name=coordinator.partition_queue(settings.PARTITION)))
+        else:
+            asyncio.run(coordinator.run(_tiles))
+    else:
+        _registry = GraphRegistry.from_settings()
+
+        # Граф зоны settings.BBOX загружается при запуске, остальные регионы - при первом запросе
+        if settings.BBOX.north is not None:
+            _graph = _registry.get()
+
+            if settings.LEG_WORKERS:
+                _graph.start_leg_pool(settings.LEG_WORKERS)
 
-    asyncio.run(run(_graph))
+        asyncio.run(run(_registry))
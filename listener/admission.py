@@ -0,0 +1,135 @@
+import time
+from datetime import timezone
+from typing import Any, Optional, Tuple, Union
+
+import aio_pika
+
+import settings
+from route_builder import codecs, deadlines, metrics, utils
+
+
+# Ответ: dataclass построителя или словарь; кодируется без dataclasses.asdict
+Response = Any
+
+
+def decode(message: aio_pika.abc.AbstractIncomingMessage) -> Tuple[codecs.Codec, Union[dict, utils.Error]]:
+    """
+    Декодирование тела сообщения кодеком, выбранным по content_type
+    :param message: сообщение
+    :return: (кодек ответа, запрос или ошибка неизвестного content_type)
+    """
+    try:
+        codec = codecs.get_codec(message.content_type)
+    except ValueError as ex:
+        return codecs.get_codec(), utils.Error(str(ex))
+
+    with metrics.stage('decode'):
+        return codec, codec.decode(message.body)
+
+
+def published_at(message: aio_pika.abc.AbstractIncomingMessage, received_at: float) -> float:
+    """
+    Время публикации сообщения, если отправитель указал timestamp, иначе время получения
+    :param message: сообщение
+    :param received_at: время получения сообщения (time.time())
+    :return: время time.time()
+    """
+    if message.timestamp is None:
+        return received_at
+
+    # pamqp декодирует timestamp как наивное время UTC
+    timestamp = message.timestamp
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    return timestamp.timestamp()
+
+
+def queue_lag(message: aio_pika.abc.AbstractIncomingMessage, received_at: float) -> float:
+    """
+    Задержка сообщения до начала обработки: от публикации, если отправитель указал timestamp,
+    иначе от получения сообщения (ожидание в пачке)
+    :param message: сообщение
+    :param received_at: время получения сообщения (time.time())
+    :return: задержка в секундах
+    """
+    return max(time.time() - published_at(message, received_at), 0.0)
+
+
+def expiration_deadline(message: aio_pika.abc.AbstractIncomingMessage, received_at: float) -> Optional[float]:
+    """
+    Срок выполнения по AMQP expiration. RabbitMQ отсчитывает expiration от попадания сообщения в очередь
+    и не доставляет истекшие сообщения, поэтому срок отсчитывается от получения. timestamp отправителя сокращает срок,
+    но он задан часами отправителя с точностью до секунды: к нему добавляется секунда отброшенной дробной части
+    и допустимое расхождение часов settings.RMQ_CLOCK_SKEW
+    :param message: сообщение
+    :param received_at: время получения сообщения (time.time())
+    :return: время time.time() или None, если expiration не задан
+    """
+    if not message.expiration:
+        return None
+
+    expiration = float(message.expiration)
+    deadline = received_at + expiration
+
+    if message.timestamp is not None:
+        deadline = min(deadline, published_at(message, received_at) + 1 + settings.RMQ_CLOCK_SKEW + expiration)
+
+    return deadline
+
+
+def admit(message: aio_pika.abc.AbstractIncomingMessage,
+          received_at: float) -> Tuple[codecs.Codec, Union[dict, utils.Error], Optional[float]]:
+    """
+    Прием сообщения с учетом срока выполнения: AMQP expiration (expiration_deadline) и поле deadline запроса
+    (время Unix в секундах), действует более ранний. Сообщение с истекшим expiration отклоняется
+    без декодирования, запрос с истекшим deadline - до привязки координат к графу
+    :param message: сообщение
+    :param received_at: время получения сообщения (time.time())
+    :return: (кодек ответа, запрос или ошибка, срок выполнения или None)
+    """
+    deadline = expiration_deadline(message, received_at)
+
+    if deadlines.expired(deadline):
+        metrics.SHED.inc(reason='expired')
+        return codecs.get_codec(message.content_type if message.content_type in codecs.CODECS else None), \
+            utils.Error(deadlines.EXPIRED), deadline
+
+    codec, request_data = decode(message)
+    if isinstance(request_data, utils.Error):
+        return codec, request_data, deadline
+
+    try:
+        requested = request_data.pop('deadline', None)
+        if requested is not None:
+            deadline = min(float(requested), deadline) if deadline is not None else float(requested)
+    except (TypeError, ValueError):
+        return codec, utils.Error('Значения deadline: время Unix в секундах'), deadline
+
+    if deadlines.expired(deadline):
+        metrics.SHED.inc(reason='expired')
+        return codec, utils.Error(deadlines.EXPIRED), deadline
+
+    return codec, request_data, deadline
+
+
+def is_cheap(request_data: dict) -> bool:
+    """
+    Дешевый запрос для полосы исполнителя: маршрут из двух точек без карты, порядка обхода и альтернатив
+    :param request_data: запрос
+    :return: bool
+    """
+    return request_data.get('type', 'route') == 'route' and not request_data.get('with_map') \
+        and len(request_data.get('points_coordinates') or ()) == 2 \
+        and not request_data.get('optimize_order') and not request_data.get('alternatives')
+
+
+def is_late(response: Response, deadline: Optional[float]) -> bool:
+    """
+    Ответ, построенный полностью, но после истечения срока (работа выполнена напрасно)
+    :param response: ответ
+    :param deadline: срок выполнения или None
+    :return: bool
+    """
+    shed = isinstance(response, utils.Error) and response.error_details == deadlines.EXPIRED
+    return not shed and deadlines.expired(deadline)
@@ -0,0 +1,464 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import aio_pika
+
+import settings
+from listener.admission import Response, admit, is_late, queue_lag
+from route_builder import builders, codecs, deadlines, metrics, partitions, utils
+
+
+logger = logging.getLogger(__name__)
+
+# Вызов операции listener'а раздела: (наименование раздела, запрос) -> ответ
+PartitionCall = Callable[[str, dict], Awaitable[dict]]
+
+# Часть участка маршрута: (раздел, начальный узел, конечный узел); раздел None - ребро между разделами
+Piece = Tuple[Optional[str], int, int]
+
+MAP_FORMATS = ('geojson', 'polyline')
+
+
+def _concat(sequences: List[list]) -> list:
+    """
+    Соединение последовательностей частей участка: первый элемент каждой следующей части совпадает
+    с последним элементом предыдущей
+    :param sequences: последовательности частей
+    :return: последовательность участка
+    """
+    return sequences[0] + [value for sequence in sequences[1:] for value in sequence[1:]]
+
+
+def partition_queue(name: str) -> str:
+    """
+    Очередь listener'а раздела
+    :param name: наименование раздела
+    :return: наименование очереди
+    """
+    return f'{settings.RMQ_QUEUE}:{name}'
+
+
+def load_partition(name: str, tiles: Dict[str, utils.Bbox]) -> builders.Graph:
+    """
+    Построение графа раздела: граф зоны раздела, расширенной на settings.PARTITION_MARGIN, загружается из OSM,
+    чтобы найти ребра в соседние разделы, и заменяется графом узлов раздела. Пока у узлов раздела есть ребра
+    длиннее расширения (второй конец вне зоны загрузки), расширение удваивается
+    :param name: наименование раздела
+    :param tiles: зоны разделов региона
+    :return: граф раздела
+    """
+    if name not in tiles:
+        raise ValueError(f'Значения PARTITION: {", ".join(tiles)}')
+
+    margin = settings.PARTITION_MARGIN
+    while True:
+        bbox = partitions.margin_bbox(tiles[name], margin)
+        source = builders.download_graph(bbox, settings.NETWORK_TYPE, truncate_by_edge=True)
+        partition = partitions.Partition.from_graph(name, tiles, source)
+
+        escaping = partitions.escaping_edges(source, partition.graph.nodes, bbox)
+        del source
+
+        if not escaping:
+            break
+
+        logger.info("============== PARTITION %s: %s EDGES LONGER THAN MARGIN %s M ==============",
+                    name, escaping, margin)
+        margin *= 2
+
+    graph = builders.Graph(tiles[name], settings.NETWORK_TYPE)
+    graph.build(partition.graph)
+    graph.partition = partition
+
+    return graph
+
+
+class PartitionClient:
+    """ RPC-клиент listener'ов разделов: ответы принимаются одной очередью и сопоставляются по correlation_id """
+    channel: aio_pika.abc.AbstractChannel
+    timeout: float
+
+    def __init__(self, channel: aio_pika.abc.AbstractChannel, timeout: Optional[float] = None):
+        """
+        Инициализация клиента
+        :param channel: канал брокера
+        :param timeout: время ожидания ответа раздела в секундах (по умолчанию settings.PARTITION_TIMEOUT)
+        """
+        self.channel = channel
+        self.timeout = timeout or settings.PARTITION_TIMEOUT
+
+        self._codec = codecs.get_codec()
+        self._reply_to = f'{settings.APP_NAME}:coordinator:{uuid.uuid4()}'
+        self._waiters: Dict[str, asyncio.Future] = {}
+
+    async def start(self, names: Sequence[str]) -> None:
+        """
+        Объявление очередей разделов (сообщения в еще не запущенный раздел не теряются) и подписка на ответы
+        :param names: наименования разделов
+        :return: None
+        """
+        for name in names:
+            await self.channel.declare_queue(partition_queue(name), auto_delete=True)
+
+        reply_queue = await self.channel.declare_queue(self._reply_to, exclusive=True, auto_delete=True)
+        await reply_queue.consume(self._receive)
+
+    async def _receive(self, message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        async with message.process():
+            waiter = self._waiters.pop(message.correlation_id, None)
+
+            if waiter is not None and not waiter.done():
+                waiter.set_result(self._codec.decode(message.body))
+
+    async def call(self, name: str, request: dict) -> dict:
+        """
+        Вызов операции listener'а раздела: ответ ожидается не дольше срока запроса (поле deadline)
+        :param name: наименование раздела
+        :param request: запрос
+        :return: ответ
+        """
+        correlation_id = str(uuid.uuid4())
+        waiter = self._waiters[correlation_id] = asyncio.get_running_loop().create_future()
+        deadline = request.get('deadline')
+        timeout = self.timeout if deadline is None else max(min(self.timeout, deadline - time.time()), 0)
+
+        try:
+            await self.channel.default_exchange.publish(aio_pika.Message(
+                body=self._codec.encode(request),
+                content_type=self._codec.content_type,
+                correlation_id=correlation_id,
+                reply_to=self._reply_to,
+            ), routing_key=partition_queue(name))
+
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError as ex:
+            deadlines.check(deadline)
+            raise ValueError(f'Раздел {name} не ответил за {self.timeout} с') from ex
+        finally:
+            self._waiters.pop(correlation_id, None)
+
+
+class PartitionRouter:
+    """
+    Построение маршрутов по разделам региона: участок маршрута - минимум из пути внутри раздела (точки одного
+    раздела) и пути через граф верхнего уровня, составленного из границ разделов. Расстояния точек до граничных
+    узлов и пути внутри разделов строят listener'ы разделов, поэтому координатор не хранит граф региона
+    """
+    tiles: Dict[str, utils.Bbox]
+    overlay: Optional[partitions.Overlay] = None
+
+    def __init__(self, tiles: Dict[str, utils.Bbox], call: PartitionCall):
+        """
+        Инициализация построителя
+        :param tiles: зоны разделов
+        :param call: вызов операции listener'а раздела
+        """
+        self.tiles = tiles
+        self._call = call
+        self._boundary: Dict[str, List[int]] = {}
+
+    async def call(self, name: str, request: dict, deadline: Optional[float] = None) -> dict:
+        """
+        Вызов операции раздела с проверкой ошибки
+        :param name: наименование раздела
+        :param request: запрос
+        :param deadline: срок выполнения (время time.time()), передается разделу полем deadline
+        :return: ответ
+        """
+        response = await self._call(name, request if deadline is None else {**request, 'deadline': deadline})
+
+        if response.get('error_details') == deadlines.EXPIRED:
+            raise deadlines.DeadlineExceeded()
+
+        if 'error_details' in response:
+            raise ValueError(f'Раздел {name}: {response["error_details"]}')
+
+        return response
+
+    async def load(self) -> None:
+        """
+        Построение графа верхнего уровня по границам всех разделов
+        :return: None
+        """
+        overlays = await asyncio.gather(*(self.call(name, {'type': 'overlay'}) for name in self.tiles))
+
+        self.overlay = partitions.Overlay(overlays)
+        self._boundary = {overlay['partition']: [self.overlay.position(node) for node in overlay['boundary']]
+                          for overlay in overlays}
+
+        logger.info("============== OVERLAY OF %s PARTITIONS: %s BOUNDARY NODES ==============",
+                    len(overlays), self.overlay.nodes_count)
+
+    def _direct(self, source: Tuple[str, dict, int], target: Tuple[str, dict, int]) -> Tuple[float, List[Piece]]:
+        """
+        Путь участка внутри раздела (точки одного раздела)
+        :param source: (раздел, таблица расстояний раздела, индекс точки в таблице) начальной точки
+        :param target: (раздел, таблица расстояний раздела, индекс точки в таблице) конечной точки
+        :return: (вес пути, части участка), пустой список частей - путь не существует
+        """
+        (name, table, index), (target_name, target_table, target_index) = source, target
+
+        if name != target_name or table['direct'][index][target_index] is None:
+            return math.inf, []
+
+        return table['direct'][index][target_index], [(name, table['nodes'][index], target_table['nodes'][target_index])]
+
+    def _via_overlay(self, source: Tuple[str, dict, int], target: Tuple[str, dict, int],
+                     optimizer: str) -> Tuple[float, List[Piece]]:
+        """
+        Путь участка через граф верхнего уровня: от начальной точки до граничного узла ее раздела,
+        по графу верхнего уровня и от граничного узла раздела конечной точки
+        :param source: (раздел, таблица расстояний раздела, индекс точки в таблице) начальной точки
+        :param target: (раздел, таблица расстояний раздела, индекс точки в таблице) конечной точки
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        :return: (вес пути, части участка), пустой список частей - путь не существует
+        """
+        (source_name, source_table, source_index), (target_name, target_table, target_index) = source, target
+
+        distance, path = self.overlay.route(
+            {position: value for position, value in zip(self._boundary[source_name],
+                                                        source_table['to_boundary'][source_index])
+             if value is not None},
+            {position: value for position, value in zip(self._boundary[target_name],
+                                                        target_table['from_boundary'][target_index])
+             if value is not None},
+            optimizer)
+
+        if not path:
+            return distance, []
+
+        nodes = self.overlay.node_ids[path].tolist()
+        pieces = [(source_name, source_table['nodes'][source_index], nodes[0])]
+
+        for index in range(len(path) - 1):
+            pieces.append((None if (path[index], path[index + 1]) in self.overlay.cut_edges
+                           else self.overlay.partitions[path[index]], nodes[index], nodes[index + 1]))
+
+        pieces.append((target_name, nodes[-1], target_table['nodes'][target_index]))
+        return distance, pieces
+
+    def _pieces(self, source: Tuple[str, dict, int], target: Tuple[str, dict, int], optimizer: str) -> List[Piece]:
+        """
+        Части участка маршрута между двумя точками: минимум из пути внутри раздела и пути через граф верхнего уровня
+        :param source: (раздел, таблица расстояний раздела, индекс точки в таблице) начальной точки
+        :param target: (раздел, таблица расстояний раздела, индекс точки в таблице) конечной точки
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        :return: части участка
+        """
+        distance, pieces = self._direct(source, target)
+        overlay_distance, overlay_pieces = self._via_overlay(source, target, optimizer)
+
+        if overlay_distance < distance:
+            pieces = overlay_pieces
+
+        if not pieces:
+            raise ValueError('Невозможно создать маршрут с текущими входными параметрами')
+
+        return pieces
+
+    def _cut_edge(self, orig: int, dest: int) -> Tuple[List[int], float, float, List[List[float]]]:
+        """
+        Ребро между разделами как часть маршрута
+        :param orig: начальный узел
+        :param dest: конечный узел
+        :return: (путь, length, travel_time, координаты)
+        """
+        first, second = self.overlay.position(orig), self.overlay.position(dest)
+        length, travel_time = self.overlay.cut_edges[(first, second)]
+
+        return ([orig, dest], length, travel_time,
+                [[float(self.overlay.x[first]), float(self.overlay.x[second])],
+                 [float(self.overlay.y[first]), float(self.overlay.y[second])]])
+
+    async def _points(self, points_coordinates: List[Sequence[float]], optimizer: str,
+                      deadline: Optional[float] = None) -> List[Tuple[str, dict, int]]:
+        """
+        Таблицы расстояний точек до граничных узлов их разделов: точки одного раздела запрашиваются одним вызовом
+        :param points_coordinates: список координат
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        :param deadline: срок выполнения (время time.time()), передается разделам
+        :return: (раздел, таблица расстояний раздела, индекс точки в таблице) точек
+        """
+        names = partitions.assign(self.tiles, *utils.split_coordinates(points_coordinates))
+        if None in names:
+            raise ValueError('Координаты должны быть в области разделов')
+
+        groups: Dict[str, List[int]] = {}
+        for index, name in enumerate(names):
+            groups.setdefault(name, []).append(index)
+
+        with metrics.stage('boundary_tables'):
+            tables = dict(zip(groups, await asyncio.gather(*(
+                self.call(name, {'type': 'boundary_table', 'optimizer': optimizer,
+                                 'points_coordinates': [points_coordinates[index] for index in indexes]}, deadline)
+                for name, indexes in groups.items()))))
+
+        return [(name, tables[name], groups[name].index(index)) for index, name in enumerate(names)]
+
+    async def _partition_legs(self, legs: List[List[Piece]], optimizer: str, with_map: bool,
+                              deadline: Optional[float] = None) -> Dict[Piece, tuple]:
+        """
+        Построение частей маршрута внутри разделов: части одного раздела запрашиваются одним вызовом
+        :param legs: части участков маршрута
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        :param with_map: вернуть координаты частей
+        :param deadline: срок выполнения (время time.time()), передается разделам
+        :return: (путь, length, travel_time, координаты или None) по частям
+        """
+        requests: Dict[str, Dict[Tuple[int, int], None]] = {}
+        for name, orig, dest in (piece for pieces in legs for piece in pieces):
+            if name is not None:
+                requests.setdefault(name, {})[(orig, dest)] = None
+
+        with metrics.stage('partition_legs'):
+            responses = await asyncio.gather(*(
+                self.call(name, {'type': 'legs', 'optimizer': optimizer, 'with_coordinates': with_map,
+                                 'legs': [list(pair) for pair in pairs]}, deadline)
+                for name, pairs in requests.items()))
+
+        built = {}
+        for (name, pairs), response in zip(requests.items(), responses):
+            for index, (orig, dest) in enumerate(pairs):
+                if response['paths'][index] is None:
+                    raise ValueError('Невозможно создать маршрут с текущими входными параметрами')
+
+                built[(name, orig, dest)] = (response['paths'][index], response['length'][index],
+                                             response['travel_time'][index],
+                                             response['coordinates'][index] if with_map else None)
+
+        return built
+
+    def _join(self, legs: List[List[Piece]], built: Dict[Piece, tuple], with_map: bool,
+              map_format: str) -> utils.Route:
+        """
+        Соединение частей участков в маршрут
+        :param legs: части участков маршрута
+        :param built: построенные части внутри разделов (см. _partition_legs)
+        :param with_map: вернуть карту маршрута
+        :param map_format: формат карты (geojson, polyline)
+        :return: маршрут
+        """
+        paths, lines, length, travel_time = [], [], 0.0, 0.0
+        for pieces in legs:
+            parts = [self._cut_edge(orig, dest) if name is None else built[(name, orig, dest)]
+                     for name, orig, dest in pieces]
+
+            paths.append(_concat([part[0] for part in parts]))
+            if with_map:
+                lines.append([_concat([part[3][axis] for part in parts]) for axis in (0, 1)])
+
+            length += sum(part[1] for part in parts)
+            travel_time += sum(part[2] for part in parts)
+
+        route_map = None
+        if with_map:
+            route_map = utils.get_geojson(lines) if map_format == 'geojson' else \
+                utils.encode_polyline([x for line in lines for x in line[0]], [y for line in lines for y in line[1]])
+
+        return utils.Route(paths=paths[0] if len(paths) == 1 else paths, length=length, travel_time=travel_time,
+                           map=route_map)
+
+    async def build_route(self, points_coordinates: List[Sequence[float]], optimizer: str = 'length',
+                          deadline: Optional[float] = None, **kwargs) -> utils.Route:
+        """
+        Построение маршрута по разделам
+        :param points_coordinates: список координат
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        :param deadline: срок выполнения (время time.time()): проверяется между этапами и передается разделам
+        :param kwargs: параметры карты (with_map, map_format), остальные параметры маршрута не поддерживаются
+        :return: маршрут
+        """
+        with_map, map_format = kwargs.pop('with_map', False), kwargs.pop('map_format', 'html')
+
+        unsupported = [name for name, value in kwargs.items() if value]
+        if unsupported:
+            raise ValueError(f'Параметры не поддерживаются маршрутами по разделам: {", ".join(unsupported)}')
+
+        if optimizer not in partitions.WEIGHTS:
+            raise ValueError(f'Значения optimizer: {", ".join(partitions.WEIGHTS)}')
+
+        if with_map and map_format not in MAP_FORMATS:
+            raise ValueError(f'Значения map_format: {", ".join(MAP_FORMATS)}')
+
+        if len(points_coordinates) < 2:
+            raise ValueError('Маршрут должен содержать не менее двух точек')
+
+        points = await self._points(points_coordinates, optimizer, deadline)
+
+        with metrics.stage('overlay'):
+            legs = [self._pieces(source, target, optimizer) for source, target in zip(points[:-1], points[1:])]
+
+        deadlines.check(deadline)
+
+        built = await self._partition_legs(legs, optimizer, with_map, deadline)
+        return self._join(legs, built, with_map, map_format)
+
+
+async def run(tiles: Dict[str, utils.Bbox], connect: Callable[[str], Awaitable] = aio_pika.connect_robust) -> None:
+    """
+    Запуск координатора: маршруты из очереди settings.RMQ_QUEUE строятся через listener'ы разделов
+    :param tiles: зоны разделов
+    :param connect: подключение к брокеру (например, брокер в памяти для замеров и тестов)
+    :return: None
+    """
+    connection = await connect(settings.RMQ_URL)
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=settings.RMQ_PREFETCH_COUNT)
+
+    # Ответы разделов принимаются отдельным каналом: prefetch канала запросов не задерживает их
+    client = PartitionClient(await connection.channel())
+    await client.start(list(tiles))
+
+    router = PartitionRouter(tiles, client.call)
+    await router.load()
+
+    queue = await channel.declare_queue(settings.RMQ_QUEUE, auto_delete=True)
+
+    async def handle(request_data: dict, deadline: Optional[float]) -> Response:
+        message_type = request_data.pop('type', 'route')
+        metrics.MESSAGES.inc(type=message_type)
+
+        if message_type != 'route':
+            return utils.Error('Значения type: route')
+
+        started_at = asyncio.get_running_loop().time()
+        try:
+            return await router.build_route(**request_data, deadline=deadline)
+        except deadlines.DeadlineExceeded as ex:
+            metrics.SHED.inc(reason='aborted')
+            return utils.Error(str(ex))
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            return utils.Error(str(ex))
+        finally:
+            metrics.REQUEST_SECONDS.observe(asyncio.get_running_loop().time() - started_at, operation='build_route')
+
+    async def process_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        async with message.process():
+            logger.info("============== MESSAGE %s RECEIVED ==============", message.correlation_id)
+            received_at = time.time()
+            metrics.QUEUE_LAG_SECONDS.set(queue_lag(message, received_at))
+            codec, response, deadline = admit(message, received_at)
+
+            if not isinstance(response, utils.Error):
+                response = await handle(response, deadline)
+
+            if is_late(response, deadline):
+                metrics.LATE.inc()
+
+            await channel.default_exchange.publish(aio_pika.Message(
+                body=codec.encode(response),
+                content_type=codec.content_type,
+                correlation_id=message.correlation_id,
+            ), routing_key=message.reply_to)
+
+    await queue.consume(process_message)
+
+    try:
+        # Wait until terminate
+        await asyncio.Future()
+    finally:
+        await connection.close()
@@ -0,0 +1,181 @@
+import dataclasses
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from route_builder.csr import CSRGraph
+from route_builder.trees import shortest_path_trees
+
+# Допустимое удлинение альтернативы относительно кратчайшего пути (доля)
+STRETCH = 0.25
+# Максимальная доля веса альтернативы на ребрах уже выбранных маршрутов
+MAX_SHARE = 0.7
+# Минимальная длина плато относительно кратчайшего пути: короткое плато дает маршрут с петлей-объездом
+MIN_PLATEAU = 0.1
+# Количество рассматриваемых плато на один запрошенный маршрут
+CANDIDATES_PER_ROUTE = 20
+
+
+@dataclasses.dataclass
+class AlternativeParams:
+    """ Параметры отбора альтернативных маршрутов """
+    # Допустимое удлинение альтернативы (доля)
+    stretch: float = STRETCH
+    # Максимальная доля веса альтернативы на ребрах выбранных маршрутов
+    max_share: float = MAX_SHARE
+    # Минимальная длина плато (доля веса кратчайшего пути)
+    min_plateau: float = MIN_PLATEAU
+
+
+def plateaus(forward: np.ndarray, backward: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Плато - общие участки прямого дерева кратчайших путей из начального узла и обратного дерева в конечный узел:
+    ребро (u, v) принадлежит плато, если u - предшественник v в прямом дереве, а v - следующий за u узел в обратном
+    :param forward: предшественники узлов в прямом дереве (-9999 - нет предшественника)
+    :param backward: следующие узлы на пути к конечному узлу в обратном дереве
+    :return: (начала плато, концы плато, следующий узел плато для каждого узла графа, -1 - нет)
+    """
+    nodes = np.flatnonzero(forward >= 0)
+    parents = forward[nodes]
+    on_plateau = backward[parents] == nodes
+
+    following = np.full(len(forward), -1, dtype=np.int64)
+    following[parents[on_plateau]] = nodes[on_plateau]
+
+    has_previous = np.zeros(len(forward), dtype=bool)
+    has_previous[nodes[on_plateau]] = True
+    starts = np.flatnonzero((following >= 0) & ~has_previous)
+
+    # Концы плато удвоением указателей: каждый шаг удваивает пройденную часть цепочки
+    jump = np.where(following >= 0, following, np.arange(len(forward)))
+    while True:
+        doubled = jump[jump]
+        if np.array_equal(doubled, jump):
+            break
+        jump = doubled
+
+    return starts, jump[starts], following
+
+
+def _unwind(tree: np.ndarray, node: int) -> List[int]:
+    """
+    Путь по дереву от узла до корня
+    :param tree: предшественники (следующие узлы) дерева
+    :param node: узел
+    :return: узлы от node до корня
+    """
+    path = [node]
+
+    while tree[node] >= 0:
+        node = tree[node]
+        path.append(node)
+
+    return path
+
+
+def _edge_costs(path: Sequence[int], costs: Sequence[float]) -> Dict[Tuple[int, int], float]:
+    """
+    Веса ребер пути по накопленной стоимости узлов
+    :param path: позиции узлов пути
+    :param costs: накопленная стоимость в каждом узле пути
+    :return: вес по ребру (u, v)
+    """
+    return {(orig, dest): cost_dest - cost_orig
+            for orig, dest, cost_orig, cost_dest in zip(path[:-1], path[1:], costs[:-1], costs[1:])}
+
+
+class _Trees:
+    """ Ограниченные деревья кратчайших путей (прямое из начального узла и обратное в конечный) и плато между ними """
+    def __init__(self, graph: CSRGraph, shortest: Sequence[int], weight: str, limit: float):
+        """
+        Построение деревьев
+        :param graph: CSR-граф
+        :param shortest: позиции узлов кратчайшего пути
+        :param weight: наименование атрибута веса
+        :param limit: максимальное расстояние от корня дерева и стоимость маршрута через плато
+        """
+        self.limit = limit
+        self.forward = tuple(values[0] for values in shortest_path_trees(graph, [shortest[0]], weight, 1, limit))
+        self.backward = tuple(values[0] for values in
+                              shortest_path_trees(graph.reversed(), [shortest[-1]], weight, 1, limit))
+
+        self.starts, self.ends, self.following = plateaus(self.forward[1], self.backward[1])
+
+    def candidates(self, min_length: float, count: int) -> Iterator[Tuple[int, int, float]]:
+        """
+        Плато по возрастанию разности стоимости маршрута через плато и длины плато
+        :param min_length: минимальная длина плато
+        :param count: максимальное количество плато
+        :return: (начало плато, конец плато, стоимость маршрута)
+        """
+        forward_distances, backward_distances = self.forward[0], self.backward[0]
+
+        costs = forward_distances[self.starts] + backward_distances[self.starts]
+        lengths = forward_distances[self.ends] - forward_distances[self.starts]
+        feasible = (costs <= self.limit) & (lengths >= min_length)
+        starts, ends, costs = self.starts[feasible], self.ends[feasible], costs[feasible]
+
+        order = np.argsort(costs - lengths[feasible], kind='stable')[:count]
+        return zip(starts[order], ends[order], costs[order])
+
+    def route(self, start: int, end: int, cost: float) -> Tuple[List[int], np.ndarray]:
+        """
+        Маршрут через плато: путь прямого дерева до начала плато, плато и путь обратного дерева от конца плато
+        :param start: начало плато
+        :param end: конец плато
+        :param cost: стоимость маршрута
+        :return: (позиции узлов маршрута, накопленная стоимость в каждом узле)
+        """
+        prefix = _unwind(self.forward[1], start)[::-1]
+        plateau = [start]
+        while plateau[-1] != end:
+            plateau.append(self.following[plateau[-1]])
+        suffix = _unwind(self.backward[1], end)
+
+        path = prefix + plateau[1:] + suffix[1:]
+        split = len(prefix) + len(plateau) - 1
+
+        return path, np.concatenate([self.forward[0][path[:split]], cost - self.backward[0][path[split:]]])
+
+
+def alternatives(graph: CSRGraph, shortest: Sequence[int], weight: str, count: int,
+                 params: Optional[AlternativeParams] = None) -> List[List[int]]:
+    """
+    Альтернативные маршруты методом плато: два дерева кратчайших путей (прямое из начального узла и обратное
+    в конечный), ограниченные расстоянием (1 + stretch) * вес кратчайшего пути, дают все кандидаты сразу,
+    без отдельного поиска на каждую альтернативу. Кандидаты перебираются по возрастанию разности стоимости
+    и длины плато и отбрасываются, если маршрут содержит петлю или больше max_share его веса приходится
+    на уже выбранные маршруты
+    :param graph: CSR-граф
+    :param shortest: позиции узлов кратчайшего пути
+    :param weight: наименование атрибута веса
+    :param count: количество маршрутов вместе с кратчайшим
+    :param params: параметры отбора альтернатив (по умолчанию STRETCH, MAX_SHARE, MIN_PLATEAU)
+    :return: позиции узлов альтернативных маршрутов (без кратчайшего) по возрастанию веса
+    """
+    if count <= 1 or len(shortest) < 2:
+        return []
+
+    params = params or AlternativeParams()
+    distance = graph.path_sums([shortest], weight, (weight,))[0][weight]
+    trees = _Trees(graph, shortest, weight, (1 + params.stretch) * distance)
+
+    used = _edge_costs(shortest, trees.forward[0][list(shortest)])
+    routes = []
+
+    for start, end, cost in trees.candidates(params.min_plateau * distance, CANDIDATES_PER_ROUTE * count):
+        path, costs = trees.route(start, end, cost)
+        if path[0] != shortest[0] or path[-1] != shortest[-1] or len(set(path)) != len(path):
+            continue
+
+        edges = _edge_costs(path, costs)
+        if sum(value for edge, value in edges.items() if edge in used) > params.max_share * cost:
+            continue
+
+        routes.append((cost, path))
+        used.update(edges)
+
+        if len(routes) == count - 1:
+            break
+
+    return [[int(node) for node in path] for _, path in sorted(routes, key=lambda route: route[0])]
@@ -0,0 +1,121 @@
+import dataclasses
+from typing import List, Optional, Sequence
+
+import settings
+from route_builder import builders, metrics, utils
+from route_builder.csr import CSRGraph
+from route_builder.partitions import Partition
+from route_builder.trees import target_distances
+
+
+def _partition(graph: builders.Graph) -> Partition:
+    """
+    Раздел графа региона, который обслуживает граф
+    :param graph: граф
+    :return: раздел
+    """
+    if graph.partition is None:
+        raise ValueError('Граф не является разделом региона')
+
+    return graph.partition
+
+
+def _distances(csr: CSRGraph, sources: List[int], targets: List[int], weight: str) -> List[List[Optional[float]]]:
+    """
+    Таблица кратчайших расстояний от начальных узлов до конечных узлов
+    :param csr: CSR-граф (транспонированный - расстояния от конечных узлов до начальных)
+    :param sources: позиции начальных узлов
+    :param targets: позиции конечных узлов
+    :param weight: наименование атрибута веса
+    :return: расстояния формы (начальные узлы, конечные узлы), None - путь не существует
+    """
+    if not sources:
+        return []
+
+    distances = target_distances(csr, sources, targets, weight, settings.MATRIX_WORKERS)
+    return [[value if value != float('inf') else None for value in row] for row in distances.tolist()]
+
+
+def partition_overlay(graph: builders.Graph) -> dataclasses.dataclass:
+    """
+    Граница раздела для графа верхнего уровня: таблицы кратчайших расстояний между граничными узлами
+    строятся одним деревом кратчайших путей на граничный узел по каждому весу
+    :param graph: граф раздела
+    :return: граница раздела
+    """
+    try:
+        partition = _partition(graph)
+        csr = graph.csr
+        boundary = csr.positions(partition.boundary)
+
+        return utils.PartitionOverlay(
+            partition=partition.name, boundary=partition.boundary,
+            x=[partition.x[node] for node in partition.boundary], y=[partition.y[node] for node in partition.boundary],
+            cut_edges=[list(edge) for edge in partition.cut_edges],
+            **{weight: _distances(csr, boundary, boundary, weight) for weight in builders.EDGE_ATTRIBUTES}
+        )
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
+
+
+def build_boundary_table(graph: builders.Graph, points_coordinates: List[Sequence[float]],
+                         optimizer: str = 'length') -> dataclasses.dataclass:
+    """
+    Расстояния точек раздела до граничных узлов и обратно: по одному дереву кратчайших путей
+    на точку в прямом и транспонированном графе
+    :param graph: граф раздела
+    :param points_coordinates: координаты точек раздела
+    :param optimizer: атрибут, по которому выбирается кратчайший путь
+    :return: таблица расстояний
+    """
+    try:
+        with metrics.stage('validation'):
+            partition = _partition(graph)
+            if optimizer not in builders.EDGE_ATTRIBUTES:
+                raise ValueError(f'Значения optimizer: {", ".join(builders.EDGE_ATTRIBUTES)}')
+
+            coordinates = utils.split_coordinates(points_coordinates)
+            utils.validate_coordinates(graph.bbox, coordinates)
+
+        nodes = graph.nearest_nodes(*coordinates)
+        csr = graph.csr
+        points, boundary = csr.positions(nodes), csr.positions(partition.boundary)
+
+        # Расстояния до граничных узлов и до точек раздела - столбцы одних деревьев из точек
+        forward = _distances(csr, points, boundary + points, optimizer)
+        backward = _distances(csr.reversed(), points, boundary, optimizer)
+
+        return utils.BoundaryTable(nodes=nodes, to_boundary=[row[:len(boundary)] for row in forward],
+                                   from_boundary=backward, direct=[row[len(boundary):] for row in forward])
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
+
+
+def build_node_legs(graph: builders.Graph, legs: List[Sequence[int]], optimizer: str = 'length',
+                    with_coordinates: bool = False) -> dataclasses.dataclass:
+    """
+    Пути между парами узлов раздела (участки маршрута между разделами)
+    :param graph: граф раздела
+    :param legs: пары узлов [начальный узел, конечный узел]
+    :param optimizer: атрибут, по которому выбирается кратчайший путь
+    :param with_coordinates: вернуть координаты узлов путей
+    :return: пути и суммы атрибутов, None - путь не существует
+    """
+    try:
+        if optimizer not in builders.EDGE_ATTRIBUTES:
+            raise ValueError(f'Значения optimizer: {", ".join(builders.EDGE_ATTRIBUTES)}')
+
+        pairs = [tuple(leg) for leg in legs]
+        graph.csr.positions(node for pair in pairs for node in pair)
+        built = graph.build_legs(pairs, optimizer) if pairs else {}
+        routes = [built[pair] for pair in pairs]
+
+        return utils.Legs(
+            paths=[route.path if route else None for route in routes],
+            length=[route.sums['length'] if route else None for route in routes],
+            travel_time=[route.sums['travel_time'] if route else None for route in routes],
+            coordinates=[graph.csr.coordinates(route.path) if route else None for route in routes]
+            if with_coordinates else None,
+        )
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
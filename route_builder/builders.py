@@ -1,23 +1,148 @@
 import dataclasses
-from typing import List, Sequence, Literal, Optional, Union, get_args
+import time
+from types import ModuleType
+from typing import TYPE_CHECKING, Dict, List, Sequence, Literal, Optional, Tuple, Union, get_args
 from dataclasses import astuple
+import os
 
 import logging
 
-import osmnx as ox
-from osmnx.utils_graph import get_route_edge_attributes
+import numpy as np
 import networkx as nx
-import folium
 
 import settings
-from route_builder import utils
+from route_builder import utils, routing, trees, metrics, ordering, alternatives, deadlines
+from route_builder.cache import CachedRoute, RouteCache
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import Landmarks
+from route_builder.indexes import GraphIndexes, IndexStore
+from route_builder.legs import LegPool
+from route_builder.partitions import Partition
+from route_builder.snapshots import Snapshot, snapshot_path
+from route_builder.spatial import NodeIndex
+
+if TYPE_CHECKING:
+    import folium
 
 logger = logging.getLogger(__name__)
-ox.config(log_console=settings.DEBUG, use_cache=settings.USE_CACHE)
 
 NetworkTypesType = Literal['all_private', 'all', 'bike', 'drive', 'drive_service', 'walk']
 NETWORK_TYPES = get_args(NetworkTypesType)
 
+MapFormatsType = Literal['html', 'geojson', 'polyline']
+MAP_FORMATS = get_args(MapFormatsType)
+
+EDGE_ATTRIBUTES = ('length', 'travel_time')
+
+# Параметры маршрута, которые не передаются в folium
+ROUTE_PARAMS = ('with_map', 'map_format', 'optimizer', 'optimize_order', 'alternatives', 'region', 'network_type')
+
+# Приблизительный объем памяти узла и ребра MultiDiGraph с атрибутами OSM (см. Graph.nbytes)
+GRAPH_NODE_BYTES = 500
+GRAPH_EDGE_BYTES = 1000
+
+# osmnx, импортированный при первом обращении (см. _osmnx)
+_ox: Optional[ModuleType] = None
+
+
+def _osmnx() -> ModuleType:
+    """
+    Импорт osmnx при первом обращении: вместе с ним загружаются geopandas, matplotlib, folium и scikit-learn,
+    которые не нужны для построения маршрутов по снимку графа. Настройки из settings применяются один раз
+    :return: модуль osmnx
+    """
+    global _ox  # pylint: disable=global-statement
+
+    if _ox is None:
+        import osmnx  # pylint: disable=import-outside-toplevel
+
+        osmnx.settings.log_console = settings.DEBUG
+        osmnx.settings.use_cache = settings.USE_CACHE
+        _ox = osmnx
+
+    return _ox
+
+
+def download_graph(bbox: utils.Bbox, network_type: Optional[NetworkTypesType] = None,
+                   truncate_by_edge: bool = False) -> nx.MultiDiGraph:
+    """
+    Загрузка графа зоны из OSM с атрибутами ребер speed_kph и travel_time
+    :param bbox: зона графа
+    :param network_type: тип связей графа
+    :param truncate_by_edge: сохранить узлы вне зоны, связанные ребром с узлом зоны
+    :return: граф
+    """
+    osmnx = _osmnx()
+    graph = osmnx.graph_from_bbox(*astuple(bbox), network_type=network_type, truncate_by_edge=truncate_by_edge)
+
+    graph = osmnx.add_edge_speeds(graph)
+    return osmnx.add_edge_travel_times(graph)
+
+
+@dataclasses.dataclass
+class EdgeUpdates:
+    """ Изменения ребер Graph.update_edges в разрезе атрибутов: np.nan - значение не задано """
+    edge_nodes: List[Tuple[int, int]]
+    explicit: Dict[str, np.ndarray]
+    speed: np.ndarray
+    closed: np.ndarray
+    reset: np.ndarray
+
+    @classmethod
+    def from_updates(cls, updates: List[dict]) -> 'EdgeUpdates':
+        """
+        Проверка и разбор изменений ребер
+        :param updates: изменения ребер [{'u', 'v', 'length', 'travel_time', 'speed_kph', 'closed', 'reset'}, ...]
+        :return: изменения в разрезе атрибутов
+        """
+        if not updates:
+            raise ValueError('Необходимо хотя бы одно изменение ребра')
+
+        try:
+            edge_nodes = [(update['u'], update['v']) for update in updates]
+        except KeyError as ex:
+            raise ValueError('Изменение ребра должно содержать узлы u и v') from ex
+
+        def column(name: str) -> np.ndarray:
+            return np.fromiter((np.nan if update.get(name) is None else update[name] for update in updates),
+                               dtype=np.float64, count=len(updates))
+
+        def flags(name: str) -> np.ndarray:
+            return np.fromiter((bool(update.get(name)) for update in updates), dtype=bool, count=len(updates))
+
+        changes = cls(edge_nodes, {attr_name: column(attr_name) for attr_name in EDGE_ATTRIBUTES},
+                      column('speed_kph'), flags('closed'), flags('reset'))
+
+        if any((values <= 0).any() for values in (*changes.explicit.values(), changes.speed)):
+            raise ValueError('Значения атрибутов ребер должны быть положительными')
+
+        return changes
+
+    def values(self, csr: CSRGraph, base: CSRGraph, edges: np.ndarray) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Новые значения атрибутов в разрезе ребер, выбранных среди параллельных по каждому весу
+        :param csr: граф текущей версии весов
+        :param base: граф исходных весов (для reset)
+        :param edges: позиции изменяемых ребер
+        :return: значения атрибутов по весу
+        """
+        values = {}
+
+        for weight in csr.weights:
+            current_values, base_values = csr.edge_attributes(weight), base.edge_attributes(weight)
+            view = {}
+
+            for attr_name in current_values:
+                attr_values = np.where(self.reset, base_values[attr_name][edges], current_values[attr_name][edges])
+                view[attr_name] = np.where(np.isnan(self.explicit[attr_name]), attr_values, self.explicit[attr_name])
+
+            view['travel_time'] = np.where(np.isnan(self.speed), view['travel_time'],
+                                           view['length'] * 3.6 / self.speed)
+            values[weight] = {attr_name: np.where(self.closed, np.inf, attr_values)
+                              for attr_name, attr_values in view.items()}
+
+        return values
+
 
 class Graph:
     """ Граф """
@@ -25,12 +150,20 @@ class Graph:
     network_type: Optional[NetworkTypesType] = 'all'
 
     _graph: nx.MultiDiGraph = None
+    _snapshot: Snapshot = None
+    route_cache: Optional[RouteCache] = None
+    # Раздел графа региона, который обслуживает граф (см. partitions.Partition)
+    partition: Optional[Partition] = None
 
-    def __init__(self, bbox: utils.Bbox, network_type: Optional[NetworkTypesType] = None):
+    _leg_pool: Optional[LegPool] = None
+
+    def __init__(self, bbox: utils.Bbox, network_type: Optional[NetworkTypesType] = None,
+                 engine: Optional[routing.EnginesType] = None):
         """
         Инициализация построителя графа
         :param bbox: конфигурация зоны графа
         :param network_type: тип связей графа
+        :param engine: алгоритм поиска кратчайшего пути (по умолчанию settings.ROUTING_ENGINE)
         """
         if not isinstance(bbox, utils.Bbox):
             raise ValueError('Некорректный тип bbox')
@@ -43,32 +176,360 @@ class Graph:
 
             self.network_type = network_type
 
-    def build(self) -> nx.MultiDiGraph:
+        engine = engine or settings.ROUTING_ENGINE
+        if engine not in routing.ENGINES:
+            raise ValueError(f'Значения engine: {", ".join(routing.ENGINES)}')
+
+        self._indexes = IndexStore(engine, lambda: self.graph)
+
+        if settings.ROUTE_CACHE_SIZE:
+            self.route_cache = RouteCache(settings.ROUTE_CACHE_SIZE, settings.ROUTE_CACHE_TTL)
+
+    @property
+    def engine(self) -> routing.EnginesType:
+        """
+        Алгоритм поиска кратчайшего пути
+        :return: наименование алгоритма
+        """
+        return self._indexes.engine
+
+    @engine.setter
+    def engine(self, engine: routing.EnginesType) -> None:
+        self._indexes.engine = engine
+
+    def reset_locks(self) -> None:
+        """
+        Создание блокировок индексов и кеша участков заново в дочернем процессе после fork
+        :return: None
+        """
+        self._indexes.reset_locks()
+
+        if self.route_cache is not None:
+            self.route_cache.reset_lock()
+
+    def build(self, source: Optional[nx.MultiDiGraph] = None) -> nx.MultiDiGraph:
         """
         Построение графа
+        :param source: готовый граф с атрибутами ребер length и travel_time вместо загрузки из OSM
+            (например, фикстура замеров производительности)
         :return: представление графа
         """
         logger.info("============== GRAPH BUILD START ==============")
 
-        graph = ox.graph_from_bbox(*astuple(self.bbox), network_type=self.network_type)
-
-        graph = ox.add_edge_speeds(graph)
-        graph = ox.add_edge_travel_times(graph)
+        graph = download_graph(self.bbox, self.network_type) if source is None else source
 
         self._graph = graph
+        self._indexes.set(NodeIndex.from_graph(graph), CSRGraph.from_graph(graph))
+        self._indexes.current()
 
         logger.info("============== GRAPH BUILD END ==============")
 
         return graph
 
+    def _snapshot_path(self) -> Optional[str]:
+        """
+        Путь к снимку графа в каталоге settings.SNAPSHOT_DIR
+        :return: путь или None, если каталог снимков не задан
+        """
+        if not settings.SNAPSHOT_DIR:
+            return None
+
+        return str(snapshot_path(settings.SNAPSHOT_DIR, self.bbox, self.network_type))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Сохранение снимка графа и построенных индексов
+        :param path: путь к каталогу снимка (по умолчанию в каталоге settings.SNAPSHOT_DIR)
+        :return: None
+        """
+        path = path or self._snapshot_path()
+        if not path:
+            raise ValueError('Не задан путь к снимку графа')
+
+        indexes = self._indexes.current()
+        landmarks = indexes.heuristic if isinstance(indexes.heuristic, Landmarks) else None
+        Snapshot(path, graph=self.graph, node_index=self.node_index, csr=indexes.csr,
+                 landmarks=landmarks, hierarchies=indexes.hierarchies).save(self.bbox, self.network_type)
+
+        logger.info("============== GRAPH SNAPSHOT %s SAVED ==============", path)
+
+    def load(self, path: Optional[str] = None, with_graph: bool = True) -> bool:
+        """
+        Загрузка графа и индексов из снимка. Массивы индексов отображаются в память;
+        индексы, отсутствующие в снимке, строятся при первом обращении
+        :param path: путь к каталогу снимка (по умолчанию в каталоге settings.SNAPSHOT_DIR)
+        :param with_graph: загрузить MultiDiGraph сразу (иначе - при первом обращении к graph)
+        :return: True, если снимок загружен
+        """
+        path = path or self._snapshot_path()
+        snapshot = Snapshot.load(path, with_graph=with_graph) if path else None
+
+        if snapshot is None:
+            return False
+
+        self._snapshot = snapshot
+        self._graph = snapshot.graph
+        self._indexes.set(snapshot.node_index, snapshot.csr, snapshot.landmarks if self.engine == 'alt' else None,
+                          snapshot.hierarchies if self.engine == 'ch' else None)
+
+        logger.info("============== GRAPH SNAPSHOT %s LOADED ==============", path)
+
+        return True
+
+    def load_or_build(self) -> None:
+        """
+        Загрузка графа из снимка, если он есть, иначе построение графа и сохранение снимка
+        :return: None
+        """
+        if self.load():
+            return
+
+        self.build()
+
+        if self._snapshot_path():
+            self.save()
+
+    def load_shared(self, directory: Optional[str] = None) -> None:
+        """
+        Подключение к графу в разделяемой памяти. Первый процесс загружает снимок из settings.SNAPSHOT_DIR
+        (или строит граф) и сохраняет его в каталог directory (например, в tmpfs /dev/shm); остальные процессы
+        только отображают массивы снимка в память, поэтому страницы графа не копируются между процессами.
+        MultiDiGraph не загружается: привязка, поиск пути и суммы атрибутов работают по массивам,
+        граф читается из снимка только для построения карты
+        :param directory: каталог разделяемых снимков (по умолчанию settings.SHARED_GRAPH_DIR)
+        :return: None
+        """
+        if self.engine == 'networkx':
+            raise ValueError('Разделяемый граф не поддерживает алгоритм networkx')
+
+        directory = directory or settings.SHARED_GRAPH_DIR
+        if not directory:
+            raise ValueError('Не задан каталог разделяемого графа')
+
+        path = snapshot_path(directory, self.bbox, self.network_type)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with utils.file_lock(f'{path}.lock'):
+            if Snapshot.load(path, with_graph=False) is None:
+                if not self.load():
+                    self.build()
+                    if self._snapshot_path():
+                        self.save()
+
+                # Save строит индексы алгоритма, отсутствующие в снимке
+                self.save(str(path))
+
+        self.load(str(path), with_graph=False)
+
     @property
     def graph(self) -> nx.MultiDiGraph:
         """
         Построенный граф
         :return: MultiDiGraph
         """
+        if self._graph is None and self._snapshot is not None:
+            self._graph = self._snapshot.load_graph()
+
         return self._graph or self.build()
 
+    @property
+    def node_index(self) -> NodeIndex:
+        """
+        Пространственный индекс узлов графа
+        :return: NodeIndex
+        """
+        return self._indexes.node_index
+
+    def nearest_nodes(self, x: Sequence[float], y: Sequence[float]) -> List[int]:
+        """
+        Привязка координат к ближайшим узлам графа без перестроения индекса
+        :param x: долготы точек
+        :param y: широты точек
+        :return: список идентификаторов узлов
+        """
+        with metrics.stage('snap'):
+            return self.node_index.nearest_nodes(x, y)
+
+    @property
+    def csr(self) -> CSRGraph:
+        """
+        Компактное представление графа для поиска кратчайшего пути и сумм атрибутов ребер
+        :return: CSRGraph
+        """
+        return self._indexes.csr
+
+    def indexes(self) -> GraphIndexes:
+        """
+        Массивы и индексы графа текущей версии весов. Обновление весов заменяет их вместе,
+        поэтому поиск, начатый с полученными индексами, не видит частично примененных изменений
+        :return: GraphIndexes
+        """
+        return self._indexes.current()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти графа: массивы построенных или отображенных из снимка индексов
+        и оценка MultiDiGraph по количеству узлов и ребер (если он загружен)
+        :return: количество байт
+        """
+        nbytes = self._indexes.nbytes
+        if self._graph is not None:
+            nbytes += self._graph.number_of_nodes() * GRAPH_NODE_BYTES + self._graph.number_of_edges() * GRAPH_EDGE_BYTES
+
+        return nbytes
+
+    def shortest_path(self, orig: Union[int, List[int]], dest: Union[int, List[int]], weight: str = 'length',
+                      indexes: Optional[GraphIndexes] = None) -> Union[Optional[List[int]], List[Optional[List[int]]]]:
+        """
+        Поиск кратчайшего пути выбранным алгоритмом (аналог ox.shortest_path)
+        :param orig: начальный узел или список начальных узлов
+        :param dest: конечный узел или список конечных узлов
+        :param weight: наименование атрибута веса
+        :param indexes: индексы графа, по которым выполняется поиск (по умолчанию текущие)
+        :return: путь или список путей
+        """
+        indexes = indexes or self.indexes()
+
+        pool = self._leg_pool
+        if isinstance(orig, list) and pool is not None and pool.usable(indexes.version):
+            try:
+                return pool.map(orig, dest, weight)
+            except RuntimeError:
+                # Пул остановлен после получения (граф вытеснен из реестра или обновлен):
+                # участки строятся текущим потоком
+                pass
+
+        if self.engine == 'networkx':
+            deadlines.check()
+            return _osmnx().shortest_path(self.graph, orig, dest, weight, settings.CPU_LIMITER)
+
+        # Иерархия веса, измененного обновлением, отбрасывается: поиск выполняется без нее
+        engine = 'bidirectional' if self.engine == 'ch' and weight not in indexes.hierarchies else self.engine
+
+        if isinstance(orig, list):
+            return [routing.shortest_path(indexes, orig_part, dest_part, weight, engine)
+                    for orig_part, dest_part in zip(orig, dest)]
+
+        return routing.shortest_path(indexes, orig, dest, weight, engine)
+
+    def start_leg_pool(self, workers: Optional[int] = None) -> None:
+        """
+        Запуск постоянного пула процессов для участков маршрута (см. legs.LegPool)
+        :param workers: количество процессов (по умолчанию settings.LEG_WORKERS или количество CPU)
+        :return: None
+        """
+        if self._leg_pool is not None:
+            return
+
+        # Граф и индексы строятся до fork, чтобы процессы пула их унаследовали
+        _ = self.graph if self.engine == 'networkx' else None, self.indexes()
+        self._leg_pool = LegPool(self, workers or settings.LEG_WORKERS or os.cpu_count())
+
+    def restart_leg_pool(self) -> None:
+        """
+        Создание пула участков маршрута заново, если его процессы унаследовали прежнюю версию весов.
+        До перезапуска участки строятся без пула. Вызывается потоком, который не выполняет запросы
+        (циклом событий исполнителя после изменения графа), чтобы не запускать fork из потока запроса
+        :return: None
+        """
+        pool = self._leg_pool
+        if pool is None or pool.pid != os.getpid() or pool.version == self._indexes.version:
+            return
+
+        self._leg_pool = None
+        self.start_leg_pool(pool.workers)
+        pool.shutdown(wait=False)
+
+    def shutdown_leg_pool(self, wait: bool = True) -> None:
+        """
+        Остановка пула процессов участков маршрута
+        :param wait: ожидать остановки процессов (см. legs.LegPool.shutdown)
+        :return: None
+        """
+        if self._leg_pool is not None:
+            pool, self._leg_pool = self._leg_pool, None
+            pool.shutdown(wait)
+
+    def path_sums(self, paths: List[List[int]], weight: str = 'length',
+                  csr: Optional[CSRGraph] = None) -> List[Dict[str, float]]:
+        """
+        Суммы атрибутов ребер путей. Параллельные ребра разрешаются так же, как при поиске пути:
+        выбирается ребро с минимальным весом weight
+        :param paths: пути в виде идентификаторов узлов
+        :param weight: наименование атрибута веса, по которому строились пути
+        :param csr: CSR-граф версии весов, по которой строились пути (по умолчанию текущий)
+        :return: суммы EDGE_ATTRIBUTES для каждого пути
+        """
+        csr = csr or self.csr
+
+        with metrics.stage('edge_sums'):
+            positions = iter(csr.positions(node for path in paths for node in path))
+            return csr.path_sums([[next(positions) for _ in path] for path in paths], weight, EDGE_ATTRIBUTES)
+
+    def build_legs(self, legs: List[Tuple[int, int]], optimizer: str = 'length',
+                   indexes: Optional[GraphIndexes] = None) -> Dict[Tuple[int, int], Optional[CachedRoute]]:
+        """
+        Построение участков маршрутов. Участки берутся из кеша графа, недостающие (без повторов)
+        строятся одним вызовом поиска и суммируются одним проходом
+        :param legs: пары (начальный узел, конечный узел)
+        :param optimizer: наименование атрибута веса
+        :param indexes: индексы графа, по которым строятся участки (по умолчанию текущие)
+        :return: участки по паре узлов, None - путь не существует
+        """
+        indexes = indexes or self.indexes()
+        cache = self.route_cache
+        routes = {leg: cache.get((*leg, optimizer), indexes.version) for leg in dict.fromkeys(legs)} \
+            if cache is not None else dict.fromkeys(legs)
+
+        missing = [leg for leg, route in routes.items() if route is None]
+        if missing:
+            started_at = time.perf_counter()
+
+            if len(missing) == 1:
+                paths = [self.shortest_path(*missing[0], optimizer, indexes)]
+            else:
+                paths = self.shortest_path([leg[0] for leg in missing], [leg[1] for leg in missing], optimizer,
+                                           indexes)
+
+            # Участки ищутся одним вызовом: длительность поиска участка - доля общего времени
+            leg_seconds = (time.perf_counter() - started_at) / len(missing)
+            for _ in missing:
+                metrics.observe_stage('shortest_path', leg_seconds)
+
+            found = [(leg, path) for leg, path in zip(missing, paths) if path]
+            sums = self.path_sums([path for _, path in found], optimizer, indexes.csr) if found else []
+
+            for (leg, path), path_sums in zip(found, sums):
+                routes[leg] = CachedRoute(path, path_sums)
+                if cache is not None:
+                    cache.put((*leg, optimizer), routes[leg], indexes.version)
+
+        return routes
+
+    def update_edges(self, updates: List[dict]) -> utils.GraphUpdate:
+        """
+        Изменение весов ребер без перестроения графа (пробки, перекрытия). Поиски, начатые до обновления,
+        завершаются по прежней версии весов (см. IndexStore.update). MultiDiGraph не изменяется:
+        он используется только для карты
+        :param updates: изменения ребер [{'u', 'v', 'length', 'travel_time', 'speed_kph', 'closed', 'reset'}, ...]:
+                        u, v - узлы ребра (параллельные ребра изменяются вместе), length и travel_time - новые
+                        значения, speed_kph - скорость для пересчета travel_time, closed - перекрытие ребра,
+                        reset - возврат исходных значений ребра
+        :return: результат обновления
+        """
+        if self.engine == 'networkx':
+            engines = ", ".join(engine for engine in routing.ENGINES if engine != 'networkx')
+            raise ValueError(f'Обновление весов не поддерживается алгоритмом networkx: '
+                             f'задайте ROUTING_ENGINE одним из значений {engines}')
+
+        version, invalidated = self._indexes.update(EdgeUpdates.from_updates(updates), self.route_cache)
+
+        logger.info("============== GRAPH UPDATED TO VERSION %s: %s EDGES, %s ROUTES INVALIDATED ==============",
+                    version, len(updates), invalidated)
+
+        return utils.GraphUpdate(version=version, edges=len(updates), invalidated_routes=invalidated)
+
 
 class RouteBuilder:
     """ Построитель маршрута """
@@ -80,7 +541,7 @@ class RouteBuilder:
     route: list
     time: int
     length: int
-    map: Optional[folium.Map]
+    map: Optional['folium.Map']
 
     def __init__(self, graph: Graph, points_coordinates: List[Sequence[float]], **kwargs):
         """
@@ -94,6 +555,18 @@ class RouteBuilder:
         coordinates = utils.split_coordinates(points_coordinates)
         self.coordinates = self._validate_coordinates(coordinates) and coordinates
 
+        map_format = kwargs.get('map_format')
+        if map_format and map_format not in MAP_FORMATS:
+            raise ValueError(f'Значения map_format: {", ".join(MAP_FORMATS)}')
+
+        count = kwargs.get('alternatives')
+        if count is not None:
+            if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+                raise ValueError('alternatives: значение должно быть положительным целым числом')
+
+            if len(points_coordinates) != 2:
+                raise ValueError('Альтернативные маршруты строятся только между двумя точками')
+
         self.extra_params = kwargs
 
     def _validate_coordinates(self, coordinates: List[List[float]]) -> bool:
@@ -102,78 +575,208 @@ class RouteBuilder:
         :param coordinates: координаты маршрута
         :return: True
         """
-        if (min(coordinates[1]) < self.graph.bbox.south or
-                max(coordinates[1]) > self.graph.bbox.north or
-                min(coordinates[0]) < self.graph.bbox.west or
-                max(coordinates[0]) > self.graph.bbox.east):
-            raise ValueError(f'Координаты должны быть в области {", ".join(map(str, astuple(self.graph.bbox)))}')
+        return utils.validate_coordinates(self.graph.bbox, coordinates)
 
-        return True
-
-    def build_map(self, route: Union[List[int], List[List[int]]]) -> str:
+    def build_map(self, route: Union[List[int], List[List[int]]]) -> Optional[Union[str, dict]]:
         """
-        Построение карты маршрута
+        Построение карты маршрута в формате map_format:
+        html - HTML-код карты folium, geojson - объект GeoJSON, polyline - Encoded Polyline
         :param route: маршрут
-        :return: HTML-код карты маршрута
+        :return: карта маршрута
         """
-        route_map = None
+        if not self.extra_params.get('with_map'):
+            return None
 
-        if self.extra_params.get('with_map'):
-            if isinstance(route[0], list):
-                route: List[List[int]]
-                raw_route_map = ox.plot_route_folium(self.graph.graph, route[0], **self.extra_params)
+        # Карта (особенно html) строится дольше маршрута: после истечения срока не строится
+        deadlines.check()
 
-                for route_part in route[1:]:
-                    raw_route_map = ox.plot_route_folium(self.graph.graph, route_part, raw_route_map,
-                                                         **self.extra_params)
+        with metrics.stage('map'):
+            return self._build_map(route)
 
-            else:
-                route: List[int]
-                raw_route_map = ox.plot_route_folium(self.graph.graph, route, **self.extra_params)
+    def _build_map(self, route: Union[List[int], List[List[int]]]) -> Union[str, dict]:
+        """
+        Построение карты маршрута без проверки параметра with_map
+        :param route: маршрут
+        :return: карта маршрута
+        """
+        legs = route if isinstance(route[0], list) else [route]
+        map_format = self.extra_params.get('map_format', 'html')
 
-            route_map = utils.get_map_html(raw_route_map)
+        if map_format == 'geojson':
+            return utils.get_geojson([self.graph.csr.coordinates(leg) for leg in legs])
 
-        return route_map
+        # Участки маршрута соединяются в один путь: конец участка совпадает с началом следующего
+        path = legs[0] + [node for leg in legs[1:] for node in leg[1:]]
 
-    def get_sum_route_edge_attributes(self, route: Union[List[int], List[List[int]]], attr_name: str) -> float:
+        if map_format == 'polyline':
+            return utils.encode_polyline(*self.graph.csr.coordinates(path))
+
+        folium_params = {key: value for key, value in self.extra_params.items() if key not in ROUTE_PARAMS}
+        return utils.get_map_html(_osmnx().plot_route_folium(self.graph.graph, path, **folium_params))
+
+    def build_legs(self, nodes: List[int], optimizer: str,
+                   routes: Optional[Dict[Tuple[int, int], Optional[CachedRoute]]] = None,
+                   indexes: Optional[GraphIndexes] = None) -> List[CachedRoute]:
         """
-        Получение атрибута ребра
-        :param route: маршрут
-        :param attr_name: наименование атрибута
-        :return: сумма атрибута ребра
+        Построение участков маршрута между последовательными узлами
+        :param nodes: узлы маршрута
+        :param optimizer: наименование атрибута веса
+        :param routes: участки, построенные заранее (например, для пачки запросов)
+        :param indexes: индексы графа, по которым строятся участки
+        :return: участки маршрута
         """
-        route_edge_attribute_sum = 0
+        legs = list(zip(nodes[:-1], nodes[1:]))
 
-        if isinstance(route[0], list):
-            route: List[List[int]]
+        if routes is None or any(leg not in routes for leg in legs):
+            routes = self.graph.build_legs(legs, optimizer, indexes)
 
-            for route_part in route:
-                route_edge_attribute_sum += sum(
-                    get_route_edge_attributes(self.graph.graph, route_part, attribute=attr_name))
-        else:
-            route: List[int]
-            route_edge_attribute_sum += sum(get_route_edge_attributes(self.graph.graph, route, attribute=attr_name))
+        if any(routes[leg] is None for leg in legs):
+            raise ValueError('Невозможно создать маршрут с текущими входными параметрами')
+
+        return [routes[leg] for leg in legs]
+
+    def optimize_order(self, nodes: List[int], optimizer: str, csr: Optional[CSRGraph] = None) -> List[int]:
+        """
+        Выбор порядка обхода точек маршрута: первая точка - начало, остальные посещаются в порядке
+        с минимальной суммой optimizer. Матрица стоимостей строится одним пакетным поиском
+        :param nodes: узлы маршрута в порядке запроса
+        :param optimizer: наименование атрибута веса
+        :param csr: CSR-граф версии весов маршрута (по умолчанию текущий)
+        :return: узлы маршрута в порядке обхода
+        """
+        if len(nodes) <= 2:
+            return nodes
+
+        csr = csr or self.graph.csr
+        positions = csr.positions(nodes)
+        costs = trees.distance_matrix(csr, positions, positions, optimizer, (optimizer,))[optimizer]
 
-        return route_edge_attribute_sum
+        order = ordering.solve_order(costs.tolist(), settings.ORDER_TIME_BUDGET)
+        return [nodes[index] for index in order]
 
-    def build(self) -> utils.Route:
+    def build_alternatives(self, nodes: List[int], indexes: GraphIndexes) -> utils.Alternatives:
         """
-        Построение маршрута
-        :return: маршрут
+        Построение кратчайшего и альтернативных маршрутов между двумя точками
+        :param nodes: узлы начальной и конечной точек
+        :param indexes: индексы графа, по которым строятся маршруты
+        :return: маршруты по возрастанию веса optimizer
         """
-        graph = self.graph.graph
-        nodes = utils.prepare_nodes(ox.nearest_nodes(graph, *self.coordinates))
-        route = ox.shortest_path(graph, *nodes, self.extra_params.get('optimizer', 'length'), settings.CPU_LIMITER)
+        optimizer = self.optimizer
+        if optimizer not in EDGE_ATTRIBUTES:
+            raise ValueError(f'Значения optimizer: {", ".join(EDGE_ATTRIBUTES)}')
 
-        if not route:
+        path = self.graph.shortest_path(nodes[0], nodes[1], optimizer, indexes)
+        if not path:
             raise ValueError('Невозможно создать маршрут с текущими входными параметрами')
 
+        csr = indexes.csr
+        with metrics.stage('shortest_path'):
+            found = alternatives.alternatives(csr, csr.positions(path), optimizer, self.extra_params['alternatives'])
+
+        paths = [path] + [csr.to_node_ids(positions) for positions in found]
+        sums = self.graph.path_sums(paths, optimizer, csr)
+
+        return utils.Alternatives(routes=[
+            utils.Route(paths=path, map=self.build_map(path), length=path_sums['length'],
+                        travel_time=path_sums['travel_time'])
+            for path, path_sums in zip(paths, sums)
+        ])
+
+    def build(self, nodes: Optional[List[int]] = None,
+              routes: Optional[Dict[Tuple[int, int], Optional[CachedRoute]]] = None,
+              indexes: Optional[GraphIndexes] = None) -> Union[utils.Route, utils.Alternatives]:
+        """
+        Построение маршрута. Порядок точек и участки строятся по одной версии весов графа
+        :param nodes: узлы, к которым уже привязаны координаты маршрута
+        :param routes: участки, построенные заранее
+        :param indexes: индексы графа, по которым построены участки routes
+        :return: маршрут или альтернативные маршруты (параметр alternatives)
+        """
+        if nodes is None:
+            nodes = self.graph.nearest_nodes(*self.coordinates)
+
+        if len(nodes) < 2:
+            raise ValueError('Маршрут должен содержать не менее двух точек')
+
+        optimizer = self.optimizer
+        indexes = indexes or self.graph.indexes()
+
+        if self.extra_params.get('alternatives'):
+            return self.build_alternatives(nodes, indexes)
+
+        if self.extra_params.get('optimize_order'):
+            nodes = self.optimize_order(nodes, optimizer, indexes.csr)
+
+        legs = self.build_legs(nodes, optimizer, routes, indexes)
+
+        route = legs[0].path if len(legs) == 1 else [leg.path for leg in legs]
+
         route_map = self.build_map(route)
-        length = self.get_sum_route_edge_attributes(route, 'length')
-        travel_time = self.get_sum_route_edge_attributes(route, 'travel_time')
+        length = sum(leg.sums['length'] for leg in legs)
+        travel_time = sum(leg.sums['travel_time'] for leg in legs)
 
         return utils.Route(paths=route, map=route_map, length=length, travel_time=travel_time)
 
+    @property
+    def optimizer(self) -> str:
+        """
+        Атрибут, по которому выбирается кратчайший путь
+        :return: наименование атрибута
+        """
+        return self.extra_params.get('optimizer', 'length')
+
+
+def build_routes(graph: Graph, requests: List[dict]) -> List[dataclasses.dataclass]:
+    """
+    Строительство пачки маршрутов: координаты всех запросов привязываются к узлам одним вызовом,
+    участки всех запросов строятся одним поиском на каждый optimizer
+    :param graph: граф для построения маршрутов
+    :param requests: конфигурации маршрутов
+    :return: маршруты или ошибки в порядке запросов
+    """
+    results: List[Optional[dataclasses.dataclass]] = [None] * len(requests)
+    route_builders = {}
+
+    for index, request in enumerate(requests):
+        try:
+            with metrics.stage('validation'):
+                route_builders[index] = RouteBuilder(graph, **request)
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            results[index] = utils.Error(str(ex))
+
+    nodes = {}
+    if route_builders:
+        coordinates = [[value for route_builder in route_builders.values() for value in route_builder.coordinates[axis]]
+                       for axis in (0, 1)]
+        snapped = iter(graph.nearest_nodes(*coordinates))
+
+        nodes = {index: [next(snapped) for _ in route_builder.coordinates[0]]
+                 for index, route_builder in route_builders.items()}
+
+    # Участки всех запросов пачки строятся по одной версии весов графа
+    indexes = graph.indexes() if route_builders else None
+
+    routes = {}
+    for optimizer in dict.fromkeys(route_builder.optimizer for route_builder in route_builders.values()):
+        legs = [leg for index, route_builder in route_builders.items()
+                if route_builder.optimizer == optimizer and not route_builder.extra_params.get('optimize_order')
+                and not route_builder.extra_params.get('alternatives')
+                for leg in zip(nodes[index][:-1], nodes[index][1:])]
+
+        try:
+            routes[optimizer] = graph.build_legs(legs, optimizer, indexes) if legs else {}
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Ошибка пакетного поиска (например, неизвестный optimizer) возвращается каждому запросу отдельно
+            routes[optimizer] = None
+
+    for index, route_builder in route_builders.items():
+        try:
+            results[index] = route_builder.build(nodes[index], routes[route_builder.optimizer], indexes)
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            results[index] = utils.Error(str(ex))
+
+    return results
+
 
 def build_route(graph: Graph, **kwargs) -> dataclasses.dataclass:
     """
@@ -183,7 +786,22 @@ def build_route(graph: Graph, **kwargs) -> dataclasses.dataclass:
     :return: маршрут
     """
     try:
-        route_builder = RouteBuilder(graph, **kwargs)
+        with metrics.stage('validation'):
+            route_builder = RouteBuilder(graph, **kwargs)
+
         return route_builder.build()
     except Exception as ex:  # pylint: disable=broad-exception-caught
         return utils.Error(str(ex))
+
+
+def update_graph(graph: Graph, edges: Optional[List[dict]] = None) -> dataclasses.dataclass:
+    """
+    Изменение весов ребер графа
+    :param graph: изменяемый граф
+    :param edges: изменения ребер (см. Graph.update_edges)
+    :return: результат обновления
+    """
+    try:
+        return graph.update_edges(edges)
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
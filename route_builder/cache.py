@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+# Ключ записи кеша: (узел начала, узел конца, наименование атрибута веса)
+CacheKey = Tuple[int, int, str]
+
+# Счетчики кеша
+COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+
+
+@dataclass
+class CachedRoute:
+    """ Закешированный участок маршрута """
+    path: List[int]
+    sums: Dict[str, float]
+
+
+class RouteCache:
+    """
+    LRU-кеш участков маршрута по ключу (узел начала, узел конца, оптимизатор) с необязательным TTL.
+    Потокобезопасен: используется воркерами пула потоков. Версия кеша соответствует версии весов графа:
+    запросы, начатые до обновления весов, не читают и не сохраняют участки
+    """
+    max_size: int
+    ttl: Optional[float]
+    version: int = 0
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """
+        Инициализация кеша
+        :param max_size: максимальное количество записей
+        :param ttl: время жизни записи в секундах (None или 0 - без ограничения)
+        """
+        if max_size <= 0:
+            raise ValueError('Размер кеша должен быть положительным')
+
+        self.max_size = max_size
+        self.ttl = ttl or None
+
+        self._entries: OrderedDict[CacheKey, Tuple[float, CachedRoute]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    def reset_lock(self) -> None:
+        """
+        Создание блокировки заново в дочернем процессе: при fork она могла быть захвачена другим потоком
+        :return: None
+        """
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey, version: Optional[int] = None) -> Optional[CachedRoute]:
+        """
+        Получение участка маршрута
+        :param key: ключ (узел начала, узел конца, наименование атрибута веса)
+        :param version: версия весов графа запроса (None - без проверки)
+        :return: участок маршрута или None
+        """
+        with self._lock:
+            entry = self._entries.get(key) if version is None or version == self.version else None
+
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def put(self, key: CacheKey, route: CachedRoute, version: Optional[int] = None) -> None:
+        """
+        Сохранение участка маршрута с вытеснением давно не использованных записей
+        :param key: ключ (узел начала, узел конца, наименование атрибута веса)
+        :param route: участок маршрута
+        :param version: версия весов графа, по которым построен участок (None - без проверки)
+        :return: None
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+
+            self._entries[key] = (time.monotonic(), route)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, edges: Collection[Tuple[int, int]], optimizers: Iterable[str], version: int) -> int:
+        """
+        Удаление участков, устаревших после изменения весов ребер: участков, проходящих по измененным
+        ребрам, и всех участков оптимизаторов, веса которых уменьшились (кратчайшим может стать другой путь).
+        Остальные участки сохраняются и переходят к новой версии
+        :param edges: измененные ребра (начальный узел, конечный узел)
+        :param optimizers: наименования атрибутов весов, уменьшившихся хотя бы на одном ребре
+        :param version: новая версия весов графа
+        :return: количество удаленных участков
+        """
+        optimizers = set(optimizers)
+
+        with self._lock:
+            stale = [key for key, (_, route) in self._entries.items()
+                     if key[2] in optimizers or any(edge in edges for edge in zip(route.path[:-1], route.path[1:]))]
+
+            for key in stale:
+                del self._entries[key]
+
+            self.version = version
+            self._counters['invalidations'] += len(stale)
+
+        return len(stale)
+
+    def clear(self) -> None:
+        """
+        Очистка кеша
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики кеша
+        :return: {'size', 'hits', 'misses', 'evictions', 'expirations', 'invalidations'}
+        """
+        return {'size': len(self._entries), **{name: self._counters[name] for name in COUNTERS}}
@@ -0,0 +1,147 @@
+import dataclasses
+import json
+from abc import ABC, abstractmethod
+from itertools import accumulate
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - необязательная зависимость
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - необязательная зависимость
+    msgpack = None
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+
+# Код расширения msgpack для массива идентификаторов узлов, закодированного разностями
+DELTA_EXT_CODE = 1
+
+# Поля ответов, содержащие пути (списки идентификаторов узлов)
+PATH_FIELDS = ('paths',)
+
+
+def _fields(obj: Any) -> Dict[str, Any]:
+    """
+    Поля dataclass без глубокого копирования значений (в отличие от dataclasses.asdict)
+    :param obj: экземпляр dataclass
+    :return: значения по наименованию поля
+    """
+    return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+
+
+class Codec(ABC):
+    """ Кодек тела сообщения """
+    content_type: str
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes:
+        """
+        Кодирование ответа
+        :param data: словарь или экземпляр dataclass
+        :return: тело сообщения
+        """
+
+    @abstractmethod
+    def decode(self, body: bytes) -> dict:
+        """
+        Декодирование запроса
+        :param body: тело сообщения
+        :return: словарь
+        """
+
+
+class JsonCodec(Codec):
+    """ JSON: orjson, если установлен (dataclass сериализуются без копирования), иначе стандартный json """
+    content_type = JSON_CONTENT_TYPE
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if dataclasses.is_dataclass(obj):
+            return _fields(obj)
+
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+    def encode(self, data: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data, default=self._default)  # pylint: disable=no-member
+
+        return json.dumps(data, default=self._default).encode()
+
+    def decode(self, body: bytes) -> dict:
+        if orjson is not None:
+            return orjson.loads(body)  # pylint: disable=no-member
+
+        return json.loads(body)
+
+
+class MsgpackCodec(Codec):
+    """ msgpack: пути кодируются разностями соседних идентификаторов узлов в расширении DELTA_EXT_CODE """
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self):
+        if msgpack is None:
+            raise ValueError('Для формата application/msgpack необходим пакет msgpack')
+
+    @staticmethod
+    def _delta(path: Any) -> Any:
+        """
+        Кодирование пути или списка путей разностями
+        :param path: путь, список путей или другое значение
+        :return: расширение msgpack или исходное значение
+        """
+        if isinstance(path, list) and path and all(isinstance(node, int) for node in path):
+            deltas = [path[0]] + [node - previous for previous, node in zip(path[:-1], path[1:])]
+            return msgpack.ExtType(DELTA_EXT_CODE, msgpack.packb(deltas))
+
+        if isinstance(path, list):
+            return [MsgpackCodec._delta(part) for part in path]
+
+        return path
+
+    @classmethod
+    def _default(cls, obj: Any) -> Any:
+        if dataclasses.is_dataclass(obj):
+            data = _fields(obj)
+            return {**data, **{name: cls._delta(data[name]) for name in PATH_FIELDS if name in data}}
+
+        raise TypeError(f'Object of type {type(obj).__name__} is not msgpack serializable')
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == DELTA_EXT_CODE:
+            return list(accumulate(msgpack.unpackb(data)))
+
+        return msgpack.ExtType(code, data)
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, dict):
+            data = {**data, **{name: self._delta(data[name]) for name in PATH_FIELDS if name in data}}
+
+        return msgpack.packb(data, default=self._default)
+
+    def decode(self, body: bytes) -> dict:
+        return msgpack.unpackb(body, ext_hook=self._ext_hook)
+
+
+CODECS = {
+    JSON_CONTENT_TYPE: JsonCodec,
+    MSGPACK_CONTENT_TYPE: MsgpackCodec,
+}
+
+
+def get_codec(content_type: Optional[str] = None) -> Codec:
+    """
+    Кодек по content_type сообщения
+    :param content_type: тип содержимого (по умолчанию application/json)
+    :return: кодек
+    """
+    content_type = content_type or JSON_CONTENT_TYPE
+
+    if content_type not in CODECS:
+        raise ValueError(f'Значения content_type: {", ".join(CODECS)}')
+
+    return CODECS[content_type]()
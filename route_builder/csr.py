@@ -0,0 +1,310 @@
+import dataclasses
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import networkx as nx
+
+WEIGHTS = ('length', 'travel_time')
+
+
+def _collapse_edges(graph: nx.MultiDiGraph, nodes: List[int],
+                    weights: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Списки смежности графа со схлопнутыми параллельными ребрами
+    :param graph: граф
+    :param nodes: узлы в порядке позиций
+    :param weights: наименования атрибутов весов
+    :return: (indptr, indices, значения атрибутов ребра, выбранного по весу: {вес: {атрибут: значения}})
+    """
+    positions = {node: position for position, node in enumerate(nodes)}
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    indices = []
+    values = {weight: {attribute: [] for attribute in weights} for weight in weights}
+
+    for position, node in enumerate(nodes):
+        adjacency = graph.adj[node]
+
+        for neighbour, edges in adjacency.items():
+            indices.append(positions[neighbour])
+
+            for weight in weights:
+                edge = min(edges.values(), key=lambda data, name=weight: data.get(name, 1))
+
+                for attribute in weights:
+                    values[weight][attribute].append(edge.get(attribute, 1))
+
+        indptr[position + 1] = indptr[position] + len(adjacency)
+
+    return indptr, np.asarray(indices, dtype=np.int64), {
+        weight: {attribute: np.asarray(attribute_values, dtype=np.float64)
+                 for attribute, attribute_values in weight_values.items()}
+        for weight, weight_values in values.items()
+    }
+
+
+@dataclasses.dataclass(eq=False, repr=False)
+class CSRGraph:
+    """
+    Компактное представление графа в формате CSR (compressed sparse row): узлы (node_ids, x, y),
+    границы списков смежности узлов indptr (длина - количество узлов + 1), позиции конечных узлов ребер indices
+    и атрибуты ребер, выбранных среди параллельных по весу, включая сам вес: {вес: {атрибут: значения}}
+    """
+    node_ids: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    attributes: Dict[str, Dict[str, np.ndarray]]
+
+    # Производные структуры, строящиеся при первом обращении или загружаемые из снимка: транспонированный граф
+    # (reversed), (отсортированные идентификаторы, позиции) узлов (sorted_nodes), (отсортированные ключи, позиции)
+    # ребер (sorted_edges) и списки смежности для поиска на Python (adjacency_{вес})
+    derived: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        reversed_graph = self.derived.get('reversed')
+        if reversed_graph is not None:
+            reversed_graph.derived['reversed'] = self
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph, weights: Sequence[str] = WEIGHTS) -> 'CSRGraph':
+        """
+        Экспорт графа. Параллельные ребра схлопываются в одно с минимальным значением каждого веса,
+        как это делает networkx при поиске кратчайшего пути по мультиграфу. Остальные атрибуты
+        сохраняются для ребра, выбранного по каждому весу, чтобы суммы атрибутов считались по тем же ребрам
+        :param graph: граф
+        :param weights: наименования атрибутов весов
+        :return: CSR-граф
+        """
+        nodes = list(graph.nodes)
+        indptr, indices, arrays = _collapse_edges(graph, nodes, weights)
+
+        node_data = graph.nodes
+        return cls(np.fromiter(nodes, dtype=np.int64, count=len(nodes)),
+                   np.fromiter((node_data[node]['x'] for node in nodes), dtype=np.float64, count=len(nodes)),
+                   np.fromiter((node_data[node]['y'] for node in nodes), dtype=np.float64, count=len(nodes)),
+                   indptr, indices, arrays)
+
+    @property
+    def weights(self) -> Dict[str, np.ndarray]:
+        """
+        Веса ребер
+        :return: значения по наименованию атрибута веса
+        """
+        return {weight: attributes[weight] for weight, attributes in self.attributes.items()}
+
+    @property
+    def nodes_count(self) -> int:
+        """
+        Количество узлов
+        :return: int
+        """
+        return len(self.node_ids)
+
+    @property
+    def edges_count(self) -> int:
+        """
+        Количество ребер
+        :return: int
+        """
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый массивами графа
+        :return: количество байт
+        """
+        arrays = [self.node_ids, self.x, self.y, self.indptr, self.indices,
+                  *(array for attributes in self.attributes.values() for array in attributes.values())]
+        return sum(array.nbytes for array in arrays)
+
+    def reversed(self) -> 'CSRGraph':
+        """
+        Транспонированный граф (входящие ребра), используется обратным поиском
+        :return: CSR-граф
+        """
+        if 'reversed' not in self.derived:
+            sources = np.repeat(np.arange(self.nodes_count, dtype=np.int64), np.diff(self.indptr))
+            order = np.argsort(self.indices, kind='stable')
+
+            indptr = np.zeros(self.nodes_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=self.nodes_count), out=indptr[1:])
+
+            CSRGraph(self.node_ids, self.x, self.y, indptr, sources[order],
+                     {weight: {weight: values[order]} for weight, values in self.weights.items()}, {'reversed': self})
+
+        return self.derived['reversed']
+
+    def adjacency(self, weight: str) -> Tuple[memoryview, memoryview, memoryview]:
+        """
+        Представление списков смежности для поиска на Python: индексация memoryview возвращает
+        скаляры Python без копирования массивов
+        :param weight: наименование атрибута веса
+        :return: (indptr, indices, weights)
+        """
+        if weight not in self.attributes:
+            raise ValueError(f'Значения optimizer: {", ".join(self.attributes)}')
+
+        key = f'adjacency_{weight}'
+        if key not in self.derived:
+            self.derived[key] = (memoryview(self.indptr), memoryview(self.indices),
+                                 memoryview(self.attributes[weight][weight]))
+
+        return self.derived[key]
+
+    def edge_attributes(self, weight: str) -> Dict[str, np.ndarray]:
+        """
+        Атрибуты ребер, выбранных среди параллельных по весу поиска
+        :param weight: наименование атрибута веса
+        :return: значения по наименованию атрибута
+        """
+        if weight not in self.attributes:
+            raise ValueError(f'Значения optimizer: {", ".join(self.attributes)}')
+
+        return dict(self.attributes[weight])
+
+    @property
+    def sorted_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Отсортированные ключи ребер (начальный узел * количество узлов + конечный узел) и позиции ребер
+        :return: (ключи, позиции)
+        """
+        if 'sorted_edges' not in self.derived:
+            keys = np.repeat(np.arange(self.nodes_count, dtype=np.int64), np.diff(self.indptr))
+            keys = keys * self.nodes_count + self.indices
+            order = np.argsort(keys, kind='stable')
+            self.derived['sorted_edges'] = (keys[order], order)
+
+        return self.derived['sorted_edges']
+
+    def edge_positions(self, orig: np.ndarray, dest: np.ndarray) -> np.ndarray:
+        """
+        Позиции ребер по позициям их узлов. Поиск выполняется одновременно для всех ребер
+        :param orig: позиции начальных узлов
+        :param dest: позиции конечных узлов
+        :return: позиции ребер
+        """
+        sorted_keys, order = self.sorted_edges
+        keys = np.asarray(orig, dtype=np.int64) * self.nodes_count + np.asarray(dest, dtype=np.int64)
+        found = np.searchsorted(sorted_keys, keys)
+
+        if (found >= len(sorted_keys)).any() or (sorted_keys[np.minimum(found, len(sorted_keys) - 1)] != keys).any():
+            raise ValueError('Ребро отсутствует в графе')
+
+        return order[found]
+
+    def path_sums(self, paths: Sequence[Sequence[int]], weight: str,
+                  attributes: Sequence[str]) -> List[Dict[str, float]]:
+        """
+        Суммы атрибутов ребер путей за один проход: ребра всех путей находятся и суммируются векторно
+        :param paths: пути в виде позиций узлов
+        :param weight: наименование атрибута веса, по которому выбирались параллельные ребра
+        :param attributes: наименования суммируемых атрибутов
+        :return: суммы по наименованию атрибута для каждого пути
+        """
+        lengths = np.fromiter((max(len(path) - 1, 0) for path in paths), dtype=np.int64, count=len(paths))
+        orig = np.fromiter((node for path in paths for node in path[:-1]), dtype=np.int64, count=lengths.sum())
+        dest = np.fromiter((node for path in paths for node in path[1:]), dtype=np.int64, count=lengths.sum())
+
+        edges = self.edge_positions(orig, dest)
+        legs = np.repeat(np.arange(len(paths)), lengths)
+        values = self.edge_attributes(weight)
+
+        sums = {attribute: np.bincount(legs, weights=values[attribute][edges], minlength=len(paths)).tolist()
+                for attribute in attributes}
+
+        return [{attribute: sums[attribute][index] for attribute in attributes} for index in range(len(paths))]
+
+    def edge_sources(self, edges: np.ndarray) -> np.ndarray:
+        """
+        Позиции начальных узлов ребер
+        :param edges: позиции ребер
+        :return: позиции узлов
+        """
+        return np.searchsorted(self.indptr, edges, side='right') - 1
+
+    def updated(self, edges: np.ndarray, values: Dict[str, Dict[str, np.ndarray]]) -> 'CSRGraph':
+        """
+        Копия графа с новыми значениями атрибутов ребер. Копируются только измененные массивы весов
+        и атрибутов; структура графа, позиции узлов и ребер общие с исходным графом, поэтому исходный граф
+        остается неизменным для поисков, начатых до обновления
+        :param edges: позиции изменяемых ребер
+        :param values: новые значения в разрезе edge_attributes: {вес: {атрибут: значения для edges}}
+        :return: CSR-граф
+        """
+        edges = np.asarray(edges, dtype=np.int64)
+        attributes = {weight: dict(weight_attributes) for weight, weight_attributes in self.attributes.items()}
+
+        for weight, weight_values in values.items():
+            for attribute, attribute_values in weight_values.items():
+                array = attributes[weight][attribute].copy()
+                array[edges] = attribute_values
+                attributes[weight][attribute] = array
+
+        # Структура графа общая: позиции узлов и ребер переносятся в копию
+        derived = {key: self.derived[key] for key in ('sorted_nodes', 'sorted_edges') if key in self.derived}
+
+        if 'reversed' in self.derived:
+            # Веса транспонированного графа обновляются по позициям тех же ребер в нем
+            reversed_graph = self.derived['reversed']
+            reversed_edges = reversed_graph.edge_positions(self.indices[edges], self.edge_sources(edges))
+            reversed_attributes = dict(reversed_graph.attributes)
+
+            for weight in values:
+                if attributes[weight][weight] is not self.attributes[weight][weight]:
+                    array = reversed_attributes[weight][weight].copy()
+                    array[reversed_edges] = attributes[weight][weight][edges]
+                    reversed_attributes[weight] = {weight: array}
+
+            derived['reversed'] = CSRGraph(self.node_ids, self.x, self.y, reversed_graph.indptr, reversed_graph.indices,
+                                           reversed_attributes, {'sorted_nodes': reversed_graph.sorted_nodes,
+                                                                 'sorted_edges': reversed_graph.sorted_edges})
+
+        return CSRGraph(self.node_ids, self.x, self.y, self.indptr, self.indices, attributes, derived)
+
+    @property
+    def sorted_nodes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Отсортированные идентификаторы узлов и их позиции
+        :return: (идентификаторы, позиции)
+        """
+        if 'sorted_nodes' not in self.derived:
+            order = np.argsort(self.node_ids)
+            self.derived['sorted_nodes'] = (self.node_ids[order], order)
+
+        return self.derived['sorted_nodes']
+
+    def positions(self, node_ids: Iterable[int]) -> List[int]:
+        """
+        Позиции узлов по идентификаторам
+        :param node_ids: идентификаторы узлов
+        :return: список позиций
+        """
+        sorted_ids, order = self.sorted_nodes
+        node_ids = np.asarray(list(node_ids), dtype=np.int64)
+        found = np.searchsorted(sorted_ids, node_ids)
+
+        if (found >= len(sorted_ids)).any() or (sorted_ids[np.minimum(found, len(sorted_ids) - 1)] != node_ids).any():
+            raise ValueError('Узел отсутствует в графе')
+
+        return order[found].tolist()
+
+    def to_node_ids(self, positions: Sequence[int]) -> List[int]:
+        """
+        Идентификаторы узлов по позициям
+        :param positions: позиции узлов
+        :return: список идентификаторов
+        """
+        return self.node_ids[np.asarray(positions, dtype=np.int64)].tolist()
+
+    def coordinates(self, node_ids: Iterable[int]) -> List[List[float]]:
+        """
+        Координаты узлов по идентификаторам
+        :param node_ids: идентификаторы узлов
+        :return: координаты вида [[X, X, ...], [Y, Y, ...]]
+        """
+        positions = self.positions(node_ids)
+        return [self.x[positions].tolist(), self.y[positions].tolist()]
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+EXPIRED = 'Истек срок выполнения запроса'
+
+# Количество извлеченных из кучи узлов между проверками срока в циклах поиска
+CHECK_INTERVAL = 1024
+
+# Срок выполнения текущей операции (время time.time()): задается исполнителем в потоке или процессе операции
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(ValueError):
+    """ Срок выполнения запроса истек: операция прерывается, ответ вызывающему уже не нужен """
+    def __init__(self):
+        super().__init__(EXPIRED)
+
+
+def expired(deadline: Optional[float]) -> bool:
+    """
+    Проверка истечения срока
+    :param deadline: срок (время time.time()), None - без срока
+    :return: bool
+    """
+    return deadline is not None and time.time() > deadline
+
+
+def current() -> Optional[float]:
+    """
+    Срок выполнения текущей операции
+    :return: время time.time() или None
+    """
+    return _deadline.get()
+
+
+def check(deadline: Optional[float] = None) -> None:
+    """
+    Прерывание операции, если срок истек
+    :param deadline: срок (по умолчанию срок текущей операции)
+    :return: None
+    """
+    if expired(deadline if deadline is not None else _deadline.get()):
+        raise DeadlineExceeded()
+
+
+@contextmanager
+def scope(deadline: Optional[float]) -> Iterator[None]:
+    """
+    Срок выполнения операции для проверок в поиске пути и построении карты
+    :param deadline: срок (время time.time()), None - без срока
+    :return: None
+    """
+    token = _deadline.set(deadline)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
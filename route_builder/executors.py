@@ -0,0 +1,367 @@
+import asyncio
+import dataclasses
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, List, Literal, Optional, Tuple, Union, get_args
+
+import logging
+
+from route_builder import boundaries, builders, deadlines, isochrones, matching, matrix, metrics, utils
+from route_builder.profiling import SamplingProfiler
+from route_builder.registry import GraphRegistry
+
+logger = logging.getLogger(__name__)
+
+ExecutorModesType = Literal['sync', 'thread', 'process']
+EXECUTOR_MODES = get_args(ExecutorModesType)
+
+# Операции, изменяющие граф: в режиме process выполняются в родительском процессе
+MUTATING_OPERATIONS = ('update_graph',)
+
+# Модули операций построителя по наименованию функции: остальные операции - функции модуля builders
+OPERATION_MODULES = {
+    'build_matrix': matrix,
+    'build_isochrones': isochrones,
+    'match_trace': matching,
+    'partition_overlay': boundaries,
+    'build_boundary_table': boundaries,
+    'build_node_legs': boundaries,
+}
+
+# Получатель частей потока (часть, количество частей): вызывается потоком, который строит части
+PartCallback = Callable[[Any, int], None]
+
+# Граф (реестр графов), унаследованный дочерними процессами при fork
+_process_graph: Optional[Union[builders.Graph, GraphRegistry]] = None
+# Профилировщик, унаследованный дочерними процессами при fork
+_process_profiler: Optional[SamplingProfiler] = None
+
+
+def operation_function(operation: str) -> Callable[..., dataclasses.dataclass]:
+    """
+    Функция операции построителя
+    :param operation: наименование функции (build_route, build_matrix)
+    :return: функция модуля операции
+    """
+    return getattr(OPERATION_MODULES.get(operation, builders), operation)
+
+
+def _run_operation(graph: Union[builders.Graph, GraphRegistry], operation: str,
+                   kwargs: dict, profiler: Optional[SamplingProfiler] = None,
+                   deadline: Optional[float] = None) -> dataclasses.dataclass:
+    """
+    Выполнение операции построителя. Для реестра граф выбирается по полям запроса region и network_type.
+    Операция, срок которой истек в очереди пула, не выполняется; поиск пути и построение карты
+    прерываются при истечении срока (см. deadlines)
+    :param graph: граф или реестр графов
+    :param operation: наименование операции построителя (build_route, build_matrix)
+    :param kwargs: конфигурация операции
+    :param profiler: профилировщик медленных операций
+    :param deadline: срок выполнения (время time.time()), None - без срока
+    :return: результат операции
+    """
+    if deadlines.expired(deadline):
+        return utils.Error(deadlines.EXPIRED)
+
+    if isinstance(graph, GraphRegistry):
+        try:
+            graph = graph.get(kwargs.pop('region', None), kwargs.pop('network_type', None))
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            return utils.Error(str(ex))
+
+    try:
+        with deadlines.scope(deadline), profiler.profile(operation) if profiler else nullcontext():
+            return operation_function(operation)(graph, **kwargs)
+    except deadlines.DeadlineExceeded as ex:
+        return utils.Error(str(ex))
+
+
+def _drain(stream: utils.Stream, on_part: Optional[PartCallback] = None, deadline: Optional[float] = None,
+           profiler: Optional[SamplingProfiler] = None) -> Union[utils.Stream, utils.Error]:
+    """
+    Построение частей потока: каждая часть передается on_part сразу после построения, без on_part части
+    сохраняются списком (например, для передачи из дочернего процесса). Ошибка построения части прерывает поток
+    :param stream: поток, части которого строятся при переборе
+    :param on_part: получатель частей
+    :param deadline: срок выполнения (время time.time()), None - без срока
+    :param profiler: профилировщик медленных операций
+    :return: поток с построенными частями (пустой, если части переданы on_part) или ошибка
+    """
+    try:
+        with deadlines.scope(deadline), profiler.profile('stream') if profiler else nullcontext():
+            if on_part is None:
+                return utils.Stream(list(stream.parts), stream.count)
+
+            for part in stream.parts:
+                on_part(part, stream.count)
+
+        return utils.Stream([], stream.count)
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
+
+
+def _init_process() -> None:
+    """
+    Инициализация процесса пула: блокировки унаследованных графа, метрик и профилировщика создаются заново,
+    так как при fork они могли быть захвачены другими потоками родительского процесса
+    :return: None
+    """
+    _process_graph.reset_locks()
+    metrics.reset_locks()
+
+    if _process_profiler is not None:
+        _process_profiler.reset_lock()
+
+
+def _run_in_process(operation: str, kwargs: dict,
+                    deadline: Optional[float] = None) -> Tuple[dataclasses.dataclass, List[Tuple[str, float]]]:
+    """
+    Выполнение операции построителя в дочернем процессе по унаследованному графу
+    :param operation: наименование операции построителя (build_route, build_matrix)
+    :param kwargs: конфигурация операции
+    :param deadline: срок выполнения (время time.time()), None - без срока
+    :return: (результат операции, длительности этапов для метрик родительского процесса)
+    """
+    with metrics.recording() as observations:
+        result = _run_operation(_process_graph, operation, kwargs, _process_profiler, deadline)
+
+        # Генератор не передается между процессами: части потока строятся дочерним процессом целиком
+        if isinstance(result, utils.Stream):
+            result = _drain(result, deadline=deadline, profiler=_process_profiler)
+
+    return result, observations
+
+
+@dataclasses.dataclass
+class _Lane:
+    """ Полоса исполнителя: пул воркеров и ограничение одновременных запросов """
+    workers: int
+    executor: Optional[Executor] = None
+    in_flight: Optional[asyncio.Semaphore] = None
+
+
+class RouteExecutor:
+    """
+    Исполнитель построения маршрутов вне цикла событий. Дешевые запросы (маршрут из двух точек без карты)
+    могут выполняться отдельной полосой: своим пулом воркеров и ограничением одновременных запросов,
+    поэтому не ожидают дорогих запросов, уже принятых исполнителем
+    """
+    graph: Union[builders.Graph, GraphRegistry]
+    mode: ExecutorModesType = 'thread'
+
+    _mutating: Optional[asyncio.Lock] = None
+
+    def __init__(self, graph: Union[builders.Graph, GraphRegistry],  # pylint: disable=too-many-arguments
+                 mode: Optional[ExecutorModesType] = None, workers: Optional[int] = None,
+                 max_in_flight: Optional[int] = None, profiler: Optional[SamplingProfiler] = None,
+                 priority_workers: Optional[int] = None):
+        """
+        Инициализация исполнителя
+        :param graph: граф или реестр графов для построения маршрутов
+        :param mode: режим исполнения (sync - в цикле событий, thread - пул потоков, process - пул процессов)
+        :param workers: количество воркеров пула
+        :param max_in_flight: максимальное количество одновременно обрабатываемых запросов
+        :param profiler: профилировщик медленных операций
+        :param priority_workers: количество воркеров полосы дешевых запросов (None или 0 - без полосы)
+        """
+        if mode:
+            if mode not in EXECUTOR_MODES:
+                raise ValueError(f'Значения mode: {", ".join(EXECUTOR_MODES)}')
+
+            self.mode = mode
+
+        self.graph = graph
+        self.profiler = profiler
+        self.max_in_flight = max_in_flight or 1
+        # Полосы исполнителя по признаку priority: полоса дешевых запросов создается, если для нее заданы воркеры
+        self._lanes = {False: _Lane(workers or min(self.max_in_flight, os.cpu_count() or 1))}
+
+        if priority_workers and self.mode != 'sync':
+            self._lanes[True] = _Lane(priority_workers)
+
+        if self.mode == 'thread':
+            for priority, lane in self._lanes.items():
+                prefix = 'route-builder-priority' if priority else 'route-builder'
+                lane.executor = ThreadPoolExecutor(max_workers=lane.workers, thread_name_prefix=prefix)
+
+        elif self.mode == 'process':
+            global _process_graph, _process_profiler  # pylint: disable=global-statement
+            _process_graph, _process_profiler = graph, profiler
+
+            # Графы регионов загружаются до fork: процессы пула наследуют их, а не загружают каждый свою копию
+            if isinstance(graph, GraphRegistry):
+                graph.preload()
+
+            for lane in self._lanes.values():
+                lane.executor = self._start_process_pool(lane.workers)
+
+        logger.info("============== EXECUTOR %s STARTED WITH %s WORKERS (%s PRIORITY) ==============",
+                    self.mode, self.workers, self.priority_workers)
+
+    @property
+    def workers(self) -> int:
+        """
+        Количество воркеров основной полосы
+        :return: количество воркеров
+        """
+        return self._lanes[False].workers
+
+    @property
+    def priority_workers(self) -> int:
+        """
+        Количество воркеров полосы дешевых запросов
+        :return: количество воркеров (0 - без полосы)
+        """
+        lane = self._lanes.get(True)
+        return lane.workers if lane else 0
+
+    @staticmethod
+    def _start_process_pool(workers: int) -> ProcessPoolExecutor:
+        """
+        Запуск пула процессов, наследующих граф при fork
+        :param workers: количество процессов
+        :return: пул процессов
+        """
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                       initializer=_init_process)
+        # fork-пул запускает все процессы при первой задаче: граф наследуется до подключения к брокеру
+        executor.submit(os.getpid).result()
+        return executor
+
+    async def run(self, operation: str, deadline: Optional[float] = None, priority: bool = False,
+                  on_part: Optional[PartCallback] = None, **kwargs) -> dataclasses.dataclass:
+        """
+        Выполнение операции построителя с ограничением количества одновременных запросов.
+        Запрос, срок которого истек в ожидании, не выполняется. Части потока (utils.Stream) строятся
+        воркером исполнителя и передаются on_part по мере построения (в режиме process - после построения
+        всех частей дочерним процессом)
+        :param operation: наименование операции построителя (build_route, build_matrix)
+        :param deadline: срок выполнения (время time.time()), None - без срока
+        :param priority: выполнить полосой дешевых запросов (если она есть)
+        :param on_part: получатель частей потока, вызывается потоком воркера (без получателя части
+            возвращаются списком в utils.Stream)
+        :param kwargs: конфигурация операции
+        :return: результат операции
+        """
+        priority = priority and True in self._lanes
+        lane = self._lanes[priority]
+
+        if self._mutating is None:
+            self._mutating = asyncio.Lock()
+
+        if lane.in_flight is None:
+            lane.in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async with lane.in_flight:
+            if deadlines.expired(deadline):
+                metrics.SHED.inc(reason='waiting')
+                return utils.Error(deadlines.EXPIRED)
+
+            metrics.IN_FLIGHT.inc()
+            started_at = time.perf_counter()
+
+            try:
+                result = await self._run(operation, kwargs, deadline, priority)
+
+                if isinstance(result, utils.Stream):
+                    result = await self._drain_stream(result, on_part, deadline, priority)
+            finally:
+                metrics.IN_FLIGHT.dec()
+                metrics.REQUEST_SECONDS.observe(time.perf_counter() - started_at, operation=operation)
+
+        if isinstance(result, utils.Error) and result.error_details == deadlines.EXPIRED:
+            metrics.SHED.inc(reason='aborted')
+
+        return result
+
+    async def _run(self, operation: str, kwargs: dict, deadline: Optional[float] = None,
+                   priority: bool = False) -> dataclasses.dataclass:
+        """
+        Выполнение операции построителя в режиме исполнителя
+        :param operation: наименование функции модуля builders
+        :param kwargs: конфигурация операции
+        :param deadline: срок выполнения (время time.time()), None - без срока
+        :param priority: выполнить пулом полосы дешевых запросов
+        :return: результат операции
+        """
+        if operation in MUTATING_OPERATIONS:
+            return await self._mutate(operation, kwargs)
+
+        if self.mode == 'sync':
+            return _run_operation(self.graph, operation, kwargs, self.profiler, deadline)
+
+        loop = asyncio.get_running_loop()
+        executor = self._lanes[priority].executor
+
+        if self.mode == 'process':
+            result, observations = await loop.run_in_executor(executor, _run_in_process, operation, kwargs, deadline)
+            metrics.replay(observations)
+            return result
+
+        return await loop.run_in_executor(executor, _run_operation, self.graph, operation, kwargs, self.profiler,
+                                          deadline)
+
+    async def _drain_stream(self, stream: utils.Stream, on_part: Optional[PartCallback],
+                            deadline: Optional[float] = None, priority: bool = False) -> Union[utils.Stream, utils.Error]:
+        """
+        Построение частей потока воркером пула исполнителя (в режимах sync и process - в цикле событий)
+        :param stream: поток
+        :param on_part: получатель частей
+        :param deadline: срок выполнения (время time.time()), None - без срока
+        :param priority: поток построен полосой дешевых запросов
+        :return: поток с построенными частями или ошибка
+        """
+        if self.mode != 'thread':
+            return _drain(stream, on_part, deadline, self.profiler)
+
+        executor = self._lanes[priority].executor
+        return await asyncio.get_running_loop().run_in_executor(executor, _drain, stream, on_part, deadline,
+                                                                self.profiler)
+
+    async def _mutate(self, operation: str, kwargs: dict) -> dataclasses.dataclass:
+        """
+        Изменение графа (в режиме process - в родительском процессе) и перезапуск пулов процессов, чтобы они
+        унаследовали новую версию; начатые запросы завершаются прежними процессами. Изменения выполняются
+        по одному, а пулы запускаются потоком цикла событий после изменения: fork не выполняется из потока,
+        который может удерживать блокировки графа
+        :param operation: наименование операции построителя
+        :param kwargs: конфигурация операции
+        :return: результат операции
+        """
+        async with self._mutating:
+            if self.mode == 'sync':
+                result = _run_operation(self.graph, operation, kwargs, self.profiler)
+            else:
+                executor = None if self.mode == 'process' else self._lanes[False].executor
+                result = await asyncio.get_running_loop().run_in_executor(executor, _run_operation, self.graph,
+                                                                          operation, kwargs, self.profiler)
+
+            self.graph.restart_leg_pool()
+
+            if self.mode == 'process':
+                for lane in self._lanes.values():
+                    executor, lane.executor = lane.executor, self._start_process_pool(lane.workers)
+                    executor.shutdown(wait=False)
+
+        return result
+
+    async def build_route(self, **kwargs) -> dataclasses.dataclass:
+        """
+        Построение маршрута
+        :param kwargs: конфигурация маршрута
+        :return: маршрут
+        """
+        return await self.run('build_route', **kwargs)
+
+    def shutdown(self) -> None:
+        """
+        Остановка пулов воркеров
+        :return: None
+        """
+        for lane in self._lanes.values():
+            if lane.executor:
+                lane.executor.shutdown(wait=True, cancel_futures=True)
+                lane.executor = None
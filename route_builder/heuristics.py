@@ -0,0 +1,247 @@
+import copy
+import math
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from route_builder.csr import CSRGraph
+
+EARTH_RADIUS_M = 6_371_009
+
+Potential = Callable[[int], float]
+
+
+def haversine(lat: np.ndarray, lon: np.ndarray, target_lat: float, target_lon: float) -> np.ndarray:
+    """
+    Расстояние по дуге большого круга
+    :param lat: широты в радианах
+    :param lon: долготы в радианах
+    :param target_lat: широта цели в радианах
+    :param target_lon: долгота цели в радианах
+    :return: расстояния в метрах
+    """
+    value = (np.sin((target_lat - lat) / 2) ** 2 +
+             np.cos(lat) * np.cos(target_lat) * np.sin((target_lon - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(value, 1)))
+
+
+class HaversineHeuristic:
+    """
+    Нижняя оценка расстояния до цели для A*: расстояние по дуге большого круга, умноженное на коэффициент веса.
+    Коэффициент - минимальное по ребрам отношение веса к расстоянию между концами ребра
+    (для travel_time - величина, обратная максимальной скорости), поэтому оценка согласована и поиск точен
+    """
+    factors: Dict[str, float]
+
+    def __init__(self, graph: CSRGraph):
+        """
+        Инициализация оценки
+        :param graph: CSR-граф
+        """
+        self._lat = np.deg2rad(graph.y)
+        self._lon = np.deg2rad(graph.x)
+        self._cos_lat = np.cos(self._lat)
+        self._views = (memoryview(self._lat), memoryview(self._lon), memoryview(self._cos_lat))
+
+        sources = np.repeat(np.arange(graph.nodes_count), np.diff(graph.indptr))
+        self.factors = self._factors(sources, graph.indices, graph.weights)
+
+    def _factors(self, sources: np.ndarray, targets: np.ndarray, weights: Dict[str, np.ndarray],
+                 default: float = 0.0) -> Dict[str, float]:
+        """
+        Минимальные отношения веса к расстоянию между концами ребер
+        :param sources: позиции начальных узлов ребер
+        :param targets: позиции конечных узлов ребер
+        :param weights: веса тех же ребер по наименованию атрибута
+        :param default: коэффициент, если у ребер нет ненулевого расстояния
+        :return: коэффициенты по наименованию атрибута веса
+        """
+        edge_distances = haversine(self._lat[sources], self._lon[sources], self._lat[targets], self._lon[targets])
+        positive = edge_distances > 0
+
+        factors = {}
+        for weight, values in weights.items():
+            ratios = values[positive] / edge_distances[positive]
+            # Запас на погрешность вычислений с плавающей точкой
+            factors[weight] = max(0.0, float(ratios.min()) * (1 - 1e-9)) if ratios.size else default
+
+        return factors
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый массивами оценки
+        :return: количество байт
+        """
+        return self._lat.nbytes + self._lon.nbytes + self._cos_lat.nbytes
+
+    def updated(self, graph: CSRGraph, edges: np.ndarray) -> 'HaversineHeuristic':
+        """
+        Оценка для графа с измененными весами ребер: коэффициенты уменьшаются, если отношение веса
+        к расстоянию у измененного ребра меньше текущего; увеличение весов оценку не нарушает
+        :param graph: CSR-граф с новыми весами
+        :param edges: позиции измененных ребер
+        :return: HaversineHeuristic
+        """
+        factors = self._factors(graph.edge_sources(edges), graph.indices[edges],
+                                {weight: values[edges] for weight, values in graph.weights.items()}, float('inf'))
+
+        heuristic = copy.copy(self)
+        heuristic.factors = {weight: min(factor, factors[weight]) for weight, factor in self.factors.items()}
+        return heuristic
+
+    def potential(self, _source: int, target: int, weight: str) -> Potential:
+        """
+        Функция нижней оценки расстояния от узла до цели
+        :param _source: позиция начального узла (оценка от него не зависит)
+        :param target: позиция конечного узла
+        :param weight: наименование атрибута веса
+        :return: функция от позиции узла
+        """
+        lat, lon, cos_lat = self._views
+        factor = self.factors[weight] * 2 * EARTH_RADIUS_M
+        target_lat, target_lon, target_cos_lat = lat[target], lon[target], cos_lat[target]
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+
+        def _potential(node: int) -> float:
+            value = (sin((target_lat - lat[node]) / 2) ** 2 +
+                     cos_lat[node] * target_cos_lat * sin((target_lon - lon[node]) / 2) ** 2)
+            return factor * asin(sqrt(min(value, 1.0)))
+
+        return _potential
+
+
+class Landmarks:
+    """
+    Таблицы расстояний до ориентиров и от них для ALT (A*, landmarks, triangle inequality).
+    Оценка max(d(v, L) - d(t, L), d(L, t) - d(L, v)) по ориентирам L - нижняя граница d(v, t)
+    """
+    positions: np.ndarray
+    forward: Dict[str, np.ndarray]
+    backward: Dict[str, np.ndarray]
+
+    def __init__(self, positions: np.ndarray, forward: Dict[str, np.ndarray], backward: Dict[str, np.ndarray],
+                 active: int = 4):
+        """
+        Инициализация таблиц
+        :param positions: позиции ориентиров
+        :param forward: расстояния от ориентиров до узлов по весу, форма (ориентиры, узлы)
+        :param backward: расстояния от узлов до ориентиров по весу, форма (ориентиры, узлы)
+        :param active: количество ориентиров, используемых в одном запросе
+        """
+        self.positions = positions
+        self.forward = forward
+        self.backward = backward
+        self.active = active
+
+        self._views = {weight: ([memoryview(row) for row in forward[weight]],
+                                [memoryview(row) for row in backward[weight]]) for weight in forward}
+
+    @staticmethod
+    def _distances(graph: CSRGraph, weight: str, sources: Sequence[int]) -> np.ndarray:
+        """
+        Расстояния от узлов до всех узлов графа
+        :param graph: CSR-граф
+        :param weight: наименование атрибута веса
+        :param sources: позиции начальных узлов
+        :return: массив формы (узлы, узлы графа), inf для недостижимых узлов
+        """
+        matrix = csr_matrix((graph.weights[weight], graph.indices, graph.indptr),
+                            shape=(graph.nodes_count, graph.nodes_count))
+        return np.atleast_2d(dijkstra(matrix, directed=True, indices=list(sources)))
+
+    @classmethod
+    def build(cls, graph: CSRGraph, count: int = 16, weights: Optional[Sequence[str]] = None,
+              seed: int = 0) -> 'Landmarks':
+        """
+        Выбор ориентиров методом наиболее удаленной точки и расчет таблиц
+        :param graph: CSR-граф
+        :param count: количество ориентиров
+        :param weights: наименования атрибутов весов (по умолчанию все веса графа)
+        :param seed: начальное значение генератора для выбора первого ориентира
+        :return: таблицы ориентиров
+        """
+        weights = weights or list(graph.weights)
+        count = min(count, graph.nodes_count)
+
+        positions = [int(np.random.default_rng(seed).integers(graph.nodes_count))]
+        nearest = np.full(graph.nodes_count, np.inf)
+
+        while len(positions) < count:
+            distances = cls._distances(graph, weights[0], positions[-1:])[0]
+            distances += cls._distances(graph.reversed(), weights[0], positions[-1:])[0]
+            nearest = np.minimum(nearest, distances)
+
+            candidates = np.where(np.isfinite(nearest), nearest, -1)
+            candidates[positions] = -1
+            if candidates.max() <= 0:
+                break
+
+            positions.append(int(candidates.argmax()))
+
+        forward = {weight: cls._distances(graph, weight, positions) for weight in weights}
+        backward = {weight: cls._distances(graph.reversed(), weight, positions) for weight in weights}
+
+        return cls(np.asarray(positions, dtype=np.int64), forward, backward)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый таблицами расстояний
+        :return: количество байт
+        """
+        return self.positions.nbytes + sum(array.nbytes for array in (*self.forward.values(), *self.backward.values()))
+
+    def updated(self, graph: CSRGraph, decreased: Sequence[str]) -> 'Landmarks':
+        """
+        Таблицы для графа с измененными весами ребер. При увеличении весов старые расстояния остаются
+        допустимой (хотя и менее точной) оценкой, поэтому таблицы пересчитываются только для весов,
+        значения которых уменьшились; ориентиры не выбираются заново
+        :param graph: CSR-граф с новыми весами
+        :param decreased: наименования атрибутов весов, уменьшившихся хотя бы на одном ребре
+        :return: Landmarks
+        """
+        if not decreased:
+            return self
+
+        forward, backward = dict(self.forward), dict(self.backward)
+        for weight in decreased:
+            if weight in forward:
+                forward[weight] = self._distances(graph, weight, self.positions)
+                backward[weight] = self._distances(graph.reversed(), weight, self.positions)
+
+        return Landmarks(self.positions, forward, backward, self.active)
+
+    def potential(self, source: int, target: int, weight: str) -> Potential:
+        """
+        Функция нижней оценки расстояния от узла до цели по наиболее информативным для запроса ориентирам
+        :param source: позиция начального узла
+        :param target: позиция конечного узла
+        :param weight: наименование атрибута веса
+        :return: функция от позиции узла
+        """
+        forward, backward = self._views[weight]
+        inf = math.inf
+
+        def _bound(landmark: int, node: int) -> float:
+            bound = 0.0
+
+            # d(v, t) >= d(v, L) - d(t, L); если v не достигает L, а t достигает - v не достигает t
+            if backward[landmark][target] < inf:
+                bound = max(bound, backward[landmark][node] - backward[landmark][target])
+
+            # d(v, t) >= d(L, t) - d(L, v)
+            if forward[landmark][target] < inf and forward[landmark][node] < inf:
+                bound = max(bound, forward[landmark][target] - forward[landmark][node])
+
+            return bound
+
+        active = sorted(range(len(forward)), key=lambda landmark: _bound(landmark, source), reverse=True)
+        active = active[:self.active]
+
+        def _potential(node: int) -> float:
+            return max(_bound(landmark, node) for landmark in active)
+
+        return _potential
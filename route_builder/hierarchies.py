@@ -0,0 +1,406 @@
+import math
+from heapq import heappush, heappop, heapify
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from route_builder.csr import CSRGraph
+from route_builder.routing import SearchResult
+
+# Ребро текущего (частично сжатого) графа: соседний узел -> (вес, промежуточный узел ярлыка или -1)
+Adjacency = List[Dict[int, Tuple[float, int]]]
+
+
+def _to_arrays(edges: List[List[Tuple[int, float, int]]], prefix: str) -> Dict[str, np.ndarray]:
+    """
+    Упаковка списков ребер в массивы CSR
+    :param edges: списки ребер узлов (сосед, вес, промежуточный узел)
+    :param prefix: префикс наименований массивов (up, down)
+    :return: массивы {prefix}_indptr, {prefix}_indices, {prefix}_weights, {prefix}_middles
+    """
+    indptr = np.zeros(len(edges) + 1, dtype=np.int64)
+    np.cumsum([len(node_edges) for node_edges in edges], out=indptr[1:])
+
+    flat = [edge for node_edges in edges for edge in node_edges]
+    return {f'{prefix}_indptr': indptr,
+            f'{prefix}_indices': np.fromiter((edge[0] for edge in flat), dtype=np.int64, count=len(flat)),
+            f'{prefix}_weights': np.fromiter((edge[1] for edge in flat), dtype=np.float64, count=len(flat)),
+            f'{prefix}_middles': np.fromiter((edge[2] for edge in flat), dtype=np.int64, count=len(flat))}
+
+
+class _Contractor:
+    """ Сжатие узлов графа с добавлением ярлыков """
+    def __init__(self, graph: CSRGraph, weight: str, witness_settled_limit: int):
+        """
+        :param graph: CSR-граф
+        :param weight: наименование атрибута веса
+        :param witness_settled_limit: максимальное количество узлов, просматриваемых поиском свидетеля
+        """
+        self.nodes_count = graph.nodes_count
+        self.witness_settled_limit = witness_settled_limit
+
+        self.outgoing: Adjacency = [{} for _ in range(self.nodes_count)]
+        self.incoming: Adjacency = [{} for _ in range(self.nodes_count)]
+        self.contracted = [False] * self.nodes_count
+        self.deleted_neighbours = [0] * self.nodes_count
+
+        indptr, indices, weights = graph.adjacency(weight)
+        for node in range(self.nodes_count):
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+
+                if neighbour != node and weights[edge] < self.outgoing[node].get(neighbour, (float('inf'), -1))[0]:
+                    self.outgoing[node][neighbour] = (weights[edge], -1)
+                    self.incoming[neighbour][node] = (weights[edge], -1)
+
+    def _witness_distances(self, source: int, excluded: int, limit: float) -> Dict[int, float]:
+        """
+        Ограниченный поиск путей из узла в обход сжимаемого узла
+        :param source: начальный узел
+        :param excluded: сжимаемый узел
+        :param limit: максимальное расстояние
+        :return: найденные расстояния
+        """
+        distances = {source: 0.0}
+        settled = set()
+        heap = [(0.0, source)]
+
+        while heap and len(settled) < self.witness_settled_limit:
+            distance, node = heappop(heap)
+
+            if node in settled:
+                continue
+
+            if distance > limit:
+                break
+
+            settled.add(node)
+
+            for neighbour, (weight, _) in self.outgoing[node].items():
+                if neighbour == excluded:
+                    continue
+
+                neighbour_distance = distance + weight
+                if neighbour_distance < distances.get(neighbour, float('inf')):
+                    distances[neighbour] = neighbour_distance
+                    heappush(heap, (neighbour_distance, neighbour))
+
+        return distances
+
+    def shortcuts(self, node: int) -> List[Tuple[int, int, float]]:
+        """
+        Ярлыки, необходимые для сохранения кратчайших путей при сжатии узла
+        :param node: сжимаемый узел
+        :return: список ярлыков (начало, конец, вес)
+        """
+        shortcuts = []
+        outgoing = self.outgoing[node]
+
+        if not outgoing:
+            return shortcuts
+
+        max_outgoing = max(weight for weight, _ in outgoing.values())
+
+        for source, (source_weight, _) in self.incoming[node].items():
+            witnesses = self._witness_distances(source, node, source_weight + max_outgoing)
+
+            for target, (target_weight, _) in outgoing.items():
+                if target == source:
+                    continue
+
+                distance = source_weight + target_weight
+                if witnesses.get(target, float('inf')) > distance:
+                    shortcuts.append((source, target, distance))
+
+        return shortcuts
+
+    def priority(self, node: int) -> int:
+        """
+        Приоритет сжатия узла: разность ребер и количество уже сжатых соседей
+        :param node: узел
+        :return: приоритет (меньше - раньше)
+        """
+        removed = len(self.incoming[node]) + len(self.outgoing[node])
+        return len(self.shortcuts(node)) - removed + self.deleted_neighbours[node]
+
+    def contract(self, node: int) -> Tuple[List[Tuple[int, float, int]], List[Tuple[int, float, int]]]:
+        """
+        Сжатие узла
+        :param node: узел
+        :return: восходящие исходящие и восходящие входящие ребра узла (сосед, вес, промежуточный узел)
+        """
+        for source, target, distance in self.shortcuts(node):
+            if distance < self.outgoing[source].get(target, (float('inf'), -1))[0]:
+                self.outgoing[source][target] = (distance, node)
+                self.incoming[target][source] = (distance, node)
+
+        upward = [(neighbour, weight, middle) for neighbour, (weight, middle) in self.outgoing[node].items()]
+        downward = [(neighbour, weight, middle) for neighbour, (weight, middle) in self.incoming[node].items()]
+
+        for neighbour, _, _ in upward:
+            del self.incoming[neighbour][node]
+            self.deleted_neighbours[neighbour] += 1
+
+        for neighbour, _, _ in downward:
+            del self.outgoing[neighbour][node]
+            self.deleted_neighbours[neighbour] += 1
+
+        self.outgoing[node] = {}
+        self.incoming[node] = {}
+        self.contracted[node] = True
+
+        return upward, downward
+
+    def contract_all(self) -> Tuple[np.ndarray, List[list], List[list]]:
+        """
+        Сжатие всех узлов в порядке приоритета с ленивым пересчетом: приоритет извлеченного узла пересчитывается,
+        и узел возвращается в кучу, если он больше минимального
+        :return: (ранги узлов, восходящие исходящие ребра узлов, восходящие входящие ребра узлов)
+        """
+        ranks = np.zeros(self.nodes_count, dtype=np.int64)
+        upward: List[list] = [[] for _ in range(self.nodes_count)]
+        downward: List[list] = [[] for _ in range(self.nodes_count)]
+
+        heap = [(self.priority(node), node) for node in range(self.nodes_count)]
+        heapify(heap)
+        rank = 0
+
+        while heap:
+            _, node = heappop(heap)
+            if self.contracted[node]:
+                continue
+
+            priority = self.priority(node)
+            if heap and priority > heap[0][0]:
+                heappush(heap, (priority, node))
+                continue
+
+            upward[node], downward[node] = self.contract(node)
+            ranks[node] = rank
+            rank += 1
+
+        return ranks, upward, downward
+
+
+class _Frontier:
+    """ Одно направление поиска по восходящим ребрам иерархии """
+    def __init__(self, adjacency: tuple, root: int):
+        """
+        Инициализация направления
+        :param adjacency: (indptr, indices, weights, middles) восходящих ребер направления
+        :param root: узел, от которого ведется поиск
+        """
+        self.adjacency = adjacency
+        self.settled = set()
+        self.distances = {root: 0.0}
+        self.predecessors = {root: (-1, -1)}
+        self.heap = [(0.0, root)]
+
+    def minimum(self) -> float:
+        """
+        Минимальное расстояние в куче направления
+        :return: расстояние или бесконечность, если куча пуста
+        """
+        return self.heap[0][0] if self.heap else math.inf
+
+    def expand(self, other: '_Frontier', best: Tuple[float, Optional[int]]) -> Tuple[float, Optional[int]]:
+        """
+        Извлечение узла из кучи и релаксация его восходящих ребер
+        :param other: встречное направление
+        :param best: (найденное расстояние, узел встречи)
+        :return: (найденное расстояние, узел встречи) с учетом извлеченного узла
+        """
+        distance, node = heappop(self.heap)
+
+        if node in self.settled:
+            return best
+
+        self.settled.add(node)
+
+        best_distance, meeting_node = best
+        other_distance = other.distances.get(node)
+        if other_distance is not None and distance + other_distance < best_distance:
+            best_distance, meeting_node = distance + other_distance, node
+
+        indptr, indices, weights, _ = self.adjacency
+        distances = self.distances
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[edge]
+            neighbour_distance = distance + weights[edge]
+
+            if neighbour_distance < distances.get(neighbour, math.inf):
+                distances[neighbour] = neighbour_distance
+                self.predecessors[neighbour] = (node, edge)
+                heappush(self.heap, (neighbour_distance, neighbour))
+
+        return best_distance, meeting_node
+
+
+class ContractionHierarchy:
+    """
+    Иерархия сжатия (Contraction Hierarchies) для одного веса. Запрос - двунаправленный поиск
+    только по ребрам к узлам с большим рангом; ярлыки раскрываются через промежуточные узлы
+    """
+    ranks: np.ndarray
+
+    up_indptr: np.ndarray
+    up_indices: np.ndarray
+    up_weights: np.ndarray
+    up_middles: np.ndarray
+
+    down_indptr: np.ndarray
+    down_indices: np.ndarray
+    down_weights: np.ndarray
+    down_middles: np.ndarray
+
+    ARRAYS = ('ranks', 'up_indptr', 'up_indices', 'up_weights', 'up_middles',
+              'down_indptr', 'down_indices', 'down_weights', 'down_middles')
+
+    def __init__(self, **arrays: np.ndarray):
+        """
+        Инициализация иерархии
+        :param arrays: массивы иерархии (см. ARRAYS). up - восходящие исходящие ребра узлов,
+                       down - восходящие входящие ребра узлов (индекс - начало ребра)
+        """
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        self._up = tuple(memoryview(array) for array in (self.up_indptr, self.up_indices,
+                                                          self.up_weights, self.up_middles))
+        self._down = tuple(memoryview(array) for array in (self.down_indptr, self.down_indices,
+                                                            self.down_weights, self.down_middles))
+
+    @classmethod
+    def build(cls, graph: CSRGraph, weight: str, witness_settled_limit: int = 500) -> 'ContractionHierarchy':
+        """
+        Предварительная обработка: сжатие узлов в порядке приоритета с ленивым пересчетом
+        :param graph: CSR-граф
+        :param weight: наименование атрибута веса
+        :param witness_settled_limit: максимальное количество узлов, просматриваемых поиском свидетеля
+        :return: иерархия
+        """
+        ranks, upward, downward = _Contractor(graph, weight, witness_settled_limit).contract_all()
+        return cls(ranks=ranks, **_to_arrays(upward, 'up'), **_to_arrays(downward, 'down'))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый массивами иерархии
+        :return: количество байт
+        """
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    @property
+    def shortcuts_count(self) -> int:
+        """
+        Количество ярлыков
+        :return: int
+        """
+        return int((self.up_middles >= 0).sum() + (self.down_middles >= 0).sum())
+
+    @staticmethod
+    def _find_edge(adjacency: tuple, node: int, neighbour: int) -> int:
+        """
+        Поиск ребра в списке смежности узла
+        :param adjacency: (indptr, indices, weights, middles)
+        :param node: узел
+        :param neighbour: соседний узел
+        :return: индекс ребра
+        """
+        indptr, indices, _, _ = adjacency
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            if indices[edge] == neighbour:
+                return edge
+
+        raise ValueError('Ребро отсутствует в иерархии')
+
+    def _unpack_edge(self, orig: int, dest: int, middle: int) -> List[int]:
+        """
+        Раскрытие ребра иерархии в последовательность узлов исходного графа
+        :param orig: начало ребра
+        :param dest: конец ребра
+        :param middle: промежуточный узел ярлыка или -1
+        :return: узлы пути без начального узла
+        """
+        path = []
+        stack = [(orig, dest, middle)]
+
+        while stack:
+            orig, dest, middle = stack.pop()
+
+            if middle < 0:
+                path.append(dest)
+                continue
+
+            # Промежуточный узел сжат раньше концов ярлыка: оба ребра хранятся в его списках смежности
+            first = self._find_edge(self._down, middle, orig)
+            second = self._find_edge(self._up, middle, dest)
+
+            stack.append((middle, dest, self._up[3][second]))
+            stack.append((orig, middle, self._down[3][first]))
+
+        return path
+
+    def search(self, source: int, target: int) -> Optional[SearchResult]:
+        """
+        Двунаправленный поиск по восходящим ребрам
+        :param source: позиция начального узла
+        :param target: позиция конечного узла
+        :return: результат поиска или None, если путь не существует
+        """
+        forward, backward = _Frontier(self._up, source), _Frontier(self._down, target)
+        best = (0.0, source) if source == target else (float('inf'), None)
+
+        while True:
+            # Расширяется направление с меньшим минимумом кучи, пока он меньше найденного расстояния
+            forward_minimum, backward_minimum = forward.minimum(), backward.minimum()
+            if min(forward_minimum, backward_minimum) >= best[0]:
+                break
+
+            frontier, other = (forward, backward) if forward_minimum <= backward_minimum else (backward, forward)
+            best = frontier.expand(other, best)
+
+        distance, meeting_node = best
+        if meeting_node is None:
+            return None
+
+        return SearchResult(distance, self._unpack_path((forward.predecessors, backward.predecessors), meeting_node),
+                            len(forward.settled) + len(backward.settled))
+
+    def _unpack_path(self, predecessors: tuple, meeting_node: int) -> List[int]:
+        """
+        Восстановление пути исходного графа через узел встречи
+        :param predecessors: предшественники прямого и обратного поиска (узел, ребро)
+        :param meeting_node: узел встречи
+        :return: путь
+        """
+        forward_edges = []
+        node = meeting_node
+        while predecessors[0][node][0] != -1:
+            previous, edge = predecessors[0][node]
+            forward_edges.append((previous, node, self._up[3][edge]))
+            node = previous
+
+        path = [node]
+        for orig, dest, middle in reversed(forward_edges):
+            path.extend(self._unpack_edge(orig, dest, middle))
+
+        node = meeting_node
+        while predecessors[1][node][0] != -1:
+            following, edge = predecessors[1][node]
+            path.extend(self._unpack_edge(node, following, self._down[3][edge]))
+            node = following
+
+        return path
+
+
+def build_hierarchies(graph: CSRGraph, witness_settled_limit: int = 500) -> Dict[str, ContractionHierarchy]:
+    """
+    Построение иерархий сжатия для всех весов графа
+    :param graph: CSR-граф
+    :param witness_settled_limit: максимальное количество узлов, просматриваемых поиском свидетеля
+    :return: иерархии по наименованию атрибута веса
+    """
+    return {weight: ContractionHierarchy.build(graph, weight, witness_settled_limit) for weight in graph.weights}
@@ -0,0 +1,251 @@
+import dataclasses
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+import logging
+
+import networkx as nx
+import numpy as np
+
+import settings
+from route_builder import routing
+from route_builder.cache import RouteCache
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import HaversineHeuristic, Landmarks
+from route_builder.hierarchies import ContractionHierarchy, build_hierarchies
+from route_builder.spatial import NodeIndex
+
+if TYPE_CHECKING:
+    from route_builder.builders import EdgeUpdates
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class GraphIndexes:
+    """ Массивы и индексы графа одной версии весов """
+    csr: CSRGraph
+    heuristic: Optional[Union[HaversineHeuristic, Landmarks]] = None
+    hierarchies: Optional[Dict[str, ContractionHierarchy]] = None
+    version: int = 0
+
+
+class IndexStore:
+    """
+    Индексы графа: пространственный индекс узлов и массивы текущей версии весов с индексами алгоритма поиска.
+    Отсутствующие индексы строятся по MultiDiGraph при первом обращении. Обновление весов заменяет версию
+    целиком, поэтому поиск, начатый с полученной версией, не видит частично примененных изменений
+    """
+    engine: routing.EnginesType
+
+    def __init__(self, engine: routing.EnginesType, source: Callable[[], nx.MultiDiGraph]):
+        """
+        Инициализация хранилища индексов
+        :param engine: алгоритм поиска кратчайшего пути
+        :param source: получение MultiDiGraph для построения индексов
+        """
+        self.engine = engine
+        self._source = source
+
+        self._node_index: Optional[NodeIndex] = None
+        self._current = GraphIndexes(None, None, None, 0)
+        # Граф исходных весов (для reset изменений ребер), None - веса не изменялись
+        self._base_csr: Optional[CSRGraph] = None
+
+        self._lock = threading.Lock()
+        self._updates_lock = threading.Lock()
+
+    def reset_locks(self) -> None:
+        """
+        Создание блокировок заново в дочернем процессе: при fork они могли быть захвачены другими потоками
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self._updates_lock = threading.Lock()
+
+    def set(self, node_index: Optional[NodeIndex], csr: Optional[CSRGraph],
+            heuristic: Optional[Union[HaversineHeuristic, Landmarks]] = None,
+            hierarchies: Optional[Dict[str, ContractionHierarchy]] = None) -> None:
+        """
+        Замена индексов построенными или загруженными из снимка (None - построить при первом обращении).
+        Номер версии весов сохраняется
+        :param node_index: пространственный индекс узлов
+        :param csr: CSR-граф
+        :param heuristic: нижняя оценка расстояния для алгоритмов astar и alt
+        :param hierarchies: иерархии сжатия для алгоритма ch
+        :return: None
+        """
+        with self._lock:
+            self._node_index = node_index
+            self._current = GraphIndexes(csr, heuristic, hierarchies, self._current.version)
+            self._base_csr = None
+
+    @property
+    def version(self) -> int:
+        """
+        Версия весов графа
+        :return: номер версии
+        """
+        return self._current.version
+
+    @property
+    def node_index(self) -> NodeIndex:
+        """
+        Пространственный индекс узлов графа
+        :return: NodeIndex
+        """
+        if self._node_index is None:
+            self._node_index = NodeIndex.from_graph(self._source())
+
+        return self._node_index
+
+    @property
+    def csr(self) -> CSRGraph:
+        """
+        Компактное представление графа текущей версии весов
+        :return: CSRGraph
+        """
+        return self._fill('csr', lambda _: CSRGraph.from_graph(self._source()))
+
+    @property
+    def heuristic(self) -> Optional[Union[HaversineHeuristic, Landmarks]]:
+        """
+        Нижняя оценка расстояния для алгоритмов astar и alt
+        :return: HaversineHeuristic, Landmarks или None для остальных алгоритмов
+        """
+        _ = self.csr
+        return self._fill('heuristic', lambda current: self._build_heuristic(current.csr))
+
+    @property
+    def hierarchies(self) -> Optional[Dict[str, ContractionHierarchy]]:
+        """
+        Иерархии сжатия для алгоритма ch
+        :return: иерархии по наименованию атрибута веса или None для остальных алгоритмов
+        """
+        _ = self.csr
+        return self._fill('hierarchies', lambda current: self._build_hierarchies(current.csr))
+
+    def _fill(self, name: str, build: Callable[[GraphIndexes], Any]) -> Any:
+        """
+        Индекс текущей версии весов: отсутствующий индекс строится и сохраняется, если версия не изменилась
+        :param name: наименование поля GraphIndexes
+        :param build: построение индекса по массивам и индексам версии
+        :return: индекс
+        """
+        current = self._current
+        value = getattr(current, name)
+
+        if value is None:
+            value = build(current)
+
+            with self._lock:
+                if self._current.version == current.version and getattr(self._current, name) is None:
+                    self._current = dataclasses.replace(self._current, **{name: value})
+
+        return value
+
+    def _build_heuristic(self, csr: CSRGraph) -> Optional[Union[HaversineHeuristic, Landmarks]]:
+        """
+        Предрасчет нижней оценки расстояния для алгоритмов astar и alt
+        :param csr: CSR-граф
+        :return: оценка или None для остальных алгоритмов
+        """
+        if self.engine == 'astar':
+            return HaversineHeuristic(csr)
+
+        if self.engine == 'alt':
+            logger.info("============== LANDMARKS BUILD START ==============")
+            landmarks = Landmarks.build(csr, settings.ALT_LANDMARKS)
+            logger.info("============== LANDMARKS BUILD END ==============")
+            return landmarks
+
+        return None
+
+    def _build_hierarchies(self, csr: CSRGraph) -> Optional[Dict[str, ContractionHierarchy]]:
+        """
+        Предварительная обработка графа для алгоритма ch: иерархия сжатия по каждому весу
+        :param csr: CSR-граф
+        :return: иерархии по наименованию атрибута веса или None для остальных алгоритмов
+        """
+        if self.engine != 'ch':
+            return None
+
+        logger.info("============== CONTRACTION HIERARCHIES BUILD START ==============")
+        hierarchies = build_hierarchies(csr)
+        logger.info("============== CONTRACTION HIERARCHIES BUILD END ==============")
+        return hierarchies
+
+    def current(self) -> GraphIndexes:
+        """
+        Массивы и индексы текущей версии весов (отсутствующие строятся)
+        :return: GraphIndexes
+        """
+        _ = self.csr, self.heuristic, self.hierarchies
+        return self._current
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти построенных или отображенных из снимка индексов, включая граф исходных весов
+        :return: количество байт
+        """
+        current = self._current
+        base_csr = self._base_csr if self._base_csr is not current.csr else None
+        indexes = (self._node_index, current.csr, base_csr, current.heuristic, *(current.hierarchies or {}).values())
+
+        return sum(index.nbytes for index in indexes if index is not None)
+
+    def update(self, changes: 'EdgeUpdates', cache: Optional[RouteCache] = None) -> Tuple[int, int]:
+        """
+        Изменение весов ребер новой версией: измененные массивы весов копируются (copy-on-write), коэффициенты A*
+        при необходимости уменьшаются, таблицы ALT пересчитываются только для уменьшившихся весов, иерархии ch
+        измененных весов отбрасываются (поиск по ним выполняется двунаправленным алгоритмом Дейкстры),
+        из кеша удаляются только устаревшие участки
+        :param changes: изменения ребер
+        :param cache: кеш участков маршрута
+        :return: (новая версия весов, количество удаленных из кеша участков)
+        """
+        with self._updates_lock:
+            current = self.current()
+            csr = current.csr
+
+            edges = csr.edge_positions(csr.positions(orig for orig, _ in changes.edge_nodes),
+                                       csr.positions(dest for _, dest in changes.edge_nodes))
+            updated = csr.updated(edges, changes.values(csr, self._base_csr or csr, edges))
+
+            decreased = self._replace(current, updated, edges)
+
+            invalidated = 0
+            if cache is not None:
+                invalidated = cache.invalidate(set(changes.edge_nodes), decreased, current.version + 1)
+
+        return current.version + 1, invalidated
+
+    def _replace(self, current: GraphIndexes, updated: CSRGraph, edges: np.ndarray) -> List[str]:
+        """
+        Замена весов и индексов новой версией: индексы исправляются по измененным ребрам
+        :param current: текущая версия весов и индексов
+        :param updated: граф с измененными весами
+        :param edges: позиции измененных ребер
+        :return: веса, значения которых уменьшились хотя бы на одном ребре
+        """
+        old_weights = {weight: values[edges] for weight, values in current.csr.weights.items()}
+        new_weights = {weight: values[edges] for weight, values in updated.weights.items()}
+        changed = [weight for weight in old_weights if (new_weights[weight] != old_weights[weight]).any()]
+        decreased = [weight for weight in changed if (new_weights[weight] < old_weights[weight]).any()]
+
+        heuristic = current.heuristic
+        if isinstance(heuristic, HaversineHeuristic):
+            heuristic = heuristic.updated(updated, edges)
+        elif isinstance(heuristic, Landmarks):
+            heuristic = heuristic.updated(updated, decreased)
+
+        hierarchies = current.hierarchies
+        if hierarchies is not None:
+            hierarchies = {weight: hierarchy for weight, hierarchy in hierarchies.items() if weight not in changed}
+
+        with self._lock:
+            self._base_csr = self._base_csr or current.csr
+            self._current = GraphIndexes(updated, heuristic, hierarchies, current.version + 1)
+
+        return decreased
@@ -0,0 +1,170 @@
+import dataclasses
+from typing import Iterator, List, Literal, Optional, Sequence, Tuple, Union, get_args
+
+import numpy as np
+
+from route_builder import builders, metrics, utils
+from route_builder.csr import CSRGraph
+from route_builder.trees import shortest_path_trees
+
+HullsType = Literal['concave', 'convex']
+HULLS = get_args(HullsType)
+
+# Доля, на которую вогнутая оболочка ближе к выпуклой: 0 - максимально вогнутая, 1 - выпуклая
+HULL_RATIO = 0.3
+
+
+def reachable(graph: CSRGraph, source: int, weight: str, limit: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Узлы, достижимые из начального узла на расстоянии не больше limit: одно дерево кратчайших путей,
+    поиск которого останавливается на границе limit
+    :param graph: CSR-граф
+    :param source: позиция начального узла
+    :param weight: наименование атрибута веса
+    :param limit: максимальное расстояние
+    :return: (позиции узлов, расстояния) в порядке возрастания расстояния
+    """
+    distances = shortest_path_trees(graph, [source], weight, workers=1, limit=limit)[0][0]
+
+    positions = np.flatnonzero(distances <= limit)
+    order = np.argsort(distances[positions], kind='stable')
+
+    return positions[order], distances[positions[order]]
+
+
+def hull(x: np.ndarray, y: np.ndarray, kind: HullsType = 'concave', ratio: float = HULL_RATIO,
+         precision: int = 6) -> Optional[dict]:
+    """
+    Полигон, охватывающий точки
+    :param x: долготы точек
+    :param y: широты точек
+    :param kind: вид оболочки (concave - вогнутая, convex - выпуклая)
+    :param ratio: степень вогнутости для concave (см. HULL_RATIO)
+    :param precision: количество знаков после запятой
+    :return: геометрия GeoJSON (Polygon или MultiPolygon) или None, если точки не образуют площадь
+    """
+    if len(x) < 3:
+        return None
+
+    # shapely загружается только при построении полигона
+    import shapely  # pylint: disable=import-outside-toplevel
+
+    points = shapely.multipoints(np.column_stack([x, y]))
+    polygon = shapely.concave_hull(points, ratio=ratio) if kind == 'concave' else shapely.convex_hull(points)
+    polygon = shapely.set_precision(polygon, 10 ** -precision)
+
+    if polygon.is_empty or polygon.geom_type not in ('Polygon', 'MultiPolygon'):
+        return None
+
+    return shapely.geometry.mapping(polygon)
+
+
+def isochrones(graph: CSRGraph, source: int, weight: str, thresholds: Sequence[float],
+               kind: HullsType = 'concave') -> Iterator[Tuple[float, np.ndarray, Optional[dict]]]:
+    """
+    Зоны достижимости для нескольких порогов по одному дереву кратчайших путей. Узлы зоны - префикс
+    узлов, упорядоченных по расстоянию, поэтому зоны выдаются по возрастанию порога по мере построения оболочек
+    :param graph: CSR-граф
+    :param source: позиция начального узла
+    :param weight: наименование атрибута веса
+    :param thresholds: пороги расстояния
+    :param kind: вид оболочки
+    :return: (порог, позиции узлов зоны, полигон зоны)
+    """
+    thresholds = sorted(thresholds)
+    positions, distances = reachable(graph, source, weight, thresholds[-1])
+
+    for threshold in thresholds:
+        nodes = positions[:np.searchsorted(distances, threshold, side='right')]
+        yield threshold, nodes, hull(graph.x[nodes], graph.y[nodes], kind)
+
+
+class IsochroneBuilder:
+    """ Построитель зон достижимости """
+    graph: builders.Graph
+
+    coordinates: List[List[float]]
+    thresholds: List[float]
+    optimizer: str = 'travel_time'
+    hull: HullsType = 'concave'
+    with_nodes: bool = False
+
+    def __init__(self, graph: builders.Graph, point_coordinates: Sequence[float], thresholds: List[float], **kwargs):
+        """
+        Инициализация построителя зон достижимости
+        :param graph: абстракция графа
+        :param point_coordinates: координаты начальной точки
+        :param thresholds: пороги в единицах optimizer (секунды для travel_time, метры для length)
+        :param kwargs: дополнительные параметры построения зон: optimizer - атрибут, по которому считается
+            расстояние, hull - вид полигона зоны (concave - вогнутая оболочка, convex - выпуклая),
+            with_nodes - вернуть идентификаторы узлов зон
+        """
+        self.graph = graph
+
+        self.coordinates = utils.split_coordinates([point_coordinates])
+        utils.validate_coordinates(graph.bbox, self.coordinates)
+
+        if not thresholds or any(threshold <= 0 for threshold in thresholds):
+            raise ValueError('Необходим хотя бы один положительный порог')
+
+        self.thresholds = sorted(thresholds)
+
+        optimizer = kwargs.get('optimizer')
+        if optimizer:
+            if optimizer not in builders.EDGE_ATTRIBUTES:
+                raise ValueError(f'Значения optimizer: {", ".join(builders.EDGE_ATTRIBUTES)}')
+
+            self.optimizer = optimizer
+
+        kind = kwargs.get('hull')
+        if kind:
+            if kind not in HULLS:
+                raise ValueError(f'Значения hull: {", ".join(HULLS)}')
+
+            self.hull = kind
+
+        self.with_nodes = bool(kwargs.get('with_nodes'))
+
+    def iter_build(self, origin: Optional[int] = None) -> Iterator[utils.Isochrone]:
+        """
+        Построение зон по возрастанию порога: одно дерево кратчайших путей, ограниченное наибольшим порогом
+        :param origin: узел, к которому уже привязана начальная точка
+        :return: зоны достижимости
+        """
+        csr = self.graph.csr
+        if origin is None:
+            origin = self.graph.nearest_nodes(*self.coordinates)[0]
+
+        for threshold, nodes, polygon in isochrones(csr, csr.positions([origin])[0], self.optimizer,
+                                                    self.thresholds, self.hull):
+            yield utils.Isochrone(threshold=threshold, nodes_count=len(nodes), polygon=polygon,
+                                  nodes=csr.to_node_ids(nodes) if self.with_nodes else None)
+
+    def build(self) -> utils.Isochrones:
+        """
+        Построение зон достижимости
+        :return: зоны по возрастанию порога
+        """
+        origin = self.graph.nearest_nodes(*self.coordinates)[0]
+        return utils.Isochrones(origin=origin, optimizer=self.optimizer, isochrones=list(self.iter_build(origin)))
+
+
+def build_isochrones(graph: builders.Graph, stream: bool = False, **kwargs) -> Union[dataclasses.dataclass, utils.Stream]:
+    """
+    Строительство зон достижимости
+    :param graph: граф для построения зон
+    :param stream: вернуть поток, зоны которого строятся при переборе (для отправки отдельными сообщениями
+        по мере построения)
+    :param kwargs: конфигурация зон (point_coordinates, thresholds, optimizer, hull, with_nodes)
+    :return: зоны достижимости
+    """
+    try:
+        with metrics.stage('validation'):
+            isochrone_builder = IsochroneBuilder(graph, **kwargs)
+
+        if stream:
+            return utils.Stream(isochrone_builder.iter_build(), len(isochrone_builder.thresholds))
+
+        return isochrone_builder.build()
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from route_builder import metrics
+
+if TYPE_CHECKING:
+    from route_builder.builders import Graph
+
+# Графы, наследуемые процессами пулов участков маршрута при fork, по id графа
+_graphs: Dict[int, 'Graph'] = {}
+
+
+def _init_process(graph_id: int) -> None:
+    """
+    Инициализация процесса пула участков маршрута: блокировки графа и метрик создаются заново,
+    так как при fork они могли быть захвачены другими потоками родительского процесса
+    :param graph_id: id графа
+    :return: None
+    """
+    _graphs[graph_id].reset_locks()
+    metrics.reset_locks()
+
+
+def _shortest_path(graph_id: int, orig: int, dest: int, weight: str) -> Optional[List[int]]:
+    """
+    Поиск кратчайшего пути участка маршрута в процессе пула по унаследованному графу
+    :param graph_id: id графа
+    :param orig: начальный узел
+    :param dest: конечный узел
+    :param weight: наименование атрибута веса
+    :return: путь
+    """
+    return _graphs[graph_id].shortest_path(orig, dest, weight)
+
+
+class LegPool:
+    """
+    Постоянный пул процессов для участков маршрута графа. Процессы создаются один раз через fork
+    и наследуют граф, поэтому граф не сериализуется на каждый запрос, как в пулах osmnx.
+    Участки одного запроса и участки одновременных запросов распределяются по одному пулу.
+    Пул используется только процессом, который его создал, и только для унаследованной версии весов
+    """
+    def __init__(self, graph: 'Graph', workers: int):
+        """
+        Запуск пула
+        :param graph: граф с построенными индексами
+        :param workers: количество процессов
+        """
+        self.graph_id = id(graph)
+        self.workers = workers
+        self.version = graph.indexes().version
+        self.pid = os.getpid()
+
+        _graphs[self.graph_id] = graph
+
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                             initializer=_init_process, initargs=(self.graph_id,))
+        # fork-пул запускает все процессы при первой задаче: после нее ссылка родительского процесса не нужна
+        self._executor.submit(os.getpid).result()
+
+        _graphs.pop(self.graph_id, None)
+
+    def usable(self, version: int) -> bool:
+        """
+        Возможность построения участков пулом
+        :param version: версия весов графа запроса
+        :return: True, если пул создан текущим процессом и его процессы унаследовали эту версию весов
+        """
+        return self.pid == os.getpid() and self.version == version
+
+    def map(self, orig: List[int], dest: List[int], weight: str) -> List[Optional[List[int]]]:
+        """
+        Поиск кратчайших путей участков процессами пула
+        :param orig: начальные узлы
+        :param dest: конечные узлы
+        :param weight: наименование атрибута веса
+        :return: список путей
+        """
+        return list(self._executor.map(_shortest_path, repeat(self.graph_id), orig, dest, repeat(weight)))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Остановка пула
+        :param wait: ожидать остановки процессов с отменой неначатых участков; иначе начатые запросы
+            завершают отправленные участки, а процессы останавливаются после них
+        :return: None
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=wait)
@@ -0,0 +1,302 @@
+import dataclasses
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from route_builder import builders, metrics, utils
+from route_builder.cache import CachedRoute
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import EARTH_RADIUS_M, haversine
+from route_builder.trees import weight_matrix
+
+# Стандартное отклонение ошибки GPS, м
+SIGMA = 10.0
+# Масштаб штрафа за расхождение длины пути по графу и расстояния между точками, м
+BETA = 20.0
+# Количество узлов-кандидатов на точку
+CANDIDATES = 5
+# Радиус поиска кандидатов, м: ближайший узел остается кандидатом при любом расстоянии
+RADIUS = 100.0
+# Максимальное отношение длины пути по графу к расстоянию между точками (с учетом удаления кандидатов)
+MAX_DETOUR = 3.0
+# Количество переходов, пути которых ищутся одним вызовом поиска
+CHUNK = 64
+
+
+def step_distances(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Расстояния между последовательными точками трека
+    :param x: долготы точек
+    :param y: широты точек
+    :return: расстояния в метрах (на одно меньше количества точек)
+    """
+    lat, lon = np.radians(y), np.radians(x)
+    return haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+
+def _window(graph: CSRGraph, nodes: np.ndarray, margin: float) -> np.ndarray:
+    """
+    Узлы графа в прямоугольнике узлов-кандидатов, расширенном на margin
+    :param graph: CSR-граф
+    :param nodes: позиции узлов-кандидатов
+    :param margin: расширение, м
+    :return: позиции узлов окна по возрастанию
+    """
+    lat = np.degrees(margin / EARTH_RADIUS_M)
+    lon = lat / max(np.cos(np.radians(graph.y[nodes].mean())), 1e-6)
+
+    return np.flatnonzero((graph.y >= graph.y[nodes].min() - lat) & (graph.y <= graph.y[nodes].max() + lat) &
+                          (graph.x >= graph.x[nodes].min() - lon) & (graph.x <= graph.x[nodes].max() + lon))
+
+
+@dataclasses.dataclass
+class MatchParams:
+    """ Параметры скрытой марковской модели привязки трека """
+    # Стандартное отклонение ошибки GPS, м
+    sigma: float = SIGMA
+    # Масштаб штрафа перехода, м
+    beta: float = BETA
+    # Максимальное отношение длины пути перехода к расстоянию между точками
+    max_detour: float = MAX_DETOUR
+    # Количество переходов на один поиск
+    chunk: int = CHUNK
+
+
+class Viterbi:
+    """
+    Выбор наиболее вероятной последовательности состояний алгоритмом Витерби. Если ни один переход
+    между точками невозможен, трек разбивается: модель начинается заново со следующей точки
+    """
+    def __init__(self, emissions: np.ndarray):
+        """
+        Инициализация
+        :param emissions: логарифмы вероятностей наблюдения формы (точки, кандидаты)
+        """
+        self.emissions = emissions
+        self.scores = emissions[0]
+        self.back = np.full(emissions.shape, -1, dtype=np.int64)
+        self.starts, self.ends = [0], []
+
+    def step(self, point: int, transitions: np.ndarray) -> None:
+        """
+        Переход от точки к следующей
+        :param point: индекс точки
+        :param transitions: логарифмы вероятностей переходов формы (кандидаты точки, кандидаты следующей точки)
+        :return: None
+        """
+        totals = self.scores[:, None] + transitions
+        best = totals.argmax(axis=0)
+        following = totals[best, np.arange(totals.shape[1])] + self.emissions[point + 1]
+
+        if np.isneginf(following).all():
+            self.ends.append(int(self.scores.argmax()))
+            self.starts.append(point + 1)
+            self.scores = self.emissions[point + 1]
+        else:
+            self.back[point + 1] = best
+            # Нормировка: значения остаются сравнимыми на длинных треках
+            self.scores = following - following.max()
+
+    def path(self) -> Tuple[np.ndarray, List[int]]:
+        """
+        Восстановление наиболее вероятной последовательности
+        :return: (индексы выбранных кандидатов для каждой точки, индексы первых точек участков трека)
+        """
+        points_count = len(self.emissions)
+        ends = self.ends + [int(self.scores.argmax())]
+        chosen = np.empty(points_count, dtype=np.int64)
+
+        for start, stop, state in zip(self.starts, self.starts[1:] + [points_count], ends):
+            for point in range(stop - 1, start - 1, -1):
+                chosen[point] = state
+                state = self.back[point, state]
+
+        return chosen, self.starts
+
+
+def _limits(candidates: np.ndarray, distances: np.ndarray, steps: np.ndarray, max_detour: float) -> np.ndarray:
+    """
+    Ограничения длины путей переходов с учетом удаления наиболее далеких кандидатов точек
+    :param candidates: позиции узлов-кандидатов формы (точки, кандидаты), -1 - нет кандидата
+    :param distances: удаление точек от кандидатов, м
+    :param steps: расстояния между последовательными точками, м
+    :param max_detour: максимальное отношение длины пути перехода к расстоянию между точками
+    :return: ограничения длины для каждого перехода, м
+    """
+    reach = np.where(candidates >= 0, distances, 0).max(axis=1)
+    return max_detour * (steps + reach[:-1] + reach[1:])
+
+
+def _transition_lengths(graph: CSRGraph, matrix: csr_matrix, local: np.ndarray, block: np.ndarray,
+                        limit: float) -> List[np.ndarray]:
+    """
+    Длины путей переходов между кандидатами последовательных точек блока: пути ищутся одним вызовом
+    поиска Дейкстры от всех кандидатов по окну графа вокруг них с ограничением длины
+    :param graph: CSR-граф
+    :param matrix: матрица длин ребер графа
+    :param local: позиции узлов в окне (заполняется на время поиска, -1 - узел вне окна)
+    :param block: позиции узлов-кандидатов точек блока формы (точки, кандидаты), -1 - нет кандидата
+    :param limit: ограничение длины пути, м
+    :return: матрицы длин (кандидаты точки, кандидаты следующей точки) для каждого перехода, inf - нет пути
+    """
+    window = _window(graph, block[block >= 0], limit / 2)
+    local[window] = np.arange(len(window))
+    sources = np.unique(block[:-1][block[:-1] >= 0])
+
+    routes = np.atleast_2d(dijkstra(matrix[window][:, window], directed=True, indices=local[sources], limit=limit))
+
+    result = []
+    for orig, dest in zip(block[:-1], block[1:]):
+        lengths = np.full((len(orig), len(dest)), np.inf)
+        rows = np.searchsorted(sources, orig[orig >= 0])
+        lengths[np.ix_(orig >= 0, dest >= 0)] = routes[rows][:, local[dest[dest >= 0]]]
+        result.append(lengths)
+
+    local[window] = -1
+    return result
+
+
+def match(graph: CSRGraph, candidates: np.ndarray, distances: np.ndarray, steps: np.ndarray,
+          params: Optional[MatchParams] = None) -> Tuple[np.ndarray, List[int]]:
+    """
+    Привязка трека к графу скрытой марковской моделью (Newson, Krumm): состояния - узлы-кандидаты точек,
+    вероятность наблюдения - нормальное распределение удаления точки от узла, вероятность перехода -
+    экспоненциальное распределение разности длины пути по графу и расстояния между точками. Пути переходов
+    chunk точек ищутся одним вызовом поиска (см. _transition_lengths), поэтому поиск не выходит за пределы
+    допустимого объезда. Наиболее вероятная последовательность выбирается алгоритмом Витерби
+    :param graph: CSR-граф
+    :param candidates: позиции узлов-кандидатов формы (точки, кандидаты), -1 - нет кандидата
+    :param distances: удаление точек от кандидатов, м
+    :param steps: расстояния между последовательными точками, м
+    :param params: параметры модели (по умолчанию MatchParams())
+    :return: (позиции выбранных узлов для каждой точки, индексы первых точек участков трека)
+    """
+    params = params or MatchParams()
+    viterbi = Viterbi(np.where(candidates >= 0, -0.5 * (distances / params.sigma) ** 2, -np.inf))
+
+    limits = _limits(candidates, distances, steps, params.max_detour)
+
+    matrix = weight_matrix(graph, 'length')
+    local = np.full(graph.nodes_count, -1, dtype=np.int64)
+
+    for first in range(0, len(candidates) - 1, params.chunk):
+        last = min(first + params.chunk, len(candidates) - 1)
+
+        for point, lengths in enumerate(_transition_lengths(graph, matrix, local, candidates[first:last + 1],
+                                                            limits[first:last].max()), start=first):
+            viterbi.step(point, np.where(lengths <= limits[point], -np.abs(lengths - steps[point]) / params.beta,
+                                         -np.inf))
+
+    chosen, starts = viterbi.path()
+    return candidates[np.arange(len(candidates)), chosen], starts
+
+
+class TraceMatcher(builders.RouteBuilder):
+    """ Привязка GPS-трека к графу (map matching) """
+    sigma: float = SIGMA
+    radius: float = RADIUS
+    candidates: int = CANDIDATES
+
+    def __init__(self, graph: builders.Graph, points_coordinates: List[Sequence[float]], **kwargs):
+        """
+        Инициализация привязки трека
+        :param graph: абстракция графа
+        :param points_coordinates: координаты точек трека в порядке записи
+        :param kwargs: параметры привязки (sigma - стандартное отклонение ошибки GPS, м; radius - радиус поиска
+            узлов-кандидатов, м; candidates - количество узлов-кандидатов на точку) и карты (with_map, map_format)
+        """
+        if len(points_coordinates) < 2:
+            raise ValueError('Трек должен содержать не менее двух точек')
+
+        super().__init__(graph, points_coordinates, **kwargs)
+
+        for name in ('sigma', 'radius'):
+            value = kwargs.get(name)
+            if value is not None:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                    raise ValueError(f'{name}: значение должно быть положительным числом')
+
+                setattr(self, name, float(value))
+
+        candidates = kwargs.get('candidates')
+        if candidates is not None:
+            if not isinstance(candidates, int) or isinstance(candidates, bool) or candidates < 1:
+                raise ValueError('candidates: значение должно быть положительным целым числом')
+
+            self.candidates = candidates
+
+    def match(self, indexes: builders.GraphIndexes) -> List[List[int]]:
+        """
+        Выбор узлов точек трека (см. функцию match)
+        :param indexes: индексы графа, по которым выполняется привязка
+        :return: узлы точек по участкам трека
+        """
+        csr = indexes.csr
+        x, y = (np.asarray(values, dtype=float) for values in self.coordinates)
+
+        with metrics.stage('snap'):
+            positions, distances = self.graph.node_index.candidates(x, y, self.candidates, self.radius)
+            node_ids = self.graph.node_index.node_ids[positions]
+            candidates = np.where(positions >= 0, np.reshape(csr.positions(node_ids.ravel()), node_ids.shape), -1)
+
+        with metrics.stage('matching'):
+            matched, starts = match(csr, candidates, distances, step_distances(x, y), MatchParams(sigma=self.sigma))
+
+        nodes = csr.to_node_ids(matched)
+        return [nodes[start:stop] for start, stop in zip(starts, starts[1:] + [len(nodes)])]
+
+    def build(self, nodes: Optional[List[int]] = None,
+              routes: Optional[Dict[Tuple[int, int], Optional[CachedRoute]]] = None,
+              indexes: Optional[builders.GraphIndexes] = None) -> utils.Match:
+        """
+        Привязка трека: участки между последовательными различными узлами строятся по длине
+        :param nodes: не используется: точка трека привязывается к одному из нескольких кандидатов
+        :param routes: участки, построенные заранее
+        :param indexes: индексы графа, по которым выполняется привязка
+        :return: привязанный трек
+        """
+        indexes = indexes or self.graph.indexes()
+        segments = self.match(indexes)
+
+        # Повторяющиеся подряд узлы (стоянка, частая запись) не дают участков
+        stops = [[node for index, node in enumerate(segment) if index == 0 or node != segment[index - 1]]
+                 for segment in segments]
+        legs = [leg for segment in stops for leg in zip(segment[:-1], segment[1:])]
+        if routes is None or any(leg not in routes for leg in legs):
+            routes = self.graph.build_legs(legs, 'length', indexes)
+
+        paths, length, travel_time = [], 0.0, 0.0
+        for segment in stops:
+            path = segment[:1]
+
+            for leg in zip(segment[:-1], segment[1:]):
+                if routes[leg] is None:
+                    raise ValueError('Невозможно привязать трек с текущими входными параметрами')
+
+                path.extend(routes[leg].path[1:])
+                length += routes[leg].sums['length']
+                travel_time += routes[leg].sums['travel_time']
+
+            paths.append(path)
+
+        route = paths[0] if len(paths) == 1 else paths
+        return utils.Match(paths=route, map=self.build_map(route), length=length, travel_time=travel_time,
+                           nodes=[node for segment in segments for node in segment])
+
+
+def match_trace(graph: builders.Graph, **kwargs) -> dataclasses.dataclass:
+    """
+    Привязка GPS-трека к графу
+    :param graph: граф для привязки
+    :param kwargs: конфигурация привязки (points_coordinates, sigma, radius, candidates, with_map, map_format)
+    :return: привязанный трек
+    """
+    try:
+        with metrics.stage('validation'):
+            trace_matcher = TraceMatcher(graph, **kwargs)
+
+        return trace_matcher.build()
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
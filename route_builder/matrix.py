@@ -0,0 +1,77 @@
+import dataclasses
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from route_builder import builders, metrics, utils
+from route_builder.trees import distance_matrix
+
+
+class MatrixBuilder:
+    """ Построитель матриц расстояний и времени в пути """
+    graph: builders.Graph
+
+    sources: List[List[float]]
+    destinations: List[List[float]]
+    optimizer: str = 'length'
+
+    def __init__(self, graph: builders.Graph, sources: List[Sequence[float]], destinations: List[Sequence[float]],
+                 optimizer: Optional[str] = None):
+        """
+        Инициализация построителя матриц
+        :param graph: абстракция графа
+        :param sources: список координат начальных точек
+        :param destinations: список координат конечных точек
+        :param optimizer: атрибут, по которому выбирается кратчайший путь
+        """
+        self.graph = graph
+
+        if not sources or not destinations:
+            raise ValueError('Необходимы начальные и конечные точки')
+
+        self.sources = utils.split_coordinates(sources)
+        self.destinations = utils.split_coordinates(destinations)
+        utils.validate_coordinates(graph.bbox, self.sources)
+        utils.validate_coordinates(graph.bbox, self.destinations)
+
+        if optimizer:
+            if optimizer not in builders.EDGE_ATTRIBUTES:
+                raise ValueError(f'Значения optimizer: {", ".join(builders.EDGE_ATTRIBUTES)}')
+
+            self.optimizer = optimizer
+
+    def matrices(self) -> Dict[str, np.ndarray]:
+        """
+        Расчет матриц: одно дерево кратчайших путей на начальную точку
+        :return: матрицы по наименованию атрибута, inf - путь не существует
+        """
+        csr = self.graph.csr
+        sources = csr.positions(self.graph.nearest_nodes(*self.sources))
+        destinations = csr.positions(self.graph.nearest_nodes(*self.destinations))
+
+        return distance_matrix(csr, sources, destinations, self.optimizer, builders.EDGE_ATTRIBUTES)
+
+    def build(self) -> utils.Matrix:
+        """
+        Построение матриц
+        :return: матрицы length и travel_time, None - путь не существует
+        """
+        return utils.Matrix(**{attr_name: [[value if value != float('inf') else None for value in row]
+                                           for row in values.tolist()]
+                               for attr_name, values in self.matrices().items()})
+
+
+def build_matrix(graph: builders.Graph, **kwargs) -> dataclasses.dataclass:
+    """
+    Строительство матриц расстояний и времени в пути
+    :param graph: граф для построения матриц
+    :param kwargs: конфигурация матриц (sources, destinations, optimizer)
+    :return: матрицы
+    """
+    try:
+        with metrics.stage('validation'):
+            matrix_builder = MatrixBuilder(graph, **kwargs)
+
+        return matrix_builder.build()
+    except Exception as ex:  # pylint: disable=broad-exception-caught
+        return utils.Error(str(ex))
@@ -0,0 +1,302 @@
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Границы корзин гистограмм длительностей в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """
+    Метки метрики в формате Prometheus
+    :param names: наименования меток
+    :param values: значения меток
+    :param extra: дополнительная метка (например, le гистограммы)
+    :return: строка вида {name="value",...} или пустая строка
+    """
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + ([extra] if extra else [])
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """ Метрика с метками """
+    kind: str
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        """
+        Инициализация метрики
+        :param name: наименование метрики
+        :param documentation: описание метрики
+        :param labels: наименования меток
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+        REGISTRY.append(self)
+
+    def reset_lock(self) -> None:
+        """
+        Создание блокировки заново в дочернем процессе: при fork она могла быть захвачена другим потоком
+        :return: None
+        """
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """
+        Значения меток в порядке их наименований
+        :param labels: значения меток по наименованию
+        :return: ключ серии
+        """
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self) -> List[str]:
+        """
+        Строки значений метрики
+        :return: список строк формата Prometheus
+        """
+        raise NotImplementedError
+
+    def expose(self) -> List[str]:
+        """
+        Описание и значения метрики
+        :return: список строк формата Prometheus
+        """
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}', *self.samples()]
+
+
+class Gauge(Metric):
+    """ Текущее значение """
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Установка значения
+        :param value: значение
+        :param labels: значения меток
+        :return: None
+        """
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        """
+        Увеличение значения
+        :param value: приращение
+        :param labels: значения меток
+        :return: None
+        """
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value: float = 1, **labels: str) -> None:
+        """
+        Уменьшение значения
+        :param value: уменьшение
+        :param labels: значения меток
+        :return: None
+        """
+        self.inc(-value, **labels)
+
+    def value(self, **labels: str) -> float:
+        """
+        Значение серии
+        :param labels: значения меток
+        :return: значение (0, если серия не создана)
+        """
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f'{self.name}{_labels(self.labels, key)} {value}' for key, value in self._values.items()]
+
+
+class Counter(Gauge):
+    """ Монотонно растущий счетчик """
+    kind = 'counter'
+
+
+class Histogram(Metric):
+    """ Распределение значений по корзинам """
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Добавление значения
+        :param value: значение
+        :param labels: значения меток
+        :return: None
+        """
+        key = self._key(labels)
+
+        with self._lock:
+            # Счетчики корзин (последняя - +Inf), затем сумма значений
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        """
+        Количество значений серии
+        :param labels: значения меток
+        :return: количество
+        """
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), series[:-1]):
+                    cumulative += count
+                    bucket = f'le="{bound}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labels, key, bucket)} {cumulative}')
+
+                lines.append(f'{self.name}_sum{_labels(self.labels, key)} {series[-1]}')
+                lines.append(f'{self.name}_count{_labels(self.labels, key)} {cumulative}')
+
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+STAGE_SECONDS = Histogram('route_builder_stage_seconds', 'Длительность этапа обработки запроса', ('stage',))
+REQUEST_SECONDS = Histogram('route_builder_request_seconds', 'Длительность операции построителя', ('operation',))
+QUEUE_LAG_SECONDS = Gauge('listener_queue_lag_seconds',
+                          'Время от публикации (или получения) последнего сообщения до начала обработки')
+IN_FLIGHT = Gauge('listener_in_flight', 'Количество запросов, обрабатываемых исполнителем')
+MESSAGES = Counter('listener_messages_total', 'Количество обработанных сообщений', ('type',))
+SHED = Counter('listener_shed_total', 'Количество запросов, отклоненных или прерванных после истечения срока',
+               ('reason',))
+LATE = Counter('listener_late_total', 'Количество ответов, построенных полностью, но отправленных после истечения срока')
+
+# Наблюдения этапов, записываемые для передачи из дочернего процесса исполнителя в родительский
+_recording: Optional[List[Tuple[str, float]]] = None
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """
+    Добавление длительности этапа
+    :param name: наименование этапа
+    :param seconds: длительность в секундах
+    :return: None
+    """
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+    if _recording is not None:
+        _recording.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Замер длительности этапа
+    :param name: наименование этапа (decode, validation, snap, shortest_path, edge_sums, map, encode, publish)
+    :return: None
+    """
+    started_at = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started_at)
+
+
+@contextmanager
+def recording() -> Iterator[List[Tuple[str, float]]]:
+    """
+    Запись наблюдений этапов в список (в дочернем процессе, выполняющем одну операцию за раз)
+    :return: список (этап, длительность)
+    """
+    global _recording  # pylint: disable=global-statement
+    observations: List[Tuple[str, float]] = []
+    _recording = observations
+
+    try:
+        yield observations
+    finally:
+        _recording = None
+
+
+def reset_locks() -> None:
+    """
+    Создание блокировок всех метрик заново в дочернем процессе после fork
+    :return: None
+    """
+    for metric in REGISTRY:
+        metric.reset_lock()
+
+
+def replay(observations: Sequence[Tuple[str, float]]) -> None:
+    """
+    Добавление наблюдений этапов, записанных в дочернем процессе
+    :param observations: список (этап, длительность)
+    :return: None
+    """
+    for name, seconds in observations:
+        STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def expose() -> str:
+    """
+    Значения всех метрик в текстовом формате Prometheus
+    :return: текст
+    """
+    return '\n'.join(line for metric in REGISTRY for line in metric.expose()) + '\n'
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Ответ на HTTP-запрос: метрики по пути /metrics, 404 для остальных путей
+    :param reader: поток запроса
+    :param writer: поток ответа
+    :return: None
+    """
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()).strip():
+            pass
+
+        parts = request_line.decode('latin-1').split()
+        path = parts[1].split('?')[0] if len(parts) > 1 else ''
+
+        if path == '/metrics':
+            status, content_type, body = '200 OK', CONTENT_TYPE, expose().encode()
+        else:
+            status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', b'Not Found\n'
+
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server(port: int, host: str = '0.0.0.0') -> asyncio.AbstractServer:
+    """
+    Запуск HTTP-сервера метрик в текущем цикле событий
+    :param port: порт (0 - любой свободный)
+    :param host: адрес
+    :return: сервер
+    """
+    return await asyncio.start_server(_handle_http, host, port)
@@ -0,0 +1,212 @@
+import itertools
+import time
+from typing import List, Optional, Sequence, Tuple
+
+# Максимальное количество точек, для которого порядок ищется точно (Хелд-Карп)
+EXACT_LIMIT = 10
+
+INF = float('inf')
+
+
+def order_cost(costs: Sequence[Sequence[float]], order: Sequence[int]) -> float:
+    """
+    Стоимость обхода точек в заданном порядке
+    :param costs: матрица стоимостей переходов между точками
+    :param order: порядок обхода
+    :return: суммарная стоимость
+    """
+    return sum(costs[orig][dest] for orig, dest in zip(order[:-1], order[1:]))
+
+
+def _held_karp(costs: Sequence[Sequence[float]]) -> List[int]:
+    """
+    Точный порядок обхода динамическим программированием по подмножествам.
+    Первая точка - начало маршрута, конец маршрута свободный
+    :param costs: матрица стоимостей переходов между точками
+    :return: порядок обхода
+    """
+    count = len(costs)
+    full = (1 << (count - 1)) - 1
+
+    # best[(подмножество точек 1..n-1, последняя точка)] = (стоимость, предыдущая точка)
+    best = {(1 << (point - 1), point): (costs[0][point], 0) for point in range(1, count)}
+
+    for size in range(2, count):
+        for subset in itertools.combinations(range(1, count), size):
+            mask = sum(1 << (point - 1) for point in subset)
+
+            for last in subset:
+                previous_mask = mask & ~(1 << (last - 1))
+                best[(mask, last)] = min(
+                    ((best[(previous_mask, previous)][0] + costs[previous][last], previous)
+                     for previous in subset if previous != last),
+                    key=lambda item: item[0])
+
+    last = min(range(1, count), key=lambda point: best[(full, point)][0])
+    order, mask = [], full
+
+    while last:
+        order.append(last)
+        mask, last = mask & ~(1 << (last - 1)), best[(mask, last)][1]
+
+    return [0] + order[::-1]
+
+
+def nearest_neighbour(costs: Sequence[Sequence[float]]) -> List[int]:
+    """
+    Начальный порядок обхода: переход к ближайшей непосещенной точке
+    :param costs: матрица стоимостей переходов между точками
+    :return: порядок обхода
+    """
+    order = [0]
+    remaining = set(range(1, len(costs)))
+
+    while remaining:
+        point = min(remaining, key=lambda candidate: costs[order[-1]][candidate])
+        order.append(point)
+        remaining.remove(point)
+
+    return order
+
+
+def _prefix_costs(costs: Sequence[Sequence[float]], order: Sequence[int]) -> Tuple[List[float], List[float]]:
+    """
+    Накопленные стоимости переходов вдоль порядка в прямом и обратном направлении
+    :param costs: матрица стоимостей переходов между точками
+    :param order: порядок обхода
+    :return: (прямые, обратные) суммы до каждой позиции порядка
+    """
+    forward, backward = [0.0], [0.0]
+
+    for orig, dest in zip(order[:-1], order[1:]):
+        forward.append(forward[-1] + costs[orig][dest])
+        backward.append(backward[-1] + costs[dest][orig])
+
+    return forward, backward
+
+
+def _two_opt(costs: Sequence[Sequence[float]], order: List[int], deadline: float) -> bool:
+    """
+    Улучшение 2-opt: разворот отрезка порядка. Стоимости переходов несимметричны (односторонние улицы),
+    поэтому стоимость развернутого отрезка берется из накопленных обратных сумм
+    :param costs: матрица стоимостей переходов между точками
+    :param order: порядок обхода (изменяется на месте)
+    :param deadline: момент time.monotonic, после которого поиск прекращается
+    :return: True, если порядок улучшен
+    """
+    improved = False
+    forward, backward = _prefix_costs(costs, order)
+
+    for start in range(1, len(order) - 1):
+        if time.monotonic() > deadline:
+            break
+
+        for end in range(start + 1, len(order)):
+            before, first, last = order[start - 1], order[start], order[end]
+            after = order[end + 1] if end + 1 < len(order) else None
+
+            current = costs[before][first] + forward[end] - forward[start]
+            candidate = costs[before][last] + backward[end] - backward[start]
+
+            if after is not None:
+                current += costs[last][after]
+                candidate += costs[first][after]
+
+            if candidate < current - 1e-9:
+                order[start:end + 1] = order[start:end + 1][::-1]
+                forward, backward = _prefix_costs(costs, order)
+                improved = True
+
+    return improved
+
+
+def _best_insertion(costs: Sequence[Sequence[float]], rest: List[int], segment: List[int], start: int,
+                    removal: float) -> Optional[int]:
+    """
+    Лучшая позиция вставки отрезка в порядок без него
+    :param costs: матрица стоимостей переходов между точками
+    :param rest: порядок обхода без отрезка
+    :param segment: отрезок
+    :param start: исходная позиция отрезка (не рассматривается)
+    :param removal: выигрыш от удаления отрезка с исходной позиции
+    :return: позиция, вставка в которую уменьшает стоимость, или None
+    """
+    first, last = segment[0], segment[-1]
+    best_position, best_delta = None, -1e-9
+
+    for position in range(1, len(rest) + 1):
+        if position == start:
+            continue
+
+        previous = rest[position - 1]
+        following = rest[position] if position < len(rest) else None
+        insertion = costs[previous][first] + (costs[last][following] - costs[previous][following]
+                                              if following is not None else 0)
+
+        if insertion - removal < best_delta:
+            best_position, best_delta = position, insertion - removal
+
+    return best_position
+
+
+def _or_opt(costs: Sequence[Sequence[float]], order: List[int], deadline: float) -> bool:
+    """
+    Улучшение Or-opt: перенос отрезка из 1-3 точек на другую позицию без разворота
+    :param costs: матрица стоимостей переходов между точками
+    :param order: порядок обхода (изменяется на месте)
+    :param deadline: момент time.monotonic, после которого поиск прекращается
+    :return: True, если порядок улучшен
+    """
+    improved = False
+
+    for length in (1, 2, 3):
+        start = 1
+
+        while start + length <= len(order):
+            if time.monotonic() > deadline:
+                return improved
+
+            segment = order[start:start + length]
+            rest = order[:start] + order[start + length:]
+
+            # Выигрыш от удаления отрезка и затраты на его вставку; стоимость внутри отрезка не меняется
+            before = order[start - 1]
+            after = order[start + length] if start + length < len(order) else None
+            removal = costs[before][segment[0]] + (costs[segment[-1]][after] - costs[before][after]
+                                                   if after is not None else 0)
+
+            position = _best_insertion(costs, rest, segment, start, removal)
+            if position is not None:
+                order[:] = rest[:position] + segment + rest[position:]
+                improved = True
+
+            start += 1
+
+    return improved
+
+
+def solve_order(costs: Sequence[Sequence[float]], time_budget: Optional[float] = None) -> List[int]:
+    """
+    Поиск порядка обхода точек с минимальной стоимостью. Первая точка - начало маршрута, конец свободный.
+    До EXACT_LIMIT точек порядок ищется точно, для большего количества - ближайшим соседом
+    с улучшениями 2-opt и Or-opt в пределах бюджета времени
+    :param costs: матрица стоимостей переходов между точками, inf - переход невозможен
+    :param time_budget: бюджет времени улучшений в секундах (None - без ограничения)
+    :return: порядок обхода
+    """
+    if len(costs) <= 2:
+        return list(range(len(costs)))
+
+    if len(costs) <= EXACT_LIMIT:
+        order = _held_karp(costs)
+    else:
+        deadline = time.monotonic() + time_budget if time_budget else INF
+        order = nearest_neighbour(costs)
+
+        while time.monotonic() <= deadline and (_two_opt(costs, order, deadline) | _or_opt(costs, order, deadline)):
+            pass
+
+    if order_cost(costs, order) == INF:
+        raise ValueError('Невозможно создать маршрут с текущими входными параметрами')
+
+    return order
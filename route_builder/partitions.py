@@ -0,0 +1,251 @@
+import dataclasses
+import math
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from route_builder import utils
+from route_builder.heuristics import EARTH_RADIUS_M
+
+WEIGHTS = ('length', 'travel_time')
+
+
+def grid_tiles(bbox: utils.Bbox, rows: int, cols: int) -> Dict[str, utils.Bbox]:
+    """
+    Разбиение зоны на прямоугольные разделы
+    :param bbox: зона региона
+    :param rows: количество разделов по широте
+    :param cols: количество разделов по долготе
+    :return: зоны разделов по наименованию вида <строка>_<столбец> (строки - с юга на север)
+    """
+    if rows < 1 or cols < 1:
+        raise ValueError('Количество разделов по широте и долготе должно быть положительным')
+
+    lat = np.linspace(bbox.south, bbox.north, rows + 1)
+    lon = np.linspace(bbox.west, bbox.east, cols + 1)
+
+    return {f'{row}_{col}': utils.Bbox(float(lat[row + 1]), float(lat[row]), float(lon[col + 1]), float(lon[col]))
+            for row in range(rows) for col in range(cols)}
+
+
+def assign(tiles: Dict[str, utils.Bbox], x: Sequence[float], y: Sequence[float]) -> List[Optional[str]]:
+    """
+    Разделы точек. Точка на общей границе разделов относится к первому из них, поэтому узлы графа
+    и точки запросов распределяются одинаково
+    :param tiles: зоны разделов
+    :param x: долготы точек
+    :param y: широты точек
+    :return: наименования разделов, None - точка вне всех разделов
+    """
+    return [next((name for name, tile in tiles.items()
+                  if tile.south <= lat <= tile.north and tile.west <= lon <= tile.east), None)
+            for lon, lat in zip(x, y)]
+
+
+def margin_bbox(tile: utils.Bbox, margin: float) -> utils.Bbox:
+    """
+    Зона раздела, расширенная на margin: граф расширенной зоны содержит ребра, пересекающие границу раздела,
+    если второй конец ребра не дальше margin от раздела (см. escaping_edges)
+    :param tile: зона раздела
+    :param margin: расширение, м
+    :return: расширенная зона
+    """
+    lat = math.degrees(margin / EARTH_RADIUS_M)
+    lon = lat / max(math.cos(math.radians((tile.north + tile.south) / 2)), 1e-6)
+
+    return utils.Bbox(tile.north + lat, tile.south - lat, tile.east + lon, tile.west - lon)
+
+
+def escaping_edges(graph: nx.MultiDiGraph, nodes: Iterable[int], bbox: utils.Bbox) -> int:
+    """
+    Количество ребер узлов nodes (исходящих и входящих), второй конец которых вне зоны загрузки bbox.
+    Граф, загруженный из OSM с truncate_by_edge, сохраняет такие концы, но конец длинного ребра может оказаться
+    точкой, на которой osmnx обрезал ребро: в графе соседнего раздела у этого ребра другой конец
+    :param graph: граф зоны bbox
+    :param nodes: узлы раздела
+    :param bbox: зона загрузки графа
+    :return: количество ребер
+    """
+    def inside(node: int) -> bool:
+        return bbox.south <= graph.nodes[node]['y'] <= bbox.north and bbox.west <= graph.nodes[node]['x'] <= bbox.east
+
+    return sum(1 for node in nodes for neighbour in chain(graph.succ[node], graph.pred[node]) if not inside(neighbour))
+
+
+@dataclasses.dataclass
+class Partition:
+    """
+    Раздел графа региона: узлы зоны раздела, граничные узлы (узлы раздела, связанные ребром с узлом другого
+    раздела) и исходящие ребра в другие разделы (u, v, length, travel_time). Координаты x, y хранятся
+    для граничных узлов и концов ребер в другие разделы. Раздел обслуживается отдельным listener'ом,
+    поэтому один процесс не хранит MultiDiGraph всего региона
+    """
+    name: str
+    graph: nx.MultiDiGraph
+    boundary: List[int]
+    cut_edges: List[Tuple[int, int, float, float]]
+    x: Dict[int, float]
+    y: Dict[int, float]
+
+    @classmethod
+    def from_graph(cls, name: str, tiles: Dict[str, utils.Bbox], graph: nx.MultiDiGraph) -> 'Partition':
+        """
+        Выделение раздела из графа, содержащего зону раздела (граф региона или граф расширенной зоны раздела)
+        :param name: наименование раздела
+        :param tiles: зоны всех разделов региона
+        :param graph: исходный граф
+        :return: раздел
+        """
+        nodes = list(graph.nodes)
+        owners = dict(zip(nodes, assign(tiles, [graph.nodes[node]['x'] for node in nodes],
+                                        [graph.nodes[node]['y'] for node in nodes])))
+        own = [node for node in nodes if owners[node] == name]
+
+        boundary, cut_edges = {}, []
+        for node in own:
+            for neighbour, edges in graph.adj[node].items():
+                if owners[neighbour] != name:
+                    boundary[node] = None
+                    cut_edges.append((node, neighbour, float(min(edge.get('length', 1) for edge in edges.values())),
+                                      float(min(edge.get('travel_time', 1) for edge in edges.values()))))
+
+            if any(owners[neighbour] != name for neighbour in graph.pred[node]):
+                boundary[node] = None
+
+        ends = set(boundary) | {dest for _, dest, _, _ in cut_edges}
+        return cls(name, graph.subgraph(own).copy(), list(boundary), cut_edges,
+                   {node: float(graph.nodes[node]['x']) for node in ends},
+                   {node: float(graph.nodes[node]['y']) for node in ends})
+
+
+def split(graph: nx.MultiDiGraph, tiles: Dict[str, utils.Bbox]) -> Dict[str, Partition]:
+    """
+    Разбиение графа региона на разделы
+    :param graph: граф региона
+    :param tiles: зоны разделов
+    :return: разделы по наименованию
+    """
+    return {name: Partition.from_graph(name, tiles, graph) for name in tiles}
+
+
+class Overlay:
+    """
+    Граф верхнего уровня (multi-level): граничные узлы всех разделов, ребра между разделами и ребра между
+    граничными узлами одного раздела с весом кратчайшего пути внутри раздела (таблицы разделов).
+    Кратчайший путь между узлами разных разделов проходит через граничные узлы, поэтому его вес - минимум
+    суммы расстояния до граничного узла начального раздела, пути по графу верхнего уровня и расстояния
+    от граничного узла конечного раздела
+    """
+    node_ids: np.ndarray
+    partitions: List[str]
+    x: np.ndarray
+    y: np.ndarray
+    matrices: Dict[str, csr_matrix]
+    cut_edges: Dict[Tuple[int, int], Tuple[float, float]]
+
+    def __init__(self, overlays: Sequence[dict]):
+        """
+        Построение графа верхнего уровня по границам разделов
+        :param overlays: границы разделов (см. utils.PartitionOverlay)
+        """
+        boundary = [(overlay['partition'], node, x, y) for overlay in overlays
+                    for node, x, y in zip(overlay['boundary'], overlay['x'], overlay['y'])]
+
+        self.partitions = [partition for partition, _, _, _ in boundary]
+        self.node_ids = np.array([node for _, node, _, _ in boundary], dtype=np.int64)
+        self.x = np.array([x for _, _, x, _ in boundary], dtype=float)
+        self.y = np.array([y for _, _, _, y in boundary], dtype=float)
+        self._positions = {node: position for position, node in enumerate(self.node_ids.tolist())}
+
+        edges, self.cut_edges = self._edges(overlays)
+
+        keys = sorted(edges)
+        rows = np.array([orig for orig, _ in keys], dtype=np.int64)
+        cols = np.array([dest for _, dest in keys], dtype=np.int64)
+        indptr = np.searchsorted(rows, np.arange(len(self.node_ids) + 1))
+
+        self.matrices = {weight: csr_matrix((np.array([edges[key][index] for key in keys], dtype=float), cols, indptr),
+                                            shape=(len(self.node_ids), len(self.node_ids)))
+                         for index, weight in enumerate(WEIGHTS)}
+
+    def _edges(self, overlays: Sequence[dict]) -> Tuple[Dict[Tuple[int, int], List[float]],
+                                                          Dict[Tuple[int, int], Tuple[float, float]]]:
+        """
+        Ребра графа верхнего уровня: ребра между разделами и ребра таблиц разделов
+        :param overlays: границы разделов (см. utils.PartitionOverlay)
+        :return: ([length, travel_time] всех ребер, (length, travel_time) ребер между разделами)
+                 по паре позиций граничных узлов
+        """
+        edges: Dict[Tuple[int, int], List[float]] = {}
+        cut_edges = {}
+
+        for overlay in overlays:
+            for orig, dest, length, travel_time in overlay['cut_edges']:
+                if orig in self._positions and dest in self._positions:
+                    key = (self._positions[orig], self._positions[dest])
+                    values = edges.setdefault(key, [math.inf, math.inf])
+                    values[0], values[1] = min(values[0], length), min(values[1], travel_time)
+                    cut_edges[key] = (values[0], values[1])
+
+            positions = [self._positions[node] for node in overlay['boundary']]
+            for row, orig in enumerate(positions):
+                for col, dest in enumerate(positions):
+                    if row != col and overlay['length'][row][col] is not None:
+                        edges[(orig, dest)] = [overlay['length'][row][col], overlay['travel_time'][row][col]]
+
+        return edges, cut_edges
+
+    @property
+    def nodes_count(self) -> int:
+        """
+        Количество граничных узлов
+        :return: int
+        """
+        return len(self.node_ids)
+
+    def position(self, node: int) -> Optional[int]:
+        """
+        Позиция граничного узла
+        :param node: идентификатор узла
+        :return: позиция или None, если узел не граничный
+        """
+        return self._positions.get(node)
+
+    def route(self, sources: Dict[int, float], targets: Dict[int, float], weight: str) -> Tuple[float, List[int]]:
+        """
+        Кратчайший путь по графу верхнего уровня от любого начального граничного узла до любого конечного
+        с учетом расстояний до начальных и от конечных узлов: один поиск Дейкстры из дополнительного узла,
+        связанного с начальными узлами ребрами с весом расстояния до них
+        :param sources: расстояния до начальных граничных узлов по их позициям
+        :param targets: расстояния от конечных граничных узлов по их позициям
+        :param weight: наименование атрибута веса
+        :return: (вес пути, позиции граничных узлов пути), пустой путь - путь не существует
+        """
+        if not sources or not targets:
+            return math.inf, []
+
+        matrix = self.matrices[weight]
+        count = self.nodes_count
+        starts = np.fromiter(sources, dtype=np.int64, count=len(sources))
+
+        extended = csr_matrix((np.concatenate([matrix.data, np.fromiter(sources.values(), dtype=float)]),
+                               np.concatenate([matrix.indices, starts]),
+                               np.append(matrix.indptr, matrix.indptr[-1] + len(starts))), shape=(count + 1, count + 1))
+        distances, predecessors = dijkstra(extended, directed=True, indices=count, return_predecessors=True)
+
+        ends = np.fromiter(targets, dtype=np.int64, count=len(targets))
+        totals = distances[ends] + np.fromiter(targets.values(), dtype=float)
+        best = int(np.argmin(totals))
+
+        if not np.isfinite(totals[best]):
+            return math.inf, []
+
+        path = [int(ends[best])]
+        while predecessors[path[-1]] != count:
+            path.append(int(predecessors[path[-1]]))
+
+        return float(totals[best]), path[::-1]
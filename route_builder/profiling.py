@@ -0,0 +1,139 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Dict, Iterator, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def collapse(frame: Optional[FrameType]) -> str:
+    """
+    Стек кадра в свернутом виде для flamegraph: вызовы от корня через ';'
+    :param frame: кадр
+    :return: строка вида module:function;module:function
+    """
+    names = []
+
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик медленных запросов: фоновый поток снимает стеки потоков, выполняющих запросы,
+    с интервалом interval и сохраняет свернутые стеки (формат flamegraph.pl / speedscope) запросов
+    длительнее slow_ms в каталог directory. Поток работает, только пока открыто хотя бы одно окно
+    профилирования (см. profile), и не просыпается между запросами
+    """
+    def __init__(self, slow_ms: float, directory: str, interval_ms: float = 5):
+        """
+        Инициализация профилировщика
+        :param slow_ms: минимальная длительность запроса для сохранения стеков в миллисекундах
+        :param directory: каталог файлов стеков
+        :param interval_ms: интервал снятия стеков в миллисекундах
+        """
+        if interval_ms <= 0:
+            raise ValueError('Интервал снятия стеков должен быть положительным')
+
+        self.slow_ms = slow_ms
+        self.directory = Path(directory)
+        self.interval = interval_ms / 1000
+
+        # Снимки стеков по потокам с открытым окном профилирования
+        self._samples: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        # Процесс, в котором работает поток семплирования (None - поток не запущен)
+        self._sampler_pid: Optional[int] = None
+
+    def reset_lock(self) -> None:
+        """
+        Создание блокировки заново в дочернем процессе: при fork она могла быть захвачена потоком семплирования
+        :return: None
+        """
+        self._lock = threading.Lock()
+
+    def _open(self, thread_id: int) -> None:
+        """
+        Открытие окна профилирования потока. Поток семплирования запускается, если он не работает
+        в текущем процессе (в том числе в дочернем процессе после fork, куда потоки не наследуются)
+        :param thread_id: идентификатор потока запроса
+        :return: None
+        """
+        with self._lock:
+            if self._sampler_pid != os.getpid():
+                self._sampler_pid = os.getpid()
+                self._samples = {}
+                threading.Thread(target=self._run, name='route-builder-profiler', daemon=True).start()
+
+            self._samples[thread_id] = Counter()
+
+    def _run(self) -> None:
+        """
+        Снятие стеков потоков, выполняющих запросы. Поток завершается, когда не остается открытых окон
+        :return: None
+        """
+        while True:
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()  # pylint: disable=protected-access
+
+            with self._lock:
+                if not self._samples:
+                    self._sampler_pid = None
+                    return
+
+                for thread_id, samples in self._samples.items():
+                    if thread_id in frames:
+                        samples[collapse(frames[thread_id])] += 1
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """
+        Профилирование запроса, выполняемого в текущем потоке
+        :param name: наименование запроса (часть имени файла стеков)
+        :return: None
+        """
+        thread_id = threading.get_ident()
+        started_at = time.perf_counter()
+
+        self._open(thread_id)
+
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+            with self._lock:
+                samples = self._samples.pop(thread_id)
+
+            if elapsed_ms >= self.slow_ms and samples:
+                self.dump(name, elapsed_ms, samples)
+
+    def dump(self, name: str, elapsed_ms: float, samples: Counter) -> Path:
+        """
+        Сохранение свернутых стеков запроса
+        :param name: наименование запроса
+        :param elapsed_ms: длительность запроса в миллисекундах
+        :param samples: количество снимков по свернутым стекам
+        :return: путь к файлу
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{time.strftime("%Y%m%dT%H%M%S")}_{name}_{os.getpid()}_{threading.get_ident()}.folded'
+
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+        logger.info("============== SLOW %s (%.0f ms) PROFILED TO %s ==============", name, elapsed_ms, path)
+
+        return path
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import logging
+
+import settings
+from route_builder import builders, utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = 'default'
+
+
+@dataclass
+class GraphEntry:
+    """ Загруженный граф реестра """
+    graph: builders.Graph
+    load_seconds: float
+    memory_bytes: int
+    hits: int = 0
+
+
+class GraphRegistry:
+    """
+    Реестр графов процесса по ключу (регион, тип связей). Графы загружаются при первом запросе
+    из снимка или OSM с алгоритмом поиска settings.ROUTING_ENGINE; при превышении бюджета памяти
+    вытесняются давно не использованные графы.
+    Пул процессов исполнителя (EXECUTOR_MODE=process) наследует графы, загруженные до fork (см. preload);
+    графы, которые процессы пула загружают сами, занимают память каждого процесса, учитываются
+    бюджетом каждого процесса отдельно и не попадают в stats родительского процесса
+    """
+    regions: Dict[str, utils.Bbox]
+    memory_budget: Optional[int]
+
+    def __init__(self, regions: Dict[str, utils.Bbox], memory_budget: Optional[int] = None,
+                 default_network_type: Optional[str] = None):
+        """
+        Инициализация реестра
+        :param regions: зоны графов по наименованию региона
+        :param memory_budget: бюджет памяти графов в байтах (None или 0 - без ограничения)
+        :param default_network_type: тип связей для запросов без network_type
+        """
+        if not regions:
+            raise ValueError('Необходим хотя бы один регион')
+
+        self.regions = regions
+        self.memory_budget = memory_budget or None
+        self.default_network_type = default_network_type
+
+        self._entries: OrderedDict[Tuple[str, str], GraphEntry] = OrderedDict()
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls) -> 'GraphRegistry':
+        """
+        Реестр по настройкам: settings.REGIONS и регион default из settings.BBOX
+        :return: GraphRegistry
+        """
+        regions = {name: utils.Bbox(*bbox) for name, bbox in settings.REGIONS.items()}
+
+        if settings.BBOX.north is not None:
+            regions.setdefault(DEFAULT_REGION, settings.BBOX)
+
+        return cls(regions, settings.GRAPH_MEMORY_BUDGET * 1024 * 1024, default_network_type=settings.NETWORK_TYPE)
+
+    def key(self, region: Optional[str] = None, network_type: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Ключ графа
+        :param region: наименование региона (по умолчанию default или единственный регион)
+        :param network_type: тип связей графа
+        :return: (регион, тип связей)
+        """
+        if region is None:
+            region = DEFAULT_REGION if DEFAULT_REGION in self.regions or len(self.regions) > 1 \
+                else next(iter(self.regions))
+
+        if region not in self.regions:
+            raise ValueError(f'Значения region: {", ".join(self.regions)}')
+
+        network_type = network_type or self.default_network_type or builders.Graph.network_type
+        if network_type not in builders.NETWORK_TYPES:
+            raise ValueError(f'Значения network_type: {", ".join(builders.NETWORK_TYPES)}')
+
+        return region, network_type
+
+    def get(self, region: Optional[str] = None, network_type: Optional[str] = None) -> builders.Graph:
+        """
+        Получение графа с загрузкой при первом обращении. Одновременные запросы одного графа
+        ожидают одну загрузку, запросы загруженных графов не блокируются
+        :param region: наименование региона
+        :param network_type: тип связей графа
+        :return: граф
+        """
+        key = self.key(region, network_type)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                return entry.graph
+
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.hits += 1
+                    return entry.graph
+
+            entry = self._load(*key)
+
+            with self._lock:
+                self._entries[key] = entry
+                self._loading.pop(key, None)
+                self._evict(key)
+
+        return entry.graph
+
+    def preload(self, network_type: Optional[str] = None) -> None:
+        """
+        Загрузка графов всех регионов (в пределах бюджета памяти), например, до запуска пула процессов
+        :param network_type: тип связей графов (по умолчанию тип связей запросов без network_type)
+        :return: None
+        """
+        for region in self.regions:
+            self.get(region, network_type)
+
+    def _load(self, region: str, network_type: str) -> GraphEntry:
+        """
+        Загрузка графа из снимка (разделяемого снимка) или OSM с замером времени. Память графа -
+        объем массивов индексов и оценка MultiDiGraph (Graph.nbytes): прирост RSS процесса
+        искажают одновременные загрузки и освобожденная при вытеснении память
+        :param region: наименование региона
+        :param network_type: тип связей графа
+        :return: запись реестра
+        """
+        started_at = time.perf_counter()
+
+        graph = builders.Graph(self.regions[region], network_type)
+        if settings.SHARED_GRAPH_DIR:
+            graph.load_shared()
+        else:
+            graph.load_or_build()
+
+        entry = GraphEntry(graph, time.perf_counter() - started_at, graph.nbytes, hits=1)
+        logger.info("============== GRAPH %s %s LOADED IN %.2f S, %s BYTES ==============",
+                    region, network_type, entry.load_seconds, entry.memory_bytes)
+
+        return entry
+
+    def _evict(self, keep: Tuple[str, str]) -> None:
+        """
+        Вытеснение давно не использованных графов до соблюдения бюджета памяти
+        :param keep: ключ графа, который не вытесняется (только что загруженный)
+        :return: None
+        """
+        if not self.memory_budget:
+            return
+
+        for key in list(self._entries):
+            if self.memory_bytes <= self.memory_budget:
+                break
+
+            if key == keep:
+                continue
+
+            entry = self._entries.pop(key)
+            # Граф может использоваться начатыми запросами: пул участков завершает отправленные участки
+            entry.graph.shutdown_leg_pool(wait=False)
+            self.evictions += 1
+
+            logger.info("============== GRAPH %s %s EVICTED ==============", *key)
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        Память загруженных графов
+        :return: количество байт
+        """
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def reset_locks(self) -> None:
+        """
+        Создание блокировок реестра и загруженных графов заново в дочернем процессе после fork
+        :return: None
+        """
+        self._lock = threading.Lock()
+        self._loading = {}
+
+        for entry in self._entries.values():
+            entry.graph.reset_locks()
+
+    def restart_leg_pool(self) -> None:
+        """
+        Перезапуск пулов участков маршрута графов, веса которых изменились (см. Graph.restart_leg_pool)
+        :return: None
+        """
+        with self._lock:
+            graphs = [entry.graph for entry in self._entries.values()]
+
+        for graph in graphs:
+            graph.restart_leg_pool()
+
+    def shutdown_leg_pool(self) -> None:
+        """
+        Остановка пулов процессов участков маршрута всех загруженных графов
+        :return: None
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                entry.graph.shutdown_leg_pool()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> List[dict]:
+        """
+        Метрики загруженных графов
+        :return: [{'region', 'network_type', 'load_seconds', 'memory_bytes', 'hits'}, ...]
+        """
+        with self._lock:
+            return [{'region': region, 'network_type': network_type, 'load_seconds': entry.load_seconds,
+                     'memory_bytes': entry.memory_bytes, 'hits': entry.hits}
+                    for (region, network_type), entry in self._entries.items()]
@@ -0,0 +1,303 @@
+from dataclasses import dataclass
+from heapq import heappush, heappop
+from typing import TYPE_CHECKING, Dict, Iterator, List, Literal, Optional, Tuple, get_args
+
+from route_builder import deadlines
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import Potential
+
+if TYPE_CHECKING:
+    from route_builder.indexes import GraphIndexes
+
+EnginesType = Literal['networkx', 'dijkstra', 'bidirectional', 'astar', 'alt', 'ch']
+ENGINES = get_args(EnginesType)
+
+# Списки смежности для поиска на Python: (indptr, indices, weights), см. CSRGraph.adjacency
+Adjacency = Tuple[memoryview, memoryview, memoryview]
+
+
+@dataclass
+class SearchResult:
+    """ Результат поиска кратчайшего пути """
+    distance: float
+    path: List[int]
+    settled: int
+
+
+def _unpack_path(predecessors: dict, node: int) -> List[int]:
+    """
+    Восстановление пути по дереву предшественников
+    :param predecessors: предшественники узлов (у корня -1)
+    :param node: конечный узел
+    :return: путь от корня до узла
+    """
+    path = []
+
+    while node != -1:
+        path.append(node)
+        node = predecessors[node]
+
+    path.reverse()
+    return path
+
+
+def dijkstra(graph: CSRGraph, source: int, target: int, weight: str) -> Optional[SearchResult]:
+    """
+    Алгоритм Дейкстры на бинарной куче с остановкой при извлечении целевого узла
+    :param graph: CSR-граф
+    :param source: позиция начального узла
+    :param target: позиция конечного узла
+    :param weight: наименование атрибута веса
+    :return: результат поиска или None, если путь не существует
+    """
+    return _dijkstra(graph.adjacency(weight), source, target)
+
+
+def _dijkstra(adjacency: Adjacency, source: int, target: int) -> Optional[SearchResult]:
+    """
+    Цикл алгоритма Дейкстры по спискам смежности
+    :param adjacency: списки смежности по весу поиска
+    :param source: позиция начального узла
+    :param target: позиция конечного узла
+    :return: результат поиска или None, если путь не существует
+    """
+    indptr, indices, weights = adjacency
+
+    settled = set()
+    distances = {source: 0.0}
+    predecessors = {source: -1}
+    heap = [(0.0, source)]
+
+    while heap:
+        distance, node = heappop(heap)
+
+        if node in settled:
+            continue
+
+        settled.add(node)
+
+        if node == target:
+            return SearchResult(distance, _unpack_path(predecessors, target), len(settled))
+
+        if not len(settled) % deadlines.CHECK_INTERVAL:
+            deadlines.check()
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[edge]
+            neighbour_distance = distance + weights[edge]
+
+            if neighbour_distance < distances.get(neighbour, float('inf')):
+                distances[neighbour] = neighbour_distance
+                predecessors[neighbour] = node
+                heappush(heap, (neighbour_distance, neighbour))
+
+    return None
+
+
+class _Frontier:
+    """ Одно направление двунаправленного поиска: куча, расстояния и предшественники узлов """
+    def __init__(self, adjacency: Adjacency, root: int):
+        """
+        Инициализация направления
+        :param adjacency: списки смежности направления
+        :param root: позиция узла, от которого ведется поиск
+        """
+        self.adjacency = adjacency
+        self.settled = set()
+        self.distances = {root: 0.0}
+        self.predecessors = {root: -1}
+        self.heap = [(0.0, root)]
+
+    def expand(self, other: '_Frontier', best: Tuple[float, Optional[int]]) -> Tuple[float, Optional[int]]:
+        """
+        Извлечение узла из кучи и релаксация его ребер
+        :param other: встречное направление
+        :param best: (найденное расстояние, узел встречи)
+        :return: (найденное расстояние, узел встречи) с учетом узлов, достигнутых обоими направлениями
+        """
+        distance, node = heappop(self.heap)
+
+        if node in self.settled:
+            return best
+
+        self.settled.add(node)
+
+        if not len(self.settled) % deadlines.CHECK_INTERVAL:
+            deadlines.check()
+
+        indptr, indices, weights = self.adjacency
+        distances = self.distances
+        best_distance, meeting_node = best
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[edge]
+            neighbour_distance = distance + weights[edge]
+
+            if neighbour_distance < distances.get(neighbour, float('inf')):
+                distances[neighbour] = neighbour_distance
+                self.predecessors[neighbour] = node
+                heappush(self.heap, (neighbour_distance, neighbour))
+
+                if neighbour in other.distances and neighbour_distance + other.distances[neighbour] < best_distance:
+                    best_distance = neighbour_distance + other.distances[neighbour]
+                    meeting_node = neighbour
+
+        return best_distance, meeting_node
+
+    def path(self, node: int) -> List[int]:
+        """
+        Путь от узла, с которого начат поиск направления, до узла
+        :param node: позиция узла
+        :return: позиции узлов пути
+        """
+        return _unpack_path(self.predecessors, node)
+
+
+def bidirectional_dijkstra(graph: CSRGraph, source: int, target: int, weight: str) -> Optional[SearchResult]:
+    """
+    Двунаправленный алгоритм Дейкстры: прямой поиск по исходящим ребрам, обратный - по входящим.
+    Поиск останавливается, когда сумма минимумов куч не меньше найденного расстояния
+    :param graph: CSR-граф
+    :param source: позиция начального узла
+    :param target: позиция конечного узла
+    :param weight: наименование атрибута веса
+    :return: результат поиска или None, если путь не существует
+    """
+    if source == target:
+        return SearchResult(0.0, [source], 1)
+
+    forward = _Frontier(graph.adjacency(weight), source)
+    backward = _Frontier(graph.reversed().adjacency(weight), target)
+    best = (float('inf'), None)
+
+    while forward.heap and backward.heap:
+        if forward.heap[0][0] + backward.heap[0][0] >= best[0]:
+            break
+
+        # Расширяется направление с меньшей кучей
+        if len(forward.heap) <= len(backward.heap):
+            best = forward.expand(backward, best)
+        else:
+            best = backward.expand(forward, best)
+
+    best_distance, meeting_node = best
+    if meeting_node is None:
+        return None
+
+    path = forward.path(meeting_node)
+    path.extend(reversed(backward.path(meeting_node)[:-1]))
+
+    return SearchResult(best_distance, path, len(forward.settled) + len(backward.settled))
+
+
+def astar(graph: CSRGraph, source: int, target: int, weight: str, potential: Potential) -> Optional[SearchResult]:
+    """
+    Алгоритм A*. Узел открывается повторно, если до него найден более короткий путь,
+    поэтому результат оптимален при любой допустимой (не завышающей) оценке
+    :param graph: CSR-граф
+    :param source: позиция начального узла
+    :param target: позиция конечного узла
+    :param weight: наименование атрибута веса
+    :param potential: нижняя оценка расстояния от узла до цели
+    :return: результат поиска или None, если путь не существует
+    """
+    predecessors = {source: -1}
+
+    for settled, (node, distance) in enumerate(_astar(graph.adjacency(weight), source, potential, predecessors), 1):
+        if node == target:
+            return SearchResult(distance, _unpack_path(predecessors, target), settled)
+
+        if not settled % deadlines.CHECK_INTERVAL:
+            deadlines.check()
+
+    return None
+
+
+def _astar(adjacency: Adjacency, source: int, potential: Potential,
+           predecessors: Dict[int, int]) -> Iterator[Tuple[int, float]]:
+    """
+    Цикл алгоритма A* по спискам смежности: узлы в порядке закрытия. Элемент кучи устаревает,
+    если до узла найден более короткий путь; узел извлекается из кучи с новым расстоянием и открывается повторно
+    :param adjacency: списки смежности по весу поиска
+    :param source: позиция начального узла
+    :param potential: нижняя оценка расстояния от узла до цели
+    :param predecessors: предшественники узлов, заполняются по ходу поиска
+    :return: (позиция узла, расстояние до него)
+    """
+    indptr, indices, weights = adjacency
+
+    distances = {source: 0.0}
+    estimates = {source: potential(source)}
+    heap = [(estimates[source], 0.0, source)]
+
+    while heap:
+        _, distance, node = heappop(heap)
+
+        if distance > distances[node]:
+            continue
+
+        yield node, distance
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbour = indices[edge]
+            neighbour_distance = distance + weights[edge]
+
+            if neighbour_distance < distances.get(neighbour, float('inf')):
+                distances[neighbour] = neighbour_distance
+                predecessors[neighbour] = node
+
+                if neighbour not in estimates:
+                    estimates[neighbour] = potential(neighbour)
+
+                heappush(heap, (neighbour_distance + estimates[neighbour], neighbour_distance, neighbour))
+
+
+SEARCHES = {
+    'dijkstra': dijkstra,
+    'bidirectional': bidirectional_dijkstra,
+}
+
+
+def search(indexes: 'GraphIndexes', source: int, target: int, weight: str,
+           engine: EnginesType) -> Optional[SearchResult]:
+    """
+    Поиск кратчайшего пути между позициями узлов выбранным алгоритмом
+    :param indexes: CSR-граф и индексы алгоритма: нижняя оценка для astar (HaversineHeuristic) и alt (Landmarks),
+                    иерархии сжатия по весам для ch
+    :param source: позиция начального узла
+    :param target: позиция конечного узла
+    :param weight: наименование атрибута веса
+    :param engine: алгоритм поиска
+    :return: результат поиска или None, если путь не существует
+    """
+    if engine == 'ch':
+        if not indexes.hierarchies or weight not in indexes.hierarchies:
+            raise ValueError(f'Для алгоритма ch необходима иерархия сжатия по весу {weight}')
+
+        return indexes.hierarchies[weight].search(source, target)
+
+    if engine in ('astar', 'alt'):
+        if indexes.heuristic is None:
+            raise ValueError(f'Для алгоритма {engine} необходима нижняя оценка расстояния')
+
+        return astar(indexes.csr, source, target, weight, indexes.heuristic.potential(source, target, weight))
+
+    return SEARCHES[engine](indexes.csr, source, target, weight)
+
+
+def shortest_path(indexes: 'GraphIndexes', orig: int, dest: int, weight: str,
+                  engine: EnginesType) -> Optional[List[int]]:
+    """
+    Кратчайший путь между узлами графа
+    :param indexes: CSR-граф и индексы алгоритма (см. search)
+    :param orig: идентификатор начального узла
+    :param dest: идентификатор конечного узла
+    :param weight: наименование атрибута веса
+    :param engine: алгоритм поиска
+    :return: список идентификаторов узлов пути или None, если путь не существует
+    """
+    deadlines.check()
+
+    source, target = indexes.csr.positions([orig, dest])
+    result = search(indexes, source, target, weight, engine)
+    return indexes.csr.to_node_ids(result.path) if result else None
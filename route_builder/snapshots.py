@@ -0,0 +1,231 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Optional
+
+import logging
+
+import numpy as np
+import networkx as nx
+
+from route_builder import utils
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import Landmarks
+from route_builder.hierarchies import ContractionHierarchy
+from route_builder.spatial import NodeIndex
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 4
+
+GRAPH_FILE = 'graph.pickle'
+META_FILE = 'meta.json'
+
+
+def snapshot_path(directory: str, bbox: utils.Bbox, network_type: str) -> Path:
+    """
+    Путь к снимку графа
+    :param directory: каталог снимков
+    :param bbox: зона графа
+    :param network_type: тип связей графа
+    :return: путь к каталогу снимка
+    """
+    bbox_key = '_'.join(f'{value:.6f}' for value in asdict(bbox).values())
+    return Path(directory) / f'{network_type}_{bbox_key}_v{SNAPSHOT_VERSION}'
+
+
+def _save_arrays(directory: Path, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Сохранение массивов в формате .npy
+    :param directory: каталог
+    :param arrays: массивы по наименованию
+    :return: None
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for name, array in arrays.items():
+        np.save(directory / f'{name}.npy', np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _load_arrays(directory: Path, mmap: bool) -> Dict[str, np.ndarray]:
+    """
+    Загрузка массивов из каталога
+    :param directory: каталог
+    :param mmap: отображать файлы в память без чтения
+    :return: массивы по наименованию
+    """
+    return {path.stem: np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+            for path in sorted(directory.glob('*.npy'))}
+
+
+def _prefixed(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    """
+    Выбор массивов по префиксу наименования
+    :param arrays: массивы по наименованию
+    :param prefix: префикс
+    :return: массивы по наименованию без префикса
+    """
+    return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+
+def _attributes(weights: Dict[str, np.ndarray], arrays: Dict[str, np.ndarray]) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Группировка весов и массивов атрибутов ребер вида {вес}__{атрибут} по весу
+    :param weights: веса по наименованию атрибута
+    :param arrays: массивы атрибутов по наименованию
+    :return: {вес: {атрибут: значения}}
+    """
+    attributes = {weight: {weight: values} for weight, values in weights.items()}
+
+    for name, array in arrays.items():
+        weight, attribute = name.split('__', 1)
+        attributes.setdefault(weight, {})[attribute] = array
+
+    return attributes
+
+
+class Snapshot:
+    """ Версионированный снимок графа и производных индексов """
+    graph: Optional[nx.MultiDiGraph] = None
+    node_index: Optional[NodeIndex] = None
+    csr: Optional[CSRGraph] = None
+    landmarks: Optional[Landmarks] = None
+    hierarchies: Optional[Dict[str, ContractionHierarchy]] = None
+
+    def __init__(self, path: Path, **indexes):
+        """
+        Инициализация снимка
+        :param path: путь к каталогу снимка
+        :param indexes: граф и индексы (graph, node_index, csr, landmarks, hierarchies)
+        """
+        self.path = Path(path)
+
+        for name, value in indexes.items():
+            setattr(self, name, value)
+
+    def save(self, bbox: utils.Bbox, network_type: str) -> None:
+        """
+        Сохранение снимка. Запись выполняется во временный каталог, который затем атомарно переименовывается
+        :param bbox: зона графа
+        :param network_type: тип связей графа
+        :return: None
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = Path(tempfile.mkdtemp(prefix=f'.{self.path.name}.', dir=self.path.parent))
+
+        try:
+            if self.graph is not None:
+                with open(temporary / GRAPH_FILE, 'wb') as file:
+                    pickle.dump(self.graph, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            if self.node_index is not None:
+                _save_arrays(temporary / 'nodes', {
+                    'node_ids': self.node_index.node_ids, 'x': self.node_index.x, 'y': self.node_index.y,
+                    **{f'tree_{name}': array for name, array in self.node_index.tree_arrays().items()},
+                })
+
+            if self.csr is not None:
+                reversed_csr = self.csr.reversed()
+                sorted_ids, sorted_positions = self.csr.sorted_nodes
+                sorted_keys, sorted_edges = self.csr.sorted_edges
+                _save_arrays(temporary / 'csr', {
+                    'node_ids': self.csr.node_ids, 'x': self.csr.x, 'y': self.csr.y,
+                    'indptr': self.csr.indptr, 'indices': self.csr.indices,
+                    **{f'weight_{name}': values for name, values in self.csr.weights.items()},
+                    'reversed_indptr': reversed_csr.indptr, 'reversed_indices': reversed_csr.indices,
+                    **{f'reversed_weight_{name}': values for name, values in reversed_csr.weights.items()},
+                    'sorted_ids': sorted_ids, 'sorted_positions': sorted_positions,
+                    'sorted_keys': sorted_keys, 'sorted_edges': sorted_edges,
+                    **{f'attribute_{weight}__{name}': values for weight, attributes in self.csr.attributes.items()
+                       for name, values in attributes.items() if name != weight},
+                })
+
+            if self.landmarks is not None:
+                _save_arrays(temporary / 'landmarks', {
+                    'positions': self.landmarks.positions,
+                    **{f'forward_{weight}': table for weight, table in self.landmarks.forward.items()},
+                    **{f'backward_{weight}': table for weight, table in self.landmarks.backward.items()},
+                })
+
+            for weight, hierarchy in (self.hierarchies or {}).items():
+                _save_arrays(temporary / 'hierarchies' / weight,
+                             {name: getattr(hierarchy, name) for name in ContractionHierarchy.ARRAYS})
+
+            with open(temporary / META_FILE, 'w', encoding='utf-8') as file:
+                json.dump({'version': SNAPSHOT_VERSION, 'bbox': asdict(bbox), 'network_type': network_type}, file)
+
+            if self.path.exists():
+                shutil.rmtree(self.path)
+
+            os.replace(temporary, self.path)
+
+        except Exception:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True, with_graph: bool = True) -> Optional['Snapshot']:
+        """
+        Загрузка снимка
+        :param path: путь к каталогу снимка
+        :param mmap: отображать массивы в память без чтения
+        :param with_graph: загружать MultiDiGraph (иначе его можно загрузить позже через load_graph)
+        :return: снимок или None, если снимок отсутствует или имеет другую версию
+        """
+        path = Path(path)
+
+        try:
+            with open(path / META_FILE, encoding='utf-8') as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            return None
+
+        if meta.get('version') != SNAPSHOT_VERSION:
+            logger.warning('Snapshot %s has version %s, expected %s', path, meta.get('version'), SNAPSHOT_VERSION)
+            return None
+
+        snapshot = cls(path)
+
+        if with_graph:
+            snapshot.graph = snapshot.load_graph()
+
+        if (path / 'nodes').is_dir():
+            nodes = _load_arrays(path / 'nodes', mmap)
+            snapshot.node_index = NodeIndex(nodes['node_ids'], nodes['x'], nodes['y'],
+                                            _prefixed(nodes, 'tree_') or None)
+
+        if (path / 'csr').is_dir():
+            arrays = _load_arrays(path / 'csr', mmap)
+            reversed_csr = CSRGraph(arrays['node_ids'], arrays['x'], arrays['y'], arrays['reversed_indptr'],
+                                    arrays['reversed_indices'], _attributes(_prefixed(arrays, 'reversed_weight_'), {}))
+            snapshot.csr = CSRGraph(arrays['node_ids'], arrays['x'], arrays['y'], arrays['indptr'], arrays['indices'],
+                                    _attributes(_prefixed(arrays, 'weight_'), _prefixed(arrays, 'attribute_')),
+                                    {'reversed': reversed_csr,
+                                     'sorted_nodes': (arrays['sorted_ids'], arrays['sorted_positions']),
+                                     'sorted_edges': (arrays['sorted_keys'], arrays['sorted_edges'])})
+
+        if (path / 'landmarks').is_dir():
+            arrays = _load_arrays(path / 'landmarks', mmap)
+            snapshot.landmarks = Landmarks(arrays['positions'], _prefixed(arrays, 'forward_'),
+                                           _prefixed(arrays, 'backward_'))
+
+        if (path / 'hierarchies').is_dir():
+            snapshot.hierarchies = {directory.name: ContractionHierarchy(**_load_arrays(directory, mmap))
+                                    for directory in sorted((path / 'hierarchies').iterdir()) if directory.is_dir()}
+
+        return snapshot
+
+    def load_graph(self) -> Optional[nx.MultiDiGraph]:
+        """
+        Загрузка MultiDiGraph из снимка
+        :return: граф или None, если граф не сохранялся
+        """
+        try:
+            with open(self.path / GRAPH_FILE, 'rb') as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,131 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import networkx as nx
+
+from route_builder.heuristics import EARTH_RADIUS_M
+
+if TYPE_CHECKING:
+    from sklearn.neighbors import BallTree
+
+# Массивы состояния BallTree (BallTree.__getstate__), сохраняемые в снимке графа
+TREE_ARRAYS = ('data', 'idx_array', 'node_data', 'node_bounds')
+# Количество целочисленных параметров состояния BallTree после массивов
+TREE_PARAMS_COUNT = 7
+
+
+class NodeIndex:
+    """ Пространственный индекс узлов графа для привязки координат """
+    node_ids: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+
+    _tree: 'BallTree'
+
+    def __init__(self, node_ids: np.ndarray, x: np.ndarray, y: np.ndarray,
+                 tree: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Инициализация индекса. Порядок узлов должен совпадать с порядком узлов графа,
+        чтобы результат привязки совпадал с ox.nearest_nodes
+        :param node_ids: идентификаторы узлов
+        :param x: долготы узлов
+        :param y: широты узлов
+        :param tree: массивы BallTree из снимка (см. tree_arrays): дерево не строится заново, а использует
+            массивы, в том числе отображенные в память; без массивов или при другой версии scikit-learn
+            дерево строится по координатам
+        """
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+
+        # scikit-learn загружается вместе с индексом, а не при импорте модуля
+        from sklearn import __version__ as sklearn_version  # pylint: disable=import-outside-toplevel
+        from sklearn.metrics import DistanceMetric  # pylint: disable=import-outside-toplevel
+        from sklearn.neighbors import BallTree  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        if tree is not None and str(tree['version'][0]) == sklearn_version:
+            # Состояние в формате BallTree.__getstate__ (как при распаковке pickle), массивы не копируются
+            self._tree = BallTree.__new__(BallTree)
+            self._tree.__setstate__((*(tree[name] for name in TREE_ARRAYS), *tree['params'].tolist(),
+                                     DistanceMetric.get_metric('haversine'), None))
+        else:
+            # haversine требует координаты (широта, долгота) в радианах
+            self._tree = BallTree(np.deg2rad(np.column_stack((y, x))), metric='haversine')
+
+    @classmethod
+    def from_graph(cls, graph: nx.MultiDiGraph) -> 'NodeIndex':
+        """
+        Построение индекса по графу
+        :param graph: непроецированный граф
+        :return: индекс узлов
+        """
+        if not graph.number_of_nodes():
+            raise ValueError('Граф не содержит узлов')
+
+        x, y = (np.fromiter((np.nan if data.get(name) is None else data[name] for _, data in graph.nodes(data=True)),
+                            dtype=float, count=graph.number_of_nodes()) for name in ('x', 'y'))
+
+        if np.isnan(x).any() or np.isnan(y).any():
+            raise ValueError('Узлы графа должны содержать координаты x и y')
+
+        return cls(np.array(list(graph.nodes)), x, y)
+
+    def tree_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Массивы BallTree для сохранения в снимке графа
+        :return: массивы TREE_ARRAYS, параметры params и версия scikit-learn version
+        """
+        from sklearn import __version__ as sklearn_version  # pylint: disable=import-outside-toplevel
+
+        state = self._tree.__getstate__()
+        return {**dict(zip(TREE_ARRAYS, state)),
+                'params': np.asarray(state[len(TREE_ARRAYS):len(TREE_ARRAYS) + TREE_PARAMS_COUNT], dtype=np.int64),
+                'version': np.asarray([sklearn_version])}
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый массивами индекса (в том числе массивами BallTree)
+        :return: количество байт
+        """
+        return sum(array.nbytes for array in (self.node_ids, self.x, self.y, *self._tree.get_arrays()))
+
+    def nearest_positions(self, x: Sequence[float], y: Sequence[float]) -> np.ndarray:
+        """
+        Поиск позиций ближайших узлов
+        :param x: долготы точек
+        :param y: широты точек
+        :return: позиции узлов в порядке индекса
+        """
+        points = np.deg2rad(np.column_stack((np.asarray(y, dtype=float), np.asarray(x, dtype=float))))
+        return self._tree.query(points, k=1, return_distance=False)[:, 0]
+
+    def candidates(self, x: Sequence[float], y: Sequence[float], count: int,
+                   radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Поиск нескольких ближайших узлов в радиусе. Ближайший узел остается кандидатом при любом расстоянии,
+        чтобы у каждой точки был хотя бы один кандидат
+        :param x: долготы точек
+        :param y: широты точек
+        :param count: максимальное количество узлов на точку
+        :param radius: радиус поиска, м
+        :return: (позиции узлов в порядке индекса формы (точки, count), -1 - нет узла; расстояния, м)
+        """
+        points = np.deg2rad(np.column_stack((np.asarray(y, dtype=float), np.asarray(x, dtype=float))))
+        distances, positions = self._tree.query(points, k=min(count, len(self.node_ids)))
+        distances *= EARTH_RADIUS_M
+
+        outside = distances > radius
+        outside[:, 0] = False
+        positions[outside] = -1
+
+        return positions, distances
+
+    def nearest_nodes(self, x: Sequence[float], y: Sequence[float]) -> List[int]:
+        """
+        Поиск ближайших узлов (аналог ox.nearest_nodes для непроецированного графа)
+        :param x: долготы точек
+        :param y: широты точек
+        :return: список идентификаторов узлов
+        """
+        return self.node_ids[self.nearest_positions(x, y)].tolist()
@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+import settings
+from route_builder.csr import CSRGraph
+
+# Максимальное количество начальных узлов части поиска деревьев кратчайших путей
+TREE_CHUNK_SIZE = 64
+
+
+def weight_matrix(graph: CSRGraph, weight: str) -> csr_matrix:
+    """
+    Разреженная матрица весов графа
+    :param graph: CSR-граф
+    :param weight: наименование атрибута веса
+    :return: csr_matrix
+    """
+    return csr_matrix((graph.weights[weight], graph.indices, graph.indptr), shape=(graph.nodes_count, graph.nodes_count))
+
+
+def _search_chunks(matrix: csr_matrix, sources: Sequence[int],
+                   reduce: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, ...]], workers: Optional[int] = None,
+                   limit: float = np.inf) -> Tuple[np.ndarray, ...]:
+    """
+    Деревья кратчайших путей из начальных узлов: по одному поиску Дейкстры на узел.
+    Поиски разбиваются на части не более TREE_CHUNK_SIZE узлов и выполняются параллельно (scipy выполняет поиск
+    без GIL); деревья части сводятся функцией reduce до объединения, поэтому массивы формы (начальные узлы,
+    узлы графа) одновременно существуют только для выполняемых частей
+    :param matrix: матрица весов графа (см. weight_matrix)
+    :param sources: позиции начальных узлов
+    :param reduce: функция (расстояния, предшественники) части -> массивы строк части
+    :param workers: количество потоков (по умолчанию количество CPU)
+    :param limit: максимальное расстояние: поиск не продолжается за его пределы
+    :return: массивы reduce, объединенные по строкам
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sources)))
+    chunks = np.array_split(sources, max(workers, -(-len(sources) // TREE_CHUNK_SIZE)))
+
+    def _search(chunk: np.ndarray) -> Tuple[np.ndarray, ...]:
+        distances, predecessors = dijkstra(matrix, directed=True, indices=chunk, return_predecessors=True,
+                                           limit=limit)
+        return reduce(np.atleast_2d(distances), np.atleast_2d(predecessors))
+
+    if len(chunks) == 1:
+        return _search(chunks[0])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_search, chunks))
+
+    return tuple(np.vstack(arrays) for arrays in zip(*results))
+
+
+def shortest_path_trees(graph: CSRGraph, sources: Sequence[int], weight: str, workers: Optional[int] = None,
+                        limit: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Деревья кратчайших путей из начальных узлов целиком (для немногих начальных узлов)
+    :param graph: CSR-граф
+    :param sources: позиции начальных узлов
+    :param weight: наименование атрибута веса
+    :param workers: количество потоков (по умолчанию количество CPU)
+    :param limit: максимальное расстояние: поиск не продолжается за его пределы
+    :return: (расстояния, предшественники) формы (начальные узлы, узлы графа); -9999 - нет предшественника
+    """
+    return _search_chunks(weight_matrix(graph, weight), sources,
+                          lambda distances, predecessors: (distances, predecessors), workers, limit)
+
+
+def target_distances(graph: CSRGraph, sources: Sequence[int], targets: Sequence[int], weight: str,
+                     workers: Optional[int] = None) -> np.ndarray:
+    """
+    Кратчайшие расстояния от начальных узлов до конечных узлов
+    :param graph: CSR-граф
+    :param sources: позиции начальных узлов
+    :param targets: позиции конечных узлов
+    :param weight: наименование атрибута веса
+    :param workers: количество потоков (по умолчанию количество CPU)
+    :return: расстояния формы (начальные узлы, конечные узлы), inf - путь не существует
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+    return _search_chunks(weight_matrix(graph, weight), sources, lambda distances, _: (distances[:, targets],),
+                          workers)[0]
+
+
+def tree_sums(graph: CSRGraph, predecessors: np.ndarray, targets: Sequence[int], weight: str,
+              attribute: str) -> np.ndarray:
+    """
+    Суммы атрибута по путям деревьев кратчайших путей до конечных узлов.
+    Подъем к корню выполняется одновременно для всех пар (начальный узел, конечный узел)
+    :param graph: CSR-граф
+    :param predecessors: предшественники узлов формы (начальные узлы, узлы графа)
+    :param targets: позиции конечных узлов
+    :param weight: наименование атрибута веса, по которому построены деревья
+    :param attribute: наименование атрибута, который суммируется
+    :return: суммы формы (начальные узлы, конечные узлы)
+    """
+    values = graph.edge_attributes(weight)[attribute]
+    rows = np.repeat(np.arange(predecessors.shape[0]), len(targets))
+    current = np.tile(np.asarray(targets, dtype=np.int64), predecessors.shape[0])
+    sums = np.zeros(len(current), dtype=np.float64)
+
+    active = np.flatnonzero(predecessors[rows, current] >= 0)
+    while active.size:
+        previous = predecessors[rows[active], current[active]]
+        sums[active] += values[graph.edge_positions(previous, current[active])]
+        current[active] = previous
+
+        active = active[predecessors[rows[active], current[active]] >= 0]
+
+    return sums.reshape(predecessors.shape[0], len(targets))
+
+
+def distance_matrix(graph: CSRGraph, sources: Sequence[int], targets: Sequence[int], optimizer: str,
+                    attributes: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Матрицы сумм атрибутов по кратчайшим (по optimizer) путям между всеми парами узлов.
+    Деревья ищутся settings.MATRIX_WORKERS потоками (по умолчанию количество CPU)
+    :param graph: CSR-граф
+    :param sources: позиции начальных узлов
+    :param targets: позиции конечных узлов
+    :param optimizer: наименование атрибута веса поиска
+    :param attributes: наименования атрибутов матриц
+    :return: матрицы по наименованию атрибута, inf - путь не существует
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+
+    def _matrices(distances: np.ndarray, predecessors: np.ndarray) -> Tuple[np.ndarray, ...]:
+        values = distances[:, targets]
+        reachable = np.isfinite(values)
+
+        return tuple(np.where(reachable, values if attribute == optimizer else
+                              tree_sums(graph, predecessors, targets, optimizer, attribute), np.inf)
+                     for attribute in attributes)
+
+    return dict(zip(attributes, _search_chunks(weight_matrix(graph, optimizer), sources, _matrices,
+                                               settings.MATRIX_WORKERS)))
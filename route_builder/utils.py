@@ -1,7 +1,10 @@
-from typing import List, Sequence, Optional
-from dataclasses import dataclass
+import fcntl
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Sequence, Optional, Union
+from dataclasses import dataclass, astuple
 
-import folium
+if TYPE_CHECKING:
+    import folium
 
 
 @dataclass
@@ -19,7 +22,98 @@ class Route:
     paths: list
     length: Optional[float]
     travel_time: Optional[float]
-    map: Optional[str]
+    map: Optional[Union[str, dict]]
+
+
+@dataclass
+class Alternatives:
+    """ Альтернативные маршруты между двумя точками по возрастанию веса optimizer (первый - кратчайший) """
+    routes: List[Route]
+
+
+@dataclass
+class Match:
+    """ Трек, привязанный к графу: путь по участкам трека (трек разбивается, если переход между точками невозможен) """
+    paths: list
+    length: float
+    travel_time: float
+    map: Optional[Union[str, dict]]
+    nodes: List[int]
+
+
+@dataclass
+class Matrix:
+    """ Матрицы расстояний и времени в пути между начальными (строки) и конечными (столбцы) точками """
+    length: List[List[Optional[float]]]
+    travel_time: List[List[Optional[float]]]
+
+
+@dataclass
+class Isochrone:
+    """ Зона достижимости: узлы и полигон (геометрия GeoJSON), достижимые не дальше порога """
+    threshold: float
+    nodes_count: int
+    nodes: Optional[List[int]]
+    polygon: Optional[dict]
+
+
+@dataclass
+class Isochrones:
+    """ Зоны достижимости от одной точки по возрастанию порога """
+    origin: int
+    optimizer: str
+    isochrones: List[Isochrone]
+
+
+@dataclass
+class Stream:
+    """ Ответ, отправляемый частями по мере построения: части (например, генератор зон) и их количество """
+    parts: Iterable[Any]
+    count: int
+
+
+@dataclass
+class GraphUpdate:
+    """ Результат обновления весов ребер графа """
+    version: int
+    edges: int
+    invalidated_routes: int
+
+
+@dataclass
+class PartitionOverlay:
+    """
+    Граница раздела: граничные узлы с координатами, исходящие ребра в другие разделы [u, v, length, travel_time]
+    и кратчайшие расстояния между граничными узлами внутри раздела по каждому весу (None - путь не существует)
+    """
+    partition: str
+    boundary: List[int]
+    x: List[float]
+    y: List[float]
+    cut_edges: List[list]
+    length: List[List[Optional[float]]]
+    travel_time: List[List[Optional[float]]]
+
+
+@dataclass
+class BoundaryTable:
+    """
+    Расстояния точек раздела: узлы точек, от точек до граничных узлов, от граничных узлов до точек
+    (строки - точки) и между точками внутри раздела
+    """
+    nodes: List[int]
+    to_boundary: List[List[Optional[float]]]
+    from_boundary: List[List[Optional[float]]]
+    direct: List[List[Optional[float]]]
+
+
+@dataclass
+class Legs:
+    """ Пути между парами узлов раздела, суммы атрибутов ребер и координаты узлов путей вида [[X, ...], [Y, ...]] """
+    paths: List[Optional[List[int]]]
+    length: List[Optional[float]]
+    travel_time: List[Optional[float]]
+    coordinates: Optional[List[Optional[List[List[float]]]]]
 
 
 @dataclass
@@ -41,28 +135,23 @@ def split_coordinates(points_coordinates: List[Sequence[float]]) -> List[List[fl
     return [x_coordinates, y_coordinates]
 
 
-def prepare_nodes(nodes: list):
+def validate_coordinates(bbox: Bbox, coordinates: List[List[float]]) -> bool:
     """
-    Составление списка нод для построения маршрута
-    :param nodes: список всех нод
-    :return: список нод в формате [[от 0, от 1, ...], [к 1, к 2, ...]]
+    Валидация принадлежности координат зоне графа
+    :param bbox: зона графа
+    :param coordinates: координаты вида [[X, X, ...], [Y, Y, ...]]
+    :return: True
     """
-    if len(nodes) == 2:
-        return nodes
-
-    orig = [nodes[0]]
-    dest = []
-
-    for node in nodes[1:-1]:
-        dest.append(node)
-        orig.append(node)
-
-    dest.append(nodes[-1])
+    if (min(coordinates[1]) < bbox.south or
+            max(coordinates[1]) > bbox.north or
+            min(coordinates[0]) < bbox.west or
+            max(coordinates[0]) > bbox.east):
+        raise ValueError(f'Координаты должны быть в области {", ".join(map(str, astuple(bbox)))}')
 
-    return [orig, dest]
+    return True
 
 
-def get_map_html(route_map: folium.Map) -> str:
+def get_map_html(route_map: 'folium.Map') -> str:
     """
     Получение HTML карты
     :param route_map: карта с маршрутом
@@ -71,3 +160,66 @@ def get_map_html(route_map: folium.Map) -> str:
     root = route_map.get_root()
     html = root.render()
     return html
+
+
+def encode_polyline(x: Sequence[float], y: Sequence[float], precision: int = 5) -> str:
+    """
+    Кодирование линии в формат Encoded Polyline (порядок координат - широта, долгота)
+    :param x: долготы точек
+    :param y: широты точек
+    :param precision: количество знаков после запятой
+    :return: закодированная линия
+    """
+    factor = 10 ** precision
+    chunks = []
+    previous = (0, 0)
+
+    for point in zip(y, x):
+        current = tuple(int(round(value * factor)) for value in point)
+
+        for value, previous_value in zip(current, previous):
+            delta = value - previous_value
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+
+            while delta >= 0x20:
+                chunks.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+
+            chunks.append(chr(delta + 63))
+
+        previous = current
+
+    return ''.join(chunks)
+
+
+def get_geojson(lines: List[Sequence[Sequence[float]]], precision: int = 6) -> dict:
+    """
+    Получение GeoJSON маршрута: LineString для одного участка, MultiLineString для нескольких
+    :param lines: участки маршрута в виде [[X, X, ...], [Y, Y, ...]]
+    :param precision: количество знаков после запятой
+    :return: объект GeoJSON Feature
+    """
+    coordinates = [[[round(x, precision), round(y, precision)] for x, y in zip(*line)] for line in lines]
+
+    if len(coordinates) == 1:
+        geometry = {'type': 'LineString', 'coordinates': coordinates[0]}
+    else:
+        geometry = {'type': 'MultiLineString', 'coordinates': coordinates}
+
+    return {'type': 'Feature', 'geometry': geometry, 'properties': {}}
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Межпроцессная эксклюзивная блокировка на файле
+    :param path: путь к файлу блокировки
+    :return: None
+    """
+    with open(path, 'a', encoding='utf-8') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
@@ -14,6 +14,9 @@ APP_NAME = env.str('APP_NAME', default='rpc-route-route_builder')
 RMQ_HOST = env.str('RMQ_HOST', default='localhost')
 RMQ_PORT = env.int('RMQ_PORT', default=5672)
 RMQ_PREFETCH_COUNT = env.int('RMQ_PREFETCH_COUNT', default=10)
+RMQ_BATCH_SIZE = env.int('RMQ_BATCH_SIZE', default=1)
+RMQ_BATCH_WAIT_MS = env.float('RMQ_BATCH_WAIT_MS', default=5)
+RMQ_CLOCK_SKEW = env.float('RMQ_CLOCK_SKEW', default=1)
 
 RMQ_USER = env.str('RMQ_USER', default='guest')
 RMQ_PASSWORD = env.str('RMQ_PASSWORD', default='guest')
@@ -22,7 +25,30 @@ RMQ_URL_QUERY_PARAMS = env.str('RMQ_URL_QUERY_PARAMS', default='')
 RMQ_URL = f"amqp://{RMQ_USER}:{RMQ_PASSWORD}@{RMQ_HOST}:{RMQ_PORT}/?{RMQ_URL_QUERY_PARAMS}"
 
 CPU_LIMITER = env.int('CPU_LIMITER', default=None)
+EXECUTOR_MODE = env.str('EXECUTOR_MODE', default='thread')
+EXECUTOR_WORKERS = env.int('EXECUTOR_WORKERS', default=None)
 NETWORK_TYPE = env.str('NETWORK_TYPE', default='all')
+ROUTING_ENGINE = env.str('ROUTING_ENGINE', default='networkx')
+ALT_LANDMARKS = env.int('ALT_LANDMARKS', default=16)
+SNAPSHOT_DIR = env.str('SNAPSHOT_DIR', default='')
+SHARED_GRAPH_DIR = env.str('SHARED_GRAPH_DIR', default='')
+ROUTE_CACHE_SIZE = env.int('ROUTE_CACHE_SIZE', default=0)
+ROUTE_CACHE_TTL = env.float('ROUTE_CACHE_TTL', default=0)
+MATRIX_WORKERS = env.int('MATRIX_WORKERS', default=None)
+LEG_WORKERS = env.int('LEG_WORKERS', default=0)
+ORDER_TIME_BUDGET = env.float('ORDER_TIME_BUDGET', default=1.0)
+REGIONS = env.json('REGIONS', default={})
+GRAPH_MEMORY_BUDGET = env.int('GRAPH_MEMORY_BUDGET', default=0)
+METRICS_PORT = env.int('METRICS_PORT', default=0)
+PROFILE_SLOW_MS = env.float('PROFILE_SLOW_MS', default=0)
+PROFILE_INTERVAL_MS = env.float('PROFILE_INTERVAL_MS', default=5)
+PROFILE_DIR = env.str('PROFILE_DIR', default='profiles')
+PRIORITY_WORKERS = env.int('PRIORITY_WORKERS', default=0)
+PARTITION_ROWS = env.int('PARTITION_ROWS', default=1)
+PARTITION_COLS = env.int('PARTITION_COLS', default=1)
+PARTITION = env.str('PARTITION', default='')
+PARTITION_MARGIN = env.float('PARTITION_MARGIN', default=500)
+PARTITION_TIMEOUT = env.float('PARTITION_TIMEOUT', default=10)
 
 BBOX = Bbox(env.float('BBOX_NORTH', default=None), env.float('BBOX_SOUTH', default=None),
             env.float('BBOX_EAST', default=None), env.float('BBOX_WEST', default=None))
@@ -0,0 +1,206 @@
+import asyncio
+import dataclasses
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Set
+
+import aio_pika
+
+
+@dataclasses.dataclass
+class InMemoryMessage:
+    """
+    Полученное сообщение брокера в памяти (подмножество aio_pika.abc.AbstractIncomingMessage):
+    свойства опубликованного сообщения (body, correlation_id, reply_to, expiration, ...) читаются из него
+    """
+    message: aio_pika.Message
+    routing_key: str
+    # Вызывается при завершении обработки (подтверждении)
+    on_processed: Callable[[], None]
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Свойство опубликованного сообщения
+        :param name: наименование свойства
+        :return: значение свойства
+        """
+        return getattr(self.message, name)
+
+    @asynccontextmanager
+    async def process(self) -> AsyncIterator[None]:
+        """
+        Обработка сообщения: по завершении освобождается место в prefetch канала
+        :return: None
+        """
+        try:
+            yield
+        finally:
+            self.on_processed()
+
+
+class InMemoryQueue:
+    """ Очередь брокера в памяти """
+    def __init__(self, name: str):
+        """
+        Инициализация очереди
+        :param name: наименование очереди
+        """
+        self.name = name
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.consumed = asyncio.Event()
+        self._consumers: Set[asyncio.Task] = set()
+
+    async def consume(self, callback: Callable[[InMemoryMessage], Awaitable[Any]], prefetch_count: int = 0) -> None:
+        """
+        Подписка на очередь: сообщения передаются обработчику отдельными задачами,
+        не больше prefetch_count неподтвержденных одновременно (0 - без ограничения)
+        :param callback: обработчик сообщения
+        :param prefetch_count: ограничение неподтвержденных сообщений
+        :return: None
+        """
+        unacked = asyncio.Semaphore(prefetch_count) if prefetch_count else None
+
+        async def dispatch() -> None:
+            while True:
+                if unacked:
+                    await unacked.acquire()
+
+                message, routing_key = await self.messages.get()
+                incoming = InMemoryMessage(message, routing_key, unacked.release if unacked else lambda: None)
+
+                task = asyncio.create_task(callback(incoming))
+                self._consumers.add(task)
+                task.add_done_callback(self._consumers.discard)
+
+        consumer = asyncio.create_task(dispatch())
+        self._consumers.add(consumer)
+        self.consumed.set()
+
+    def close(self) -> None:
+        """
+        Остановка подписчиков очереди
+        :return: None
+        """
+        for task in self._consumers:
+            task.cancel()
+
+
+class InMemoryChannel:
+    """ Канал брокера в памяти """
+    prefetch_count: int = 0
+
+    def __init__(self, broker: 'InMemoryBroker'):
+        """
+        Инициализация канала
+        :param broker: брокер
+        """
+        self.broker = broker
+        # Обменник по умолчанию: сообщение доставляется в очередь с именем routing_key
+        self.default_exchange = broker
+
+    async def set_qos(self, prefetch_count: int = 0) -> None:
+        """
+        Ограничение неподтвержденных сообщений подписчиков канала
+        :param prefetch_count: ограничение (0 - без ограничения)
+        :return: None
+        """
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name: str, **_) -> 'InMemoryChannelQueue':
+        """
+        Объявление очереди
+        :param name: наименование очереди
+        :return: очередь
+        """
+        return InMemoryChannelQueue(self, self.broker.queue(name))
+
+
+@dataclasses.dataclass
+class InMemoryChannelQueue:
+    """ Очередь, объявленная каналом: подписка использует prefetch канала """
+    channel: InMemoryChannel
+    queue: InMemoryQueue
+
+    @property
+    def name(self) -> str:
+        """
+        Наименование очереди
+        :return: наименование
+        """
+        return self.queue.name
+
+    async def consume(self, callback: Callable[[InMemoryMessage], Awaitable[Any]], **_) -> None:
+        """
+        Подписка на очередь с prefetch канала
+        :param callback: обработчик сообщения
+        :return: None
+        """
+        await self.queue.consume(callback, self.channel.prefetch_count)
+
+
+class InMemoryConnection:
+    """ Подключение к брокеру в памяти """
+    def __init__(self, broker: 'InMemoryBroker'):
+        """
+        Инициализация подключения
+        :param broker: брокер
+        """
+        self.broker = broker
+
+    async def channel(self) -> InMemoryChannel:
+        """
+        Открытие канала
+        :return: канал
+        """
+        return InMemoryChannel(self.broker)
+
+    async def close(self) -> None:
+        """
+        Закрытие подключения (у брокера в памяти нет соединения)
+        :return: None
+        """
+        return None
+
+
+class InMemoryBroker:
+    """
+    Брокер в памяти процесса вместо RabbitMQ для замеров и тестов listener'а без внешних сервисов:
+    поддерживает обменник по умолчанию, prefetch и подтверждение через message.process()
+    """
+    def __init__(self):
+        """ Инициализация брокера без очередей """
+        self.queues: Dict[str, InMemoryQueue] = {}
+
+    def queue(self, name: str) -> InMemoryQueue:
+        """
+        Очередь по наименованию (создается при первом обращении)
+        :param name: наименование очереди
+        :return: очередь
+        """
+        if name not in self.queues:
+            self.queues[name] = InMemoryQueue(name)
+
+        return self.queues[name]
+
+    async def connect_robust(self, *_, **__) -> InMemoryConnection:
+        """
+        Подключение к брокеру (аналог aio_pika.connect_robust, адрес и параметры подключения не используются)
+        :return: подключение
+        """
+        return InMemoryConnection(self)
+
+    async def publish(self, message: aio_pika.Message, routing_key: str) -> None:
+        """
+        Публикация сообщения в очередь
+        :param message: сообщение
+        :param routing_key: наименование очереди
+        :return: None
+        """
+        self.queue(routing_key).messages.put_nowait((message, routing_key))
+
+    def close(self) -> None:
+        """
+        Остановка подписчиков всех очередей
+        :return: None
+        """
+        for queue in self.queues.values():
+            queue.close()
@@ -1,29 +1,35 @@
 import asyncio
 import threading
+from typing import Dict, List, Optional
 
 from unittest.mock import AsyncMock
+import aio_pika
 import pytest
 
 import settings
 from listener.__main__ import run
-from tests.utils import Publisher, Consumer
-from route_builder import utils, builders
+from tests.broker import InMemoryBroker
+from tests.utils import Publisher, Consumer, random_graph as random_graph_factory
+from route_builder import codecs, utils, builders
 
 
 TEST_BBOX = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
 REPLY_RMQ_QUERY = f'{settings.APP_NAME}:test_reply'
+MEMORY_REPLY_QUEUE = f'{settings.APP_NAME}:memory_reply'
 
 
 @pytest.fixture()
 def disable_osmnx_cache(mocker):
-    """ Отключение кеша osmnx """
+    """ Отключение кеша osmnx (настройки применяются при первом импорте osmnx построителем) """
+    mocker.patch('settings.USE_CACHE', False)
     mocker.patch('osmnx.settings.use_cache', False)
     yield
 
 
 @pytest.fixture()
 def disable_osmnx_logs(mocker):
-    """ Отключение логов osmnx """
+    """ Отключение логов osmnx (настройки применяются при первом импорте osmnx построителем) """
+    mocker.patch('settings.DEBUG', False)
     mocker.patch('osmnx.settings.log_console', False)
     yield
 
@@ -62,6 +68,22 @@ def mock_geo(mocker):
     yield
 
 
+@pytest.fixture(params=range(5))
+def random_graph(request):
+    """ Случайный мультиграф """
+    yield random_graph_factory(request.param)
+
+
+@pytest.fixture()
+def mock_osm(mocker):
+    """ Мок загрузки графа из OSM: Graph.build строит индексы по случайному графу. Возвращает мок загрузки """
+    graph_from_bbox = mocker.patch('osmnx.graph_from_bbox', side_effect=lambda *args, **kwargs: random_graph_factory(0))
+    mocker.patch('osmnx.add_edge_speeds', side_effect=lambda graph, *args, **kwargs: graph)
+    mocker.patch('osmnx.add_edge_travel_times', side_effect=lambda graph, *args, **kwargs: graph)
+
+    yield graph_from_bbox
+
+
 @pytest.fixture()
 async def publisher():
     """ Запуск издателя """
@@ -85,3 +107,56 @@ async def consumer():
     yield _consumer
 
     await _consumer.close()
+
+
+@pytest.fixture()
+def memory_listener():
+    """ Отправка сообщений listener'у, подключенному к брокеру в памяти (граф загружается из OSM или мока mock_osm) """
+    async def send(messages: List[aio_pika.Message], graph: Optional[builders.Graph] = None) -> Dict[str, dict]:
+        """
+        Отправка сообщений и ожидание ответов на все сообщения
+        :param messages: сообщения (reply_to и correlation_id - номер сообщения - задаются при отправке)
+        :param graph: граф listener'а (по умолчанию граф TEST_BBOX)
+        :return: декодированные ответы по correlation_id (ответ частями - список частей)
+        """
+        if graph is None:
+            graph = builders.Graph(TEST_BBOX, 'drive', engine='dijkstra')
+            graph.build()
+
+        broker = InMemoryBroker()
+        replies = {}
+        received = asyncio.Event()
+
+        async def receive(message) -> None:
+            async with message.process():
+                reply = codecs.get_codec(message.content_type).decode(message.body)
+
+                if message.headers and 'parts' in message.headers:
+                    parts = replies.setdefault(message.correlation_id, [None] * message.headers['parts'])
+                    parts[message.headers['part']] = reply
+                else:
+                    replies[message.correlation_id] = reply
+
+                if len(replies) == len(messages) and all(not isinstance(reply, list) or None not in reply
+                                                         for reply in replies.values()):
+                    received.set()
+
+        listener = asyncio.create_task(run(graph, broker.connect_robust))
+
+        try:
+            await broker.queue(MEMORY_REPLY_QUEUE).consume(receive)
+            await broker.queue(settings.RMQ_QUEUE).consumed.wait()
+
+            for index, message in enumerate(messages):
+                message.reply_to, message.correlation_id = MEMORY_REPLY_QUEUE, str(index)
+                await broker.publish(message, settings.RMQ_QUEUE)
+
+            await asyncio.wait_for(received.wait(), 10)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            broker.close()
+
+        return replies
+
+    yield send
@@ -0,0 +1,111 @@
+import networkx as nx
+import pytest
+
+from route_builder import alternatives, builders, utils
+from route_builder.csr import CSRGraph
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+POINTS = [[55.97999, 37.18581], [55.97863, 37.18954]]
+
+
+def _corridors() -> nx.MultiDiGraph:
+    """ Граф с тремя путями 0 -> 9: через 1, 2 (вес 10), через 3, 4 (вес 11) и через 5, 6 (вес 20) """
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+
+    for node in (0, 1, 2, 3, 4, 5, 6, 9):
+        graph.add_node(node, x=37.185 + node * 0.001, y=55.98)
+
+    for first, second, weight in ((1, 2, 10), (3, 4, 11), (5, 6, 20)):
+        for orig, dest in ((0, first), (first, second), (second, 9)):
+            graph.add_edge(orig, dest, length=weight / 3, travel_time=weight / 3)
+
+    return graph
+
+
+def _weight(csr: CSRGraph, path: list, weight: str) -> float:
+    """ Вес пути по позициям узлов """
+    return csr.path_sums([path], weight, (weight,))[0][weight]
+
+
+def test_alternatives_corridors():
+    """ Проверка выбора непересекающихся путей в пределах допустимого удлинения """
+    csr = CSRGraph.from_graph(_corridors())
+    shortest = csr.positions([0, 1, 2, 9])
+
+    paths = alternatives.alternatives(csr, shortest, 'length', 3)
+    assert [csr.to_node_ids(path) for path in paths] == [[0, 3, 4, 9]]
+
+    paths = alternatives.alternatives(csr, shortest, 'length', 3, alternatives.AlternativeParams(stretch=1.0))
+    assert [csr.to_node_ids(path) for path in paths] == [[0, 3, 4, 9], [0, 5, 6, 9]]
+
+    assert not alternatives.alternatives(csr, shortest, 'length', 1)
+
+
+@pytest.mark.parametrize('weight', ['length', 'travel_time'])
+def test_alternatives(random_graph, weight):
+    """ Проверка альтернатив на случайном графе: простые пути с ограниченным удлинением и общей частью """
+    csr = CSRGraph.from_graph(random_graph)
+    nodes = list(random_graph.nodes)
+
+    for orig, dest in zip(nodes[:10], nodes[-10:]):
+        try:
+            shortest = nx.shortest_path(random_graph, orig, dest, weight=weight)
+        except nx.NetworkXNoPath:
+            continue
+
+        positions = csr.positions(shortest)
+        distance = _weight(csr, positions, weight)
+        paths = alternatives.alternatives(csr, positions, weight, 4)
+
+        assert len(paths) <= 3
+        used = set(zip(positions[:-1], positions[1:]))
+
+        for path in paths:
+            assert path[0] == positions[0] and path[-1] == positions[-1]
+            assert len(set(path)) == len(path)
+            node_ids = csr.to_node_ids(path)
+            assert all(random_graph.has_edge(orig, dest) for orig, dest in zip(node_ids[:-1], node_ids[1:]))
+            assert distance <= _weight(csr, path, weight) <= (1 + alternatives.STRETCH) * distance + 1e-9
+            assert set(zip(path[:-1], path[1:])) != used
+
+        assert [_weight(csr, path, weight) for path in paths] == sorted(_weight(csr, path, weight) for path in paths)
+
+
+@pytest.mark.parametrize('count', [1, 3])
+def test_build_route_alternatives(mock_osm, count):
+    """ Проверка построения альтернативных маршрутов: первый совпадает с кратчайшим """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    route = builders.build_route(graph, points_coordinates=POINTS, optimizer='travel_time')
+    result = builders.build_route(graph, points_coordinates=POINTS, optimizer='travel_time', alternatives=count,
+                                  with_map=True, map_format='polyline')
+
+    assert isinstance(result, utils.Alternatives)
+    assert 1 <= len(result.routes) <= count
+    assert result.routes[0].paths == route.paths
+    assert result.routes[0].travel_time == pytest.approx(route.travel_time)
+    assert all(isinstance(alternative.map, str) for alternative in result.routes)
+    assert [alternative.travel_time for alternative in result.routes] == \
+        sorted(alternative.travel_time for alternative in result.routes)
+
+    batch = builders.build_routes(graph, [{'points_coordinates': POINTS, 'optimizer': 'travel_time',
+                                           'alternatives': count}])
+    assert batch == [builders.build_route(graph, points_coordinates=POINTS, optimizer='travel_time',
+                                          alternatives=count)]
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'points_coordinates': POINTS, 'alternatives': 0},
+    {'points_coordinates': POINTS, 'alternatives': '2'},
+    {'points_coordinates': POINTS + [[55.98006, 37.18981]], 'alternatives': 2},
+    {'points_coordinates': POINTS, 'alternatives': 2, 'optimizer': 'speed'},
+])
+def test_build_route_alternatives_exception(mock_osm, kwargs):
+    """ Проверка возврата ошибки при некорректной конфигурации альтернатив """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    assert isinstance(builders.build_route(graph, **kwargs), utils.Error)
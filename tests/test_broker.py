@@ -0,0 +1,52 @@
+import json
+
+import aio_pika
+import msgpack
+import pytest
+
+import settings
+from route_builder import codecs
+
+
+@pytest.mark.parametrize('batch_size', [1, 4])
+async def test_listener_in_memory_broker(mocker, mock_osm, memory_listener, batch_size):
+    """ Проверка ответов listener'а без RabbitMQ: маршрут и неизвестный тип запроса, по одному и пачкой """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', batch_size)
+    route = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]]}
+
+    replies = await memory_listener([aio_pika.Message(body=json.dumps(request).encode())
+                                     for request in (route, {'type': 'unknown'}, route)])
+
+    assert set(replies['0']) == {'paths', 'length', 'travel_time', 'map'}
+    assert replies['2'] == replies['0']
+    assert 'error_details' in replies['1']
+
+
+async def test_listener_batch_with_bytes(mocker, mock_osm, memory_listener):
+    """ Проверка пачки с запросом msgpack, содержащим bytes: ключ одинаковых запросов строится кодеком запроса """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', 4)
+    route = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]]}
+    unknown = {'type': 'unknown', 'payload': b'\x00\x01'}
+
+    replies = await memory_listener([
+        aio_pika.Message(body=json.dumps(route).encode()),
+        *(aio_pika.Message(body=msgpack.packb(request), content_type=codecs.MSGPACK_CONTENT_TYPE)
+          for request in (unknown, unknown, route)),
+    ])
+
+    assert set(replies['0']) == {'paths', 'length', 'travel_time', 'map'}
+    assert replies['1'] == replies['2'] and 'error_details' in replies['1']
+    assert replies['3'] == replies['0']
+
+
+@pytest.mark.parametrize('batch_size', [1, 4])
+async def test_listener_isochrones_stream(mocker, mock_osm, memory_listener, batch_size):
+    """ Проверка отправки зон достижимости с stream отдельными сообщениями по одному и пачкой """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', batch_size)
+    request = {'type': 'isochrones', 'point_coordinates': [55.97999, 37.18581], 'thresholds': [5, 10], 'stream': True}
+
+    replies = await memory_listener([aio_pika.Message(body=json.dumps(request).encode()),
+                                     aio_pika.Message(body=json.dumps({**request, 'thresholds': []}).encode())])
+
+    assert [zone['threshold'] for zone in replies['0']] == [5, 10]
+    assert 'error_details' in replies['1']
@@ -1,8 +1,13 @@
+import random
+
 import pytest
 
 import networkx as nx
+import numpy as np
+import osmnx as ox
 
 from route_builder import builders, utils
+from route_builder.heuristics import haversine
 from route_builder.utils import Bbox
 
 
@@ -46,6 +51,34 @@ def test_route_builder(disable_osmnx_cache, disable_osmnx_logs, network_type, co
     assert isinstance(route.map, str) if extra_params.get('with_map') else route.map is None
 
 
+@pytest.mark.geo
+def test_graph_nearest_nodes(disable_osmnx_cache, disable_osmnx_logs):
+    """ Проверка совпадения привязки к узлам через индекс графа с ox.nearest_nodes """
+    graph = _build_graph('drive')
+    lon = [37.18581, 37.18954, 37.18981, bbox.west, bbox.east]
+    lat = [55.97999, 55.97863, 55.98006, bbox.south, bbox.north]
+
+    assert graph.nearest_nodes(lon, lat) == ox.nearest_nodes(graph.graph, lon, lat)
+
+
+def test_graph_nearest_nodes_offline(random_graph):
+    """ Проверка привязки к узлам через индекс графа перебором всех узлов по расстоянию haversine """
+    graph = builders.Graph(bbox, 'drive')
+    graph.build(random_graph)
+
+    generator = random.Random(0)
+    lon = [generator.uniform(bbox.west, bbox.east) for _ in range(50)] + [bbox.west, bbox.east]
+    lat = [generator.uniform(bbox.south, bbox.north) for _ in range(50)] + [bbox.south, bbox.north]
+
+    nodes = list(random_graph.nodes)
+    nodes_lat = np.radians([random_graph.nodes[node]['y'] for node in nodes])
+    nodes_lon = np.radians([random_graph.nodes[node]['x'] for node in nodes])
+    expected = [nodes[int(np.argmin(haversine(nodes_lat, nodes_lon, *np.radians([point_lat, point_lon]))))]
+                for point_lon, point_lat in zip(lon, lat)]
+
+    assert graph.nearest_nodes(lon, lat) == expected
+
+
 def test_route_builder_with_invalid_coordinates(disable_osmnx_cache, disable_osmnx_logs):
     """ Проверка возникновения ошибки при передаче координат, не принадлежащих зоне графа """
     graph = _build_graph('all')
@@ -68,6 +101,33 @@ def test_build_route_exception(mocker, disable_osmnx_cache, disable_osmnx_logs):
     assert isinstance(result, utils.Error)
 
 
+@pytest.mark.parametrize('engine', ['networkx', 'dijkstra'])
+def test_build_routes(mocker, mock_osm, engine):
+    """ Проверка пачки маршрутов: результаты совпадают с построением по одному, ошибки не влияют на пачку """
+    mocker.patch('settings.ROUTE_CACHE_SIZE', 0)
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    graph.build()
+
+    points = [[55.97999, 37.18581], [55.98006, 37.18981], [55.97863, 37.18954], [55.98100, 37.19000]]
+    requests = [
+        {'points_coordinates': points[:2]},
+        {'points_coordinates': points, 'optimizer': 'travel_time'},
+        {'points_coordinates': points[1:], 'optimize_order': True},
+        {'points_coordinates': [[1, 1], [2, 2]]},
+        {'points_coordinates': points[:2], 'optimizer': 'not exist'},
+    ]
+
+    # участки запросов строятся одним поиском на optimizer
+    shortest_path_patcher = mocker.patch.object(graph, 'shortest_path', wraps=graph.shortest_path)
+    builders.build_routes(graph, [dict(request) for request in requests[:2]] + [{'points_coordinates': points[2:]}])
+    assert shortest_path_patcher.call_count == 2
+
+    results = builders.build_routes(graph, [dict(request) for request in requests])
+    assert [builders.build_route(graph, **request) for request in requests] == results
+    assert isinstance(results[0], utils.Route)
+    assert isinstance(results[3], utils.Error) and isinstance(results[4], utils.Error)
+
+
 def _build_graph(network_type) -> builders.Graph:
     """ Строительство графа """
     graph = builders.Graph(bbox, network_type)
@@ -0,0 +1,70 @@
+import pytest
+
+from route_builder import builders, utils
+from route_builder.cache import CachedRoute, RouteCache
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+def test_route_cache_eviction():
+    """ Проверка вытеснения давно не использованных записей """
+    cache = RouteCache(2)
+    for node in range(3):
+        if node == 2:
+            assert cache.get((0, 1, 'length'))
+        cache.put((node, node + 1, 'length'), CachedRoute([node, node + 1], {'length': 1.0}))
+
+    assert cache.get((1, 2, 'length')) is None
+    assert cache.get((0, 1, 'length')) and cache.get((2, 3, 'length'))
+    assert cache.stats() == {'size': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'expirations': 0, 'invalidations': 0}
+
+
+def test_route_cache_ttl(mocker):
+    """ Проверка истечения времени жизни записи """
+    monotonic_patcher = mocker.patch('time.monotonic', return_value=100.0)
+    cache = RouteCache(10, ttl=5)
+    cache.put((0, 1, 'length'), CachedRoute([0, 1], {'length': 1.0}))
+
+    monotonic_patcher.return_value = 104.0
+    assert cache.get((0, 1, 'length'))
+
+    monotonic_patcher.return_value = 106.0
+    assert cache.get((0, 1, 'length')) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_route_cache_with_invalid_size():
+    """ Проверка возникновения ошибки при неположительном размере кеша """
+    with pytest.raises(ValueError):
+        RouteCache(0)
+
+
+@pytest.mark.parametrize('engine', ['networkx', 'dijkstra'])
+def test_route_builder_cache(mocker, mock_osm, engine):
+    """ Проверка использования кеша участков маршрута, в том числе для каждого участка многоточечного маршрута """
+    mocker.patch('settings.ROUTE_CACHE_SIZE', 100)
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    graph.build()
+
+    coordinates = [(55.97999, 37.18581), (55.98006, 37.18981), (55.97863, 37.18954)]
+    shortest_path_patcher = mocker.patch.object(graph, 'shortest_path', wraps=graph.shortest_path)
+
+    route = builders.RouteBuilder(graph, coordinates).build()
+    assert graph.route_cache.stats()['misses'] == 2
+    assert shortest_path_patcher.call_count == 1
+
+    cached_route = builders.RouteBuilder(graph, coordinates[1:]).build()
+    assert graph.route_cache.stats()['hits'] == 1
+    assert shortest_path_patcher.call_count == 1
+
+    assert cached_route.paths == route.paths[1]
+    assert builders.RouteBuilder(graph, coordinates).build() == route
+
+
+def test_route_builder_cache_disabled_by_default(mock_osm):
+    """ Проверка отключенного по умолчанию кеша участков маршрута: граф не хранит участки без ROUTE_CACHE_SIZE """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    assert graph.route_cache is None
@@ -0,0 +1,50 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from route_builder import codecs, utils
+
+
+ROUTE = utils.Route(paths=[[1000000001, 1000000005, 999999990], [999999990, 42]], length=1523.4,
+                    travel_time=181.2, map=None)
+
+
+def test_json_codec():
+    """ JSON-кодек кодирует dataclass так же, как json.dumps(asdict(...)) """
+    codec = codecs.get_codec()
+
+    assert codec.content_type == codecs.JSON_CONTENT_TYPE
+    assert codec.decode(codec.encode(ROUTE)) == json.loads(json.dumps(asdict(ROUTE)))
+    assert codec.decode(codec.encode({'graphs': []})) == {'graphs': []}
+
+
+def test_json_codec_without_orjson(monkeypatch):
+    """ Без orjson используется стандартный json """
+    monkeypatch.setattr(codecs, 'orjson', None)
+    codec = codecs.JsonCodec()
+
+    assert json.loads(codec.encode(ROUTE)) == asdict(ROUTE)
+    assert codec.decode(b'{"type": "route"}') == {'type': 'route'}
+
+
+@pytest.mark.parametrize('data', [ROUTE, asdict(ROUTE), utils.Error('error'), {'paths': [[5], [7, 3]], 'map': None}])
+def test_msgpack_codec(data):
+    """ Пути кодируются разностями и восстанавливаются при декодировании """
+    codec = codecs.get_codec(codecs.MSGPACK_CONTENT_TYPE)
+
+    expected = asdict(data) if not isinstance(data, dict) else data
+    assert codec.decode(codec.encode(data)) == expected
+
+
+def test_msgpack_codec_is_compact():
+    """ Разностное кодирование путей уменьшает размер сообщения """
+    route = utils.Route(paths=[list(range(5000000000, 5000001000, 3))], length=1.0, travel_time=1.0, map=None)
+
+    assert len(codecs.MsgpackCodec().encode(route)) < len(codecs.JsonCodec().encode(route)) / 2
+
+
+def test_unknown_content_type():
+    """ Неизвестный content_type """
+    with pytest.raises(ValueError):
+        codecs.get_codec('text/plain')
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+
+import aio_pika
+import pytest
+
+import settings
+from listener.admission import expiration_deadline, is_cheap, is_late
+from route_builder import builders, deadlines, executors, metrics, routing, utils
+from route_builder.csr import CSRGraph
+from route_builder.indexes import GraphIndexes
+from tests.broker import InMemoryMessage
+from tests.utils import random_graph
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+ROUTE = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]]}
+
+
+def _slow_route(_graph, seconds: float = 0.0, **_) -> utils.Route:
+    """ Построение маршрута, проверяющее срок после долгого поиска """
+    time.sleep(seconds)
+    deadlines.check()
+    return utils.Route([], seconds, 0, None)
+
+
+@pytest.mark.parametrize('engine', ['dijkstra', 'bidirectional'])
+def test_search_deadline(mocker, engine):
+    """ Проверка прерывания поиска пути после истечения срока и поиска без срока """
+    mocker.patch.object(deadlines, 'CHECK_INTERVAL', 1)
+    indexes = GraphIndexes(CSRGraph.from_graph(random_graph(0, nodes=300, edges=1500)))
+    source, target = 0, indexes.csr.nodes_count - 1
+
+    expected = routing.search(indexes, source, target, 'length', engine)
+
+    with deadlines.scope(time.time() - 1):
+        with pytest.raises(deadlines.DeadlineExceeded):
+            routing.search(indexes, source, target, 'length', engine)
+
+    with deadlines.scope(time.time() + 60):
+        assert routing.search(indexes, source, target, 'length', engine) == expected
+
+    assert deadlines.current() is None
+
+
+async def test_build_route_deadline(mock_osm):
+    """ Проверка ответа построителя с истекшим сроком: ошибка вместо маршрута и карты """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.route_cache = None
+
+    with deadlines.scope(time.time() - 1):
+        result = builders.build_route(graph, **ROUTE, with_map=True, map_format='geojson')
+
+    assert result == utils.Error(deadlines.EXPIRED)
+    assert isinstance(builders.build_route(graph, **ROUTE), utils.Route)
+
+
+@pytest.mark.parametrize('mode', executors.EXECUTOR_MODES)
+async def test_route_executor_deadline(mocker, mode):
+    """ Проверка исполнителя: запрос с истекшим сроком не выполняется, долгий запрос прерывается """
+    mocker.patch('route_builder.builders.build_route', side_effect=_slow_route)
+    waiting, aborted = metrics.SHED.value(reason='waiting'), metrics.SHED.value(reason='aborted')
+
+    executor = executors.RouteExecutor(mocker.Mock(spec=builders.Graph), mode, workers=1, max_in_flight=1)
+
+    try:
+        expired = await executor.build_route(deadline=time.time() - 1, **ROUTE)
+        interrupted = await executor.build_route(deadline=time.time() + 0.05, seconds=0.1, **ROUTE)
+        completed = await executor.build_route(deadline=time.time() + 60, seconds=0.01, **ROUTE)
+    finally:
+        executor.shutdown()
+
+    assert expired == interrupted == utils.Error(deadlines.EXPIRED)
+    assert completed == utils.Route([], 0.01, 0, None)
+    assert metrics.SHED.value(reason='waiting') == waiting + 1
+    assert metrics.SHED.value(reason='aborted') == aborted + 1
+
+
+async def test_route_executor_priority(mocker):
+    """ Проверка полосы дешевых запросов: запрос полосы не ожидает долгого запроса основной полосы """
+    mocker.patch('route_builder.builders.build_route', side_effect=_slow_route)
+    executor = executors.RouteExecutor(mocker.sentinel.graph, 'thread', workers=1, max_in_flight=2,
+                                       priority_workers=1)
+    finished = []
+
+    async def build(seconds: float, priority: bool) -> None:
+        await executor.run('build_route', priority=priority, seconds=seconds)
+        finished.append(priority)
+
+    try:
+        await asyncio.gather(build(0.3, False), build(0.3, False), build(0.01, True))
+    finally:
+        executor.shutdown()
+
+    assert finished[0] is True
+
+
+def test_is_cheap():
+    """ Проверка выбора запросов полосы дешевых запросов """
+    assert is_cheap(dict(ROUTE))
+    assert not is_cheap({**ROUTE, 'with_map': True})
+    assert not is_cheap({**ROUTE, 'alternatives': 2})
+    assert not is_cheap({**ROUTE, 'type': 'matrix'})
+    assert not is_cheap({'points_coordinates': ROUTE['points_coordinates'] * 2})
+
+
+def test_is_late():
+    """ Проверка учета ответов, построенных после истечения срока """
+    assert is_late(utils.Route([], 0, 0, None), time.time() - 1)
+    assert not is_late(utils.Error(deadlines.EXPIRED), time.time() - 1)
+    assert not is_late(utils.Route([], 0, 0, None), time.time() + 60)
+    assert not is_late(utils.Route([], 0, 0, None), None)
+
+
+def test_expiration_deadline(mocker):
+    """ Проверка срока AMQP expiration: отсчет от получения, timestamp отправителя с точностью до секунды """
+    mocker.patch.object(settings, 'RMQ_CLOCK_SKEW', 1)
+    received_at = time.time()
+
+    def deadline(**properties) -> float:
+        return expiration_deadline(InMemoryMessage(aio_pika.Message(b'', **properties), 'queue', lambda: None),
+                                   received_at)
+
+    assert deadline() is None
+    assert deadline(expiration=0.5) == pytest.approx(received_at + 0.5)
+    # Часы отправителя впереди: срок отсчитывается от получения
+    assert deadline(expiration=0.5, timestamp=received_at + 30) == pytest.approx(received_at + 0.5)
+    # Отброшенная дробная часть timestamp и расхождение часов в пределах RMQ_CLOCK_SKEW не сокращают срок
+    assert deadline(expiration=0.5, timestamp=int(received_at) - 1) == pytest.approx(received_at + 0.5)
+    assert deadline(expiration=5, timestamp=received_at - 10) == pytest.approx(received_at - 3)
+
+
+async def test_listener_truncated_timestamp(mocker, mock_osm, memory_listener):
+    """ Проверка listener'а: короткий expiration и timestamp, отброшенная дробная часть которого близка к секунде """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', 1)
+    mocker.patch.object(settings, 'RMQ_CLOCK_SKEW', 0)
+
+    replies = await memory_listener([aio_pika.Message(body=json.dumps(ROUTE).encode(), expiration=0.5,
+                                                      timestamp=time.time() - 0.95)])
+
+    assert set(replies['0']) == {'paths', 'length', 'travel_time', 'map'}
+
+
+@pytest.mark.parametrize('batch_size', [1, 4])
+async def test_listener_deadlines(mocker, mock_osm, memory_listener, batch_size):
+    """ Проверка listener'а: сообщения с истекшим expiration и deadline отклоняются без построения """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', batch_size)
+    expired = metrics.SHED.value(reason='expired')
+
+    replies = await memory_listener([
+        # Тело не декодируется: истек срок AMQP expiration от публикации
+        aio_pika.Message(body=b'not json', timestamp=time.time() - 10, expiration=5),
+        aio_pika.Message(body=json.dumps({**ROUTE, 'deadline': time.time() - 1}).encode()),
+        aio_pika.Message(body=json.dumps({**ROUTE, 'deadline': 'soon'}).encode()),
+        aio_pika.Message(body=json.dumps({**ROUTE, 'deadline': time.time() + 60}).encode(), expiration=60),
+    ])
+
+    assert replies['0'] == replies['1'] == {'error_details': deadlines.EXPIRED}
+    assert 'deadline' in replies['2']['error_details']
+    assert set(replies['3']) == {'paths', 'length', 'travel_time', 'map'}
+    assert metrics.SHED.value(reason='expired') == expired + 2
@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import ANY
+
+import pytest
+
+from route_builder import builders, executors, utils
+from route_builder.utils import Route
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+request_body = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]]}
+
+
+@pytest.mark.parametrize('mode', executors.EXECUTOR_MODES)
+async def test_route_executor(mocker, mock_geo, mode):
+    """ Проверка построения маршрута исполнителем во всех режимах """
+    route_builder_patcher = mocker.patch('route_builder.builders.build_route')
+    route_builder_patcher.return_value = Route([], 0, 0, None)
+
+    executor = executors.RouteExecutor(mocker.Mock(spec=builders.Graph), mode, workers=2, max_in_flight=2)
+
+    try:
+        result = await executor.build_route(**request_body)
+    finally:
+        executor.shutdown()
+
+    assert result == route_builder_patcher.return_value
+
+    if mode != 'process':
+        route_builder_patcher.assert_called_once_with(ANY, **request_body)
+
+
+def test_route_executor_with_invalid_mode(mocker):
+    """ Проверка возникновения ошибки при передаче неизвестного режима """
+    with pytest.raises(ValueError):
+        executors.RouteExecutor(mocker.sentinel.graph, 'not exist')
+
+
+@pytest.mark.parametrize('engine', ['networkx', 'dijkstra'])
+async def test_graph_leg_pool(mock_osm, engine):
+    """ Проверка построения участков маршрута постоянным пулом процессов графа """
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    graph.build()
+
+    coordinates = [[55.97999, 37.18581], [55.98006, 37.18981], [55.97863, 37.18954], [55.98100, 37.19000]]
+    expected = builders.build_route(graph, points_coordinates=coordinates)
+    graph.route_cache = None
+
+    graph.start_leg_pool(2)
+    executor = executors.RouteExecutor(graph, 'thread', workers=2, max_in_flight=2)
+
+    try:
+        results = await asyncio.gather(*(executor.build_route(points_coordinates=coordinates) for _ in range(4)))
+    finally:
+        executor.shutdown()
+        graph.shutdown_leg_pool()
+
+    assert all(result == expected for result in results)
+
+
+@pytest.mark.parametrize('mode', ['thread', 'process'])
+async def test_route_executor_update_graph(mock_osm, mode):
+    """ Проверка построения маршрутов по обновленному графу, в том числе процессами пулов, созданными до обновления """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.route_cache = None
+
+    coordinates = [[55.97999, 37.18581], [55.98006, 37.18981], [55.97863, 37.18954]]
+    route = builders.build_route(graph, points_coordinates=coordinates)
+    slower = [{'u': path[-2], 'v': path[-1], 'length': 1000.0} for path in route.paths]
+
+    graph.start_leg_pool(2)
+    executor = executors.RouteExecutor(graph, mode, workers=2, max_in_flight=2)
+
+    try:
+        result = await executor.run('update_graph', edges=slower)
+        updated_route = await executor.build_route(points_coordinates=coordinates)
+    finally:
+        executor.shutdown()
+        graph.shutdown_leg_pool()
+
+    assert result == utils.GraphUpdate(version=1, edges=len(slower), invalidated_routes=0)
+    assert updated_route == builders.build_route(graph, points_coordinates=coordinates)
+    assert isinstance(updated_route, utils.Route) and updated_route.paths != route.paths
+
+
+def test_graph_leg_pool_shutdown(mocker, mock_osm):
+    """ Проверка построения участков текущим потоком, если пул остановлен после получения поиском """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.start_leg_pool(1)
+
+    mocker.patch('concurrent.futures.ProcessPoolExecutor.map',
+                 side_effect=RuntimeError('cannot schedule new futures after shutdown'))
+    nodes = list(graph.graph.nodes)[:4]
+
+    try:
+        paths = graph.shortest_path(nodes[:2], nodes[2:])
+    finally:
+        graph.shutdown_leg_pool()
+
+    assert paths == [graph.shortest_path(orig, dest) for orig, dest in zip(nodes[:2], nodes[2:])]
+
+
+@pytest.mark.parametrize('mode', executors.EXECUTOR_MODES)
+async def test_route_executor_stream(mocker, mode):
+    """ Проверка передачи частей потока получателю по мере построения (в режиме process - после построения всех) """
+    received, built = [], []
+
+    def zones():
+        for zone in range(3):
+            yield zone
+            built.append(len(received))
+
+    mocker.patch('route_builder.isochrones.build_isochrones', side_effect=lambda graph, **_: utils.Stream(zones(), 3))
+    executor = executors.RouteExecutor(mocker.Mock(spec=builders.Graph), mode, workers=2, max_in_flight=2)
+
+    try:
+        result = await executor.run('build_isochrones', on_part=lambda part, count: received.append((part, count)))
+        listed = await executor.run('build_isochrones')
+    finally:
+        executor.shutdown()
+
+    assert result == utils.Stream([], 3)
+    assert received == [(0, 3), (1, 3), (2, 3)]
+    assert listed == utils.Stream([0, 1, 2], 3)
+
+    if mode != 'process':
+        assert built[:3] == [1, 2, 3]
@@ -0,0 +1,19 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Зависимости, которые загружаются только при построении графа из OSM или карты в формате html
+HEAVY_MODULES = ('osmnx', 'folium', 'geopandas', 'matplotlib', 'sklearn', 'shapely')
+
+
+@pytest.mark.parametrize('module', ['settings', 'route_builder.builders', 'listener.__main__'])
+def test_import_without_heavy_modules(module):
+    """ Проверка импорта модулей без тяжелых зависимостей (в отдельном процессе) """
+    script = f'import json, sys, {module}; print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))'
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True,
+                            cwd=Path(__file__).parent.parent).stdout
+
+    assert json.loads(output.splitlines()[-1]) == []
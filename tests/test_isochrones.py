@@ -0,0 +1,87 @@
+from typing import Iterator
+
+import networkx as nx
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from route_builder import builders, isochrones, utils
+from route_builder.csr import CSRGraph
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+POINT = [55.97999, 37.18581]
+
+
+@pytest.mark.parametrize('weight', ['length', 'travel_time'])
+def test_isochrones(random_graph, weight):
+    """ Проверка узлов зон в сравнении с networkx и охвата узлов полигонами """
+    csr = CSRGraph.from_graph(random_graph)
+    source = next(iter(random_graph.nodes))
+    thresholds = [30, 10, 60]
+
+    distances = nx.single_source_dijkstra_path_length(random_graph, source, cutoff=max(thresholds), weight=weight)
+    results = list(isochrones.isochrones(csr, csr.positions([source])[0], weight, thresholds))
+
+    assert [threshold for threshold, _, _ in results] == sorted(thresholds)
+
+    for threshold, nodes, polygon in results:
+        assert set(csr.to_node_ids(nodes)) == {node for node, distance in distances.items() if distance <= threshold}
+
+        if polygon is not None:
+            points = shapely.points(np.column_stack([csr.x[nodes], csr.y[nodes]]))
+            assert shapely.dwithin(shape(polygon), points, 1e-5).all()
+
+
+@pytest.mark.parametrize('kind', isochrones.HULLS)
+def test_hull(kind):
+    """ Проверка полигона оболочки и вырожденных наборов точек """
+    lons, lats = np.array([0.0, 1.0, 1.0, 0.0, 0.5]), np.array([0.0, 0.0, 1.0, 1.0, 0.5])
+
+    polygon = shape(isochrones.hull(lons, lats, kind))
+
+    assert 0 < polygon.area <= 1.0 + 1e-9
+    assert shapely.dwithin(polygon, shapely.points(np.column_stack([lons, lats])), 1e-9).all()
+    assert isochrones.hull(lons[:2], lats[:2], kind) is None
+    assert isochrones.hull(np.array([0.0, 1.0, 2.0]), np.array([0.0, 1.0, 2.0]), kind) is None
+
+
+def test_build_isochrones(mock_osm):
+    """ Проверка построения зон достижимости от точки """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    result = isochrones.build_isochrones(graph, point_coordinates=POINT, thresholds=[20, 5, 10], with_nodes=True)
+
+    assert isinstance(result, utils.Isochrones)
+    assert result.optimizer == 'travel_time'
+    assert [isochrone.threshold for isochrone in result.isochrones] == [5, 10, 20]
+    assert all(isochrone.nodes_count == len(isochrone.nodes) for isochrone in result.isochrones)
+    assert all(set(smaller.nodes) <= set(larger.nodes)
+               for smaller, larger in zip(result.isochrones[:-1], result.isochrones[1:]))
+    assert result.origin in result.isochrones[0].nodes
+
+    streamed = isochrones.build_isochrones(graph, stream=True, point_coordinates=POINT, thresholds=[20, 5, 10])
+    assert isinstance(streamed, utils.Stream) and streamed.count == 3
+    assert isinstance(streamed.parts, Iterator)
+
+    parts = list(streamed.parts)
+    assert [isochrone.polygon for isochrone in parts] == [isochrone.polygon for isochrone in result.isochrones]
+    assert all(isochrone.nodes is None for isochrone in parts)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'point_coordinates': POINT, 'thresholds': []},
+    {'point_coordinates': POINT, 'thresholds': [-1]},
+    {'point_coordinates': POINT, 'thresholds': [10], 'optimizer': 'speed'},
+    {'point_coordinates': POINT, 'thresholds': [10], 'hull': 'circle'},
+    {'point_coordinates': [0, 0], 'thresholds': [10]},
+])
+def test_build_isochrones_exception(mock_osm, kwargs):
+    """ Проверка возврата ошибки при некорректной конфигурации зон """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    assert isinstance(isochrones.build_isochrones(graph, **kwargs), utils.Error)
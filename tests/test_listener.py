@@ -5,7 +5,7 @@ from unittest.mock import ANY
 
 import pytest
 
-from route_builder.utils import Route, Error
+from route_builder.utils import Route, Matrix, Error
 
 
 REQUESTS = [
@@ -35,6 +35,31 @@ async def test_listener(mocker, mock_geo, server, publisher, consumer, request_b
     consumer.process_message.assert_called_once_with(asdict(route_builder_patcher.return_value))
 
 
+async def test_listener_matrix(mocker, mock_geo, server, publisher, consumer):
+    """ Проверка rpc-модуля с запросом матриц """
+    matrix_builder_patcher = mocker.patch('route_builder.matrix.build_matrix')
+    matrix_builder_patcher.return_value = Matrix([[0.0]], [[0.0]])
+
+    request_body = {'sources': [[55.97999, 37.18581]], 'destinations': [[55.97863, 37.18954]]}
+    await publisher.publish({'type': 'matrix', **request_body})
+
+    await asyncio.sleep(2)
+
+    matrix_builder_patcher.assert_called_once_with(ANY, **request_body)
+
+    consumer.process_message.assert_called_once_with(asdict(matrix_builder_patcher.return_value))
+
+
+async def test_listener_unknown_type(mock_geo, server, publisher, consumer):
+    """ Проверка rpc-модуля с неизвестным типом запроса """
+    await publisher.publish({'type': 'not exist'})
+
+    await asyncio.sleep(2)
+
+    consumer.process_message.assert_called_once()
+    assert 'error_details' in consumer.process_message.call_args[0][0]
+
+
 @pytest.mark.geo
 @pytest.mark.parametrize('request_body', REQUESTS)
 async def test_listener_with_builder(disable_osmnx_cache, disable_osmnx_logs,
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from route_builder import builders, utils
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+COORDINATES = [(55.97999, 37.18581), (55.98006, 37.18981), (55.97863, 37.18954)]
+
+
+def _decode_polyline(polyline: str, precision: int = 5):
+    """ Декодирование Encoded Polyline в список (широта, долгота) """
+    values, value, shift = [], 0, 0
+
+    for char in polyline:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    points, latitude, longitude = [], 0, 0
+    for delta_latitude, delta_longitude in zip(values[::2], values[1::2]):
+        latitude, longitude = latitude + delta_latitude, longitude + delta_longitude
+        points.append((latitude / 10 ** precision, longitude / 10 ** precision))
+
+    return points
+
+
+def test_encode_polyline():
+    """ Проверка кодирования линии на примере из описания формата """
+    lons, lats = [-120.2, -120.95, -126.453], [38.5, 40.7, 43.252]
+    assert utils.encode_polyline(lons, lats) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+@pytest.mark.parametrize('coordinates', [COORDINATES[:2], COORDINATES])
+def test_route_map_formats(mock_osm, coordinates):
+    """ Проверка форматов карты маршрута: все форматы строятся по одним и тем же узлам """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    route = builders.build_route(graph, points_coordinates=coordinates)
+    if isinstance(route, utils.Error):
+        pytest.skip('Маршрут не существует в случайном графе')
+
+    legs = route.paths if isinstance(route.paths[0], list) else [route.paths]
+    path = legs[0] + [node for leg in legs[1:] for node in leg[1:]]
+    lons, lats = graph.csr.coordinates(path)
+
+    geojson = builders.build_route(graph, points_coordinates=coordinates, with_map=True, map_format='geojson').map
+    assert geojson['geometry']['type'] == ('LineString' if len(legs) == 1 else 'MultiLineString')
+    assert json.loads(json.dumps(geojson)) == geojson
+
+    polyline = builders.build_route(graph, points_coordinates=coordinates, with_map=True, map_format='polyline').map
+    assert _decode_polyline(polyline) == [(round(lat, 5), round(lon, 5)) for lat, lon in zip(lats, lons)]
+
+    html = builders.build_route(graph, points_coordinates=coordinates, with_map=True).map
+    assert html.startswith('<!DOCTYPE html>')
+
+    assert builders.build_route(graph, points_coordinates=coordinates, map_format='geojson').map is None
+
+
+def test_route_map_with_unknown_format(mock_osm):
+    """ Проверка ошибки при неизвестном формате карты """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+
+    route = builders.build_route(graph, points_coordinates=COORDINATES, with_map=True, map_format='not exist')
+    assert isinstance(route, utils.Error)
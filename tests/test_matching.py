@@ -0,0 +1,117 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from route_builder import builders, matching, utils
+from route_builder.heuristics import haversine
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+# Широта и первый узел улиц A, C и B: A и C соединены только на концах, B не связана с ними
+STREETS = ((55.978, 0), (55.9785, 100), (55.982, 200))
+STEP = 0.0006
+
+
+def _streets() -> nx.MultiDiGraph:
+    """ Граф трех параллельных двусторонних улиц по 11 узлов с длиной ребер по расстоянию между узлами """
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+
+    for lat, first in STREETS:
+        for index in range(11):
+            graph.add_node(first + index, x=37.184 + index * STEP, y=lat)
+
+    def _connect(orig: int, dest: int) -> None:
+        lat, lon = np.radians([graph.nodes[orig]['y'], graph.nodes[dest]['y']]), \
+            np.radians([graph.nodes[orig]['x'], graph.nodes[dest]['x']])
+        length = float(haversine(lat[0], lon[0], lat[1], lon[1]))
+
+        for first, second in ((orig, dest), (dest, orig)):
+            graph.add_edge(first, second, length=length, travel_time=length / 10)
+
+    for _, first in STREETS:
+        for index in range(10):
+            _connect(first + index, first + index + 1)
+
+    _connect(0, 100)
+    _connect(10, 110)
+
+    return graph
+
+
+def _graph() -> builders.Graph:
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build(_streets())
+    return graph
+
+
+def test_match_trace_streets():
+    """ Проверка привязки: точки ближе к соседней улице остаются на улице трека, несвязанная часть - новый участок """
+    graph = _graph()
+
+    # Точки 3 и 5 смещены на 30 м к улице C: ближайший узел - на улице C
+    trace = [[55.978 + (0.00027 if index in (3, 5) else 0.00002), 37.184 + index * STEP + 0.0001]
+             for index in range(2, 9)]
+    trace += [[55.98203, 37.184 + index * STEP] for index in range(3, 6)]
+
+    assert graph.nearest_nodes([trace[3][1]], [trace[3][0]]) == [105]
+
+    result = matching.match_trace(graph, points_coordinates=trace, with_map=True, map_format='geojson')
+
+    assert isinstance(result, utils.Match)
+    assert result.nodes == [2, 3, 4, 5, 6, 7, 8, 203, 204, 205]
+    assert result.paths == [[2, 3, 4, 5, 6, 7, 8], [203, 204, 205]]
+    assert result.length == pytest.approx(graph.path_sums(result.paths)[0]['length'] +
+                                          graph.path_sums(result.paths)[1]['length'])
+    assert result.map['geometry']['type'] == 'MultiLineString'
+
+
+def test_match_chunks():
+    """ Проверка совпадения результата при поиске переходов частями разного размера """
+    graph = _graph()
+    csr = graph.csr
+
+    lons = 37.184 + np.linspace(0, 10 * STEP, 40)
+    lats = 55.978 + np.random.default_rng(0).normal(0, 0.00005, len(lons))
+
+    positions, distances = graph.node_index.candidates(lons, lats, matching.CANDIDATES, matching.RADIUS)
+    candidates = np.where(positions >= 0,
+                          np.reshape(csr.positions(graph.node_index.node_ids[positions].ravel()), positions.shape), -1)
+    steps = matching.step_distances(lons, lats)
+
+    results = [matching.match(csr, candidates, distances, steps, matching.MatchParams(chunk=chunk))
+               for chunk in (1, 7, 64)]
+
+    for matched, starts in results:
+        assert starts == [0]
+        assert csr.to_node_ids(matched) == csr.to_node_ids(results[0][0])
+        assert set(csr.to_node_ids(matched)) <= set(range(11))
+
+
+def test_match_trace_random_graph(mock_osm):
+    """ Проверка привязки трека по узлам пути: выбираются узлы пути, длина не больше длины пути """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    route = builders.build_route(graph, points_coordinates=[[55.97999, 37.18581], [55.97863, 37.18954]])
+    lons, lats = graph.csr.coordinates(route.paths)
+
+    result = matching.match_trace(graph, points_coordinates=list(zip(lats, lons)), sigma=0.1, with_map=True,
+                                  map_format='polyline')
+
+    assert result.nodes == route.paths
+    assert result.paths[0] == route.paths[0] and result.paths[-1] == route.paths[-1]
+    assert result.length <= graph.path_sums([route.paths])[0]['length'] + 1e-9
+    assert isinstance(result.map, str)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'points_coordinates': [[55.97999, 37.18581]]},
+    {'points_coordinates': [[55.97999, 37.18581], [55.99, 37.18954]]},
+    {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]], 'sigma': 0},
+    {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]], 'radius': '50'},
+    {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]], 'candidates': 0},
+])
+def test_match_trace_exception(kwargs):
+    """ Проверка возврата ошибки при некорректной конфигурации привязки """
+    assert isinstance(matching.match_trace(_graph(), **kwargs), utils.Error)
@@ -0,0 +1,88 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+import settings
+from route_builder import builders, matrix, trees, utils
+from route_builder.csr import CSRGraph
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+def _networkx_matrices(graph, sources, targets, optimizer):
+    """ Матрицы networkx: вес поиска и другой атрибут, суммированный вдоль того же пути """
+    other = 'travel_time' if optimizer == 'length' else 'length'
+    matrices = {attribute: np.full((len(sources), len(targets)), np.inf) for attribute in (optimizer, other)}
+
+    for row, source in enumerate(sources):
+        distances, paths = nx.single_source_dijkstra(graph, source, weight=optimizer)
+
+        for column, target in enumerate(targets):
+            if target in distances:
+                matrices[optimizer][row, column] = distances[target]
+                matrices[other][row, column] = sum(min(graph[orig][dest].values(), key=lambda data: data[optimizer])[other]
+                                                   for orig, dest in zip(paths[target][:-1], paths[target][1:]))
+
+    return matrices
+
+
+@pytest.mark.parametrize('workers, chunk_size', [(1, trees.TREE_CHUNK_SIZE), (3, trees.TREE_CHUNK_SIZE), (3, 2)])
+@pytest.mark.parametrize('optimizer', ['length', 'travel_time'])
+def test_distance_matrix(monkeypatch, random_graph, workers, chunk_size, optimizer):
+    """ Проверка матриц кратчайших путей в сравнении с networkx, в том числе при поиске частями """
+    monkeypatch.setattr(trees, 'TREE_CHUNK_SIZE', chunk_size)
+    monkeypatch.setattr(settings, 'MATRIX_WORKERS', workers)
+    csr = CSRGraph.from_graph(random_graph)
+    nodes = list(random_graph.nodes)
+    sources, targets = nodes[:7], nodes[-5:]
+
+    matrices = trees.distance_matrix(csr, csr.positions(sources), csr.positions(targets), optimizer,
+                                     ('length', 'travel_time'))
+
+    for attribute, expected in _networkx_matrices(random_graph, sources, targets, optimizer).items():
+        assert matrices[attribute] == pytest.approx(expected)
+
+
+def test_target_distances(monkeypatch, random_graph):
+    """ Проверка расстояний до конечных узлов, сведенных в каждой части поиска, в сравнении с деревьями целиком """
+    monkeypatch.setattr(trees, 'TREE_CHUNK_SIZE', 2)
+    csr = CSRGraph.from_graph(random_graph)
+    sources, targets = list(range(7)), list(range(csr.nodes_count - 5, csr.nodes_count))
+
+    distances = trees.target_distances(csr, sources, targets, 'length', workers=2)
+    assert distances.shape == (len(sources), len(targets))
+    assert distances == pytest.approx(trees.shortest_path_trees(csr, sources, 'length', workers=1)[0][:, targets])
+
+
+def test_build_matrix(mock_osm):
+    """ Проверка построения матриц по координатам """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    points = [[55.97999, 37.18581], [55.97863, 37.18954], [55.98100, 37.19000]]
+
+    result = matrix.build_matrix(graph, sources=points, destinations=points[:2])
+
+    assert isinstance(result, utils.Matrix)
+    assert len(result.length) == 3 and all(len(row) == 2 for row in result.length)
+    assert len(result.travel_time) == 3 and all(len(row) == 2 for row in result.travel_time)
+
+    assert result.length[0][0] == 0 and result.travel_time[1][1] == 0
+
+    # матрица совпадает с маршрутом между теми же точками (если маршрут существует)
+    route = builders.build_route(graph, points_coordinates=points[:2])
+    if isinstance(route, utils.Route):
+        assert result.length[0][1] == pytest.approx(route.length)
+    else:
+        assert result.length[0][1] is None
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'sources': [], 'destinations': [[55.97999, 37.18581]]},
+    {'sources': [[55.97999, 37.18581]], 'destinations': [[1, 1]]},
+    {'sources': [[55.97999, 37.18581]], 'destinations': [[55.97999, 37.18581]], 'optimizer': 'not exist'},
+])
+def test_build_matrix_exception(mock_osm, kwargs):
+    """ Проверка ошибок построения матриц """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+
+    assert isinstance(matrix.build_matrix(graph, **kwargs), utils.Error)
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from route_builder import builders, executors, metrics, utils
+from route_builder.profiling import SamplingProfiler, collapse
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+request_body = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]], 'with_map': True,
+                'map_format': 'polyline'}
+
+STAGES = ('validation', 'snap', 'shortest_path', 'edge_sums', 'map')
+
+
+def test_histogram_exposition():
+    """ Проверка накопительных корзин, суммы и количества гистограммы в формате Prometheus """
+    histogram = metrics.Histogram('test_seconds', 'Тестовая гистограмма', ('stage',), buckets=(0.1, 1.0))
+    metrics.REGISTRY.remove(histogram)
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage='snap')
+
+    assert histogram.count(stage='snap') == 4
+    assert histogram.expose() == [
+        '# HELP test_seconds Тестовая гистограмма',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{stage="snap",le="0.1"} 2',
+        'test_seconds_bucket{stage="snap",le="1.0"} 3',
+        'test_seconds_bucket{stage="snap",le="+Inf"} 4',
+        'test_seconds_sum{stage="snap"} 2.65',
+        'test_seconds_count{stage="snap"} 4',
+    ]
+
+
+def test_recording():
+    """ Проверка записи этапов для передачи из дочернего процесса и их добавления в гистограмму """
+    before = metrics.STAGE_SECONDS.count(stage='test')
+
+    with metrics.recording() as observations:
+        with metrics.stage('test'):
+            pass
+
+    metrics.replay(observations)
+
+    assert [name for name, _ in observations] == ['test']
+    assert metrics.STAGE_SECONDS.count(stage='test') == before + 2
+
+
+@pytest.mark.parametrize('mode', executors.EXECUTOR_MODES)
+async def test_route_executor_stages(mock_osm, mode):
+    """ Проверка метрик этапов построения маршрута во всех режимах исполнителя """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.route_cache = None
+
+    before = {name: metrics.STAGE_SECONDS.count(stage=name) for name in STAGES}
+    requests = metrics.REQUEST_SECONDS.count(operation='build_route')
+
+    executor = executors.RouteExecutor(graph, mode, workers=1, max_in_flight=1)
+
+    try:
+        result = await executor.build_route(**request_body)
+    finally:
+        executor.shutdown()
+
+    assert isinstance(result, utils.Route)
+    assert all(metrics.STAGE_SECONDS.count(stage=name) > before[name] for name in STAGES)
+    assert metrics.REQUEST_SECONDS.count(operation='build_route') == requests + 1
+    assert metrics.IN_FLIGHT.value() == 0
+
+
+async def test_metrics_server():
+    """ Проверка ответа HTTP-сервера метрик """
+    server = await metrics.start_server(0, '127.0.0.1')
+    port = server.sockets[0].getsockname()[1]
+
+    async def get(path: str) -> bytes:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+
+    try:
+        response = await get('/metrics')
+        missing = await get('/')
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert response.startswith(b'HTTP/1.1 200 OK')
+    assert b'# TYPE route_builder_stage_seconds histogram' in response
+    assert missing.startswith(b'HTTP/1.1 404')
+
+
+def _slow():
+    """ Медленная функция для профилирования """
+    time.sleep(0.1)
+
+
+def test_sampling_profiler(tmp_path):
+    """ Проверка сохранения свернутых стеков только для медленных запросов """
+    profiler = SamplingProfiler(50, str(tmp_path), interval_ms=1)
+
+    with profiler.profile('fast'):
+        pass
+
+    with profiler.profile('slow'):
+        _slow()
+
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1 and '_slow_' in files[0].name
+
+    lines = files[0].read_text(encoding='utf-8').splitlines()
+    stack, count = lines[0].rsplit(' ', 1)
+    assert 'test_metrics.py:_slow' in stack and int(count) > 0
+
+
+def test_sampling_profiler_thread(tmp_path):
+    """ Проверка работы потока семплирования только при открытых окнах профилирования """
+    def samplers() -> int:
+        return sum(thread.name == 'route-builder-profiler' for thread in threading.enumerate())
+
+    profiler = SamplingProfiler(50, str(tmp_path), interval_ms=1)
+    assert samplers() == 0
+
+    with profiler.profile('fast'):
+        assert samplers() == 1
+
+    time.sleep(0.05)
+    assert samplers() == 0
+
+    with profiler.profile('slow'):
+        _slow()
+
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_sampling_profiler_with_invalid_interval(tmp_path):
+    """ Проверка возникновения ошибки при неположительном интервале """
+    with pytest.raises(ValueError):
+        SamplingProfiler(50, str(tmp_path), interval_ms=0)
+
+
+def test_collapse():
+    """ Проверка порядка вызовов свернутого стека: от корня к текущему кадру """
+    def inner():
+        import sys  # pylint: disable=import-outside-toplevel
+        return collapse(sys._getframe())  # pylint: disable=protected-access
+
+    assert inner().endswith('test_metrics.py:test_collapse;test_metrics.py:inner')
@@ -0,0 +1,64 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from route_builder import builders, ordering, utils
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+def _costs(count: int, seed: int):
+    """ Несимметричная матрица стоимостей между случайными точками """
+    generator = random.Random(seed)
+    points = [(generator.random(), generator.random()) for _ in range(count)]
+    return [[math.dist(orig, dest) * (1 if index < other else 1.3) for other, dest in enumerate(points)]
+            for index, orig in enumerate(points)]
+
+
+@pytest.mark.parametrize('count', range(2, ordering.EXACT_LIMIT))
+def test_solve_order_exact(count):
+    """ Проверка точного порядка обхода в сравнении с перебором """
+    costs = _costs(count, count)
+    order = ordering.solve_order(costs)
+
+    best = min(ordering.order_cost(costs, [0, *permutation]) for permutation in itertools.permutations(range(1, count)))
+    assert order[0] == 0 and sorted(order) == list(range(count))
+    assert ordering.order_cost(costs, order) == pytest.approx(best)
+
+
+@pytest.mark.parametrize('count', [ordering.EXACT_LIMIT + 1, 30, 60])
+def test_solve_order_heuristic(count):
+    """ Проверка эвристического порядка обхода: улучшения не ухудшают ближайшего соседа """
+    costs = _costs(count, count)
+    order = ordering.solve_order(costs, time_budget=1)
+
+    assert order[0] == 0 and sorted(order) == list(range(count))
+    assert ordering.order_cost(costs, order) <= ordering.order_cost(costs, ordering.nearest_neighbour(costs))
+
+
+def test_solve_order_without_path():
+    """ Проверка ошибки, если точку невозможно посетить """
+    costs = _costs(4, 0)
+    for row in costs:
+        row[3] = math.inf
+
+    with pytest.raises(ValueError):
+        ordering.solve_order(costs)
+
+
+def test_route_builder_optimize_order(mock_osm):
+    """ Проверка маршрута с оптимизацией порядка точек: не длиннее маршрута в исходном порядке """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    coordinates = [[55.97999, 37.18581], [55.98200, 37.19200], [55.97863, 37.18954], [55.97700, 37.18400],
+                   [55.98006, 37.18981]]
+
+    route = builders.build_route(graph, points_coordinates=coordinates)
+    optimized = builders.build_route(graph, points_coordinates=coordinates, optimize_order=True)
+
+    if isinstance(route, utils.Route):
+        assert isinstance(optimized, utils.Route)
+        assert optimized.length <= route.length + 1e-6
+        assert optimized.paths[0][0] == route.paths[0][0]
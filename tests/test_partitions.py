@@ -0,0 +1,257 @@
+import asyncio
+import time
+from itertools import chain
+
+import aio_pika
+import pytest
+
+import settings
+from listener import coordinator
+from listener.__main__ import MESSAGE_TYPES, run
+from route_builder import boundaries, builders, codecs, deadlines, executors, partitions, utils
+from tests.broker import InMemoryBroker
+from tests.utils import random_graph
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+TILES = partitions.grid_tiles(bbox, 2, 2)
+REPLY_QUEUE = f'{settings.APP_NAME}:partition_reply'
+
+
+def _partition_graphs(source) -> dict:
+    """ Графы разделов случайного графа """
+    graphs = {}
+
+    for name, partition in partitions.split(source, TILES).items():
+        graphs[name] = builders.Graph(TILES[name], 'drive', engine='dijkstra')
+        graphs[name].build(partition.graph)
+        graphs[name].partition = partition
+
+    return graphs
+
+
+def _call(graphs: dict):
+    """ Вызов операции раздела напрямую с кодированием запроса и ответа и сроком запроса, как через брокер """
+    codec = codecs.get_codec()
+
+    async def call(name: str, request: dict) -> dict:
+        request = codec.decode(codec.encode(request))
+        operation = executors.operation_function(MESSAGE_TYPES[request.pop('type')])
+
+        try:
+            with deadlines.scope(request.pop('deadline', None)):
+                response = operation(graphs[name], **request)
+        except deadlines.DeadlineExceeded as ex:
+            response = utils.Error(str(ex))
+
+        return codec.decode(codec.encode(response))
+
+    return call
+
+
+def test_grid_tiles():
+    """ Проверка разбиения зоны: разделы покрывают зону, точка на общей границе относится к одному разделу """
+    tiles = partitions.grid_tiles(bbox, 2, 3)
+
+    assert len(tiles) == 6
+    assert tiles['0_0'].south == bbox.south and tiles['1_2'].north == bbox.north
+    assert tiles['0_0'].north == tiles['1_0'].south
+
+    middle = (bbox.north + bbox.south) / 2
+    assert partitions.assign(tiles, [bbox.west, bbox.west, bbox.east + 1], [middle, bbox.north, middle]) == \
+        ['0_0', '1_0', None]
+
+    with pytest.raises(ValueError):
+        partitions.grid_tiles(bbox, 0, 2)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_split(seed):
+    """ Проверка разбиения графа: каждый узел в одном разделе, ребра между разделами - исходящие ребра границы """
+    source = random_graph(seed)
+    parts = partitions.split(source, TILES)
+
+    assert sum(len(partition.graph) for partition in parts.values()) == len(source)
+
+    owners = {node: name for name, partition in parts.items() for node in partition.graph}
+    cut_edges = {(orig, dest) for orig, dest in source.edges() if owners[orig] != owners[dest]}
+
+    assert cut_edges == {(orig, dest) for partition in parts.values() for orig, dest, _, _ in partition.cut_edges}
+    assert all(orig in parts[owners[orig]].boundary and dest in parts[owners[dest]].boundary
+               for orig, dest in cut_edges)
+
+
+def test_load_partition_long_edges(mocker):
+    """ Проверка загрузки раздела: ребро длиннее расширения зоны раздела не теряется ни одним из разделов """
+    source = random_graph(0)
+    nodes = sorted(source.nodes, key=lambda node: source.nodes[node]['x'])
+    west, east = nodes[0], nodes[-1]
+    source.add_edge(west, east, length=700.0, travel_time=50.0)
+    margins = []
+
+    def download(area: utils.Bbox, _network_type, truncate_by_edge: bool = False):
+        # Обрезка графа зоной загрузки, как в osmnx: с truncate_by_edge сохраняются соседи узлов зоны
+        nodes = {node for node, data in source.nodes(data=True)
+                 if area.south <= data['y'] <= area.north and area.west <= data['x'] <= area.east}
+        if truncate_by_edge:
+            nodes |= {neighbour for node in nodes for neighbour in chain(source.succ[node], source.pred[node])}
+
+        margins.append(area)
+        return source.subgraph(nodes).copy()
+
+    mocker.patch('route_builder.builders.download_graph', side_effect=download)
+    mocker.patch.object(settings, 'PARTITION_MARGIN', 10)
+
+    expected = partitions.split(source, TILES)
+
+    for name, partition in expected.items():
+        margins.clear()
+        loaded = coordinator.load_partition(name, TILES).partition
+
+        assert set(loaded.graph.nodes) == set(partition.graph.nodes)
+        assert sorted(loaded.cut_edges) == sorted(partition.cut_edges)
+        assert sorted(loaded.boundary) == sorted(partition.boundary)
+        assert len(margins) > 1 and margins[-1].west < margins[0].west
+
+    assert (west, east, 700.0, 50.0) in expected[partitions.assign(TILES, [source.nodes[west]['x']],
+                                                                   [source.nodes[west]['y']])[0]].cut_edges
+
+    bbox_10 = partitions.margin_bbox(TILES['0_0'], 10)
+    assert partitions.escaping_edges(source, expected['0_0'].graph.nodes, bbox_10) > 0
+    assert partitions.escaping_edges(source, expected['0_0'].graph.nodes, bbox) == 0
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('optimizer', ['length', 'travel_time'])
+async def test_partition_router(seed, optimizer):
+    """ Проверка маршрутов по разделам: веса совпадают с маршрутами по графу региона, в том числе для пути через узлы """
+    source = random_graph(seed)
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build(source)
+
+    router = coordinator.PartitionRouter(TILES, _call(_partition_graphs(source)))
+    await router.load()
+
+    nodes = list(source.nodes)
+    points = [[source.nodes[node]['y'], source.nodes[node]['x']] for node in nodes[::7]]
+    routes = 0
+
+    for index in range(len(points) - 2):
+        coordinates = points[index:index + 3]
+        expected = builders.build_route(graph, points_coordinates=coordinates, optimizer=optimizer)
+
+        if isinstance(expected, utils.Error):
+            with pytest.raises(ValueError):
+                await router.build_route(coordinates, optimizer=optimizer)
+            continue
+
+        route = await router.build_route(coordinates, optimizer=optimizer, with_map=True, map_format='geojson')
+        routes += 1
+
+        assert getattr(route, optimizer) == pytest.approx(getattr(expected, optimizer))
+        assert [path[0] for path in route.paths] == [path[0] for path in expected.paths]
+        assert [path[-1] for path in route.paths] == [path[-1] for path in expected.paths]
+        assert [len(line) for line in route.map['geometry']['coordinates']] == [len(path) for path in route.paths]
+        assert sum(graph.path_sums(route.paths, optimizer)[index][optimizer] for index in range(2)) == \
+            pytest.approx(getattr(expected, optimizer))
+
+    assert routes
+
+
+async def test_partition_router_errors():
+    """ Проверка ошибок маршрутов по разделам """
+    graphs = _partition_graphs(random_graph(0))
+    router = coordinator.PartitionRouter(TILES, _call(graphs))
+    await router.load()
+
+    points = [[55.97999, 37.18581], [55.97863, 37.18954]]
+
+    for kwargs in ({'optimize_order': True}, {'with_map': True}, {'optimizer': 'speed'}):
+        with pytest.raises(ValueError):
+            await router.build_route(points, **kwargs)
+
+    with pytest.raises(ValueError):
+        await router.build_route(points[:1])
+
+    with pytest.raises(ValueError):
+        await router.build_route([points[0], [56.5, 37.18954]])
+
+    codec = codecs.get_codec()
+    assert 'error_details' in codec.decode(codec.encode(boundaries.partition_overlay(
+        builders.Graph(bbox, 'drive', engine='dijkstra'))))
+
+
+async def test_partition_router_deadline():
+    """ Проверка срока маршрута по разделам: срок передается разделам, истекший срок прерывает построение """
+    call = _call(_partition_graphs(random_graph(0)))
+    requested = []
+
+    async def recorded_call(name: str, request: dict) -> dict:
+        requested.append(request.get('deadline'))
+        return await call(name, request)
+
+    router = coordinator.PartitionRouter(TILES, recorded_call)
+    await router.load()
+
+    points = [[55.97999, 37.18581], [55.97863, 37.18954]]
+    deadline = time.time() + 60
+    await router.build_route(points, deadline=deadline)
+
+    assert requested[len(TILES):] and set(requested[len(TILES):]) == {deadline}
+
+    with pytest.raises(deadlines.DeadlineExceeded):
+        await router.build_route(points, deadline=time.time() - 1)
+
+
+async def test_coordinator_in_memory_broker(mocker):
+    """ Проверка координатора и listener'ов разделов без RabbitMQ: ответ совпадает с маршрутом по графу региона """
+    mocker.patch.object(settings, 'RMQ_BATCH_SIZE', 1)
+    source = random_graph(0)
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build(source)
+
+    nodes = list(source.nodes)
+    points = [[source.nodes[node]['y'], source.nodes[node]['x']] for node in (nodes[0], nodes[-1])]
+    expected = builders.build_route(graph, points_coordinates=points)
+
+    broker = InMemoryBroker()
+    replies = asyncio.Queue()
+
+    async def receive(message) -> None:
+        async with message.process():
+            await replies.put((message.correlation_id, codecs.get_codec().decode(message.body)))
+
+    servers = [asyncio.create_task(run(partition_graph, broker.connect_robust, coordinator.partition_queue(name)))
+               for name, partition_graph in _partition_graphs(source).items()]
+    servers.append(asyncio.create_task(coordinator.run(TILES, broker.connect_robust)))
+
+    try:
+        await broker.queue(REPLY_QUEUE).consume(receive)
+        await asyncio.wait_for(broker.queue(settings.RMQ_QUEUE).consumed.wait(), 10)
+
+        for correlation_id, request in (('route', {'points_coordinates': points}),
+                                        ('matrix', {'type': 'matrix', 'points_coordinates': points}),
+                                        ('deadline', {'points_coordinates': points, 'deadline': time.time() + 60}),
+                                        ('expired', {'points_coordinates': points, 'deadline': time.time() - 1})):
+            await broker.publish(aio_pika.Message(body=codecs.get_codec().encode(request), reply_to=REPLY_QUEUE,
+                                                  correlation_id=correlation_id), settings.RMQ_QUEUE)
+
+        received = {}
+        for _ in range(4):
+            correlation_id, reply = await asyncio.wait_for(replies.get(), 10)
+            received[correlation_id] = reply
+    finally:
+        for server in servers:
+            server.cancel()
+
+        await asyncio.gather(*servers, return_exceptions=True)
+        broker.close()
+
+    if isinstance(expected, utils.Error):
+        assert 'error_details' in received['route']
+    else:
+        assert received['route']['length'] == pytest.approx(expected.length)
+
+    assert received['deadline'] == received['route']
+    assert 'error_details' in received['matrix']
+    assert received['expired'] == {'error_details': deadlines.EXPIRED}
@@ -0,0 +1,117 @@
+import threading
+from unittest.mock import ANY
+
+import pytest
+
+from route_builder import builders, executors, registry, utils
+from route_builder.registry import GraphRegistry
+from route_builder.utils import Route
+
+
+REGIONS = {
+    'first': utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280),
+    'second': utils.Bbox(55.99323, 55.98630, 37.20288, 37.19280),
+}
+
+
+def test_registry_lazy_loading(mock_osm):
+    """ Проверка загрузки графа при первом запросе и повторного использования загруженного графа """
+    graphs = GraphRegistry(REGIONS, default_network_type='drive')
+    mock_osm.assert_not_called()
+
+    graph = graphs.get('first')
+    assert graphs.get('first', 'drive') is graph
+    assert graphs.get('first', 'walk') is not graph
+    assert mock_osm.call_count == 2
+
+    stats = {(item['region'], item['network_type']): item for item in graphs.stats()}
+    assert stats[('first', 'drive')]['hits'] == 2
+    assert stats[('first', 'walk')]['load_seconds'] >= 0
+
+
+def test_registry_concurrent_loading(mock_osm):
+    """ Проверка единственной загрузки графа при одновременных запросах """
+    graphs = GraphRegistry(REGIONS)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(graphs.get('second', 'drive'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_osm.call_count == 1
+    assert all(graph is results[0] for graph in results)
+
+
+def test_registry_eviction(mock_osm):
+    """ Проверка вытеснения давно не использованных графов при превышении бюджета памяти """
+    graphs = GraphRegistry(REGIONS)
+    first = graphs.get('first', 'drive')
+    assert graphs.memory_bytes == first.nbytes > 0
+
+    graphs.memory_budget = int(first.nbytes * 2.5)
+    graphs.get('second', 'drive')
+    graphs.get('first', 'drive')
+    graphs.get('first', 'walk')
+
+    assert len(graphs) == 2 and graphs.evictions == 1
+    assert {(item['region'], item['network_type']) for item in graphs.stats()} == {('first', 'drive'),
+                                                                                  ('first', 'walk')}
+    assert graphs.get('first', 'drive') is first
+
+
+def test_registry_eviction_with_leg_pool(mock_osm):
+    """ Проверка построения участков маршрута графом, пул которого остановлен при вытеснении """
+    graphs = GraphRegistry(REGIONS, memory_budget=1)
+    first = graphs.get('first', 'drive')
+    first.engine = 'dijkstra'
+    first.start_leg_pool(1)
+
+    nodes = list(first.graph.nodes)[:4]
+    indexes = first.indexes()
+    graphs.get('second', 'drive')
+
+    assert graphs.evictions == 1
+    assert first.shortest_path(nodes[:2], nodes[2:], indexes=indexes) == \
+        [first.shortest_path(orig, dest) for orig, dest in zip(nodes[:2], nodes[2:])]
+
+
+@pytest.mark.parametrize('region, network_type', [('not exist', 'drive'), ('first', 'not exist'), (None, 'drive')])
+def test_registry_with_invalid_key(region, network_type):
+    """ Проверка ошибки при неизвестном регионе или типе связей """
+    with pytest.raises(ValueError):
+        GraphRegistry(REGIONS).get(region, network_type)
+
+
+def test_registry_default_region(mock_osm):
+    """ Проверка выбора региона default для запросов без region """
+    graphs = GraphRegistry({**REGIONS, registry.DEFAULT_REGION: REGIONS['first']})
+    assert graphs.key() == (registry.DEFAULT_REGION, builders.Graph.network_type)
+
+
+async def test_route_executor_with_registry(mocker, mock_osm):
+    """ Проверка выбора графа исполнителем по полям запроса region и network_type """
+    route_builder_patcher = mocker.patch('route_builder.builders.build_route')
+    route_builder_patcher.return_value = Route([], 0, 0, None)
+
+    graphs = GraphRegistry(REGIONS)
+    executor = executors.RouteExecutor(graphs, 'sync')
+
+    request_body = {'points_coordinates': [[55.97999, 37.18581], [55.97863, 37.18954]]}
+    assert await executor.build_route(region='first', network_type='drive', **request_body) == Route([], 0, 0, None)
+    route_builder_patcher.assert_called_once_with(graphs.get('first', 'drive'), **request_body)
+
+    error = await executor.build_route(region='not exist', **request_body)
+    assert isinstance(error, utils.Error)
+    route_builder_patcher.assert_called_once_with(ANY, **request_body)
+
+
+def test_route_executor_with_registry_processes(mock_osm):
+    """ Проверка загрузки графов регионов до запуска пула процессов исполнителя """
+    graphs = GraphRegistry(REGIONS, default_network_type='drive')
+    executor = executors.RouteExecutor(graphs, 'process', workers=1)
+    executor.shutdown()
+
+    assert mock_osm.call_count == len(REGIONS)
+    assert {item['region'] for item in graphs.stats()} == set(REGIONS)
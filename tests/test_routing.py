@@ -0,0 +1,140 @@
+import pytest
+
+import networkx as nx
+
+from route_builder import routing
+from route_builder.csr import CSRGraph
+from route_builder.heuristics import HaversineHeuristic, Landmarks
+from route_builder.hierarchies import ContractionHierarchy, build_hierarchies
+from route_builder.indexes import GraphIndexes
+
+
+def test_csr_graph(random_graph):
+    """ Проверка экспорта графа в CSR: параллельные ребра схлопываются к минимальному весу """
+    csr = CSRGraph.from_graph(random_graph)
+    assert csr.nodes_count == len(random_graph.nodes)
+    assert csr.edges_count == sum(len(adjacency) for adjacency in random_graph.adj.values())
+
+    for weight in ('length', 'travel_time'):
+        indptr, indices, weights = csr.adjacency(weight)
+        node = csr.positions([next(iter(random_graph.nodes))])[0]
+
+        for edge in range(indptr[node], indptr[node + 1]):
+            orig, dest = csr.to_node_ids([node, indices[edge]])
+            assert weights[edge] == min(data[weight] for data in random_graph[orig][dest].values())
+
+    reversed_csr = csr.reversed()
+    assert reversed_csr.edges_count == csr.edges_count
+    assert reversed_csr.reversed() is csr
+
+
+def _heuristic(csr: CSRGraph, engine: str):
+    """ Нижняя оценка расстояния для алгоритма """
+    if engine == 'astar':
+        return HaversineHeuristic(csr)
+
+    if engine == 'alt':
+        return Landmarks.build(csr, count=4)
+
+    return None
+
+
+@pytest.mark.parametrize('engine', ['dijkstra', 'bidirectional', 'astar', 'alt', 'ch'])
+@pytest.mark.parametrize('weight', ['length', 'travel_time'])
+def test_shortest_path(random_graph, engine, weight):
+    """ Проверка совпадения длины пути с networkx """
+    csr = CSRGraph.from_graph(random_graph)
+    indexes = GraphIndexes(csr, _heuristic(csr, engine), build_hierarchies(csr) if engine == 'ch' else None)
+    nodes = list(random_graph.nodes)
+
+    for orig in nodes[::7]:
+        lengths = nx.single_source_dijkstra_path_length(random_graph, orig, weight=weight)
+
+        for dest in nodes:
+            path = routing.shortest_path(indexes, orig, dest, weight, engine)
+
+            if dest not in lengths:
+                assert path is None
+                continue
+
+            assert path[0] == orig and path[-1] == dest
+            assert nx.path_weight(random_graph, path, weight) == pytest.approx(lengths[dest])
+
+
+@pytest.mark.parametrize('engine', ['astar', 'alt'])
+def test_heuristic_search(random_graph, engine):
+    """ Проверка совпадения расстояний поиска с нижней оценкой и алгоритма Дейкстры """
+    csr = CSRGraph.from_graph(random_graph)
+    indexes = GraphIndexes(csr, _heuristic(csr, engine))
+
+    for source in range(0, csr.nodes_count, 5):
+        for target in range(csr.nodes_count):
+            result = routing.search(indexes, source, target, 'length', engine)
+            baseline = routing.search(indexes, source, target, 'length', 'dijkstra')
+
+            assert (result is None) == (baseline is None)
+            if result:
+                assert result.distance == pytest.approx(baseline.distance)
+
+
+def test_heuristic_search_without_heuristic(random_graph):
+    """ Проверка возникновения ошибки при поиске A* без нижней оценки """
+    with pytest.raises(ValueError):
+        routing.search(GraphIndexes(CSRGraph.from_graph(random_graph)), 0, 1, 'length', 'astar')
+
+
+@pytest.mark.parametrize('witness_settled_limit', [1, 500])
+def test_contraction_hierarchy(random_graph, witness_settled_limit):
+    """ Проверка иерархии сжатия: ограничение поиска свидетеля добавляет ярлыки, но не меняет расстояния """
+    csr = CSRGraph.from_graph(random_graph)
+    hierarchy = ContractionHierarchy.build(csr, 'length', witness_settled_limit)
+    assert sorted(hierarchy.ranks.tolist()) == list(range(csr.nodes_count))
+
+    for source in range(0, csr.nodes_count, 5):
+        for target in range(csr.nodes_count):
+            result = hierarchy.search(source, target)
+            baseline = routing.search(GraphIndexes(csr), source, target, 'length', 'dijkstra')
+
+            assert (result is None) == (baseline is None)
+            if result:
+                assert result.distance == pytest.approx(baseline.distance)
+                assert result.path[0] == source and result.path[-1] == target
+
+
+def test_csr_graph_with_unknown_node(random_graph):
+    """ Проверка возникновения ошибки при поиске позиции отсутствующего узла """
+    with pytest.raises(ValueError):
+        CSRGraph.from_graph(random_graph).positions([0])
+
+
+@pytest.mark.parametrize('weight', ['length', 'travel_time'])
+def test_csr_path_sums(random_graph, weight):
+    """ Проверка сумм атрибутов путей: параллельные ребра выбираются по весу поиска """
+    csr = CSRGraph.from_graph(random_graph)
+    nodes = list(random_graph.nodes)
+
+    paths = []
+    for source, target in zip(nodes[:10], nodes[-10:]):
+        try:
+            paths.append(nx.shortest_path(random_graph, source, target, weight=weight))
+        except nx.NetworkXNoPath:
+            continue
+    paths.append(nodes[:1])
+
+    sums = csr.path_sums([csr.positions(path) for path in paths], weight, ('length', 'travel_time'))
+
+    for path, path_sums in zip(paths, sums):
+        edges = [min(random_graph[orig][dest].values(), key=lambda data: data[weight])
+                 for orig, dest in zip(path[:-1], path[1:])]
+
+        for attribute in ('length', 'travel_time'):
+            assert path_sums[attribute] == pytest.approx(sum(edge[attribute] for edge in edges))
+
+
+def test_csr_graph_with_unknown_edge(random_graph):
+    """ Проверка возникновения ошибки при поиске позиции отсутствующего ребра """
+    csr = CSRGraph.from_graph(random_graph)
+    node = csr.positions([next(node for node in random_graph.nodes if not random_graph.has_edge(node, node))])[0]
+
+    with pytest.raises(ValueError):
+        csr.edge_positions([node], [node])
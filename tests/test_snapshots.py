@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from route_builder import builders, utils
+from route_builder.snapshots import Snapshot, snapshot_path
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+@pytest.mark.parametrize('engine', ['networkx', 'dijkstra', 'alt', 'ch'])
+def test_graph_snapshot(mocker, mock_osm, tmp_path, engine):
+    """ Проверка сохранения и загрузки снимка графа с индексами """
+    mocker.patch('settings.SNAPSHOT_DIR', str(tmp_path))
+
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    assert not graph.load()
+
+    graph.load_or_build()
+    assert snapshot_path(str(tmp_path), bbox, 'drive').is_dir()
+
+    loaded = builders.Graph(bbox, 'drive', engine=engine)
+    assert loaded.load()
+    assert len(loaded.graph.nodes) == len(graph.graph.nodes)
+
+    lon, lat = [37.18581, 37.18954], [55.97999, 55.97863]
+    assert loaded.nearest_nodes(lon, lat) == graph.nearest_nodes(lon, lat)
+
+    nodes = graph.nearest_nodes(lon, lat)
+    for weight in ('length', 'travel_time'):
+        assert loaded.shortest_path(*nodes, weight) == graph.shortest_path(*nodes, weight)
+
+    if engine != 'networkx':
+        assert isinstance(loaded.csr.indices, np.memmap)
+
+    # BallTree индекса узлов использует массивы снимка и не строится заново
+    assert isinstance(loaded.node_index.tree_arrays()['data'], np.memmap)
+
+
+def test_graph_snapshot_with_other_sklearn_version(mocker, mock_osm, tmp_path):
+    """ Проверка построения BallTree заново, если снимок сохранен другой версией scikit-learn """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.save(str(tmp_path / 'snapshot'))
+
+    mocker.patch('sklearn.__version__', '0.0.0')
+    node_index = Snapshot.load(tmp_path / 'snapshot').node_index
+
+    lon, lat = [37.18581, 37.18954], [55.97999, 55.97863]
+    assert not isinstance(node_index.tree_arrays()['data'], np.memmap)
+    assert node_index.nearest_nodes(lon, lat) == graph.nearest_nodes(lon, lat)
+
+
+def test_graph_snapshot_with_other_version(mocker, mock_osm, tmp_path):
+    """ Проверка игнорирования снимка другой версии """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    graph.save(str(tmp_path / 'snapshot'))
+
+    mocker.patch('route_builder.snapshots.SNAPSHOT_VERSION', -1)
+    assert Snapshot.load(tmp_path / 'snapshot') is None
+
+
+def test_shared_graph(mock_osm, tmp_path):
+    """ Проверка подключения нескольких графов к разделяемому снимку без повторного построения """
+    graphs = [builders.Graph(bbox, 'drive', engine='bidirectional') for _ in range(2)]
+    for graph in graphs:
+        graph.load_shared(str(tmp_path))
+
+    mock_osm.assert_called_once()
+
+    coordinates = [(55.97999, 37.18581), (55.98006, 37.18981), (55.97863, 37.18954)]
+    routes = [builders.RouteBuilder(graph, coordinates).build() for graph in graphs]
+    assert routes[0] == routes[1]
+    assert isinstance(routes[0].length, float)
+
+    for graph in graphs:
+        assert graph._graph is None  # pylint: disable=protected-access
+        assert isinstance(graph.csr.indptr, np.memmap)
+
+
+def test_shared_graph_with_networkx_engine(tmp_path):
+    """ Проверка возникновения ошибки при подключении к разделяемому графу с алгоритмом networkx """
+    with pytest.raises(ValueError):
+        builders.Graph(bbox, 'drive', engine='networkx').load_shared(str(tmp_path))
@@ -0,0 +1,170 @@
+import numpy as np
+import networkx as nx
+import pytest
+
+from route_builder import builders, utils
+from route_builder.csr import CSRGraph
+from tests.utils import random_graph as random_graph_factory
+
+
+bbox = utils.Bbox(55.98323, 55.97630, 37.19288, 37.18280)
+
+
+def _apply(graph: nx.MultiDiGraph, updates: list) -> nx.MultiDiGraph:
+    """ Применение изменений ребер к MultiDiGraph для сравнения с networkx """
+    graph = graph.copy()
+
+    for update in updates:
+        if update.get('closed'):
+            graph.remove_edges_from([(update['u'], update['v'], key) for key in list(graph[update['u']][update['v']])])
+            continue
+
+        for data in graph[update['u']][update['v']].values():
+            data.update({name: value for name, value in update.items() if name in builders.EDGE_ATTRIBUTES})
+
+    return graph
+
+
+def _edges(graph: nx.MultiDiGraph, count: int, seed: int = 0) -> list:
+    """ Случайные ребра графа без петель """
+    edges = sorted({(orig, dest) for orig, dest in graph.edges() if orig != dest})
+    generator = np.random.default_rng(seed)
+    return [edges[index] for index in generator.choice(len(edges), count, replace=False)]
+
+
+def _changes(graph: nx.MultiDiGraph) -> tuple:
+    """ Перекрытие, замедление и ускорение случайных ребер: (изменения, граф networkx с изменениями, перекрытые ребра) """
+    closed, slower, faster = _edges(graph, 15), _edges(graph, 10, 1), _edges(graph, 10, 2)
+    updates = [{'u': orig, 'v': dest, 'closed': True} for orig, dest in closed]
+    updates += [{'u': orig, 'v': dest, 'length': 500.0, 'travel_time': 50.0}
+                for orig, dest in slower if (orig, dest) not in closed]
+    updates += [{'u': orig, 'v': dest, 'length': 0.5, 'speed_kph': 200.0}
+                for orig, dest in faster if (orig, dest) not in closed]
+
+    expected = _apply(graph, [{**update, 'travel_time': 0.5 * 3.6 / 200} if 'speed_kph' in update else update
+                              for update in updates])
+    return updates, expected, closed
+
+
+def test_csr_graph_updated(random_graph):
+    """ Проверка копирования измененных массивов: исходный граф и транспонированный граф согласованы """
+    csr = CSRGraph.from_graph(random_graph)
+    reversed_csr = csr.reversed()
+    edges = np.arange(0, csr.edges_count, 5)
+
+    values = {weight: {weight: np.full(len(edges), 1000.0)} for weight in csr.weights}
+    updated = csr.updated(edges, values)
+
+    assert (updated.weights['length'][edges] == 1000).all()
+    assert (csr.weights['length'][edges] != 1000).all()
+    assert updated.indices is csr.indices and updated.attributes['length']['travel_time'] is \
+        csr.attributes['length']['travel_time']
+
+    sources = updated.edge_sources(np.arange(csr.edges_count))
+    reversed_edges = reversed_csr.edge_positions(csr.indices, sources)
+    for weight in csr.weights:
+        assert (updated.reversed().weights[weight][reversed_edges] == updated.weights[weight]).all()
+        assert (reversed_csr.weights[weight][reversed_edges] == csr.weights[weight]).all()
+
+
+@pytest.mark.parametrize('engine', ['dijkstra', 'astar', 'alt', 'ch'])
+@pytest.mark.parametrize('weight', ['length', 'travel_time'])
+def test_graph_update_edges(mocker, mock_osm, engine, weight):
+    """ Проверка совпадения путей после перекрытия, замедления и ускорения ребер с networkx """
+    mocker.patch('settings.ALT_LANDMARKS', 4)
+    graph = builders.Graph(bbox, 'drive', engine=engine)
+    graph.build()
+
+    source = random_graph_factory(0)
+    legs = [(orig, dest) for orig in list(source)[::9] for dest in list(source)[::7] if orig != dest]
+    graph.build_legs(legs, weight)
+
+    updates, expected, closed = _changes(source)
+    result = graph.update_edges(updates)
+    assert result.version == 1 and result.edges == len(updates)
+
+    routes = graph.build_legs(legs, weight)
+
+    for (orig, dest), route in routes.items():
+        if not nx.has_path(expected, orig, dest):
+            assert route is None
+            continue
+
+        assert route.sums[weight] == pytest.approx(nx.shortest_path_length(expected, orig, dest, weight=weight))
+        assert not set(zip(route.path[:-1], route.path[1:])) & set(closed)
+
+
+def test_graph_update_edges_reset(mock_osm):
+    """ Проверка возврата исходных значений ребер """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    csr = graph.csr
+
+    edges = _edges(random_graph_factory(0), 20)
+    graph.update_edges([{'u': orig, 'v': dest, 'closed': True} for orig, dest in edges])
+    graph.update_edges([{'u': orig, 'v': dest, 'reset': True} for orig, dest in edges])
+
+    for weight in csr.weights:
+        assert (graph.csr.weights[weight] == csr.weights[weight]).all()
+        assert all((graph.csr.edge_attributes(weight)[attr_name] == values).all()
+                   for attr_name, values in csr.edge_attributes(weight).items())
+
+
+def test_graph_update_edges_cache(mocker, mock_osm):
+    """ Проверка удаления из кеша только участков, устаревших после обновления """
+    mocker.patch('settings.ROUTE_CACHE_SIZE', 100)
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    nodes = list(random_graph_factory(0).nodes)
+    routes = graph.build_legs([(orig, dest) for orig in nodes[:5] for dest in nodes[-5:]], 'length')
+    routes = {leg: route for leg, route in routes.items() if route and len(route.path) > 2}
+    leg, route = next(iter(routes.items()))
+    size = len(graph.route_cache)
+
+    result = graph.update_edges([{'u': route.path[0], 'v': route.path[1], 'length': 10000.0}])
+    assert result.invalidated_routes == sum(tuple(route.path[:2]) in zip(other.path[:-1], other.path[1:])
+                                            for other in routes.values())
+    assert len(graph.route_cache) == size - result.invalidated_routes
+    assert graph.route_cache.get((*leg, 'length'), graph.indexes().version) is None
+
+    # Уменьшение веса может сделать кратчайшим любой другой путь: удаляются все участки этого веса
+    graph.build_legs(list(routes), 'length')
+    result = graph.update_edges([{'u': route.path[0], 'v': route.path[1], 'length': 0.1}])
+    assert result.invalidated_routes == size
+    assert len(graph.route_cache) == 0
+
+
+def test_graph_indexes_snapshot(mock_osm):
+    """ Проверка построения участков по версии весов, полученной до обновления """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+
+    nodes = list(random_graph_factory(0).nodes)
+    legs = [(orig, dest) for orig in nodes[:5] for dest in nodes[-5:]]
+    indexes = graph.indexes()
+    routes = graph.build_legs(legs, 'length', indexes)
+
+    leg, route = next((leg, route) for leg, route in routes.items() if route and len(route.path) > 2)
+    graph.update_edges([{'u': route.path[0], 'v': route.path[1], 'closed': True}])
+
+    assert graph.build_legs([leg], 'length', indexes)[leg] == route
+    assert graph.build_legs([leg], 'length')[leg] != route
+
+
+def test_graph_update_edges_with_invalid_params(mock_osm):
+    """ Проверка возникновения ошибок при некорректных изменениях """
+    graph = builders.Graph(bbox, 'drive', engine='dijkstra')
+    graph.build()
+    orig, dest = _edges(random_graph_factory(0), 1)[0]
+
+    for updates in ([], [{'u': orig}], [{'u': orig, 'v': dest, 'length': -1}], [{'u': -1, 'v': dest}]):
+        with pytest.raises(ValueError):
+            graph.update_edges(updates)
+
+    assert isinstance(builders.update_graph(graph, edges=[]), utils.Error)
+    assert graph.indexes().version == 0
+
+    graph = builders.Graph(bbox, 'drive', engine='networkx')
+    with pytest.raises(ValueError, match='ROUTING_ENGINE'):
+        graph.update_edges([{'u': orig, 'v': dest, 'closed': True}])
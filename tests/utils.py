@@ -1,7 +1,9 @@
 from typing import Optional, Literal
 import json
+import random
 
 import aio_pika
+import networkx as nx
 
 
 class BaseQueueWorker:
@@ -100,3 +102,26 @@ class Consumer(BaseQueueWorker):
         """
         queue = await self.channel.declare_queue(self.routing_key, auto_delete=True)
         await queue.consume(self._process_message)
+
+
+def random_graph(seed: int, nodes: int = 60, edges: int = 180) -> nx.MultiDiGraph:
+    """
+    Случайный мультиграф в формате osmnx: узлы с координатами внутри тестовой зоны,
+    ребра (в том числе параллельные) с атрибутами length и travel_time
+    :param seed: начальное значение генератора
+    :param nodes: количество узлов
+    :param edges: количество ребер
+    :return: MultiDiGraph
+    """
+    generator = random.Random(seed)
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+
+    for node in range(nodes):
+        graph.add_node(node * 10 + 1, x=generator.uniform(37.18280, 37.19288), y=generator.uniform(55.97630, 55.98323))
+
+    node_ids = list(graph.nodes)
+    for _ in range(edges):
+        graph.add_edge(generator.choice(node_ids), generator.choice(node_ids),
+                       length=generator.uniform(1, 100), travel_time=generator.uniform(1, 10))
+
+    return graph